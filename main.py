@@ -1,38 +1,28 @@
-import torch
-from src.database.database_operations import inserir_metadados, obter_metadados_por_nome_arquivo
-from src.tests.test_models import load_test_documents, generate_embeddings, MODEL_NAMES
-from src.utils.db_vectores import criar_indice_chromadb, buscar_documentos_chromadb
+import os
+from src.tests.test_models import MODEL_NAMES
 
-if __name__ == "__main__":
-    DATA_DIR_TEST_DOCUMENTS = "data/test_documents"
-    documentos_teste = load_test_documents(DATA_DIR_TEST_DOCUMENTS)
 
-    if not documentos_teste:
+def main():
+    # Ponto de entrada pesado: indexação e busca (modelos, índice vetorial) só são importadas aqui, e não ao importar
+    # main.py. Comandos leves e buscas com o modelo residente ficam na CLI (`rag-sys`, src/cli.py).
+    from src.utils.embedding_cache import obter_cache_embeddings
+    from src.utils.query_cache import estatisticas_cache_queries
+    from src.utils.indexador import indexar_diretorio
+    from src.utils.instrumentacao import consultas_lentas, exportar_metricas, instrumentacao_ativa
+    from src.utils.model_registry import aquecer_modelos, estatisticas_modelos
+    from src.utils.query_classifier import estatisticas_roteador
+    from src.utils.roteador_consultas import estatisticas_rotas, responder_query
+
+    DATA_DIR_TEST_DOCUMENTS = "data/test_documents"
+    if not os.path.isdir(DATA_DIR_TEST_DOCUMENTS) or not os.listdir(DATA_DIR_TEST_DOCUMENTS):
         print(f"Nenhum documento de teste encontrado em {DATA_DIR_TEST_DOCUMENTS}.")
-        exit()
-
-#    print(f"Iniciando inserção de metadados para documentos em '{DATA_DIR_TEST_DOCUMENTS}':")
-#    for nome_arquivo_teste in documentos_teste.keys():
-#        insercao_sucesso = inserir_metadados(nome_arquivo_teste)
-#        if not insercao_sucesso:
-#            print(f"  - Falha ao inserir metadados para '{nome_arquivo_teste}'. Abortando.")
-#            exit()
-#        else:
-#            print(f"  - Metadados para '{nome_arquivo_teste}' inseridos com sucesso.")
-#
-#    print("Inserção de metadados concluída.")
-
-    # --- Geração de Embeddings e Criação do Índice ChromaDB ---
+        return
+
+    # --- Indexação Incremental (chunks + embeddings) no ChromaDB ---
     model_name = MODEL_NAMES[1]  # Usar o primeiro modelo da lista por enquanto
-    print(f"Gerando embeddings com modelo: {model_name}")
-    embeddings_docs, document_filenames, embedding_time = generate_embeddings(
-    model_name, documentos_teste, device="cpu", batch_size=32
-)  
-    # Passando lista de queries vazia
-    print(f"Embeddings gerados para o modelo {model_name}.")
-
-    print("Criando índice ChromaDB...")
-    criar_indice_chromadb(documentos_teste, embeddings_docs)
+    aquecer_modelos([model_name], device="cpu")  # Deixa o modelo residente antes da primeira busca
+    print(f"Indexando documentos com modelo: {model_name}")
+    indexar_diretorio(DATA_DIR_TEST_DOCUMENTS, model_name, device="cpu", batch_size=32)
     print("Índice ChromaDB criado.")
 
     # --- Loop de Busca (Simulação de Produção) - Redirecionando Saída ---
@@ -46,16 +36,38 @@ if __name__ == "__main__":
 
             tipo_documento_filtro = input("Filtrar por tipo de documento (pdf, txt, md, ou deixe em branco para todos): ").strip().lower() # Pede o tipo de documento para filtro
 
-            resultados = buscar_documentos_chromadb(query, model_name, tipo_documento_filtro=tipo_documento_filtro) # Passa o filtro para a função de busca
+            # Contagens e listagens vão direto ao SQL; as demais, para a busca híbrida (vetorial + BM25)
+            resposta = responder_query(query, model_name, tipo_documento_filtro=tipo_documento_filtro) # Passa o filtro para o roteador
 
-            if resultados:
+            if resposta["tipo"] == "contagem":
+                print(f"\nTotal de documentos ({resposta['filtros']}): {resposta['total']}", file=output_file)
+            elif resposta["tipo"] == "listagem":
+                print(f"\nDocumentos ({resposta['filtros']}):", file=output_file)
+                for documento in resposta["documentos"]:
+                    print(f"  - {documento['nome_arquivo']} (Tipo: {documento['tipo_documento']}, modificado em {documento['data_modificacao']})", file=output_file)
+            elif resposta["resultados"]:
                 print("\nResultados da busca:", file=output_file)
-                for resultado in resultados:
+                for resultado in resposta["resultados"]:
                     print(f"  - Nome do arquivo: {resultado['nome_arquivo']} (Tipo: {resultado['tipo_documento']})", file=output_file) # Mostra o tipo de documento nos resultados
-                    print(f"    Trecho: {resultado['trecho']}", file=output_file)
-                    print(f"    Score: {resultado['score']:.4f}", file=output_file)
+                    print(f"    Trecho ({resultado['chunk_id']}): {resultado['trecho']}", file=output_file)
+                    print(f"    Score (RRF): {resultado['score']:.4f} - posições: {resultado['posicoes']}", file=output_file)
                     print("-" * 20, file=output_file)
             else:
                 print("Nenhum documento encontrado para a sua busca.", file=output_file)
 
-    print("Programa encerrado. Resultados da busca salvos em 'resultados_busca.txt'.")
\ No newline at end of file
+    print(f"Estatísticas do registro de modelos: {estatisticas_modelos()}")
+    print(f"Estatísticas do cache de embeddings: {obter_cache_embeddings().estatisticas()}")
+    print(f"Estatísticas do cache de queries: {estatisticas_cache_queries()}")
+    print(f"Estatísticas do roteador de queries: {estatisticas_roteador()}")
+    print(f"Latência por rota: {estatisticas_rotas()}")
+    if instrumentacao_ativa():  # RAG_INSTRUMENTACAO=1
+        with open("metricas.prom", "w", encoding="utf-8") as f:
+            f.write(exportar_metricas("prometheus"))
+        print("Métricas de instrumentação salvas em 'metricas.prom'.")
+        if consultas_lentas.capacidade:  # RAG_CONSULTAS_LENTAS=N
+            print(f"Consultas mais lentas salvas em: {consultas_lentas.despejar()}")
+    print("Programa encerrado. Resultados da busca salvos em 'resultados_busca.txt'.")
+
+
+if __name__ == "__main__":
+    main()
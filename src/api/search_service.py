@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Serviço HTTP assíncrono de busca, sem dependências externas (apenas asyncio).
+
+Endpoints:
+    GET  /busca?q=<texto>&n=<n_results>&tipo=<pdf|txt|md>
+    POST /busca   {"query": "...", "n_results": 10, "tipo_documento": "pdf"}
+    POST /sessao  {"codigo": "..."}
+    GET  /saude   -> {"status": "ok", "modelo": ..., "indice": ..., "armazenamento": ...}
+    GET  /metricas[?formato=prometheus]
+
+Requisições que chegam dentro de uma janela de poucos milissegundos são
+agrupadas em um lote: as queries do lote são codificadas em uma única chamada a
+`model.encode` (em uma thread de trabalho) e enviadas ao ChromaDB em uma única
+consulta por combinação de filtros. Com o re-ranqueador ativo (`--reranker`), o
+lote busca `RAG_RERANK_CANDIDATOS` candidatos por query e cada query é reordenada
+por um cross-encoder dentro do seu orçamento de tempo.
+
+Sem concessão, as buscas só enxergam documentos públicos. `POST /sessao` verifica
+o código de acesso (bcrypt, uma vez) e devolve uma concessão assinada e com
+prazo, enviada nas buscas seguintes no cabeçalho `Authorization: Bearer <concessao>`
+(ou no parâmetro/campo `concessao`).
+
+Uma busca pode informar `modelo`, `indice` e `armazenamento` (parâmetros ou
+campos JSON); se algum diferir do que o serviço carregou, a resposta é 409, em
+vez de resultados de outro índice ou de embeddings de outro modelo.
+
+Uso:
+    python -m src.api.search_service --porta 8000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+from src.config import carregar_ambiente
+from src.utils.controle_acesso import abrir_sessao, ler_concessao
+from src.utils.instrumentacao import ativar_instrumentacao, exportar_metricas, medir_consulta
+
+carregar_ambiente()
+
+# Janela de agrupamento (ms), tamanho máximo do lote, requisições simultâneas e tamanho da fila
+JANELA_LOTE_MS = float(os.environ.get("RAG_SERVICO_JANELA_MS", "5"))
+MAX_LOTE = int(os.environ.get("RAG_SERVICO_MAX_LOTE", "32"))
+MAX_CONCORRENCIA = int(os.environ.get("RAG_SERVICO_MAX_CONCORRENCIA", "256"))
+MAX_FILA = int(os.environ.get("RAG_SERVICO_MAX_FILA", "512"))
+
+# Tamanho máximo do corpo de uma requisição (bytes)
+MAX_CORPO = 64 * 1024
+
+_STATUS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class RequisicaoInvalida(Exception):
+    """Erro de requisição HTTP que deve ser respondido com o status informado."""
+
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+
+class ServicoBusca:
+    """
+    Servidor de busca com agrupamento de queries em micro-lotes.
+
+    Cada requisição de busca entra em uma fila limitada (`max_fila`); se a fila
+    estiver cheia, o serviço responde 503 imediatamente (backpressure) em vez de
+    acumular latência. Um único coletor retira a primeira requisição da fila,
+    espera até `janela_ms` por outras (ou até `max_lote`) e processa o lote em
+    uma thread de trabalho. O número de requisições em atendimento simultâneo é
+    limitado por `max_concorrencia`.
+    """
+
+    def __init__(self, model_name, index_name="documentos_index", janela_ms=JANELA_LOTE_MS, max_lote=MAX_LOTE,
+                 max_concorrencia=MAX_CONCORRENCIA, max_fila=MAX_FILA, backend=None, armazenamento=None,
+                 reranker=None, orcamento_rerank_ms=None):
+        self.model_name = model_name
+        self.index_name = index_name
+        self.janela_s = janela_ms / 1000
+        self.max_lote = max_lote
+        self.max_concorrencia = max_concorrencia
+        self.max_fila = max_fila
+        self.backend = backend
+        self.armazenamento = armazenamento
+        self.reranker = reranker  # Nome do cross-encoder, ou None para devolver a ordem da busca vetorial
+        self.orcamento_rerank_ms = orcamento_rerank_ms
+        self._fila = None
+        self._semaforo = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="busca-lote")
+        self._estatisticas = {"requisicoes": 0, "rejeitadas": 0, "erros": 0, "lotes": 0, "queries_em_lote": 0}
+
+    # --- Micro-lotes ---------------------------------------------------------------
+
+    async def buscar(self, query, n_results=10, tipo_documento=None, concessao=None):
+        """Enfileira uma busca e aguarda o resultado do lote em que ela for processada."""
+        futuro = asyncio.get_running_loop().create_future()
+        try:
+            self._fila.put_nowait((query, n_results, tipo_documento, concessao, futuro))
+        except asyncio.QueueFull:
+            self._estatisticas["rejeitadas"] += 1
+            raise RequisicaoInvalida(503, "Fila de buscas cheia, tente novamente.")
+        return await futuro
+
+    async def _coletar_lotes(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            lote = [await self._fila.get()]
+            prazo = loop.time() + self.janela_s
+            while len(lote) < self.max_lote:
+                restante = prazo - loop.time()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(await asyncio.wait_for(self._fila.get(), restante))
+                except asyncio.TimeoutError:
+                    break
+
+            self._estatisticas["lotes"] += 1
+            self._estatisticas["queries_em_lote"] += len(lote)
+            try:
+                resultados = await loop.run_in_executor(self._executor, self._processar_lote, lote)
+            except Exception as e:
+                for *_, futuro in lote:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+                continue
+            for (*_, futuro), resultado in zip(lote, resultados):
+                if not futuro.done():
+                    futuro.set_result(resultado)
+
+    def _processar_lote(self, lote):
+        """Executa um lote na thread de trabalho: um encode e uma consulta ao ChromaDB por grupo de filtros.
+
+        Concessões que liberam os mesmos níveis caem no mesmo grupo; a primeira delas representa o grupo.
+        """
+        from src.utils.db_vectores import buscar_documentos_chromadb_em_lote
+        from src.utils.reranker import N_CANDIDATOS_RERANK, ORCAMENTO_RERANK_MS, reranquear
+        from src.utils.vector_store import obter_sessao_vetorial
+
+        with medir_consulta("lote", [query for query, *_ in lote]):
+            sessao = obter_sessao_vetorial(self.armazenamento)
+            grupos, concessoes = {}, {}
+            for posicao, (query, n_results, tipo_documento, concessao, _) in enumerate(lote):
+                lida = ler_concessao(concessao)
+                chave = (n_results, tipo_documento, lida[0] if lida else None)
+                concessoes.setdefault(chave, concessao)
+                grupos.setdefault(chave, []).append(posicao)
+
+            resultados = [None] * len(lote)
+            for chave, posicoes in grupos.items():
+                n_results, tipo_documento, _ = chave
+                resultados_grupo = buscar_documentos_chromadb_em_lote(
+                    [lote[posicao][0] for posicao in posicoes],
+                    self.model_name,
+                    index_name=self.index_name,
+                    n_results=max(n_results, N_CANDIDATOS_RERANK) if self.reranker else n_results,
+                    tipo_documento_filtro=tipo_documento,
+                    sessao=sessao,
+                    backend=self.backend,
+                    concessao=concessoes[chave],
+                )
+                for posicao, resultado in zip(posicoes, resultados_grupo):
+                    if self.reranker:
+                        resultado = reranquear(lote[posicao][0], resultado, model_name=self.reranker, n_results=n_results,
+                                               orcamento_ms=self.orcamento_rerank_ms or ORCAMENTO_RERANK_MS)
+                    resultados[posicao] = resultado
+            return resultados
+
+    def aquecer(self):
+        """Abre o índice e faz uma busca descartável: a primeira requisição não paga a abertura do índice."""
+        from src.utils.db_vectores import buscar_documentos_chromadb_em_lote
+        from src.utils.vector_store import obter_sessao_vetorial
+
+        try:
+            buscar_documentos_chromadb_em_lote(["aquecimento"], self.model_name, index_name=self.index_name, n_results=1,
+                                               sessao=obter_sessao_vetorial(self.armazenamento), backend=self.backend)
+        except Exception as e:
+            print(f"Aviso: índice '{self.index_name}' não aquecido: {e}")
+
+    def configuracao(self):
+        """Modelo, índice e armazenamento atendidos pelo serviço (devolvidos em /saude)."""
+        from src.utils.vector_store import ARMAZENAMENTO_PADRAO
+
+        return {"modelo": self.model_name, "indice": self.index_name,
+                "armazenamento": self.armazenamento or ARMAZENAMENTO_PADRAO}
+
+    def _verificar_configuracao(self, pedida):
+        """Levanta 409 se a busca pede um modelo, índice ou armazenamento diferente do carregado."""
+        divergentes = [f"{campo} '{valor}' (serviço: '{atual}')" for campo, atual in self.configuracao().items()
+                       if (valor := pedida.get(campo)) not in (None, "", atual)]
+        if divergentes:
+            raise RequisicaoInvalida(409, f"Serviço carregado com outra configuração: {', '.join(divergentes)}.")
+
+    # --- HTTP ------------------------------------------------------------------------
+
+    async def _ler_requisicao(self, reader):
+        linha = await reader.readline()
+        if not linha:
+            return None
+        try:
+            metodo, alvo, _ = linha.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise RequisicaoInvalida(400, "Linha de requisição inválida.")
+
+        cabecalhos = {}
+        while True:
+            linha = await reader.readline()
+            if linha in (b"\r\n", b"\n", b""):
+                break
+            nome, _, valor = linha.decode("latin-1").partition(":")
+            cabecalhos[nome.strip().lower()] = valor.strip()
+
+        tamanho = cabecalhos.get("content-length", "").strip() or "0"
+        if not (tamanho.isascii() and tamanho.isdigit()):  # Sem sinal ("-1") nem dígitos não ASCII ("²")
+            raise RequisicaoInvalida(400, "Content-Length inválido.")
+        tamanho = int(tamanho)
+        if tamanho > MAX_CORPO:
+            raise RequisicaoInvalida(413, "Corpo da requisição muito grande.")
+        corpo = await reader.readexactly(tamanho) if tamanho else b""
+        return metodo.upper(), alvo, cabecalhos, corpo
+
+    async def _abrir_sessao(self, metodo, corpo):
+        if metodo != "POST":
+            raise RequisicaoInvalida(405, f"Método não suportado: {metodo}")
+        try:
+            codigo = json.loads(corpo or b"{}").get("codigo")
+        except (json.JSONDecodeError, AttributeError):
+            raise RequisicaoInvalida(400, "Corpo JSON inválido.")
+        if not codigo or not isinstance(codigo, str):
+            raise RequisicaoInvalida(400, "Campo 'codigo' é obrigatório.")
+        # O bcrypt leva centenas de ms: roda fora do loop de eventos
+        sessao = await asyncio.get_running_loop().run_in_executor(None, abrir_sessao, codigo)
+        if sessao is None:
+            raise RequisicaoInvalida(401, "Código de acesso inválido.")
+        return 200, sessao
+
+    async def _rotear(self, metodo, alvo, cabecalhos, corpo):
+        url = urlsplit(alvo)
+        if url.path == "/saude":
+            return 200, {"status": "ok", **self.configuracao()}
+        if url.path == "/metricas":
+            if parse_qs(url.query).get("formato") == ["prometheus"]:
+                return 200, exportar_metricas("prometheus")
+            return 200, self.metricas()
+        if url.path == "/sessao":
+            return await self._abrir_sessao(metodo, corpo)
+        if url.path != "/busca":
+            raise RequisicaoInvalida(404, f"Rota não encontrada: {url.path}")
+
+        if metodo == "GET":
+            parametros = {chave: valores[0] for chave, valores in parse_qs(url.query).items()}
+            query, n_results, tipo = parametros.get("q"), parametros.get("n", 10), parametros.get("tipo")
+            concessao = parametros.get("concessao")
+        elif metodo == "POST":
+            try:
+                dados = json.loads(corpo or b"{}")
+            except json.JSONDecodeError:
+                raise RequisicaoInvalida(400, "Corpo JSON inválido.")
+            if not isinstance(dados, dict):
+                raise RequisicaoInvalida(400, "Corpo JSON deve ser um objeto.")
+            query, n_results, tipo = dados.get("query"), dados.get("n_results", 10), dados.get("tipo_documento")
+            concessao = dados.get("concessao")
+            parametros = dados
+        else:
+            raise RequisicaoInvalida(405, f"Método não suportado: {metodo}")
+        self._verificar_configuracao(parametros)
+
+        if not query:
+            raise RequisicaoInvalida(400, "Parâmetro 'q'/'query' é obrigatório.")
+        try:
+            n_results = max(1, min(int(n_results), 100))
+        except (TypeError, ValueError):
+            raise RequisicaoInvalida(400, "n_results deve ser um inteiro.")
+
+        autorizacao = cabecalhos.get("authorization", "")
+        if autorizacao[:7].lower() == "bearer ":
+            concessao = autorizacao[7:].strip()
+        if concessao and ler_concessao(concessao) is None:
+            # Melhor recusar que responder só com os públicos: o cliente sabe que precisa abrir outra sessão
+            raise RequisicaoInvalida(401, "Concessão inválida ou expirada.")
+
+        inicio = time.perf_counter()
+        resultados = await self.buscar(query, n_results, tipo or None, concessao or None)
+        return 200, {"query": query, "resultados": resultados, "tempo_ms": (time.perf_counter() - inicio) * 1000}
+
+    async def _atender_conexao(self, reader, writer):
+        try:
+            while True:
+                try:
+                    requisicao = await self._ler_requisicao(reader)
+                except RequisicaoInvalida as e:
+                    await self._responder(writer, e.status, {"erro": str(e)}, manter_conexao=False)
+                    break
+                if requisicao is None:
+                    break
+                metodo, alvo, cabecalhos, corpo = requisicao
+                manter_conexao = cabecalhos.get("connection", "").lower() != "close"
+
+                self._estatisticas["requisicoes"] += 1
+                async with self._semaforo:
+                    try:
+                        status, resposta = await self._rotear(metodo, alvo, cabecalhos, corpo)
+                    except RequisicaoInvalida as e:
+                        status, resposta = e.status, {"erro": str(e)}
+                    except Exception as e:
+                        self._estatisticas["erros"] += 1
+                        status, resposta = 500, {"erro": f"Erro interno: {e}"}
+                await self._responder(writer, status, resposta, manter_conexao)
+                if not manter_conexao:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _responder(self, writer, status, resposta, manter_conexao):
+        if isinstance(resposta, str):  # Texto de exposição do Prometheus
+            corpo, tipo = resposta.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            corpo, tipo = json.dumps(resposta, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+        cabecalhos = [
+            f"HTTP/1.1 {status} {_STATUS.get(status, '')}",
+            f"Content-Type: {tipo}",
+            f"Content-Length: {len(corpo)}",
+            f"Connection: {'keep-alive' if manter_conexao else 'close'}",
+        ]
+        if status == 503:
+            cabecalhos.append("Retry-After: 1")
+        writer.write(("\r\n".join(cabecalhos) + "\r\n\r\n").encode("latin-1") + corpo)
+        await writer.drain()
+
+    def metricas(self):
+        """Contadores do serviço (requisições, rejeições, lotes e tamanho médio do lote), da instrumentação e do re-ranqueador."""
+        from src.utils.reranker import estatisticas_reranker
+
+        lotes = self._estatisticas["lotes"]
+        return {
+            **self._estatisticas,
+            "tamanho_medio_lote": self._estatisticas["queries_em_lote"] / lotes if lotes else 0.0,
+            "fila": self._fila.qsize() if self._fila else 0,
+            "instrumentacao": exportar_metricas(),
+            **({"reranker": estatisticas_reranker()} if self.reranker else {}),
+        }
+
+    async def iniciar(self, host="127.0.0.1", porta=8000):
+        """Inicia o servidor e retorna o `asyncio.Server` (o coletor de lotes roda em segundo plano)."""
+        self._fila = asyncio.Queue(maxsize=self.max_fila)
+        self._semaforo = asyncio.Semaphore(self.max_concorrencia)
+        self._tarefa_coletor = asyncio.create_task(self._coletar_lotes())
+        return await asyncio.start_server(self._atender_conexao, host, porta, backlog=1024)
+
+    async def servir(self, host="127.0.0.1", porta=8000):
+        """Inicia o servidor e atende requisições até ser interrompido."""
+        servidor = await self.iniciar(host, porta)
+        print(f"Serviço de busca ouvindo em http://{host}:{porta} (modelo {self.model_name}, índice '{self.index_name}').")
+        async with servidor:
+            await servidor.serve_forever()
+
+
+def main(argv=None):
+    from src.utils.encoders import BACKEND_PADRAO, BACKENDS
+    from src.utils.indexador import MODELO_PADRAO
+    from src.utils.model_registry import aquecer_modelos
+    from src.utils.reranker import MODELO_RERANKER, ORCAMENTO_RERANK_MS, RERANKER_ATIVO
+    from src.utils.vector_store import ARMAZENAMENTO_PADRAO, ARMAZENAMENTOS
+
+    parser = argparse.ArgumentParser(description="Serviço HTTP de busca do rag-sys.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8000)
+    parser.add_argument("--modelo", default=MODELO_PADRAO)
+    parser.add_argument("--indice", default="documentos_index")
+    parser.add_argument("--backend", choices=BACKENDS, default=BACKEND_PADRAO)
+    parser.add_argument("--armazenamento", choices=ARMAZENAMENTOS, default=ARMAZENAMENTO_PADRAO)
+    parser.add_argument("--janela-ms", type=float, default=JANELA_LOTE_MS)
+    parser.add_argument("--max-lote", type=int, default=MAX_LOTE)
+    parser.add_argument("--max-concorrencia", type=int, default=MAX_CONCORRENCIA)
+    parser.add_argument("--max-fila", type=int, default=MAX_FILA)
+    parser.add_argument("--instrumentacao", action="store_true",
+                        help="Mede as etapas das buscas (expostas em /metricas). Padrão: RAG_INSTRUMENTACAO")
+    parser.add_argument("--consultas-lentas", type=int, default=None,
+                        help="Guarda as N buscas mais lentas com o detalhamento por etapa. Padrão: RAG_CONSULTAS_LENTAS")
+    parser.add_argument("--reranker", action="store_true", default=RERANKER_ATIVO,
+                        help="Re-ranqueia os candidatos com um cross-encoder. Padrão: RAG_RERANKER")
+    parser.add_argument("--modelo-reranker", default=MODELO_RERANKER)
+    parser.add_argument("--orcamento-rerank-ms", type=float, default=ORCAMENTO_RERANK_MS,
+                        help="Tempo máximo de re-ranqueamento por query (ms).")
+    args = parser.parse_args(argv)
+
+    if args.instrumentacao or args.consultas_lentas:
+        ativar_instrumentacao(consultas_lentas_max=args.consultas_lentas)
+
+    reranker = args.modelo_reranker if args.reranker else None
+    # A primeira requisição não paga o carregamento dos modelos nem a abertura do índice
+    aquecer_modelos([args.modelo], backend=args.backend, reranker=reranker)
+    servico = ServicoBusca(args.modelo, args.indice, args.janela_ms, args.max_lote, args.max_concorrencia,
+                           args.max_fila, args.backend, args.armazenamento, reranker, args.orcamento_rerank_ms)
+    servico.aquecer()
+    try:
+        asyncio.run(servico.servir(args.host, args.porta))
+    except KeyboardInterrupt:
+        print("Serviço de busca encerrado.")
+
+
+if __name__ == "__main__":
+    main()
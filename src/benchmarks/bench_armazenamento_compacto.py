@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos formatos compactos do armazenamento NumPy: precisão, redução de dimensão e re-scoring.
+
+Gera embeddings sintéticos parecidos com os de um encoder real (agrupados, com
+espectro decrescente e uma rotação aleatória, de modo que nenhuma coordenada
+seja privilegiada) e, para cada formato, popula uma coleção `ColecaoNumpy` e mede:
+  - tamanho em disco dos arquivos de vetores (matriz de busca, escalas, cópia completa e projeção);
+  - memória varrida pela busca: a matriz de busca (e escalas), que precisa ficar
+    no cache de páginas; a cópia completa só é lida nas linhas dos candidatos;
+  - latência p50/p95 de uma query;
+  - recall@k em relação ao top-k exato em float32.
+
+Com redução por PCA, ela é reajustada com todo o corpus depois da carga.
+Formatos cuja dimensão reduzida não é menor que `--dimensao` são pulados.
+
+Uso:
+    python -m src.benchmarks.bench_armazenamento_compacto --vetores 100000 --dimensao 1024
+    python -m src.benchmarks.bench_armazenamento_compacto --formatos float32 int8 int8:pca256 --fator-rescore 8
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from src.benchmarks.estatisticas import percentil
+from src.utils.numpy_store import ColecaoNumpy, buscar_top_k, normalizar_vetores
+
+# Formato: "dtype" ou "dtype:pcaN" / "dtype:truncarN"; o sufixo "-exato" desliga o re-scoring
+FORMATOS_PADRAO = ("float32", "float16", "int8", "int8-exato", "int8:pca256", "float16:pca256", "float16:truncar256")
+
+
+def gerar_embeddings(n_vetores, dimensao, n_centros=512, seed=42):
+    """Vetores normalizados agrupados em torno de centros, com variância decrescente por componente e rotacionados."""
+    rng = np.random.default_rng(seed)
+    espectro = np.arange(1, dimensao + 1, dtype=np.float32) ** -0.75
+    rotacao, _ = np.linalg.qr(rng.standard_normal((dimensao, dimensao)))
+    rotacao = rotacao.astype(np.float32)
+    centros = rng.standard_normal((n_centros, dimensao), dtype=np.float32) * espectro
+    vetores = np.empty((n_vetores, dimensao), dtype=np.float32)
+    for inicio in range(0, n_vetores, 10_000):
+        fim = min(inicio + 10_000, n_vetores)
+        ruido = 0.6 * rng.standard_normal((fim - inicio, dimensao), dtype=np.float32) * espectro
+        vetores[inicio:fim] = (centros[rng.integers(n_centros, size=fim - inicio)] + ruido) @ rotacao
+    return normalizar_vetores(vetores)
+
+
+def interpretar_formato(formato, fator_rescore):
+    """'int8:pca256-exato' -> kwargs de `ColecaoNumpy`."""
+    exato = formato.endswith("-exato")
+    dtype, _, reducao = formato.removesuffix("-exato").partition(":")
+    kwargs = {"dtype": dtype, "fator_rescore": 0 if exato else fator_rescore}
+    if reducao:
+        nome = reducao.rstrip("0123456789")
+        kwargs.update(reducao=nome, dimensao_reduzida=int(reducao[len(nome):]))
+    return kwargs
+
+
+def popular(colecao, vetores, tamanho_lote=5000):
+    inicio = time.perf_counter()
+    for inicio_lote in range(0, len(vetores), tamanho_lote):
+        fim_lote = min(inicio_lote + tamanho_lote, len(vetores))
+        colecao.upsert(ids=[f"doc_{i}" for i in range(inicio_lote, fim_lote)], embeddings=vetores[inicio_lote:fim_lote])
+    if colecao.formato["dimensao_reduzida"] and colecao.formato["reducao"] == "pca":
+        colecao.ajustar_reducao()  # Ajuste com o corpus inteiro, e não só com os primeiros vetores
+    colecao.fechar()
+    return time.perf_counter() - inicio
+
+
+def tamanhos_mb(colecao):
+    """(disco, varrido na busca) em MB: arquivos .npy da coleção e matriz de busca com as escalas."""
+    disco = sum(os.path.getsize(os.path.join(colecao.diretorio, nome))
+                for nome in os.listdir(colecao.diretorio) if nome.endswith(".npy"))
+    matriz = colecao._vetores if colecao._vetores is not None else colecao._completos
+    n = colecao.count()
+    varrido = matriz[:n].nbytes + (colecao._escalas[:n].nbytes if colecao._escalas is not None else 0)
+    return disco / 1e6, varrido / 1e6
+
+
+def medir(colecao, queries, n_results, exatos):
+    latencias, recalls = [], []
+    for query, exato in zip(queries, exatos):
+        inicio = time.perf_counter()
+        resultado = colecao.query(query_embeddings=query[None, :], n_results=n_results, include=["distances"])
+        latencias.append(time.perf_counter() - inicio)
+        recalls.append(len(set(resultado["ids"][0]) & exato) / len(exato))
+    return percentil(latencias, 50) * 1000, percentil(latencias, 95) * 1000, float(np.mean(recalls))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vetores", type=int, default=100_000)
+    parser.add_argument("--dimensao", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--n-results", type=int, default=10)
+    parser.add_argument("--fator-rescore", type=int, default=4, help="Candidatos por resultado no re-scoring")
+    parser.add_argument("--formatos", nargs="+", default=list(FORMATOS_PADRAO),
+                        help="dtype[:pcaN|:truncarN][-exato], ex.: int8:pca256 (padrão: %(default)s)")
+    args = parser.parse_args()
+
+    vetores = gerar_embeddings(args.vetores, args.dimensao)
+    rng = np.random.default_rng(7)
+    amostra = vetores[rng.integers(args.vetores, size=args.queries)]
+    queries = normalizar_vetores(amostra + 0.05 * rng.standard_normal(amostra.shape, dtype=np.float32))
+    linhas_exatas, _ = buscar_top_k(queries, vetores, args.n_results)
+    exatos = [{f"doc_{linha}" for linha in linhas} for linhas in linhas_exatas.tolist()]
+
+    diretorio = tempfile.mkdtemp(prefix="bench_armazenamento_compacto_")
+    print(f"{args.vetores} vetores de {args.dimensao} dimensões, {args.queries} queries, "
+          f"re-scoring com {args.fator_rescore}x candidatos.\n")
+    print(f"{'formato':<22} {'carga (s)':>9} {'disco (MB)':>11} {'varrido (MB)':>13} "
+          f"{'p50 (ms)':>9} {'p95 (ms)':>9} {f'recall@{args.n_results}':>10}")
+    for formato in args.formatos:
+        kwargs = interpretar_formato(formato, args.fator_rescore)
+        if kwargs.get("dimensao_reduzida", 0) >= args.dimensao:
+            print(f"{formato:<22} pulado: a redução não é menor que {args.dimensao} dimensões")
+            continue
+        colecao = ColecaoNumpy(os.path.join(diretorio, formato.replace(":", "_")), **kwargs)
+        carga = popular(colecao, vetores)
+        medir(colecao, queries[:10], args.n_results, exatos[:10])  # Aquecimento (cache de páginas)
+        p50, p95, recall = medir(colecao, queries, args.n_results, exatos)
+        disco, varrido = tamanhos_mb(colecao)
+        print(f"{formato:<22} {carga:>9.1f} {disco:>11.1f} {varrido:>13.1f} {p50:>9.2f} {p95:>9.2f} {recall:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark de latência de busca no ChromaDB: cliente novo a cada query (frio) vs. sessão compartilhada (quente).
+
+Uso:
+    python -m src.benchmarks.bench_chroma_session --vetores 100000 --dimensao 1024 --queries 50
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+from src.benchmarks.estatisticas import percentil
+from src.utils.chroma_session import SessaoChroma
+
+NOME_COLECAO = "benchmark_index"
+
+
+def popular_colecao(persist_path, n_vetores, dimensao, tamanho_lote=5000, seed=42):
+    """Cria uma coleção sintética com `n_vetores` vetores aleatórios normalizados."""
+    rng = np.random.default_rng(seed)
+    client = chromadb.PersistentClient(path=persist_path)
+    colecao = client.get_or_create_collection(name=NOME_COLECAO)
+
+    inicio = time.perf_counter()
+    for inicio_lote in range(0, n_vetores, tamanho_lote):
+        fim_lote = min(inicio_lote + tamanho_lote, n_vetores)
+        vetores = rng.standard_normal((fim_lote - inicio_lote, dimensao), dtype=np.float32)
+        vetores /= np.linalg.norm(vetores, axis=1, keepdims=True)
+        colecao.add(
+            embeddings=vetores.tolist(),
+            ids=[f"doc_{i}" for i in range(inicio_lote, fim_lote)],
+        )
+    print(f"Coleção sintética com {n_vetores} vetores ({dimensao} dims) criada em {time.perf_counter() - inicio:.1f} s.")
+
+
+def _resumo(nome, latencias):
+    print(
+        f"{nome:<8} média={statistics.mean(latencias) * 1000:8.2f} ms  "
+        f"p50={percentil(latencias, 50) * 1000:8.2f} ms  "
+        f"p99={percentil(latencias, 99) * 1000:8.2f} ms"
+    )
+
+
+def medir_frio(persist_path, queries, n_results):
+    """Reproduz o comportamento antigo: novo PersistentClient e nova resolução da coleção por query."""
+    latencias = []
+    for query in queries:
+        chromadb.api.client.SharedSystemClient.clear_system_cache()
+        inicio = time.perf_counter()
+        client = chromadb.PersistentClient(path=persist_path)
+        colecao = client.get_collection(name=NOME_COLECAO)
+        colecao.query(query_embeddings=[query], n_results=n_results)
+        latencias.append(time.perf_counter() - inicio)
+    return latencias
+
+
+def medir_quente(persist_path, queries, n_results):
+    """Usa uma única SessaoChroma para todas as queries (após uma query de aquecimento)."""
+    chromadb.api.client.SharedSystemClient.clear_system_cache()
+    sessao = SessaoChroma(persist_path)
+    sessao.executar(NOME_COLECAO, lambda c: c.query(query_embeddings=[queries[0]], n_results=n_results))
+
+    latencias = []
+    for query in queries:
+        inicio = time.perf_counter()
+        sessao.executar(NOME_COLECAO, lambda c: c.query(query_embeddings=[query], n_results=n_results))
+        latencias.append(time.perf_counter() - inicio)
+    return latencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vetores", type=int, default=100_000)
+    parser.add_argument("--dimensao", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--n-results", type=int, default=30)
+    parser.add_argument("--diretorio", default=None, help="Diretório da coleção (padrão: diretório temporário)")
+    args = parser.parse_args()
+
+    diretorio = args.diretorio or tempfile.mkdtemp(prefix="bench_chroma_")
+    persist_path = os.path.join(diretorio, "chroma_db")
+    if not os.path.exists(persist_path):
+        popular_colecao(persist_path, args.vetores, args.dimensao)
+
+    rng = np.random.default_rng(7)
+    queries = rng.standard_normal((args.queries, args.dimensao), dtype=np.float32)
+    queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).tolist()
+
+    _resumo("frio", medir_frio(persist_path, queries, args.n_results))
+    _resumo("quente", medir_quente(persist_path, queries, args.n_results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos backends de inferência do encoder (torch fp32, torch int8 e ONNX int8) em CPU.
+
+Mede, para cada backend: documentos/s na geração de embeddings, latência p50/p99
+de codificação de uma query, RSS do processo e o recall@10 em relação ao fp32
+nas QUERIES de `src.tests.test_models` (fração dos 10 documentos mais próximos
+do fp32 que o backend também recupera).
+
+Uso:
+    python -m src.benchmarks.bench_encoders --modelo intfloat/multilingual-e5-large --documentos data/test_documents
+"""
+
+import argparse
+import os
+import resource
+import statistics
+import time
+
+import numpy as np
+
+from src.benchmarks.estatisticas import percentil
+from src.tests.test_models import QUERIES, load_test_documents
+from src.utils.encoders import BACKENDS, carregar_encoder
+
+
+def rss_mb():
+    """RSS atual do processo em MB (lido de /proc; usa o pico do getrusage em outros sistemas)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def carregar_corpus(diretorio, n_sinteticos):
+    """Carrega os documentos do diretório (ou gera um corpus sintético se ele estiver vazio)."""
+    corpus = []
+    if diretorio:
+        corpus = list(load_test_documents(diretorio).values())
+    if not corpus:
+        temas = ["contrato de arrendamento", "certidão de quitação", "relatório do projeto X",
+                 "política de segurança da informação", "processo de homologação", "comprovante de pagamento"]
+        corpus = [
+            f"Documento {i} sobre {temas[i % len(temas)]}. Emitido em {2020 + i % 5}. "
+            f"Este texto descreve o {temas[(i * 7) % len(temas)]} e as obrigações das partes envolvidas."
+            for i in range(n_sinteticos)
+        ]
+    return corpus
+
+
+def top_k(embeddings_docs, embeddings_queries, k):
+    docs = embeddings_docs / np.linalg.norm(embeddings_docs, axis=1, keepdims=True)
+    queries = embeddings_queries / np.linalg.norm(embeddings_queries, axis=1, keepdims=True)
+    similaridades = queries @ docs.T
+    return [set(np.argsort(-linha)[:k]) for linha in similaridades]
+
+
+def medir_backend(model_name, backend, corpus, batch_size, repeticoes):
+    rss_antes = rss_mb()
+    modelo = carregar_encoder(model_name, backend=backend, device="cpu")
+    modelo.encode(["aquecimento"])  # Primeira chamada inclui alocações e compilação de kernels
+
+    inicio = time.perf_counter()
+    embeddings_docs = modelo.encode(corpus, batch_size=batch_size, convert_to_numpy=True)
+    docs_por_segundo = len(corpus) / (time.perf_counter() - inicio)
+
+    latencias = []
+    for _ in range(repeticoes):
+        for query in QUERIES:
+            inicio = time.perf_counter()
+            modelo.encode([query], convert_to_numpy=True)
+            latencias.append(time.perf_counter() - inicio)
+    latencias.sort()
+
+    embeddings_queries = modelo.encode(QUERIES, convert_to_numpy=True)
+    return {
+        "backend": backend,
+        "docs_por_segundo": docs_por_segundo,
+        "query_p50_ms": statistics.median(latencias) * 1000,
+        "query_p99_ms": percentil(latencias, 99) * 1000,
+        "rss_mb": rss_mb(),
+        "rss_modelo_mb": rss_mb() - rss_antes,
+        "embeddings_docs": embeddings_docs,
+        "embeddings_queries": embeddings_queries,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modelo", default="intfloat/multilingual-e5-large")
+    parser.add_argument("--documentos", default=None, help="Diretório de documentos (padrão: corpus sintético)")
+    parser.add_argument("--sinteticos", type=int, default=500, help="Tamanho do corpus sintético")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeticoes", type=int, default=25)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    corpus = carregar_corpus(args.documentos, args.sinteticos)
+    k = min(args.k, len(corpus))
+    print(f"Corpus: {len(corpus)} documentos. Modelo: {args.modelo}\n")
+
+    resultados = [medir_backend(args.modelo, backend, corpus, args.batch_size, args.repeticoes) for backend in args.backends]
+
+    referencia = next((r for r in resultados if r["backend"] == "torch"), resultados[0])
+    top_referencia = top_k(referencia["embeddings_docs"], referencia["embeddings_queries"], k)
+
+    print(f"{'backend':<12} {'docs/s':>9} {'p50 (ms)':>9} {'p99 (ms)':>9} {'RSS (MB)':>9} {'Δ RSS':>8} {f'recall@{k}':>10}")
+    for resultado in resultados:
+        top_backend = top_k(resultado["embeddings_docs"], resultado["embeddings_queries"], k)
+        recall = statistics.mean(len(a & b) / k for a, b in zip(top_referencia, top_backend))
+        print(
+            f"{resultado['backend']:<12} {resultado['docs_por_segundo']:>9.1f} {resultado['query_p50_ms']:>9.2f} "
+            f"{resultado['query_p99_ms']:>9.2f} {resultado['rss_mb']:>9.0f} {resultado['rss_modelo_mb']:>8.0f} {recall:>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
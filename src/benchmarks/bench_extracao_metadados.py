@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Benchmark da extração de metadados: arquivos/s em uma árvore grande de diretórios.
+
+Gera (uma vez) uma árvore com txt, md e pdf distribuídos em subdiretórios e mede:
+  - "anterior": a extração como era antes — `os.walk` em série, duas chamadas a
+    stat por arquivo (statx + os.stat) e o PdfReader para ler o /Info dos PDFs;
+  - "scandir, 1 thread": `varrer_arquivos` + `extrair_metadados` com uma stat por
+    arquivo (a da varredura) e leitura só do trailer/Info dos PDFs;
+  - "scandir, N threads": o mesmo, com varredura e extração em paralelo;
+  - "reindexação sem mudanças": varredura paralela comparando (tamanho, mtime)
+    com as assinaturas gravadas, que não abre arquivo algum.
+
+Por padrão as medições rodam com o cache de páginas do SO aquecido pela geração
+da árvore; com --frio (Linux, como root) o cache é descartado antes de cada cenário.
+
+Uso:
+    python -m src.benchmarks.bench_extracao_metadados --arquivos 100000 --threads 8
+    python -m src.benchmarks.bench_extracao_metadados --arquivos 100000 --frio
+    python -m src.benchmarks.bench_extracao_metadados --diretorio /tmp/arvore --arquivos 10000
+"""
+
+import argparse
+import datetime
+import io
+import os
+import tempfile
+import time
+
+from PyPDF2 import PdfReader, PdfWriter
+
+from src.benchmarks.corpus_sintetico import EXTENSOES, escrever_pdf
+from src.utils.metadata_extraction import extrair_metadados_em_paralelo, varrer_arquivos
+
+try:
+    import statx
+except ImportError:
+    statx = None
+
+EXTENSOES_SUPORTADAS = (".txt", ".pdf", ".md")
+
+
+def _modelo_pdf(diretorio):
+    """PDF de 20 páginas com /Info (autor, título e palavras-chave), copiado para cada .pdf da árvore."""
+    caminho = os.path.join(diretorio, "modelo.pdf")
+    escrever_pdf(caminho, "Relatório anual", ["Parágrafo de preenchimento do relatório. " * 30] * 60,
+                 linhas_por_pagina=20)
+    escritor = PdfWriter()
+    for pagina in PdfReader(caminho).pages:
+        escritor.add_page(pagina)
+    escritor.add_metadata({"/Author": "Ana Souza", "/Title": "Relatório anual", "/Keywords": "relatorio, anual"})
+    saida = io.BytesIO()
+    escritor.write(saida)
+    os.remove(caminho)
+    return saida.getvalue()
+
+
+def gerar_arvore(diretorio, n_arquivos, por_diretorio=500):
+    """Gera `n_arquivos` em subdiretórios de até `por_diretorio` arquivos (dois níveis), se ainda não existirem."""
+    marcador = os.path.join(diretorio, f".arvore_{n_arquivos}")
+    if os.path.exists(marcador):
+        return
+    modelo_pdf = _modelo_pdf(tempfile.mkdtemp(prefix="bench_extracao_modelo_"))
+    pesos = [(extensao, int(proporcao * 100)) for extensao, proporcao in EXTENSOES]
+    ciclo = [extensao for extensao, peso in pesos for _ in range(peso)]
+    for indice in range(n_arquivos):
+        subdiretorio = os.path.join(diretorio, f"grupo_{indice // (por_diretorio * 20)}",
+                                    f"pasta_{indice // por_diretorio}")
+        if indice % por_diretorio == 0:
+            os.makedirs(subdiretorio, exist_ok=True)
+        extensao = ciclo[indice % len(ciclo)]
+        caminho = os.path.join(subdiretorio, f"documento_{indice}.{extensao}")
+        if extensao == "pdf":
+            with open(caminho, "wb") as f:
+                f.write(modelo_pdf)
+        else:
+            with open(caminho, "w", encoding="utf-8") as f:
+                f.write(f"{'# ' if extensao == 'md' else ''}Documento {indice}\n\n" + "Texto do documento. " * 40)
+    open(marcador, "w").close()
+
+
+def _extrair_metadados_anterior(filepath):
+    """Reprodução da extração anterior: statx + os.stat, datas formatadas e PdfReader completo para PDFs."""
+    stx_info = statx.statx(filepath) if statx is not None and hasattr(statx, "statx") else os.stat(filepath)
+    stat_info = os.stat(filepath)
+    metadados = {
+        "nome_arquivo": os.path.basename(filepath),
+        "tamanho_bytes": stat_info.st_size,
+        "data_modificacao": datetime.datetime.fromtimestamp(stat_info.st_mtime).isoformat() + "Z",
+        "data_criacao": datetime.datetime.fromtimestamp(getattr(stx_info, "btime", stat_info.st_ctime)).isoformat() + "Z",
+    }
+    if filepath.endswith(".pdf"):
+        with open(filepath, "rb") as f:
+            metadata = PdfReader(f).metadata
+            if metadata:
+                metadados["autor"] = metadata.author
+                metadados["titulo"] = metadata.title
+    else:
+        with open(filepath, "r", encoding="utf-8") as f:
+            metadados["titulo"] = f.readline().strip()
+    return metadados
+
+
+def medir_anterior(diretorio):
+    total = 0
+    for raiz, _, nomes in os.walk(diretorio):
+        for nome in nomes:
+            if nome.lower().endswith(EXTENSOES_SUPORTADAS):
+                _extrair_metadados_anterior(os.path.join(raiz, nome))
+                total += 1
+    return total
+
+
+def medir_novo(diretorio, threads):
+    arquivos = ((os.path.join(diretorio, nome), stat_info)
+                for nome, stat_info in varrer_arquivos(diretorio, EXTENSOES_SUPORTADAS, max_workers=threads))
+    return sum(1 for _ in extrair_metadados_em_paralelo(arquivos, max_workers=threads))
+
+
+def medir_sem_mudancas(diretorio, threads, assinaturas):
+    inalterados = 0
+    for nome, stat_info in varrer_arquivos(diretorio, EXTENSOES_SUPORTADAS, max_workers=threads):
+        if assinaturas.get(nome) == (stat_info.st_size, stat_info.st_mtime):
+            inalterados += 1
+    return inalterados
+
+
+def descartar_cache():
+    """Descarta o cache de páginas do SO (Linux, como root)."""
+    os.sync()
+    try:
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3\n")
+    except OSError as e:
+        print(f"Aviso: não foi possível descartar o cache de páginas ({e}); medindo com cache quente.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--arquivos", type=int, default=100_000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--diretorio", default=None, help="Diretório da árvore (reaproveitado entre execuções)")
+    parser.add_argument("--frio", action="store_true", help="Descarta o cache de páginas antes de cada cenário")
+    args = parser.parse_args()
+
+    diretorio = args.diretorio or os.path.join(tempfile.gettempdir(), f"bench_extracao_metadados_{args.arquivos}")
+    inicio = time.perf_counter()
+    gerar_arvore(diretorio, args.arquivos)
+    print(f"Árvore com {args.arquivos} arquivos em '{diretorio}' ({time.perf_counter() - inicio:.1f} s).")
+
+    # Assinaturas "gravadas" da reindexação: as mesmas que o indexador guarda no SQLite
+    assinaturas = {nome: (stat_info.st_size, stat_info.st_mtime)
+                   for nome, stat_info in varrer_arquivos(diretorio, EXTENSOES_SUPORTADAS, max_workers=args.threads)}
+
+    cenarios = [
+        ("anterior", lambda: medir_anterior(diretorio)),
+        ("scandir, 1 thread", lambda: medir_novo(diretorio, 1)),
+        (f"scandir, {args.threads} threads", lambda: medir_novo(diretorio, args.threads)),
+        ("reindexação sem mudanças", lambda: medir_sem_mudancas(diretorio, args.threads, assinaturas)),
+    ]
+    print(f"\n{'cenário':<26} {'arquivos':>9} {'tempo (s)':>10} {'arquivos/s':>11} {'ganho':>7}")
+    base = None
+    for nome, funcao in cenarios:
+        if args.frio:
+            descartar_cache()
+        inicio = time.perf_counter()
+        total = funcao()
+        tempo = time.perf_counter() - inicio
+        base = base or tempo
+        print(f"{nome:<26} {total:>9} {tempo:>10.2f} {total / tempo:>11.0f} {base / tempo:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark do tempo de inicialização dos pontos de entrada (`python -X importtime`).
+
+Cada ponto de entrada roda em um processo novo, `--repeticoes` vezes, e é
+medido o tempo de parede do melhor processo (o interpretador vazio, `python -c
+pass`, é a referência). Uma execução com `-X importtime` dá o tempo acumulado
+de importação e os pacotes mais caros importados por ele.
+
+Os pontos de entrada leves (comandos de metadados da CLI e a importação de
+main.py e dos módulos de banco) têm duas verificações:
+  - tempo de parede abaixo de `--limite-ms` (padrão: 200 ms);
+  - nenhuma biblioteca pesada importada (torch, sentence_transformers, chromadb, NumPy, sklearn, PyPDF2...).
+O código de saída é 1 se alguma falhar, para uso como teste.
+
+Os comandos rodam sobre um banco vazio em um diretório temporário (`RAG_DATABASE_DIR`).
+
+Uso:
+    python -m src.benchmarks.bench_importacao
+    python -m src.benchmarks.bench_importacao --repeticoes 10 --limite-ms 150 --pesados
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Pacotes que os pontos de entrada leves não devem importar
+PACOTES_PESADOS = ("torch", "sentence_transformers", "transformers", "InstructorEmbedding", "sklearn", "chromadb",
+                   "numpy", "PyPDF2", "bcrypt")
+
+# Nome -> argumentos do interpretador
+ENTRADAS_LEVES = {
+    "rag-sys --help": ["-m", "src.cli", "--help"],
+    "rag-sys setup": ["-m", "src.cli", "setup"],
+    "rag-sys contar": ["-m", "src.cli", "contar"],
+    "rag-sys listar --tipo pdf": ["-m", "src.cli", "listar", "--tipo", "pdf"],
+    "import main": ["-c", "import main"],
+    "import database_setup": ["-c", "import src.database.database_setup"],
+    "import database_operations": ["-c", "import src.database.database_operations"],
+}
+ENTRADAS_PESADAS = {
+    "import roteador_consultas": ["-c", "import src.utils.roteador_consultas"],
+    "import search_service": ["-c", "import src.api.search_service"],
+    "import indexador": ["-c", "import src.utils.indexador"],
+}
+
+
+def executar(argumentos, ambiente, importtime=False):
+    comando = [sys.executable, *(["-X", "importtime"] if importtime else []), *argumentos]
+    inicio = time.perf_counter()
+    processo = subprocess.run(comando, env=ambiente, capture_output=True, text=True)
+    return time.perf_counter() - inicio, processo
+
+
+def analisar_importtime(saida):
+    """
+    Lê a saída de `-X importtime`: (tempo total de importação em s, {pacote de topo: tempo próprio somado em s}).
+
+    Cada linha é "import time: <próprio µs> | <acumulado µs> | <módulo>"; o tempo
+    próprio dos módulos de um pacote (ex.: "numpy.core._multiarray_umath") é
+    somado no pacote de topo ("numpy"), sem contar os pacotes que ele importa.
+    """
+    total, pacotes = 0, {}
+    for linha in saida.splitlines():
+        if not linha.startswith("import time:") or "self [us]" in linha:
+            continue
+        proprio, _, modulo = linha.removeprefix("import time:").split("|")
+        raiz = modulo.strip().split(".")[0]
+        total += int(proprio)
+        pacotes[raiz] = pacotes.get(raiz, 0) + int(proprio)
+    return total / 1e6, {pacote: tempo / 1e6 for pacote, tempo in pacotes.items()}
+
+
+def medir(nome, argumentos, ambiente, repeticoes):
+    tempos = [executar(argumentos, ambiente)[0] for _ in range(repeticoes)]
+    _, processo = executar(argumentos, ambiente, importtime=True)
+    if processo.returncode != 0:
+        print(f"Aviso: '{nome}' terminou com código {processo.returncode}: {processo.stderr.strip().splitlines()[-1:]}")
+    total_importacao, pacotes = analisar_importtime(processo.stderr)
+    return min(tempos), total_importacao, pacotes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticoes", type=int, default=5, help="Processos por ponto de entrada (vale o mais rápido)")
+    parser.add_argument("--limite-ms", type=float, default=200.0, help="Tempo máximo dos pontos de entrada leves")
+    parser.add_argument("--pesados", action="store_true", help="Mede também os pontos de entrada pesados")
+    parser.add_argument("--top", type=int, default=3, help="Pacotes mais caros mostrados por ponto de entrada")
+    args = parser.parse_args()
+
+    raiz = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    ambiente = {**os.environ, "RAG_DATABASE_DIR": tempfile.mkdtemp(prefix="bench_importacao_"),
+                "PYTHONPATH": os.pathsep.join(filter(None, [raiz, os.environ.get("PYTHONPATH")]))}
+    os.chdir(raiz)
+    executar(ENTRADAS_LEVES["rag-sys setup"], ambiente)  # Banco vazio para os comandos de metadados
+
+    base, _, _ = medir("python -c pass", ["-c", "pass"], ambiente, args.repeticoes)
+    print(f"Interpretador vazio: {base * 1000:.0f} ms. Limite dos pontos de entrada leves: {args.limite_ms:.0f} ms.\n")
+    print(f"{'ponto de entrada':<28} {'tempo (ms)':>10} {'+ vazio':>8} {'importação':>10}  pacotes mais caros (ms)")
+
+    entradas = {**{nome: (argumentos, True) for nome, argumentos in ENTRADAS_LEVES.items()},
+                **({nome: (argumentos, False) for nome, argumentos in ENTRADAS_PESADAS.items()} if args.pesados else {})}
+    falhas = []
+    for nome, (argumentos, leve) in entradas.items():
+        tempo, importacao, pacotes = medir(nome, argumentos, ambiente, args.repeticoes)
+        caros = sorted(((t, p) for p, t in pacotes.items() if p not in ("site", "encodings")), reverse=True)[:args.top]
+        pesados = sorted(set(pacotes) & set(PACOTES_PESADOS))
+        situacao = ""
+        if leve and tempo * 1000 > args.limite_ms:
+            situacao += "  ACIMA DO LIMITE"
+        if leve and pesados:
+            situacao += f"  IMPORTA {', '.join(pesados)}"
+        if situacao:
+            falhas.append(nome)
+        print(f"{nome:<28} {tempo * 1000:>10.0f} {(tempo - base) * 1000:>8.0f} {importacao * 1000:>10.0f}  "
+              + ", ".join(f"{pacote} {t * 1000:.0f}" for t, pacote in caros) + situacao)
+
+    if falhas:
+        print(f"\n{len(falhas)} ponto(s) de entrada leve(s) fora do esperado: {', '.join(falhas)}")
+        return 1
+    print("\nTodos os pontos de entrada leves dentro do limite e sem bibliotecas pesadas.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
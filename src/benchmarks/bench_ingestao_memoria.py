@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark de memória da ingestão: pico de RSS da indexação para corpora de tamanhos crescentes.
+
+Para cada tamanho, gera um corpus sintético (txt, md e pdf) e o indexa do zero
+em um processo novo, com banco SQLite e armazenamento vetorial próprios. Como a
+ingestão é um pipeline de geradores com buffers de tamanho fixo, o pico de RSS
+deve ficar praticamente constante enquanto o número de arquivos cresce; o
+benchmark mostra, por tamanho:
+  - arquivos/s da indexação completa;
+  - pico de RSS do processo principal (modelo, buffers de escrita) e dos processos de extração;
+  - a razão do pico em relação ao menor corpus.
+
+O cache de páginas e o mmap do SQLite também contam no RSS e crescem com o
+banco até os limites `RAG_SQLITE_CACHE_MB` e `RAG_SQLITE_MMAP_MB`; no
+armazenamento NumPy, as páginas da matriz mapeada tocadas na escrita também.
+
+Uso:
+    python -m src.benchmarks.bench_ingestao_memoria --tamanhos 1000 10000 100000
+    python -m src.benchmarks.bench_ingestao_memoria --tamanhos 1000 1000000 --armazenamento numpy
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+
+from src.benchmarks.corpus_sintetico import gerar_corpus
+
+
+def _indexar_em_processo_novo(diretorio_corpus, diretorio_dados, model_name, armazenamento, fila):
+    # As configurações de caminho são lidas na importação: o processo filho é criado com "spawn"
+    os.environ["RAG_DATABASE_DIR"] = diretorio_dados
+    from src.utils.indexador import indexar_diretorio
+    from src.utils.vector_store import obter_sessao_vetorial
+
+    sessao = obter_sessao_vetorial(armazenamento, os.path.join(diretorio_dados, "vetores"))
+    fila.put(indexar_diretorio(diretorio_corpus, model_name=model_name, sessao=sessao))
+
+
+def medir(n_arquivos, diretorio_base, model_name, armazenamento):
+    """Gera um corpus de `n_arquivos` e retorna o resumo de `indexar_diretorio` medido em um processo novo."""
+    diretorio_corpus = os.path.join(diretorio_base, f"corpus_{n_arquivos}")
+    gerar_corpus(diretorio_corpus, n_documentos=n_arquivos, n_consultas=0)
+    os.remove(os.path.join(diretorio_corpus, "consultas.json"))
+
+    contexto = multiprocessing.get_context("spawn")
+    fila = contexto.Queue()
+    processo = contexto.Process(
+        target=_indexar_em_processo_novo,
+        args=(diretorio_corpus, os.path.join(diretorio_base, f"dados_{n_arquivos}"), model_name, armazenamento, fila),
+    )
+    processo.start()
+    resumo = fila.get()
+    processo.join()
+    return resumo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[1000, 10_000, 100_000])
+    parser.add_argument("--modelo", default=os.environ.get("RAG_MODELO_EMBEDDING", "intfloat/multilingual-e5-large"))
+    parser.add_argument("--armazenamento", choices=("chroma", "numpy"), default=None,
+                        help="Armazenamento vetorial. Padrão: RAG_VECTOR_STORE ou chroma")
+    parser.add_argument("--diretorio", default=None, help="Diretório de trabalho. Padrão: um diretório temporário")
+    args = parser.parse_args()
+
+    diretorio_base = args.diretorio or tempfile.mkdtemp(prefix="bench_ingestao_")
+    resultados = []
+    for n_arquivos in sorted(args.tamanhos):
+        resumo = medir(n_arquivos, diretorio_base, args.modelo, args.armazenamento)
+        resultados.append((n_arquivos, resumo))
+
+    pico_base = resultados[0][1]["rss_pico_mb"]
+    print(f"\n{'arquivos':>9} {'arquivos/s':>11} {'RSS pico (MB)':>14} {'extração (MB)':>14} {'razão':>6}")
+    for n_arquivos, resumo in resultados:
+        if resumo["rss_pico_mb"] is None:
+            print(f"{n_arquivos:>9} {n_arquivos / resumo['tempo_segundos']:>11.1f} {'n/d':>14} {'n/d':>14} {'n/d':>6}")
+            continue
+        print(f"{n_arquivos:>9} {n_arquivos / resumo['tempo_segundos']:>11.1f} {resumo['rss_pico_mb']:>14.0f} "
+              f"{resumo['rss_pico_extracao_mb']:>14.0f} {resumo['rss_pico_mb'] / pico_base:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
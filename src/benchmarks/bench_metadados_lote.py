@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark do custo de metadados por query: uma consulta por hit vs. consulta em lote.
+
+Uso:
+    python -m src.benchmarks.bench_metadados_lote --documentos 10000 --repeticoes 20
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from src.database import database_operations, database_setup
+
+
+def popular_banco(n_documentos):
+    """Cria um banco temporário com `n_documentos` registros sintéticos e aponta os módulos para ele."""
+    diretorio = tempfile.mkdtemp(prefix="bench_metadados_")
+    caminho = os.path.join(diretorio, "metadados.db")
+    database_setup.DATABASE_DIR = diretorio
+    database_setup.DATABASE_PATH = caminho
+    database_operations.DATABASE_PATH = caminho
+    database_setup.create_database_and_tables()
+
+    conn = sqlite3.connect(caminho)
+    conn.executemany(
+        """
+        INSERT INTO metadados (nome_arquivo, tipo_documento, nivel_acesso, tags, tamanho_bytes)
+        VALUES (?, ?, 'publico', ?, ?)
+        """,
+        (
+            (f"documento_{i}.txt", random.choice(["txt", "md", "pdf"]), f"documento_{i}", random.randint(100, 100_000))
+            for i in range(n_documentos)
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def medir(funcao, repeticoes):
+    latencias = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        latencias.append(time.perf_counter() - inicio)
+    return statistics.median(latencias)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documentos", type=int, default=10_000)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    popular_banco(args.documentos)
+
+    print(f"{'hits':>6} {'por hit (ms)':>14} {'em lote (ms)':>14} {'ganho':>8}")
+    for n_hits in (30, 100, 1000):
+        nomes = [f"documento_{random.randrange(args.documentos)}.txt" for _ in range(n_hits)]
+
+        tempo_por_hit = medir(
+            lambda: [database_operations.obter_metadados_por_nome_arquivo(nome) for nome in nomes], args.repeticoes
+        )
+        tempo_lote = medir(lambda: database_operations.obter_metadados_por_nomes_arquivo(nomes), args.repeticoes)
+        print(f"{n_hits:>6} {tempo_por_hit * 1000:>14.2f} {tempo_lote * 1000:>14.2f} {tempo_por_hit / tempo_lote:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
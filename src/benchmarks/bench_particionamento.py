@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Benchmark do armazenamento particionado: vazão com 1, 2, 4 e 8 shards e troca do número de shards sob carga.
+
+Gera embeddings sintéticos (`bench_armazenamento_compacto.gerar_embeddings`),
+com IDs "doc_<d>#chunk_<c>", e para cada número de shards popula uma
+`SessaoParticionada` e mede, com `--clientes` threads consultando ao mesmo tempo:
+  - vazão (queries/s) e latência p50/p95 de uma query;
+  - aceleração em relação a 1 shard (cada shard é um processo: o ganho vem dos
+    núcleos disponíveis, informados no cabeçalho);
+  - recall@k em relação ao top-k exato (1.0 com a base "numpy", que é exata).
+
+Depois, para cada troca "de:para" de `--trocas`, reparticiona em segundo plano
+enquanto os clientes consultam e escrevem, e verifica que nenhuma consulta
+falhou, que a contagem de vetores se manteve e que o top-k continua exato.
+O código de saída é 1 se alguma troca falhar, para uso como teste. Os shards
+ficam em um diretório temporário removido ao final.
+
+Uso:
+    python -m src.benchmarks.bench_particionamento --vetores 200000 --dimensao 384
+    python -m src.benchmarks.bench_particionamento --shards 1 2 4 8 --clientes 16 --trocas 2:3 4:2
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from src.benchmarks.bench_armazenamento_compacto import gerar_embeddings
+from src.benchmarks.estatisticas import percentil
+from src.utils.numpy_store import buscar_top_k, normalizar_vetores
+from src.utils.particionamento import SessaoParticionada
+
+NOME_COLECAO = "bench_particionamento"
+CHUNKS_POR_DOCUMENTO = 4
+
+
+def gerar_ids(n_vetores):
+    return [f"doc_{i // CHUNKS_POR_DOCUMENTO}#chunk_{i % CHUNKS_POR_DOCUMENTO}" for i in range(n_vetores)]
+
+
+def popular(colecao, ids, vetores, tamanho_lote=5000):
+    inicio = time.perf_counter()
+    for inicio_lote in range(0, len(vetores), tamanho_lote):
+        fim_lote = min(inicio_lote + tamanho_lote, len(vetores))
+        colecao.upsert(ids=ids[inicio_lote:fim_lote], embeddings=vetores[inicio_lote:fim_lote],
+                       metadatas=[{"documento": i // CHUNKS_POR_DOCUMENTO} for i in range(inicio_lote, fim_lote)])
+    return time.perf_counter() - inicio
+
+
+def recall(colecao, queries, exatos, n_results):
+    resultado = colecao.query(query_embeddings=queries, n_results=n_results, include=["distances"])
+    return float(np.mean([len(set(ids) & exato) / len(exato) for ids, exato in zip(resultado["ids"], exatos)]))
+
+
+def carga(colecao, queries, n_results, clientes, duracao, durante=None):
+    """
+    Roda `clientes` threads consultando por `duracao` segundos (ou até `durante()` terminar, se informado).
+
+    Returns:
+        (consultas/s, latências em s, erros)
+    """
+    latencias, erros = [], []
+    parar = threading.Event()
+
+    def cliente(semente):
+        rng = np.random.default_rng(semente)
+        while not parar.is_set():
+            query = queries[rng.integers(len(queries))]
+            inicio = time.perf_counter()
+            try:
+                colecao.query(query_embeddings=query[None, :], n_results=n_results, include=["distances"])
+            except Exception as e:
+                erros.append(e)
+            latencias.append(time.perf_counter() - inicio)
+
+    threads = [threading.Thread(target=cliente, args=(i,)) for i in range(clientes)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    if durante is None:
+        time.sleep(duracao)
+    else:
+        durante()
+    parar.set()
+    for thread in threads:
+        thread.join()
+    return len(latencias) / (time.perf_counter() - inicio), latencias, erros
+
+
+def medir_vazao(args, diretorio, ids, vetores, queries, exatos):
+    print(f"{'shards':>6} {'carga (s)':>9} {'consultas/s':>12} {'acel.':>6} {'p50 (ms)':>9} {'p95 (ms)':>9} "
+          f"{f'recall@{args.n_results}':>10}")
+    referencia = None
+    for n_shards in args.shards:
+        sessao = SessaoParticionada(os.path.join(diretorio, f"shards_{n_shards}"), n_shards=n_shards, base=args.base)
+        try:
+            colecao = sessao.obter_colecao(NOME_COLECAO, criar=True)
+            tempo_carga = popular(colecao, ids, vetores)
+            carga(colecao, queries, args.n_results, args.clientes, min(1.0, args.duracao))  # Aquecimento
+            vazao, latencias, erros = carga(colecao, queries, args.n_results, args.clientes, args.duracao)
+            referencia = referencia or vazao
+            print(f"{n_shards:>6} {tempo_carga:>9.1f} {vazao:>12.1f} {vazao / referencia:>6.2f} "
+                  f"{percentil(latencias, 50) * 1000:>9.2f} {percentil(latencias, 95) * 1000:>9.2f} "
+                  f"{recall(colecao, queries, exatos, args.n_results):>10.3f}" + (f"  ({len(erros)} erros)" if erros else ""))
+        finally:
+            sessao.fechar()
+
+
+def testar_troca(args, diretorio, ids, vetores, queries, exatos, de, para):
+    sessao = SessaoParticionada(os.path.join(diretorio, f"troca_{de}_{para}"), n_shards=de, base=args.base)
+    try:
+        colecao = sessao.obter_colecao(NOME_COLECAO, criar=True)
+        popular(colecao, ids, vetores)
+        total = colecao.count()
+
+        # Durante a reconstrução, um documento é removido e reinserido: a escrita vai ao diário e é repetida na nova geração
+        def reparticionar():
+            futuro = sessao.reparticionar_em_segundo_plano(para)
+            removidos = ids[:CHUNKS_POR_DOCUMENTO]
+            colecao.delete(ids=removidos)
+            colecao.upsert(ids=removidos, embeddings=vetores[:CHUNKS_POR_DOCUMENTO])
+            futuro.result()
+
+        inicio = time.perf_counter()
+        vazao, latencias, erros = carga(colecao, queries, args.n_results, args.clientes, None, durante=reparticionar)
+        duracao = time.perf_counter() - inicio
+        contagens = sessao.estatisticas()["colecoes"][NOME_COLECAO]
+        ok = not erros and colecao.count() == total and len(contagens) == para
+        print(f"{de:>2} -> {para:<2} {duracao:>9.1f} {vazao:>12.1f} {percentil(latencias, 95) * 1000:>9.2f} "
+              f"{len(erros):>6} {f'{total} -> {colecao.count()}':>16} "
+              f"{recall(colecao, queries, exatos, args.n_results):>10.3f}  {'ok' if ok else 'FALHOU'}")
+        for erro in erros[:3]:
+            print(f"    erro: {erro}")
+        return ok
+    finally:
+        sessao.fechar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vetores", type=int, default=200_000)
+    parser.add_argument("--dimensao", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--n-results", type=int, default=10)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--clientes", type=int, default=8, help="Threads consultando ao mesmo tempo")
+    parser.add_argument("--duracao", type=float, default=5.0, help="Segundos de medição por número de shards")
+    parser.add_argument("--base", choices=("numpy", "chroma"), default="numpy", help="Armazenamento de cada shard")
+    parser.add_argument("--trocas", nargs="*", default=["2:3", "4:2"], help="Trocas de número de shards 'de:para'")
+    args = parser.parse_args()
+
+    vetores = gerar_embeddings(args.vetores, args.dimensao)
+    ids = gerar_ids(args.vetores)
+    rng = np.random.default_rng(7)
+    amostra = vetores[rng.integers(args.vetores, size=args.queries)]
+    queries = normalizar_vetores(amostra + 0.05 * rng.standard_normal(amostra.shape, dtype=np.float32))
+    linhas_exatas, _ = buscar_top_k(queries, vetores, args.n_results)
+    exatos = [{ids[linha] for linha in linhas} for linhas in linhas_exatas.tolist()]
+
+    falhas = []
+    with tempfile.TemporaryDirectory(prefix="bench_particionamento_") as diretorio:
+        print(f"{args.vetores} vetores de {args.dimensao} dimensões, base '{args.base}', {args.clientes} clientes, "
+              f"{os.cpu_count()} núcleos.\n")
+        medir_vazao(args, diretorio, ids, vetores, queries, exatos)
+
+        if args.trocas:
+            print(f"\n{'troca':<8} {'tempo (s)':>9} {'consultas/s':>12} {'p95 (ms)':>9} {'erros':>6} {'vetores':>16} "
+                  f"{f'recall@{args.n_results}':>10}")
+            for troca in args.trocas:
+                de, _, para = troca.partition(":")
+                if not testar_troca(args, diretorio, ids, vetores, queries, exatos, int(de), int(para)):
+                    falhas.append(troca)
+
+    if falhas:
+        print(f"\n{len(falhas)} troca(s) de número de shards falharam: {', '.join(falhas)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
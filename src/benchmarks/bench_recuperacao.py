@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Suíte de benchmark e avaliação da recuperação, com saída em JSON para acompanhar regressões entre commits.
+
+Gera (ou reutiliza) um corpus sintético em português com consultas rotuladas
+(`src.benchmarks.corpus_sintetico`). Para cada modelo de `MODEL_NAMES` e cada
+backend do encoder, indexa o corpus do zero com `indexar_diretorio` e mede:
+  - ingestão: documentos/s, tempo de construção do índice e tempo de carga do modelo;
+  - pico de RSS do processo;
+  - por modo de busca (vetorial e híbrida): latência p50/p99, recall@k e MRR@k,
+    no total e por tipo de consulta (semântica e exata).
+
+Cada combinação roda em um processo próprio, com banco, coleção e cache de
+embeddings em um diretório temporário. Assim o pico de RSS é o da combinação
+e nenhuma reaproveita embeddings de outra.
+
+Uso:
+    python -m src.benchmarks.bench_recuperacao --documentos 1000 --consultas 200 --saida resultados.json
+    python -m src.benchmarks.bench_recuperacao --modelos intfloat/multilingual-e5-large --backends torch onnx-int8
+"""
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.benchmarks.corpus_sintetico import gerar_corpus
+from src.benchmarks.estatisticas import percentil
+
+MODOS_BUSCA = ("vetorial", "hibrido")
+
+
+def avaliar_ranking(recuperados, relevantes, k):
+    """Retorna (recall@k, reciprocal rank@k) de uma lista de arquivos recuperados."""
+    relevantes = set(relevantes)
+    top_k = recuperados[:k]
+    recall = len(relevantes.intersection(top_k)) / len(relevantes) if relevantes else 0.0
+    rr = next((1.0 / posicao for posicao, nome in enumerate(top_k, start=1) if nome in relevantes), 0.0)
+    return recall, rr
+
+
+def _resumir(medicoes):
+    latencias = sorted(m["latencia"] for m in medicoes)
+    return {
+        "consultas": len(medicoes),
+        "p50_ms": statistics.median(latencias) * 1000,
+        "p99_ms": percentil(latencias, 99) * 1000,
+        "recall": statistics.mean(m["recall"] for m in medicoes),
+        "mrr": statistics.mean(m["rr"] for m in medicoes),
+    }
+
+
+def executar_combinacao(config):
+    """
+    Indexa o corpus e avalia as consultas para um par (modelo, backend). Roda em um processo filho.
+
+    As variáveis de ambiente de diretórios são definidas antes de importar os
+    módulos do projeto, que as leem na importação.
+    """
+    os.environ["RAG_DATABASE_DIR"] = config["diretorio_trabalho"]
+    os.environ["RAG_CACHE_EMBEDDINGS_DIR"] = os.path.join(config["diretorio_trabalho"], "cache_embeddings")
+    os.environ["RAG_MODELOS_ONNX_DIR"] = config["modelos_onnx_dir"]  # Modelos exportados são reaproveitados
+
+    from src.utils.busca_hibrida import buscar_documentos_hibrido
+    from src.utils.db_vectores import buscar_documentos_chromadb
+    from src.utils.embedding_cache import obter_cache_embeddings
+    from src.utils.indexador import indexar_diretorio
+    from src.utils.model_registry import aquecer_modelos
+    from src.utils.query_cache import cache_embeddings_query, cache_resultados
+
+    modelo, backend, k = config["modelo"], config["backend"], config["k"]
+    index_name = "bench_recuperacao"
+
+    inicio = time.perf_counter()
+    aquecer_modelos([modelo], device=config["dispositivo"], backend=backend)
+    tempo_modelo = time.perf_counter() - inicio
+
+    resumo = indexar_diretorio(config["corpus"], modelo, index_name=index_name, device=config["dispositivo"],
+                               batch_size=config["batch_size"], backend=backend)
+    n_documentos = resumo["novos"] + resumo["alterados"]
+
+    buscas = {
+        "vetorial": lambda query: buscar_documentos_chromadb(query, modelo, index_name=index_name, n_results=k, backend=backend),
+        "hibrido": lambda query: buscar_documentos_hibrido(query, modelo, index_name=index_name, n_results=k, backend=backend),
+    }
+    consultas = {}
+    for modo in config["modos"]:
+        # Cada modo começa sem embeddings de queries em cache (em memória e em disco)
+        obter_cache_embeddings().limpar()
+        cache_embeddings_query.invalidar()
+        cache_resultados.invalidar()
+
+        medicoes = []
+        for consulta in config["consultas"]:
+            inicio = time.perf_counter()
+            resultados = buscas[modo](consulta["query"])
+            latencia = time.perf_counter() - inicio
+            recall, rr = avaliar_ranking([r["nome_arquivo"] for r in resultados], consulta["relevantes"], k)
+            medicoes.append({"tipo": consulta["tipo"], "latencia": latencia, "recall": recall, "rr": rr})
+
+        consultas[modo] = {
+            **_resumir(medicoes),
+            "por_tipo": {tipo: _resumir([m for m in medicoes if m["tipo"] == tipo])
+                         for tipo in sorted({m["tipo"] for m in medicoes})},
+        }
+
+    return {
+        "modelo": modelo,
+        "backend": backend,
+        "ingestao": {
+            "documentos": n_documentos,
+            "falhas": resumo["falhas"],
+            "tempo_indexacao_s": resumo["tempo_segundos"],
+            "docs_por_segundo": n_documentos / resumo["tempo_segundos"] if resumo["tempo_segundos"] else 0.0,
+            "tempo_carga_modelo_s": tempo_modelo,
+            "extracao": resumo.get("extracao", {}),
+        },
+        "rss_pico_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "consultas": consultas,
+    }
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _imprimir(resultado, k):
+    ingestao = resultado["ingestao"]
+    print(f"\n{resultado['modelo']} [{resultado['backend']}]: {ingestao['documentos']} docs em "
+          f"{ingestao['tempo_indexacao_s']:.1f} s ({ingestao['docs_por_segundo']:.1f} docs/s), "
+          f"carga do modelo {ingestao['tempo_carga_modelo_s']:.1f} s, pico de RSS {resultado['rss_pico_mb']:.0f} MB")
+    print(f"  {'modo':<10} {'tipo':<10} {'p50 (ms)':>9} {'p99 (ms)':>9} {f'recall@{k}':>10} {f'MRR@{k}':>8}")
+    for modo, metricas in resultado["consultas"].items():
+        for tipo, m in [("todas", metricas), *metricas["por_tipo"].items()]:
+            print(f"  {modo:<10} {tipo:<10} {m['p50_ms']:>9.1f} {m['p99_ms']:>9.1f} {m['recall']:>10.3f} {m['mrr']:>8.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=None, help="Diretório do corpus (padrão: gera um corpus temporário)")
+    parser.add_argument("--documentos", type=int, default=1000, help="Tamanho do corpus gerado")
+    parser.add_argument("--consultas", type=int, default=200, help="Consultas rotuladas geradas")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--modelos", nargs="+", default=None, help="Padrão: MODEL_NAMES de src.tests.test_models")
+    parser.add_argument("--backends", nargs="+", default=None, help="Padrão: todos os backends do encoder")
+    parser.add_argument("--modos", nargs="+", default=list(MODOS_BUSCA), choices=MODOS_BUSCA)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--dispositivo", default="cpu")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--saida", default="resultados_benchmark.json", help="Arquivo JSON de saída")
+    args = parser.parse_args()
+
+    if args.modelos is None:
+        from src.tests.test_models import MODEL_NAMES
+        args.modelos = MODEL_NAMES
+    if args.backends is None:
+        from src.utils.encoders import BACKENDS
+        args.backends = list(BACKENDS)
+
+    diretorio_base = tempfile.mkdtemp(prefix="bench_recuperacao_")
+    corpus = args.corpus or os.path.join(diretorio_base, "corpus")
+    caminho_consultas = os.path.join(corpus, "consultas.json")
+    if args.corpus and os.path.exists(caminho_consultas):
+        with open(caminho_consultas, encoding="utf-8") as f:
+            consultas = json.load(f)
+    else:
+        consultas = gerar_corpus(corpus, args.documentos, args.consultas, args.semente)
+    print(f"Corpus: '{corpus}' ({len(consultas)} consultas rotuladas).")
+
+    modelos_onnx_dir = os.path.abspath(os.environ.get(
+        "RAG_MODELOS_ONNX_DIR", os.path.join(os.environ.get("RAG_DATABASE_DIR", "data"), "modelos_onnx")
+    ))
+
+    resultados = []
+    contexto = multiprocessing.get_context("spawn")  # Processo limpo: RSS e caches só desta combinação
+    for modelo in args.modelos:
+        for backend in args.backends:
+            config = {
+                "modelo": modelo, "backend": backend, "k": args.k, "modos": args.modos,
+                "dispositivo": args.dispositivo, "batch_size": args.batch_size,
+                "corpus": corpus, "consultas": consultas, "modelos_onnx_dir": modelos_onnx_dir,
+                "diretorio_trabalho": tempfile.mkdtemp(prefix=f"{backend}_", dir=diretorio_base),
+            }
+            with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as executor:
+                try:
+                    resultado = executor.submit(executar_combinacao, config).result()
+                except Exception as e:
+                    print(f"\nFalha ao avaliar {modelo} [{backend}]: {e}")
+                    resultado = {"modelo": modelo, "backend": backend, "erro": str(e)}
+                else:
+                    _imprimir(resultado, args.k)
+            resultados.append(resultado)
+
+    relatorio = {
+        "commit": _commit_atual(),
+        "data": datetime.datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "documentos": args.documentos if not args.corpus else None, "consultas": len(consultas),
+            "semente": args.semente, "k": args.k, "modos": args.modos, "dispositivo": args.dispositivo,
+            "batch_size": args.batch_size, "corpus": corpus,
+        },
+        "resultados": resultados,
+    }
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados gravados em '{args.saida}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Benchmark da busca em duas etapas: bi-encoder leve + cross-encoder, comparada ao e5-large sozinho.
+
+Cada configuração é "modelo" (só a busca vetorial) ou "modelo+reranker" (a busca
+vetorial traz `--candidatos` candidatos e o cross-encoder reordena os `-k`
+primeiros dentro do orçamento por query). Para cada bi-encoder, o corpus é
+indexado do zero em um processo próprio, com banco, coleção e caches em um
+diretório temporário, e são medidos:
+  - latência ponta a ponta p50/p95 (encode da query, busca e re-ranqueamento),
+    com os caches vazios, e a p50 de uma segunda passada (scores do
+    re-ranqueador em cache);
+  - concordância@k com o top-k do e5-large (fração dos k documentos dele que a configuração também retorna);
+  - recall@k e MRR@k, quando as consultas têm relevância rotulada (`--sintetico`).
+
+Por padrão usa as QUERIES de `src.tests.test_models` sobre `data/test_documents`
+(sem rótulos: só latência e concordância). Com `--sintetico N`, gera um corpus
+rotulado de N documentos (`src.benchmarks.corpus_sintetico`).
+
+Uso:
+    python -m src.benchmarks.bench_reranker
+    python -m src.benchmarks.bench_reranker --sintetico 1000 --consultas 100 --orcamento-ms 100
+    python -m src.benchmarks.bench_reranker --configs e5-large minilm+reranker --modelo-reranker cross-encoder/ms-marco-MiniLM-L-6-v2
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.benchmarks.bench_recuperacao import avaliar_ranking
+from src.benchmarks.estatisticas import percentil
+
+# Apelidos dos bi-encoders avaliados no README
+MODELOS = {
+    "e5-large": "intfloat/e5-large-v2",
+    "mpnet": "sentence-transformers/all-mpnet-base-v2",
+    "minilm": "sentence-transformers/all-MiniLM-L6-v2",
+}
+CONFIGS_PADRAO = ("e5-large", "minilm", "minilm+reranker", "mpnet+reranker")
+REFERENCIA = "e5-large"
+
+
+def executar_modelo(config):
+    """
+    Indexa o corpus com um bi-encoder e roda as consultas com e sem re-ranqueamento. Roda em um processo filho.
+
+    As variáveis de ambiente de diretórios são definidas antes de importar os
+    módulos do projeto, que as leem na importação.
+    """
+    os.environ["RAG_DATABASE_DIR"] = config["diretorio_trabalho"]
+    os.environ["RAG_CACHE_EMBEDDINGS_DIR"] = os.path.join(config["diretorio_trabalho"], "cache_embeddings")
+
+    from src.utils.db_vectores import buscar_documentos_chromadb
+    from src.utils.embedding_cache import obter_cache_embeddings
+    from src.utils.indexador import indexar_diretorio
+    from src.utils.model_registry import aquecer_modelos
+    from src.utils.query_cache import cache_embeddings_query, cache_resultados
+    from src.utils.reranker import cache_scores_rerank, reranquear
+
+    modelo, k, index_name = MODELOS.get(config["modelo"], config["modelo"]), config["k"], "bench_reranker"
+    aquecer_modelos([modelo], device=config["dispositivo"],
+                    reranker=config["modelo_reranker"] if config["variantes"] != [False] else None)
+    indexar_diretorio(config["corpus"], modelo, index_name=index_name, device=config["dispositivo"])
+
+    def buscar(query, com_reranker):
+        if not com_reranker:
+            return buscar_documentos_chromadb(query, modelo, index_name=index_name, n_results=k)
+        candidatos = buscar_documentos_chromadb(query, modelo, index_name=index_name, n_results=config["candidatos"])
+        return reranquear(query, candidatos, model_name=config["modelo_reranker"], n_results=k,
+                          orcamento_ms=config["orcamento_ms"], device=config["dispositivo"])
+
+    resultados = {}
+    for com_reranker in config["variantes"]:
+        obter_cache_embeddings().limpar()
+        cache_embeddings_query.invalidar()
+        cache_resultados.invalidar()
+        cache_scores_rerank.invalidar()
+
+        latencias, rankings, repetidas = [], [], []
+        for consulta in config["consultas"]:
+            inicio = time.perf_counter()
+            encontrados = buscar(consulta["query"], com_reranker)
+            latencias.append(time.perf_counter() - inicio)
+            rankings.append([resultado["nome_arquivo"] for resultado in encontrados])
+
+        # Segunda passada: embeddings das queries e scores do cross-encoder já em cache (resultados não)
+        for consulta in config["consultas"]:
+            cache_resultados.invalidar()
+            inicio = time.perf_counter()
+            buscar(consulta["query"], com_reranker)
+            repetidas.append(time.perf_counter() - inicio)
+
+        nome = f"{config['modelo']}+reranker" if com_reranker else config["modelo"]
+        resultados[nome] = {"latencias": latencias, "repetidas": repetidas, "rankings": rankings}
+    return resultados
+
+
+def carregar_consultas(args, diretorio_base):
+    """(diretório do corpus, consultas [{"query", "relevantes" ou None}])."""
+    if args.sintetico:
+        from src.benchmarks.corpus_sintetico import gerar_corpus
+
+        corpus = os.path.join(diretorio_base, "corpus")
+        return corpus, gerar_corpus(corpus, args.sintetico, args.consultas, args.semente)
+
+    from src.tests.test_models import QUERIES
+
+    return os.path.abspath(args.corpus), [{"query": query, "relevantes": None} for query in QUERIES]
+
+
+def resumir(medicao, consultas, referencia, k):
+    resumo = {
+        "p50_ms": statistics.median(medicao["latencias"]) * 1000,
+        "p95_ms": percentil(medicao["latencias"], 95) * 1000,
+        "p50_repetida_ms": statistics.median(medicao["repetidas"]) * 1000,
+        "concordancia": None,
+        "recall": None,
+        "mrr": None,
+    }
+    if referencia is not None:
+        resumo["concordancia"] = statistics.mean(
+            len(set(ranking[:k]) & set(ref[:k])) / len(ref[:k]) if ref else 1.0
+            for ranking, ref in zip(medicao["rankings"], referencia["rankings"])
+        )
+    rotuladas = [(ranking, consulta["relevantes"]) for ranking, consulta in zip(medicao["rankings"], consultas)
+                 if consulta["relevantes"]]
+    if rotuladas:
+        avaliacoes = [avaliar_ranking(ranking, relevantes, k) for ranking, relevantes in rotuladas]
+        resumo["recall"] = statistics.mean(recall for recall, _ in avaliacoes)
+        resumo["mrr"] = statistics.mean(rr for _, rr in avaliacoes)
+    return resumo
+
+
+def main():
+    from src.utils.reranker import MODELO_RERANKER, N_CANDIDATOS_RERANK, ORCAMENTO_RERANK_MS
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--configs", nargs="+", default=list(CONFIGS_PADRAO),
+                        help=f"modelo ou modelo+reranker; apelidos: {', '.join(MODELOS)} (padrão: %(default)s)")
+    parser.add_argument("--corpus", default="data/test_documents", help="Corpus das QUERIES (sem --sintetico)")
+    parser.add_argument("--sintetico", type=int, default=0, help="Gera um corpus rotulado com N documentos")
+    parser.add_argument("--consultas", type=int, default=100, help="Consultas rotuladas geradas (com --sintetico)")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--modelo-reranker", default=MODELO_RERANKER)
+    parser.add_argument("--candidatos", type=int, default=N_CANDIDATOS_RERANK, help="Candidatos da primeira etapa")
+    parser.add_argument("--orcamento-ms", type=float, default=ORCAMENTO_RERANK_MS,
+                        help="Orçamento do re-ranqueamento por query (ms); 0 = sem limite")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--dispositivo", default="cpu")
+    parser.add_argument("--saida", default=None, help="Arquivo JSON de saída (opcional)")
+    args = parser.parse_args()
+
+    diretorio_base = tempfile.mkdtemp(prefix="bench_reranker_")
+    corpus, consultas = carregar_consultas(args, diretorio_base)
+    print(f"Corpus: '{corpus}', {len(consultas)} consultas, k={args.k}, {args.candidatos} candidatos, "
+          f"orçamento {args.orcamento_ms or 'ilimitado'} ms, re-ranqueador {args.modelo_reranker}.")
+
+    # Um processo por bi-encoder, com as variantes com e sem re-ranqueador; a referência (e5-large) sempre roda
+    variantes_por_modelo = {REFERENCIA: {False}}
+    for nome in args.configs:
+        modelo, _, sufixo = nome.partition("+")
+        variantes_por_modelo.setdefault(modelo, set()).add(sufixo == "reranker")
+
+    medicoes = {}
+    contexto = multiprocessing.get_context("spawn")
+    for modelo, variantes in variantes_por_modelo.items():
+        config = {
+            "modelo": modelo, "variantes": sorted(variantes), "k": args.k, "candidatos": max(args.candidatos, args.k),
+            "modelo_reranker": args.modelo_reranker, "orcamento_ms": args.orcamento_ms or None,
+            "dispositivo": args.dispositivo, "corpus": corpus, "consultas": consultas,
+            "diretorio_trabalho": tempfile.mkdtemp(prefix=f"{modelo}_", dir=diretorio_base),
+        }
+        with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as executor:
+            try:
+                medicoes.update(executor.submit(executar_modelo, config).result())
+            except Exception as e:
+                print(f"Falha ao avaliar {modelo}: {e}")
+
+    referencia = medicoes.get(REFERENCIA)
+    resumos = {nome: resumir(medicoes[nome], consultas, referencia, args.k) for nome in args.configs if nome in medicoes}
+
+    def formatar(valor, largura):
+        return f"{valor:>{largura}.3f}" if valor is not None else f"{'-':>{largura}}"
+
+    print(f"\n{'configuração':<22} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p50 rep.':>9} "
+          f"{f'concord.@{args.k}':>11} {f'recall@{args.k}':>10} {f'MRR@{args.k}':>8}")
+    for nome, resumo in resumos.items():
+        print(f"{nome:<22} {resumo['p50_ms']:>9.1f} {resumo['p95_ms']:>9.1f} {resumo['p50_repetida_ms']:>9.1f} "
+              f"{formatar(resumo['concordancia'], 11)} {formatar(resumo['recall'], 10)} {formatar(resumo['mrr'], 8)}")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump({"config": {**vars(args), "corpus": corpus}, "resultados": resumos}, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados gravados em '{args.saida}'.")
+
+
+if __name__ == "__main__":
+    main()
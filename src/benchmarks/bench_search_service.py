@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Teste de carga do serviço HTTP de busca (`src.api.search_service`).
+
+Abre N clientes simultâneos (conexões keep-alive, HTTP cru sobre asyncio) e
+mede, para cada nível de concorrência: QPS, latência p50/p95/p99 e respostas
+com erro (incluindo 503 por fila cheia). Cada requisição usa uma variação
+única das QUERIES de `src.tests.test_models`, para que o cache de resultados
+não mascare o custo do encode.
+
+Com 4 ou mais clientes, os micro-lotes reúnem várias queries fora do cache; o
+código de saída é 1 se alguma resposta tiver erro que não seja 503 (ex.: 500 na
+divisão do resultado do lote), para uso como teste de regressão.
+
+O serviço deve estar rodando:
+    python -m src.api.search_service --porta 8000
+
+Uso:
+    python -m src.benchmarks.bench_search_service --porta 8000 --concorrencias 1 8 64 --requisicoes 400
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import statistics
+import time
+from urllib.parse import urlencode
+
+from src.benchmarks.estatisticas import percentil
+from src.tests.test_models import QUERIES
+
+
+async def _requisitar(reader, writer, host, query, n_results):
+    alvo = "/busca?" + urlencode({"q": query, "n": n_results})
+    writer.write(f"GET {alvo} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    tamanho = 0
+    while True:
+        linha = await reader.readline()
+        if linha in (b"\r\n", b""):
+            break
+        nome, _, valor = linha.decode("latin-1").partition(":")
+        if nome.lower() == "content-length":
+            tamanho = int(valor)
+    await reader.readexactly(tamanho)
+    return status
+
+
+async def _cliente(host, porta, contador, total, queries, n_results, latencias, erros):
+    reader, writer = await asyncio.open_connection(host, porta)
+    try:
+        while True:
+            indice = next(contador)
+            if indice >= total:
+                break
+            inicio = time.perf_counter()
+            status = await _requisitar(reader, writer, host, queries[indice], n_results)
+            latencias.append(time.perf_counter() - inicio)
+            if status != 200:
+                erros[status] = erros.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def medir_concorrencia(host, porta, concorrencia, total, n_results, rodada):
+    # Sufixo único por requisição: evita acertos no cache de embeddings e de resultados
+    queries = [f"{QUERIES[i % len(QUERIES)]} ({rodada}-{i})" for i in range(total)]
+    latencias, erros = [], {}
+    contador = itertools.count()
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(
+        _cliente(host, porta, contador, total, queries, n_results, latencias, erros) for _ in range(concorrencia)
+    ))
+    duracao = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        "concorrencia": concorrencia,
+        "qps": len(latencias) / duracao,
+        "p50_ms": statistics.median(latencias) * 1000,
+        "p95_ms": percentil(latencias, 95) * 1000,
+        "p99_ms": percentil(latencias, 99) * 1000,
+        "erros": erros,
+    }
+
+
+async def _metricas(host, porta):
+    reader, writer = await asyncio.open_connection(host, porta)
+    try:
+        writer.write(f"GET /metricas HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode("latin-1"))
+        await writer.drain()
+        resposta = await reader.read()
+    finally:
+        writer.close()
+    return json.loads(resposta.split(b"\r\n\r\n", 1)[1])
+
+
+async def executar(args):
+    if max(args.concorrencias) < 4:
+        print("Aviso: com menos de 4 clientes os lotes de 4+ queries não são exercitados.")
+    print(f"{'concorrência':>12} {'QPS':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9}  erros")
+    falhas = {}
+    for rodada, concorrencia in enumerate(args.concorrencias):
+        resultado = await medir_concorrencia(args.host, args.porta, concorrencia, args.requisicoes, args.n, rodada)
+        print(
+            f"{resultado['concorrencia']:>12} {resultado['qps']:>8.1f} {resultado['p50_ms']:>9.1f} "
+            f"{resultado['p95_ms']:>9.1f} {resultado['p99_ms']:>9.1f}  {resultado['erros'] or '-'}"
+        )
+        for status, quantidade in resultado["erros"].items():
+            if status != 503:  # 503 é a backpressure esperada com a fila cheia
+                falhas[status] = falhas.get(status, 0) + quantidade
+
+    metricas = await _metricas(args.host, args.porta)
+    print(f"\nLotes: {metricas['lotes']}, tamanho médio do lote: {metricas['tamanho_medio_lote']:.1f}, "
+          f"rejeitadas (503): {metricas['rejeitadas']}")
+    if falhas:
+        print(f"Respostas com erro: {falhas}")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8000)
+    parser.add_argument("--concorrencias", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--requisicoes", type=int, default=400, help="Requisições por nível de concorrência")
+    parser.add_argument("-n", type=int, default=10, help="n_results de cada busca")
+    return asyncio.run(executar(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Benchmark do banco de metadados sob leitura e escrita concorrentes.
+
+Compara dois modos sobre o mesmo esquema:
+  - legado: uma conexão por operação, journal de rollback e um commit por arquivo;
+  - otimizado: conexões por thread (`src.database.conexao`), WAL, pragmas
+    ajustados, statements em cache e `executemany` em transações de N arquivos.
+
+Mede inserções/s em carga (uma thread) e, com threads escritoras e leitoras
+rodando juntas, inserções/s e latência p50/p99 das consultas por nome de arquivo.
+
+Uso:
+    python -m src.benchmarks.bench_sqlite_concorrente --arquivos 20000 --leitores 4 --escritores 1 --lote 500
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from src.benchmarks.estatisticas import percentil
+from src.database import conexao, database_operations, database_setup
+
+
+def _metadados_sinteticos(inicio, quantidade, prefixo):
+    return [
+        {
+            "nome_arquivo": f"{prefixo}_{i}.txt", "autor": "Autor Desconhecido", "data_criacao": "2024-01-01T00:00:00Z",
+            "data_modificacao": "2024-01-01T00:00:00Z", "usuario_modificacao": "sistema", "linguagem": "pt",
+            "tipo_documento": random.choice(["txt", "md", "pdf"]), "tags": f"{prefixo}_{i}", "nivel_acesso": "publico",
+            "codigo_autenticacao": None, "titulo": f"Documento {i}", "tamanho_bytes": random.randint(100, 100_000),
+            "hash_conteudo": f"{i:064x}", "mtime": time.time(),
+        }
+        for i in range(inicio, inicio + quantidade)
+    ]
+
+
+def criar_banco(modo):
+    """Cria um banco temporário vazio e aponta os módulos para ele."""
+    diretorio = tempfile.mkdtemp(prefix=f"bench_sqlite_{modo}_")
+    caminho = os.path.join(diretorio, "metadados.db")
+    database_setup.DATABASE_DIR = diretorio
+    database_setup.DATABASE_PATH = caminho
+    database_operations.DATABASE_PATH = caminho
+    database_setup.create_database_and_tables()
+    if modo == "legado":
+        conn = sqlite3.connect(caminho)
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.close()
+    return caminho
+
+
+# --- Modo legado: conexão por operação, como o módulo fazia antes -------------------------
+
+def _upsert_legado(caminho, metadados):
+    conn = sqlite3.connect(caminho, timeout=30)
+    try:
+        conn.execute(database_operations.SQL_UPSERT_METADADOS, database_operations._valores_upsert(metadados))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _consultar_legado(caminho, nome_arquivo):
+    conn = sqlite3.connect(caminho, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        registro = conn.execute(database_operations.SQL_METADADOS_POR_NOME, (nome_arquivo,)).fetchone()
+        return dict(registro) if registro else None
+    finally:
+        conn.close()
+
+
+def gravar(modo, caminho, metadados, tamanho_lote):
+    if modo == "legado":
+        for item in metadados:
+            _upsert_legado(caminho, item)
+    else:
+        database_operations.upsert_metadados_em_lote(metadados, tamanho_lote)
+
+
+def consultar(modo, caminho, nome_arquivo):
+    if modo == "legado":
+        return _consultar_legado(caminho, nome_arquivo)
+    return database_operations.obter_metadados_por_nome_arquivo(nome_arquivo)
+
+
+# --- Cenários ---------------------------------------------------------------------------
+
+def medir_carga(modo, caminho, n_arquivos, tamanho_lote):
+    metadados = _metadados_sinteticos(0, n_arquivos, "base")
+    inicio = time.perf_counter()
+    gravar(modo, caminho, metadados, tamanho_lote)
+    return n_arquivos / (time.perf_counter() - inicio)
+
+
+def medir_misto(modo, caminho, n_arquivos, leitores, escritores, tamanho_lote, duracao):
+    parar = threading.Event()
+    latencias = []
+    gravados = [0] * escritores
+    lock = threading.Lock()
+
+    def escritor(indice):
+        proximo = 0
+        while not parar.is_set():
+            gravar(modo, caminho, _metadados_sinteticos(proximo, tamanho_lote, f"novo_{indice}"), tamanho_lote)
+            proximo += tamanho_lote
+            gravados[indice] = proximo
+
+    def leitor():
+        locais = []
+        while not parar.is_set():
+            nome = f"base_{random.randrange(n_arquivos)}.txt"
+            inicio = time.perf_counter()
+            consultar(modo, caminho, nome)
+            locais.append(time.perf_counter() - inicio)
+        with lock:
+            latencias.extend(locais)
+
+    threads = [threading.Thread(target=escritor, args=(i,)) for i in range(escritores)]
+    threads += [threading.Thread(target=leitor) for _ in range(leitores)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duracao)
+    parar.set()
+    for thread in threads:
+        thread.join()
+    tempo = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        "insercoes_por_segundo": sum(gravados) / tempo,
+        "consultas_por_segundo": len(latencias) / tempo,
+        "p50_ms": statistics.median(latencias) * 1000,
+        "p99_ms": percentil(latencias, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--arquivos", type=int, default=20_000, help="Registros da carga inicial")
+    parser.add_argument("--leitores", type=int, default=4)
+    parser.add_argument("--escritores", type=int, default=1)
+    parser.add_argument("--lote", type=int, default=database_operations.TAMANHO_LOTE_INSERCAO, help="Arquivos por transação")
+    parser.add_argument("--duracao", type=float, default=5.0, help="Duração do cenário misto (s)")
+    parser.add_argument("--arquivos-legado", type=int, default=2_000,
+                        help="Registros da carga no modo legado (um commit por arquivo é lento)")
+    args = parser.parse_args()
+
+    print(f"{'modo':<10} {'carga (ins/s)':>14} {'misto (ins/s)':>14} {'consultas/s':>12} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for modo in ("legado", "otimizado"):
+        caminho = criar_banco(modo)
+        n_arquivos = args.arquivos_legado if modo == "legado" else args.arquivos
+        carga = medir_carga(modo, caminho, n_arquivos, args.lote)
+        misto = medir_misto(modo, caminho, n_arquivos, args.leitores, args.escritores, args.lote, args.duracao)
+        conexao.gerenciador_conexoes.fechar_todas()
+        print(
+            f"{modo:<10} {carga:>14.0f} {misto['insercoes_por_segundo']:>14.0f} {misto['consultas_por_segundo']:>12.0f} "
+            f"{misto['p50_ms']:>9.3f} {misto['p99_ms']:>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
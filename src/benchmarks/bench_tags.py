@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark da busca por tags: varredura com LIKE '%tag%' vs. índice `documento_tags`.
+
+Popula um banco temporário com N documentos sintéticos (tags no formato dos
+nomes de arquivo, ex.: "certidao_quitacao_092525360590") e compara, para
+algumas buscas, a latência mediana e o número de resultados da consulta antiga
+(OR de LIKE, que varre a tabela e casa substrings) com `buscar_metadados_por_tags`.
+
+Uso:
+    python -m src.benchmarks.bench_tags --documentos 1000000 --repeticoes 5
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from src.database import database_operations, database_setup
+from src.database.conexao import transacao
+from src.database.tags import gravar_tags
+
+PALAVRAS = [
+    "contrato", "arrendamento", "certidao", "quitacao", "relatorio", "projeto", "politica", "seguranca",
+    "processo", "homologacao", "comprovante", "pagamento", "faixa", "parcela", "escritura", "matricula",
+    "procuracao", "nota", "fiscal", "balanco", "ata", "assembleia", "laudo", "vistoria", "aditivo",
+]
+
+TAMANHO_LOTE = 20_000
+
+
+def popular_banco(n_documentos):
+    """Cria um banco temporário com `n_documentos` registros sintéticos e suas tags normalizadas."""
+    diretorio = tempfile.mkdtemp(prefix="bench_tags_")
+    caminho = os.path.join(diretorio, "metadados.db")
+    database_setup.DATABASE_DIR = diretorio
+    database_setup.DATABASE_PATH = caminho
+    database_operations.DATABASE_PATH = caminho
+    database_setup.create_database_and_tables()
+
+    inicio = time.perf_counter()
+    for base in range(0, n_documentos, TAMANHO_LOTE):
+        linhas = []
+        for i in range(base, min(base + TAMANHO_LOTE, n_documentos)):
+            tags = f"{random.choice(PALAVRAS)}_{random.choice(PALAVRAS)}_{random.randrange(10**12):012d}"
+            linhas.append((f"{tags}_{i}.pdf", "pdf", tags, "publico"))
+        with transacao(caminho) as conn:
+            conn.executemany(
+                "INSERT INTO metadados (nome_arquivo, tipo_documento, tags, nivel_acesso) VALUES (?, ?, ?, ?)", linhas
+            )
+            gravar_tags(conn, [(nome, tags) for nome, _, tags, _ in linhas])
+    print(f"{n_documentos} documentos gravados em {time.perf_counter() - inicio:.1f} s.\n")
+    return caminho
+
+
+def buscar_com_like(caminho, tags_busca):
+    """A consulta anterior: um `tags LIKE '%tag%'` por tag, unidos com OR (varredura completa)."""
+    conn = database_operations.obter_conexao(caminho)
+    sql = f"SELECT * FROM metadados WHERE {' OR '.join(['tags LIKE ?'] * len(tags_busca))}"
+    return [dict(registro) for registro in conn.execute(sql, [f"%{tag}%" for tag in tags_busca])]
+
+
+def medir(funcao, repeticoes):
+    latencias = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        latencias.append(time.perf_counter() - inicio)
+    return statistics.median(latencias), len(resultado)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documentos", type=int, default=1_000_000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    caminho = popular_banco(args.documentos)
+    numero = database_operations.obter_conexao(caminho).execute(
+        "SELECT tags FROM metadados WHERE id = ?", (args.documentos // 2,)
+    ).fetchone()[0].rsplit("_", 1)[1]
+
+    buscas = [
+        (["ai"], "qualquer"),  # Substring: o LIKE casa com "faixa", "aditivo"..., o índice não casa com nada
+        ([numero], "qualquer"),  # Número de documento exato
+        (["certidao_quitacao"], "qualquer"),
+        (["laudo", "vistoria"], "qualquer"),
+        (["laudo", "vistoria"], "todas"),
+    ]
+
+    print(f"{'busca':<36} {'LIKE (ms)':>10} {'hits':>8} {'índice (ms)':>12} {'hits':>8} {'ganho':>8}")
+    for tags_busca, modo in buscas:
+        if modo == "todas":
+            # O LIKE antigo só fazia OR; o equivalente com AND é o que uma busca "todas" exigiria
+            conn = database_operations.obter_conexao(caminho)
+            sql = f"SELECT * FROM metadados WHERE {' AND '.join(['tags LIKE ?'] * len(tags_busca))}"
+            funcao_like = lambda: conn.execute(sql, [f"%{tag}%" for tag in tags_busca]).fetchall()
+        else:
+            funcao_like = lambda: buscar_com_like(caminho, tags_busca)
+        tempo_like, hits_like = medir(funcao_like, args.repeticoes)
+        tempo_indice, hits_indice = medir(
+            lambda: database_operations.buscar_metadados_por_tags(tags_busca, modo=modo), args.repeticoes
+        )
+        rotulo = f"{modo}: {', '.join(tags_busca)}"
+        print(
+            f"{rotulo:<36} {tempo_like * 1000:>10.1f} {hits_like:>8} {tempo_indice * 1000:>12.2f} "
+            f"{hits_indice:>8} {tempo_like / tempo_indice:>7.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos armazenamentos vetoriais: HNSW do ChromaDB vs. busca exata NumPy (memmap).
+
+Popula as duas implementações de `VectorStore` com os mesmos vetores sintéticos
+(agrupados em torno de centros, como embeddings reais) e metadados de tipo de
+documento, e mede por armazenamento:
+  - tempo de construção (vetores/s);
+  - latência p50/p99 de uma query, sem filtro, com filtro de 1/3 das linhas e com filtro de ~1%;
+  - vazão de um lote de queries em uma única chamada (queries/s);
+  - recall@k em relação ao top-k exato.
+
+Uso:
+    python -m src.benchmarks.bench_vector_store --vetores 200000 --dimensao 1024 --queries 100
+    python -m src.benchmarks.bench_vector_store --dtype float16
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from src.benchmarks.estatisticas import percentil
+from src.utils.numpy_store import DTYPES_VETORES, SessaoNumpy, buscar_top_k, normalizar_vetores
+
+NOME_COLECAO = "benchmark_index"
+TIPOS = ("pdf", "txt", "md")
+
+
+def gerar_dados(n_vetores, dimensao, n_centros=256, seed=42):
+    """Vetores normalizados em torno de `n_centros` centros, com tipo e grupo (1% das linhas por grupo)."""
+    rng = np.random.default_rng(seed)
+    centros = rng.standard_normal((n_centros, dimensao), dtype=np.float32)
+    vetores = centros[rng.integers(n_centros, size=n_vetores)] + 0.5 * rng.standard_normal((n_vetores, dimensao), dtype=np.float32)
+    metadados = [{"tipo_documento": TIPOS[i % len(TIPOS)], "grupo": i % 100} for i in range(n_vetores)]
+    return normalizar_vetores(vetores), metadados
+
+
+def popular(colecao, vetores, metadados, tamanho_lote=5000):
+    inicio = time.perf_counter()
+    for inicio_lote in range(0, len(vetores), tamanho_lote):
+        fim_lote = min(inicio_lote + tamanho_lote, len(vetores))
+        colecao.upsert(
+            ids=[f"doc_{i}" for i in range(inicio_lote, fim_lote)],
+            embeddings=vetores[inicio_lote:fim_lote],
+            metadatas=metadados[inicio_lote:fim_lote],
+        )
+    return time.perf_counter() - inicio
+
+
+def medir(colecao, queries, n_results, where, exatos):
+    """Latências de queries individuais e recall@k médio em relação a `exatos` (listas de IDs)."""
+    latencias, recalls = [], []
+    for query, exato in zip(queries, exatos):
+        inicio = time.perf_counter()
+        resultado = colecao.query(query_embeddings=[query.tolist()], n_results=n_results, where=where, include=["distances"])
+        latencias.append(time.perf_counter() - inicio)
+        recalls.append(len(set(resultado["ids"][0]) & set(exato)) / len(exato) if exato else 1.0)
+    return {
+        "p50_ms": percentil(latencias, 50) * 1000,
+        "p99_ms": percentil(latencias, 99) * 1000,
+        "recall": statistics.mean(recalls),
+    }
+
+
+def medir_lote(colecao, queries, n_results):
+    inicio = time.perf_counter()
+    colecao.query(query_embeddings=queries.tolist(), n_results=n_results, include=["distances"])
+    return len(queries) / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vetores", type=int, default=200_000)
+    parser.add_argument("--dimensao", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--n-results", type=int, default=30)
+    parser.add_argument("--dtype", choices=DTYPES_VETORES, default="float32", help="Precisão do armazenamento NumPy")
+    parser.add_argument("--armazenamentos", nargs="+", choices=("chroma", "numpy"), default=["chroma", "numpy"])
+    args = parser.parse_args()
+
+    vetores, metadados = gerar_dados(args.vetores, args.dimensao)
+    rng = np.random.default_rng(7)
+    queries = normalizar_vetores(vetores[rng.integers(args.vetores, size=args.queries)]
+                                 + 0.3 * rng.standard_normal((args.queries, args.dimensao), dtype=np.float32))
+
+    filtros = {
+        "sem filtro": None,
+        "tipo (1/3)": {"tipo_documento": "pdf"},
+        "grupo (1%)": {"grupo": 7},
+    }
+    # Top-k exato de referência para cada filtro
+    ids = np.array([f"doc_{i}" for i in range(args.vetores)])
+    exatos = {}
+    for nome, where in filtros.items():
+        mascara = None
+        if where:
+            campo, valor = next(iter(where.items()))
+            mascara = np.array([m[campo] == valor for m in metadados])
+        linhas, _ = buscar_top_k(queries, vetores, args.n_results, mascara)
+        exatos[nome] = [ids[linhas_query].tolist() for linhas_query in linhas]
+
+    diretorio = tempfile.mkdtemp(prefix="bench_vector_store_")
+    for armazenamento in args.armazenamentos:
+        if armazenamento == "chroma":
+            from src.utils.chroma_session import SessaoChroma
+
+            sessao = SessaoChroma(os.path.join(diretorio, "chroma_db"))
+        else:
+            sessao = SessaoNumpy(os.path.join(diretorio, "vetores_numpy"), dtype=args.dtype)
+        colecao = sessao.obter_colecao(NOME_COLECAO, criar=True)
+
+        tempo = popular(colecao, vetores, metadados)
+        rotulo = armazenamento if armazenamento == "chroma" else f"numpy ({args.dtype})"
+        print(f"\n{rotulo}: {args.vetores} vetores ({args.dimensao} dims) em {tempo:.1f} s "
+              f"({args.vetores / tempo:.0f} vetores/s); lote de {args.queries} queries: "
+              f"{medir_lote(colecao, queries, args.n_results):.0f} queries/s")
+        print(f"  {'filtro':<12} {'p50 (ms)':>9} {'p99 (ms)':>9} {f'recall@{args.n_results}':>10}")
+        for nome, where in filtros.items():
+            m = medir(colecao, queries, args.n_results, where, exatos[nome])
+            print(f"  {nome:<12} {m['p50_ms']:>9.2f} {m['p99_ms']:>9.2f} {m['recall']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Gerador de corpus sintético em português (txt, md e pdf) com consultas rotuladas.
+
+Cada documento é de um tipo (contrato, certidão, relatório, ata ou política)
+e tem campos próprios: número, pessoa, empresa, cidade, data e valor. Esses
+campos aparecem no texto em meio a parágrafos de preenchimento, o que gera vários
+chunks por arquivo. Para uma amostra dos documentos são geradas consultas de
+dois tipos:
+  - "semantica": paráfrase dos campos do documento (ex.: "arrendamento entre
+    Ana Souza e a Alfa Logística em Recife");
+  - "exata": um token exato do documento (número do documento ou CPF), o caso em
+    que a busca densa costuma falhar.
+
+Os documentos relevantes de uma consulta são todos os que têm os mesmos
+campos usados nela, e não só o documento que a originou. As consultas são
+gravadas em `consultas.json` no diretório do corpus.
+
+Uso:
+    python -m src.benchmarks.corpus_sintetico data/corpus_sintetico --documentos 1000 --consultas 200
+"""
+
+import argparse
+import json
+import os
+import random
+import unicodedata
+
+PRENOMES = ["Ana", "Bruno", "Carla", "Diego", "Eduarda", "Fábio", "Gabriela", "Henrique", "Isabel", "João",
+            "Larissa", "Marcos", "Natália", "Otávio", "Paula", "Rafael", "Sabrina", "Tiago", "Vanessa", "Wagner"]
+SOBRENOMES = ["Silva", "Souza", "Oliveira", "Santos", "Pereira", "Costa", "Rodrigues", "Almeida", "Nascimento",
+              "Lima", "Araújo", "Fernandes", "Carvalho", "Gomes", "Martins", "Rocha", "Ribeiro", "Barbosa"]
+EMPRESAS = ["Alfa Logística", "Beta Engenharia", "Gama Alimentos", "Delta Transportes", "Épsilon Tecnologia",
+            "Zeta Construções", "Eta Agropecuária", "Teta Saúde", "Iota Energia", "Kapa Mineração",
+            "Lambda Consultoria", "Mi Têxtil", "Ni Farmacêutica", "Ômicron Seguros", "Pi Educação"]
+CIDADES = ["São Paulo", "Rio de Janeiro", "Belo Horizonte", "Recife", "Salvador", "Fortaleza", "Curitiba",
+           "Porto Alegre", "Manaus", "Belém", "Goiânia", "Florianópolis", "Natal", "Campinas", "Vitória"]
+
+TIPOS = {
+    "contrato": {
+        "subtipos": ["arrendamento", "prestação de serviços", "compra e venda", "locação comercial", "fornecimento"],
+        "titulo": "Contrato de {subtipo} nº {numero}",
+        "abertura": "Pelo presente instrumento, {pessoa}, CPF {cpf}, e a empresa {empresa} celebram contrato de "
+                    "{subtipo} na cidade de {cidade}, em {data}, no valor total de R$ {valor}.",
+        "consulta": "contrato de {subtipo} entre {pessoa} e a {empresa}",
+    },
+    "certidao": {
+        "subtipos": ["quitação", "débitos trabalhistas", "regularidade fiscal", "ônus reais", "casamento"],
+        "titulo": "Certidão de {subtipo} nº {numero}",
+        "abertura": "Certificamos, para os devidos fins, que {pessoa}, CPF {cpf}, vinculado à {empresa}, obteve "
+                    "certidão de {subtipo} emitida em {cidade} na data de {data}.",
+        "consulta": "certidão de {subtipo} emitida para {pessoa} em {cidade}",
+    },
+    "relatorio": {
+        "subtipos": ["auditoria interna", "andamento de obra", "desempenho trimestral", "impacto ambiental",
+                     "segurança da informação"],
+        "titulo": "Relatório de {subtipo} nº {numero}",
+        "abertura": "Este relatório de {subtipo}, elaborado por {pessoa} para a {empresa}, consolida as atividades "
+                    "realizadas em {cidade} até {data}, com orçamento executado de R$ {valor}.",
+        "consulta": "relatório de {subtipo} da {empresa} feito por {pessoa}",
+    },
+    "ata": {
+        "subtipos": ["assembleia geral ordinária", "reunião do conselho", "assembleia extraordinária",
+                     "reunião de diretoria", "comitê de riscos"],
+        "titulo": "Ata de {subtipo} nº {numero}",
+        "abertura": "Aos {data}, na sede da {empresa} em {cidade}, realizou-se a {subtipo}, presidida por "
+                    "{pessoa}, que aprovou a destinação de R$ {valor}.",
+        "consulta": "ata da {subtipo} da {empresa} presidida por {pessoa}",
+    },
+    "politica": {
+        "subtipos": ["segurança da informação", "privacidade de dados", "compras", "viagens corporativas",
+                     "home office"],
+        "titulo": "Política de {subtipo} nº {numero}",
+        "abertura": "A {empresa} institui a política de {subtipo}, sob responsabilidade de {pessoa}, aplicável "
+                    "às unidades de {cidade} a partir de {data}.",
+        "consulta": "política de {subtipo} da {empresa} aplicável em {cidade}",
+    },
+}
+
+# Campos que identificam os documentos relevantes de uma consulta semântica, por tipo
+CAMPOS_CONSULTA = {
+    "contrato": ("tipo", "subtipo", "pessoa", "empresa"),
+    "certidao": ("tipo", "subtipo", "pessoa", "cidade"),
+    "relatorio": ("tipo", "subtipo", "empresa", "pessoa"),
+    "ata": ("tipo", "subtipo", "empresa", "pessoa"),
+    "politica": ("tipo", "subtipo", "empresa", "cidade"),
+}
+
+PARAGRAFOS = [
+    "As partes declaram ter lido e compreendido todas as cláusulas, obrigando-se ao seu fiel cumprimento.",
+    "Os prazos aqui previstos serão contados em dias corridos, excluindo-se o dia do início e incluindo-se o do vencimento.",
+    "Eventuais alterações deverão ser formalizadas por escrito, mediante termo aditivo assinado pelos representantes legais.",
+    "O descumprimento de qualquer obrigação sujeitará a parte infratora às penalidades previstas na legislação vigente.",
+    "Os documentos comprobatórios ficarão arquivados pelo prazo mínimo de cinco anos, à disposição dos órgãos de controle.",
+    "A equipe técnica acompanhou as etapas de execução e registrou as não conformidades encontradas durante as visitas.",
+    "Os indicadores foram calculados com base nos dados consolidados do sistema de gestão e validados pela controladoria.",
+    "Fica eleito o foro da comarca da sede da empresa para dirimir quaisquer dúvidas oriundas deste documento.",
+    "As informações pessoais tratadas neste processo observam os princípios da finalidade, necessidade e transparência.",
+    "Recomenda-se a revisão anual deste documento, ou sempre que houver mudança relevante no contexto da organização.",
+]
+
+# Distribuição das extensões no corpus
+EXTENSOES = [("txt", 0.6), ("md", 0.25), ("pdf", 0.15)]
+
+
+def _gerar_documento(rng, indice):
+    tipo = rng.choice(list(TIPOS))
+    campos = {
+        "tipo": tipo,
+        "subtipo": rng.choice(TIPOS[tipo]["subtipos"]),
+        "numero": f"{rng.randrange(10**11, 10**12)}",
+        "pessoa": f"{rng.choice(PRENOMES)} {rng.choice(SOBRENOMES)}",
+        "cpf": f"{rng.randrange(1000):03d}.{rng.randrange(1000):03d}.{rng.randrange(1000):03d}-{rng.randrange(100):02d}",
+        "empresa": rng.choice(EMPRESAS),
+        "cidade": rng.choice(CIDADES),
+        "data": f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(2015, 2024)}",
+        "valor": f"{rng.randint(1_000, 9_999_999):,}".replace(",", "."),
+    }
+    extensao = rng.choices([e for e, _ in EXTENSOES], weights=[p for _, p in EXTENSOES])[0]
+    slug = unicodedata.normalize("NFKD", campos["subtipo"].split()[0]).encode("ascii", "ignore").decode("ascii")
+    nome_base = f"{tipo}_{slug}_{campos['numero']}_{indice}"
+    campos["nome_arquivo"] = f"{nome_base}.{extensao}"
+
+    titulo = TIPOS[tipo]["titulo"].format(**campos)
+    corpo = [TIPOS[tipo]["abertura"].format(**campos)]
+    corpo += rng.sample(PARAGRAFOS, k=rng.randint(3, len(PARAGRAFOS)))
+    return campos, titulo, corpo
+
+
+def _escrever_texto(caminho, titulo, corpo, markdown):
+    with open(caminho, "w", encoding="utf-8") as f:
+        f.write(f"# {titulo}\n\n" if markdown else f"{titulo}\n\n")
+        f.write("\n\n".join(corpo))
+        f.write("\n")
+
+
+def _quebrar_linhas(texto, largura=90):
+    linhas, atual = [], ""
+    for palavra in texto.split():
+        if atual and len(atual) + 1 + len(palavra) > largura:
+            linhas.append(atual)
+            atual = palavra
+        else:
+            atual = f"{atual} {palavra}" if atual else palavra
+    if atual:
+        linhas.append(atual)
+    return linhas
+
+
+def escrever_pdf(caminho, titulo, corpo, linhas_por_pagina=48):
+    """Grava um PDF mínimo (Helvetica, WinAnsiEncoding) com o texto em linhas, legível pelo PyPDF2."""
+    linhas = [titulo, ""]
+    for paragrafo in corpo:
+        linhas += _quebrar_linhas(paragrafo) + [""]
+    paginas = [linhas[i:i + linhas_por_pagina] for i in range(0, len(linhas), linhas_por_pagina)]
+
+    def escapar(linha):
+        return linha.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    objetos = {1: b"<< /Type /Catalog /Pages 2 0 R >>",
+               3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"}
+    kids = []
+    for n, pagina in enumerate(paginas):
+        id_pagina, id_conteudo = 4 + 2 * n, 5 + 2 * n
+        kids.append(f"{id_pagina} 0 R")
+        texto = "BT /F1 10 Tf 12 TL 50 800 Td " + " ".join(f"({escapar(linha)}) Tj T*" for linha in pagina) + " ET"
+        conteudo = texto.encode("cp1252", errors="replace")
+        objetos[id_pagina] = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                              f"/Resources << /Font << /F1 3 0 R >> >> /Contents {id_conteudo} 0 R >>").encode("ascii")
+        objetos[id_conteudo] = b"<< /Length %d >>\nstream\n" % len(conteudo) + conteudo + b"\nendstream"
+    objetos[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode("ascii")
+
+    saida = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for id_objeto in sorted(objetos):
+        offsets[id_objeto] = len(saida)
+        saida += b"%d 0 obj\n" % id_objeto + objetos[id_objeto] + b"\nendobj\n"
+    inicio_xref = len(saida)
+    saida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    for id_objeto in sorted(objetos):
+        saida += b"%010d 00000 n \n" % offsets[id_objeto]
+    saida += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, inicio_xref)
+    with open(caminho, "wb") as f:
+        f.write(saida)
+
+
+def gerar_corpus(diretorio, n_documentos=1000, n_consultas=200, semente=42):
+    """
+    Gera o corpus sintético e as consultas rotuladas em `diretorio`.
+
+    Args:
+        diretorio (str): Diretório de saída (criado se não existir).
+        n_documentos (int, optional): Número de documentos. Padrão: 1000.
+        n_consultas (int, optional): Número de consultas rotuladas (metade semânticas, metade exatas). Padrão: 200.
+        semente (int, optional): Semente do gerador aleatório (o corpus é reprodutível). Padrão: 42.
+
+    Returns:
+        list de dict: Consultas rotuladas ({"query", "tipo", "relevantes"}), também gravadas em consultas.json.
+    """
+    rng = random.Random(semente)
+    os.makedirs(diretorio, exist_ok=True)
+
+    documentos = []
+    for indice in range(n_documentos):
+        campos, titulo, corpo = _gerar_documento(rng, indice)
+        caminho = os.path.join(diretorio, campos["nome_arquivo"])
+        if caminho.endswith(".pdf"):
+            escrever_pdf(caminho, titulo, corpo)
+        else:
+            _escrever_texto(caminho, titulo, corpo, markdown=caminho.endswith(".md"))
+        documentos.append(campos)
+
+    consultas = []
+    for origem in rng.sample(documentos, k=min(n_consultas, len(documentos))):
+        if len(consultas) % 2 == 0:
+            chave = CAMPOS_CONSULTA[origem["tipo"]]
+            relevantes = [d["nome_arquivo"] for d in documentos if all(d[c] == origem[c] for c in chave)]
+            consultas.append({"query": TIPOS[origem["tipo"]]["consulta"].format(**origem), "tipo": "semantica",
+                              "relevantes": relevantes})
+        else:
+            campo = rng.choice(["numero", "cpf"])
+            rotulo = "documento nº" if campo == "numero" else "CPF"
+            relevantes = [d["nome_arquivo"] for d in documentos if d[campo] == origem[campo]]
+            consultas.append({"query": f"{rotulo} {origem[campo]}", "tipo": "exata", "relevantes": relevantes})
+
+    with open(os.path.join(diretorio, "consultas.json"), "w", encoding="utf-8") as f:
+        json.dump(consultas, f, ensure_ascii=False, indent=1)
+    return consultas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("diretorio")
+    parser.add_argument("--documentos", type=int, default=1000)
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    consultas = gerar_corpus(args.diretorio, args.documentos, args.consultas, args.semente)
+    print(f"{args.documentos} documentos e {len(consultas)} consultas gravados em '{args.diretorio}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+"""Estatísticas comuns aos benchmarks."""
+
+
+def percentil(valores, p):
+    """
+    Percentil `p` (0 a 100) das medições, pelo valor mais próximo da posição p/100 * (n - 1), sem interpolação.
+
+    Args:
+        valores (iterable de float): Medições (ex.: latências), em qualquer ordem.
+        p (float): Percentil, de 0 a 100.
+
+    Returns:
+        float: A medição na posição do percentil.
+    """
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(round(p / 100 * (len(valores) - 1))))]
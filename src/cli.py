@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Linha de comando do rag-sys.
+
+Os comandos importam só o que usam, dentro da própria função. Os leves (`setup`,
+`contar`, `listar`, `codigo-acesso`) tocam apenas o SQLite e não carregam NumPy,
+ChromaDB nem bibliotecas de ML. Os pesados (`index`, `serve`) carregam o modelo
+de embedding e o índice. `buscar` é leve quando o serviço de busca está no ar: a
+query vai por HTTP ao processo em que modelo e índice já estão residentes
+(`--iniciar-servico` sobe esse processo em segundo plano, se preciso, e ele
+atende as invocações seguintes); sem o serviço, busca no próprio processo.
+
+Uso:
+    rag-sys index <diretorio> [--modelo NOME] [--indice NOME] [--dispositivo cpu] [--batch-size 32] [--backend torch]
+                  [--armazenamento chroma]
+    rag-sys serve [--host 127.0.0.1] [--porta 8000] [--modelo NOME] [--indice NOME] [--janela-ms 5] [--armazenamento chroma]
+                  [--instrumentacao] [--consultas-lentas N] [--reranker] [--orcamento-rerank-ms 150]
+    rag-sys setup
+    rag-sys contar [--tipo pdf] [--autor NOME] [--ano 2024] [--concessao C]
+    rag-sys listar [--tipo pdf] [--autor NOME] [--ano 2024] [--limite 100] [--concessao C]
+    rag-sys buscar <query> [-n 10] [--tipo pdf] [--concessao C] [--servico URL] [--iniciar-servico] [--local]
+    rag-sys codigo-acesso <restrito|confidencial>
+    rag-sys nivel-acesso <publico|restrito|confidencial> <arquivo>... [--indice NOME] [--armazenamento chroma]
+    rag-sys reparticionar [--shards N]
+    python -m src.cli index <diretorio>
+"""
+
+import argparse
+import os
+import sys
+
+
+def _comando_index(args):
+    from src.utils.indexador import indexar_diretorio
+    from src.utils.vector_store import obter_sessao_vetorial
+
+    resumo = indexar_diretorio(
+        args.diretorio,
+        model_name=args.modelo,
+        index_name=args.indice,
+        device=args.dispositivo,
+        batch_size=args.batch_size,
+        backend=args.backend,
+        sessao=obter_sessao_vetorial(args.armazenamento),
+    )
+    return 1 if resumo is None or resumo["falhas"] else 0
+
+
+def _comando_serve(args):
+    from src.api.search_service import main as servir
+
+    argv = [
+        "--host", args.host, "--porta", str(args.porta), "--modelo", args.modelo, "--indice", args.indice,
+        "--backend", args.backend, "--armazenamento", args.armazenamento, "--janela-ms", str(args.janela_ms), "--max-lote", str(args.max_lote),
+    ]
+    if args.instrumentacao:
+        argv.append("--instrumentacao")
+    if args.consultas_lentas is not None:
+        argv += ["--consultas-lentas", str(args.consultas_lentas)]
+    if args.reranker:
+        argv += ["--reranker", "--modelo-reranker", args.modelo_reranker]
+    if args.orcamento_rerank_ms is not None:
+        argv += ["--orcamento-rerank-ms", str(args.orcamento_rerank_ms)]
+    return servir(argv)
+
+
+def _comando_setup(args):
+    from src.database.database_setup import create_database_and_tables
+
+    create_database_and_tables()
+    return 0
+
+
+def _filtros_metadados(args):
+    from src.utils.controle_acesso import niveis_autorizados
+
+    # Sem concessão, só os documentos públicos (o mesmo que o roteador de queries aplica)
+    return dict(tipo_documento=args.tipo, autor=args.autor, ano=args.ano, campo_data=args.campo_data,
+                niveis_acesso=niveis_autorizados(args.concessao))
+
+
+def _comando_contar(args):
+    from src.database.database_operations import contar_documentos
+
+    total = contar_documentos(**_filtros_metadados(args))
+    if total is None:
+        return 1
+    print(total)
+    return 0
+
+
+def _comando_listar(args):
+    from src.database.database_operations import listar_documentos
+
+    for documento in listar_documentos(limite=args.limite, **_filtros_metadados(args)):
+        print(f"{documento['nome_arquivo']}\t{documento['tipo_documento']}\t{documento[args.campo_data]}")
+    return 0
+
+
+def _requisitar_servico(url, caminho, dados=None, concessao=None, timeout=2.0):
+    """Faz uma requisição JSON ao serviço de busca; levanta URLError se ele não estiver no ar."""
+    import json
+    import urllib.request
+
+    cabecalhos = {"Content-Type": "application/json"}
+    if concessao:
+        cabecalhos["Authorization"] = f"Bearer {concessao}"
+    corpo = json.dumps(dados).encode("utf-8") if dados is not None else None
+    requisicao = urllib.request.Request(url.rstrip("/") + caminho, data=corpo, headers=cabecalhos)
+    with urllib.request.urlopen(requisicao, timeout=timeout) as resposta:
+        return json.load(resposta)
+
+
+def _servico_no_ar(url):
+    import urllib.error
+
+    try:
+        return _requisitar_servico(url, "/saude", timeout=0.5).get("status") == "ok"
+    except (urllib.error.URLError, OSError, ValueError):
+        return False
+
+
+def _iniciar_servico(args):
+    """
+    Sobe `rag-sys serve` em segundo plano (sessão própria, saída em <dados>/servico_busca.log) e espera o /saude.
+
+    O processo continua no ar depois que este comando termina, com o modelo e o
+    índice carregados, e atende as invocações seguintes de `rag-sys buscar`.
+    """
+    import subprocess
+    import time
+    from urllib.parse import urlsplit
+    from src.config import DATABASE_DIR, TEMPO_INICIO_SERVICO_S
+
+    endereco = urlsplit(args.servico)
+    comando = [sys.executable, "-m", "src.cli", "serve", "--host", endereco.hostname or "127.0.0.1",
+               "--porta", str(endereco.port or 80), "--modelo", args.modelo, "--indice", args.indice]
+    if args.armazenamento:
+        comando += ["--armazenamento", args.armazenamento]
+    os.makedirs(DATABASE_DIR, exist_ok=True)
+    caminho_log = os.path.join(DATABASE_DIR, "servico_busca.log")
+    with open(caminho_log, "ab") as log:
+        processo = subprocess.Popen(comando, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                                    start_new_session=True)
+    print(f"Iniciando o serviço de busca em {args.servico} (pid {processo.pid}, log em '{caminho_log}')...")
+
+    prazo = time.monotonic() + TEMPO_INICIO_SERVICO_S
+    while time.monotonic() < prazo:
+        if _servico_no_ar(args.servico):
+            return True
+        if processo.poll() is not None:
+            print(f"O serviço de busca terminou ao iniciar (código {processo.returncode}); veja '{caminho_log}'.")
+            return False
+        time.sleep(0.25)
+    print(f"O serviço de busca não respondeu em {TEMPO_INICIO_SERVICO_S:.0f} s; veja '{caminho_log}'.")
+    return False
+
+
+def _buscar_localmente(args):
+    from src.utils.db_vectores import buscar_documentos_chromadb
+    from src.utils.vector_store import obter_sessao_vetorial
+
+    return buscar_documentos_chromadb(args.query, args.modelo, index_name=args.indice, n_results=args.n,
+                                      tipo_documento_filtro=args.tipo, sessao=obter_sessao_vetorial(args.armazenamento),
+                                      concessao=args.concessao)
+
+
+def _comando_buscar(args):
+    import json
+    import urllib.error
+
+    resultados = None
+    if not args.local:
+        if not _servico_no_ar(args.servico) and args.iniciar_servico:
+            _iniciar_servico(args)
+        try:
+            resposta = _requisitar_servico(args.servico, "/busca", {
+                "query": args.query, "n_results": args.n, "tipo_documento": args.tipo,
+                "modelo": args.modelo, "indice": args.indice, "armazenamento": args.armazenamento,
+            }, concessao=args.concessao, timeout=60.0)
+            resultados = resposta["resultados"]
+        except urllib.error.HTTPError as e:
+            erro = json.load(e).get("erro", e.reason)
+            if e.code != 409:
+                print(f"Erro do serviço de busca ({e.code}): {erro}")
+                return 1
+            # O serviço no ar atende outro modelo, índice ou armazenamento: a busca pedida roda aqui
+            print(f"{erro} Buscando neste processo.")
+        except (urllib.error.URLError, OSError, ValueError):
+            dica = "" if args.iniciar_servico else " (`--iniciar-servico` mantém modelo e índice residentes)"
+            print(f"Serviço de busca indisponível em {args.servico}; buscando neste processo{dica}.")
+
+    if resultados is None:
+        resultados = _buscar_localmente(args)
+    for resultado in resultados:
+        trecho = " ".join((resultado.get("trecho") or "").split())
+        print(f"{resultado['nome_arquivo']} ({resultado.get('tipo_documento')}) [{resultado.get('chunk_id')}] "
+              f"score {resultado['score']:.4f}\n    {trecho[:200]}")
+    if not resultados:
+        print("Nenhum documento encontrado.")
+    return 0
+
+
+def _comando_codigo_acesso(args):
+    import getpass
+    from src.utils.controle_acesso import definir_codigo_acesso
+
+    codigo = getpass.getpass(f"Novo código de acesso para '{args.nivel}': ")
+    if not codigo or codigo != getpass.getpass("Repita o código: "):
+        print("Os códigos não conferem; nada foi gravado.")
+        return 1
+    return 0 if definir_codigo_acesso(args.nivel, codigo) else 1
+
+
+def _comando_nivel_acesso(args):
+    from src.utils.controle_acesso import definir_nivel_acesso
+    from src.utils.vector_store import obter_sessao_vetorial
+
+    alterados = definir_nivel_acesso(args.arquivos, args.nivel, index_name=args.indice,
+                                     sessao=obter_sessao_vetorial(args.armazenamento))
+    if alterados is None:
+        return 1
+    print(f"Nível de acesso de {alterados} documento(s) alterado para '{args.nivel}'.")
+    return 0
+
+
+def _comando_reparticionar(args):
+    from src.utils.particionamento import obter_sessao_particionada
+    from src.utils.vector_store import ARMAZENAMENTO_PARTICIONADO, DIRETORIOS_ARMAZENAMENTO
+
+    sessao = obter_sessao_particionada(args.diretorio or DIRETORIOS_ARMAZENAMENTO[ARMAZENAMENTO_PARTICIONADO])
+    try:
+        sessao.reparticionar(args.shards)
+    except Exception as e:
+        print(f"Erro ao reparticionar '{sessao.persist_path}': {e}")
+        return 1
+    return 0
+
+
+def criar_parser():
+    """Cria o parser de argumentos da CLI."""
+    # Só módulos leves: montar o parser não deve carregar os módulos de busca e indexação
+    from src.config import MODELO_PADRAO, MODELO_RERANKER, RERANKER_ATIVO, SERVICO_URL
+    from src.database.niveis_acesso import NIVEIS_ACESSO
+    from src.utils.encoders import BACKEND_PADRAO, BACKENDS
+    from src.utils.vector_store import ARMAZENAMENTO_PADRAO, ARMAZENAMENTOS
+
+    parser = argparse.ArgumentParser(prog="rag-sys", description="Sistema RAG de gestão de documentos.")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    parser_index = subparsers.add_parser("index", help="Indexa incrementalmente os documentos de um diretório.")
+    parser_index.add_argument("diretorio", help="Diretório com os documentos (txt, md, pdf).")
+    parser_index.add_argument("--modelo", default=MODELO_PADRAO, help="Modelo de embedding.")
+    parser_index.add_argument("--indice", default="documentos_index", help="Nome da coleção ChromaDB.")
+    parser_index.add_argument("--dispositivo", default="cpu", help="Dispositivo do modelo (cpu, cuda).")
+    parser_index.add_argument("--batch-size", type=int, default=32, help="Tamanho do lote de embedding.")
+    parser_index.add_argument("--backend", choices=BACKENDS, default=BACKEND_PADRAO, help="Backend de inferência do encoder.")
+    parser_index.add_argument("--armazenamento", choices=ARMAZENAMENTOS, default=ARMAZENAMENTO_PADRAO,
+                              help="Armazenamento vetorial: HNSW do ChromaDB, busca exata NumPy ou shards em processos.")
+    parser_index.set_defaults(funcao=_comando_index)
+
+    parser_serve = subparsers.add_parser("serve", help="Inicia o serviço HTTP de busca.")
+    parser_serve.add_argument("--host", default="127.0.0.1", help="Endereço de escuta.")
+    parser_serve.add_argument("--porta", type=int, default=8000, help="Porta de escuta.")
+    parser_serve.add_argument("--modelo", default=MODELO_PADRAO, help="Modelo de embedding.")
+    parser_serve.add_argument("--indice", default="documentos_index", help="Nome da coleção ChromaDB.")
+    parser_serve.add_argument("--backend", choices=BACKENDS, default=BACKEND_PADRAO, help="Backend de inferência do encoder.")
+    parser_serve.add_argument("--armazenamento", choices=ARMAZENAMENTOS, default=ARMAZENAMENTO_PADRAO,
+                              help="Armazenamento vetorial: HNSW do ChromaDB, busca exata NumPy ou shards em processos.")
+    parser_serve.add_argument("--janela-ms", type=float, default=5.0, help="Janela de agrupamento de queries (ms).")
+    parser_serve.add_argument("--max-lote", type=int, default=32, help="Máximo de queries por lote.")
+    parser_serve.add_argument("--instrumentacao", action="store_true", help="Mede as etapas das buscas (em /metricas).")
+    parser_serve.add_argument("--consultas-lentas", type=int, default=None, help="Guarda as N buscas mais lentas.")
+    parser_serve.add_argument("--reranker", action="store_true", default=RERANKER_ATIVO,
+                              help="Re-ranqueia os candidatos com um cross-encoder.")
+    parser_serve.add_argument("--modelo-reranker", default=MODELO_RERANKER, help="Modelo cross-encoder.")
+    parser_serve.add_argument("--orcamento-rerank-ms", type=float, default=None,
+                              help="Tempo máximo de re-ranqueamento por query (ms).")
+    parser_serve.set_defaults(funcao=_comando_serve)
+
+    parser_setup = subparsers.add_parser("setup", help="Cria ou migra o banco de metadados.")
+    parser_setup.set_defaults(funcao=_comando_setup)
+
+    def adicionar_filtros(subparser):
+        subparser.add_argument("--tipo", default=None, help="Tipo de documento (pdf, txt, md).")
+        subparser.add_argument("--autor", default=None, help="Autor do documento.")
+        subparser.add_argument("--ano", type=int, default=None, help="Ano de --campo-data.")
+        subparser.add_argument("--campo-data", choices=("data_modificacao", "data_criacao"), default="data_modificacao")
+        subparser.add_argument("--concessao", default=None, help="Concessão de acesso (sem ela, só os públicos).")
+
+    parser_contar = subparsers.add_parser("contar", help="Conta os documentos registrados (só SQLite).")
+    adicionar_filtros(parser_contar)
+    parser_contar.set_defaults(funcao=_comando_contar)
+
+    parser_listar = subparsers.add_parser("listar", help="Lista os documentos registrados (só SQLite).")
+    adicionar_filtros(parser_listar)
+    parser_listar.add_argument("--limite", type=int, default=100, help="Número máximo de documentos.")
+    parser_listar.set_defaults(funcao=_comando_listar)
+
+    parser_buscar = subparsers.add_parser(
+        "buscar", help="Busca documentos pelo serviço de busca residente (ou neste processo, se ele não estiver no ar)."
+    )
+    parser_buscar.add_argument("query", help="Texto da busca.")
+    parser_buscar.add_argument("-n", type=int, default=10, help="Número de resultados.")
+    parser_buscar.add_argument("--tipo", default=None, help="Tipo de documento (pdf, txt, md).")
+    parser_buscar.add_argument("--concessao", default=None, help="Concessão de acesso (sem ela, só os públicos).")
+    parser_buscar.add_argument("--servico", default=SERVICO_URL, help="URL do serviço de busca. Padrão: RAG_SERVICO_URL.")
+    parser_buscar.add_argument("--iniciar-servico", action="store_true",
+                               help="Sobe o serviço em segundo plano se ele não estiver no ar e o mantém para as próximas buscas.")
+    parser_buscar.add_argument("--local", action="store_true", help="Busca neste processo, sem o serviço.")
+    parser_buscar.add_argument("--modelo", default=MODELO_PADRAO, help="Modelo de embedding (busca local e serviço iniciado).")
+    parser_buscar.add_argument("--indice", default="documentos_index", help="Nome da coleção.")
+    parser_buscar.add_argument("--armazenamento", choices=ARMAZENAMENTOS, default=ARMAZENAMENTO_PADRAO,
+                               help="Armazenamento vetorial.")
+    parser_buscar.set_defaults(funcao=_comando_buscar)
+
+    parser_codigo = subparsers.add_parser("codigo-acesso", help="Define o código que libera um nível de acesso.")
+    parser_codigo.add_argument("nivel", choices=NIVEIS_ACESSO[1:], help="Nível liberado pelo código.")
+    parser_codigo.set_defaults(funcao=_comando_codigo_acesso)
+
+    parser_nivel = subparsers.add_parser("nivel-acesso", help="Altera o nível de acesso de documentos.")
+    parser_nivel.add_argument("nivel", choices=NIVEIS_ACESSO, help="Novo nível de acesso.")
+    parser_nivel.add_argument("arquivos", nargs="+", help="Nomes dos arquivos.")
+    parser_nivel.add_argument("--indice", default="documentos_index", help="Nome da coleção ChromaDB.")
+    parser_nivel.add_argument("--armazenamento", choices=ARMAZENAMENTOS, default=ARMAZENAMENTO_PADRAO,
+                              help="Armazenamento vetorial.")
+    parser_nivel.set_defaults(funcao=_comando_nivel_acesso)
+
+    parser_reparticionar = subparsers.add_parser(
+        "reparticionar", help="Redistribui o armazenamento particionado em outro número de shards."
+    )
+    parser_reparticionar.add_argument("--shards", type=int, default=None, help="Novo número de shards.")
+    parser_reparticionar.add_argument("--diretorio", default=None, help="Diretório do armazenamento particionado.")
+    parser_reparticionar.set_defaults(funcao=_comando_reparticionar)
+
+    return parser
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    return args.funcao(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
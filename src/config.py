@@ -0,0 +1,46 @@
+"""
+Configuração do rag-sys lida do ambiente.
+
+O arquivo `.env` é carregado uma única vez por processo (`carregar_ambiente`),
+na primeira importação deste módulo; os módulos do projeto chamam
+`carregar_ambiente()` no lugar de `load_dotenv()`, o que depois da primeira vez
+não custa nada. Aqui ficam as configurações compartilhadas por vários módulos e
+as usadas pelos pontos de entrada leves (a CLI monta os argumentos sem importar
+os módulos de busca e indexação). As demais continuam nos próprios módulos,
+como `RAG_*` lidas na importação.
+"""
+
+import os
+
+_ambiente_carregado = False
+
+
+def carregar_ambiente():
+    """Carrega o `.env` (sem sobrescrever variáveis já definidas) na primeira chamada; as seguintes não fazem nada."""
+    global _ambiente_carregado
+    if not _ambiente_carregado:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        _ambiente_carregado = True
+
+
+carregar_ambiente()
+
+# Diretório de dados (banco SQLite, vetores, caches) e banco de metadados
+DATABASE_DIR = os.environ.get("RAG_DATABASE_DIR", "data")
+DATABASE_FILE = os.environ.get("RAG_DATABASE_FILE", "metadados.db")
+DATABASE_PATH = os.path.join(DATABASE_DIR, DATABASE_FILE)
+
+# Modelo de embedding padrão da indexação e das buscas
+MODELO_PADRAO = os.environ.get("RAG_MODELO_EMBEDDING", "intfloat/multilingual-e5-large")
+
+# Re-ranqueamento ativo por padrão nas rotas de busca (responder_query e serviço HTTP)
+RERANKER_ATIVO = os.environ.get("RAG_RERANKER", "0") == "1"
+
+# Cross-encoder multilíngue pequeno (MiniLM de 12 camadas, 384 dimensões, treinado no mMARCO)
+MODELO_RERANKER = os.environ.get("RAG_MODELO_RERANKER", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+
+# Serviço de busca residente usado pela CLI (`rag-sys buscar`) e tempo máximo (s) para ele subir quando iniciado por ela
+SERVICO_URL = os.environ.get("RAG_SERVICO_URL", "http://127.0.0.1:8000")
+TEMPO_INICIO_SERVICO_S = float(os.environ.get("RAG_SERVICO_INICIO_S", "300"))
@@ -0,0 +1,150 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from src.config import carregar_ambiente
+
+carregar_ambiente()
+
+# Cache de páginas e região mapeada em memória por conexão (em MB)
+CACHE_SQLITE_MB = int(os.environ.get("RAG_SQLITE_CACHE_MB", "64"))
+MMAP_SQLITE_MB = int(os.environ.get("RAG_SQLITE_MMAP_MB", "256"))
+
+# Tempo máximo (ms) que uma conexão espera por um lock antes de falhar com "database is locked"
+BUSY_TIMEOUT_MS = int(os.environ.get("RAG_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Limite de parâmetros por consulta (SQLITE_MAX_VARIABLE_NUMBER é 999 em builds antigos do SQLite)
+MAX_PARAMETROS_SQL = 900
+
+# Statements preparados mantidos em cache por conexão (o padrão do módulo sqlite3 é 128)
+STATEMENTS_EM_CACHE = 256
+
+PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",  # Em WAL, NORMAL só perde durabilidade em queda de energia, nunca corrompe
+    f"PRAGMA cache_size = -{CACHE_SQLITE_MB * 1024}",  # Valor negativo: tamanho em KiB
+    f"PRAGMA mmap_size = {MMAP_SQLITE_MB * 1024 * 1024}",
+    "PRAGMA temp_store = MEMORY",
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+)
+
+
+def ativar_wal(conn):
+    """
+    Coloca o banco em modo WAL (persistente no arquivo), se ainda não estiver.
+
+    Em WAL, leitores não bloqueiam o escritor e o escritor não bloqueia os leitores.
+
+    Returns:
+        bool: True se o banco está em WAL ao final da chamada.
+    """
+    modo = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    if modo.lower() != "wal":
+        modo = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+    return modo.lower() == "wal"
+
+
+def abrir_conexao(caminho):
+    """
+    Abre uma conexão SQLite configurada para leitura concorrente.
+
+    A conexão fica em modo autocommit (`isolation_level=None`): leituras não
+    abrem transação implícita, e escritas devem usar `GerenciadorConexoes.transacao`.
+
+    Args:
+        caminho (str): Caminho do arquivo do banco.
+
+    Returns:
+        sqlite3.Connection: Conexão com WAL, pragmas ajustados e `row_factory` sqlite3.Row.
+    """
+    conn = sqlite3.connect(
+        caminho,
+        isolation_level=None,
+        check_same_thread=False,  # Usada só pela thread dona; liberado para o fechamento em `fechar_todas`
+        cached_statements=STATEMENTS_EM_CACHE,
+    )
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    try:
+        ativar_wal(conn)
+    except sqlite3.OperationalError as e:
+        # Outra conexão segura um lock; o banco continua no modo atual até a próxima abertura
+        print(f"Aviso: não foi possível ativar WAL em '{caminho}': {e}")
+    return conn
+
+
+class GerenciadorConexoes:
+    """
+    Conexões SQLite reutilizadas por thread, com escritas serializadas por banco.
+
+    Cada thread recebe, na primeira chamada, sua própria conexão para cada
+    caminho de banco e a mantém aberta (o cache de statements preparados do
+    sqlite3 é por conexão, então reutilizá-la evita recompilar o SQL). As
+    escritas passam por `transacao`, que serializa os escritores do processo em
+    um lock por banco e abre `BEGIN IMMEDIATE`, evitando que duas threads
+    disputem o lock de escrita do SQLite até o busy timeout.
+    """
+
+    def __init__(self):
+        self._locais = threading.local()
+        self._lock = threading.Lock()
+        self._locks_escrita = {}
+        self._abertas = []
+
+    def conexao(self, caminho):
+        """Retorna a conexão da thread atual para o banco em `caminho`, abrindo-a se necessário."""
+        conexoes = getattr(self._locais, "por_caminho", None)
+        if conexoes is None:
+            conexoes = self._locais.por_caminho = {}
+
+        conn = conexoes.get(caminho)
+        if conn is None:
+            conn = abrir_conexao(caminho)
+            conexoes[caminho] = conn
+            with self._lock:
+                self._abertas.append(conn)
+        return conn
+
+    @contextmanager
+    def transacao(self, caminho):
+        """
+        Executa o bloco em uma transação de escrita (commit ao final, rollback em caso de erro).
+
+        Uso:
+            with gerenciador.transacao(caminho) as conn:
+                conn.executemany(sql, linhas)
+        """
+        with self._lock:
+            lock_escrita = self._locks_escrita.setdefault(caminho, threading.Lock())
+
+        conn = self.conexao(caminho)
+        with lock_escrita:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def fechar_todas(self):
+        """Fecha todas as conexões abertas pelo gerenciador (em todas as threads)."""
+        with self._lock:
+            abertas, self._abertas = self._abertas, []
+        for conn in abertas:
+            conn.close()
+        self._locais = threading.local()
+
+
+# Gerenciador padrão do processo
+gerenciador_conexoes = GerenciadorConexoes()
+
+
+def obter_conexao(caminho):
+    """Retorna a conexão da thread atual para `caminho` no gerenciador padrão."""
+    return gerenciador_conexoes.conexao(caminho)
+
+
+def transacao(caminho):
+    """Abre uma transação de escrita em `caminho` no gerenciador padrão."""
+    return gerenciador_conexoes.transacao(caminho)
@@ -1,15 +1,63 @@
 import os
 import sqlite3
 
-from src.utils.metadata_extraction import extrair_metadados
+from src.config import DATABASE_DIR, DATABASE_PATH, carregar_ambiente
+from src.database.conexao import MAX_PARAMETROS_SQL, obter_conexao, transacao
+from src.database.niveis_acesso import NIVEIS_ACESSO, bitmaps_niveis
+from src.database.tags import gravar_tags, normalizar_tags
+from src.utils.metadata_extraction import extrair_metadados, extrair_metadados_em_paralelo
 
-from dotenv import load_dotenv
+carregar_ambiente()
 
-load_dotenv()
+# Número de arquivos gravados por transação nas inserções em lote
+TAMANHO_LOTE_INSERCAO = int(os.environ.get("RAG_SQLITE_LOTE_INSERCAO", "500"))
 
-DATABASE_DIR = os.environ.get("RAG_DATABASE_DIR", "data")
-DATABASE_FILE = os.environ.get("RAG_DATABASE_FILE", "metadados.db")
-DATABASE_PATH = os.path.join(DATABASE_DIR, DATABASE_FILE)
+# SQL fixo em constantes: o mesmo texto reaproveita o statement preparado em cache na conexão
+COLUNAS_INSERCAO = (
+    "nome_arquivo", "autor", "data_criacao", "data_modificacao", "usuario_modificacao",
+    "linguagem", "tipo_documento", "tags", "nivel_acesso", "codigo_autenticacao", "titulo", "tamanho_bytes",
+)
+
+SQL_INSERIR_METADADOS = f"""
+INSERT INTO metadados ({', '.join(COLUNAS_INSERCAO)})
+VALUES ({', '.join('?' * len(COLUNAS_INSERCAO))})
+"""
+
+SQL_UPSERT_METADADOS = f"""
+INSERT INTO metadados ({', '.join(COLUNAS_INSERCAO)}, hash_conteudo, mtime)
+VALUES ({', '.join('?' * (len(COLUNAS_INSERCAO) + 2))})
+ON CONFLICT(nome_arquivo) DO UPDATE SET
+    autor = excluded.autor,
+    data_criacao = excluded.data_criacao,
+    data_modificacao = excluded.data_modificacao,
+    usuario_modificacao = excluded.usuario_modificacao,
+    linguagem = excluded.linguagem,
+    tipo_documento = excluded.tipo_documento,
+    tags = excluded.tags,
+    titulo = excluded.titulo,
+    tamanho_bytes = excluded.tamanho_bytes,
+    hash_conteudo = excluded.hash_conteudo,
+    mtime = excluded.mtime
+"""
+
+SQL_METADADOS_POR_NOME = "SELECT * FROM metadados WHERE nome_arquivo = ?"
+
+SQL_ATUALIZAR_MTIME = "UPDATE metadados SET mtime = ? WHERE nome_arquivo = ?"
+
+SQL_CONFIRMAR_ASSINATURA = "UPDATE metadados SET hash_conteudo = ?, mtime = ? WHERE nome_arquivo = ?"
+
+
+def _valores_insercao(metadados):
+    return tuple(metadados[coluna] for coluna in COLUNAS_INSERCAO)
+
+
+def _valores_upsert(metadados):
+    return _valores_insercao(metadados) + (metadados.get('hash_conteudo'), metadados.get('mtime'))
+
+
+def _em_lotes(itens, tamanho_lote):
+    for inicio in range(0, len(itens), tamanho_lote):
+        yield itens[inicio:inicio + tamanho_lote]
 
 
 def inserir_metadados(nome_arquivo):
@@ -24,14 +72,9 @@ def inserir_metadados(nome_arquivo):
         bool: True se a inserção for bem-sucedida, False em caso de erro.
     """
 
-    conn = None
+    # Constrói o caminho completo do arquivo
+    filepath = os.path.join(DATABASE_DIR, "test_documents", nome_arquivo)
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-
-        # Constrói o caminho completo do arquivo
-        filepath = os.path.join(DATABASE_DIR, "test_documents", nome_arquivo)
-
         # Extrai metadados usando a função unificada
         metadados = extrair_metadados(filepath)
 
@@ -39,20 +82,12 @@ def inserir_metadados(nome_arquivo):
             print(f"Erro ao extrair metadados para: {nome_arquivo} - Abortando inserção.")
             return False
 
-        sql = """
-        INSERT INTO metadados (
-            nome_arquivo, autor, data_criacao, data_modificacao, usuario_modificacao,
-            linguagem, tipo_documento, tags, nivel_acesso, codigo_autenticacao, titulo, tamanho_bytes
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
-        valores = (
-            metadados['nome_arquivo'], metadados['autor'], metadados['data_criacao'], metadados['data_modificacao'], metadados['usuario_modificacao'],
-            metadados['linguagem'], metadados['tipo_documento'], metadados['tags'], metadados['nivel_acesso'], metadados['codigo_autenticacao'], metadados['titulo'],
-            metadados['tamanho_bytes']
-        )
-
-        cursor.execute(sql, valores)
-        conn.commit()
+        bitmaps = bitmaps_niveis(DATABASE_PATH)
+        with transacao(DATABASE_PATH) as conn:
+            conn.execute(SQL_INSERIR_METADADOS, _valores_insercao(metadados))
+            gravar_tags(conn, [(metadados['nome_arquivo'], metadados['tags'])])
+            registros_niveis = bitmaps.ler_registros(conn, [metadados['nome_arquivo']])
+        bitmaps.registrar(registros_niveis)  # Só depois do commit: um rollback não deixa o bitmap adiantado
         print(f"Metadados para '{nome_arquivo}' inseridos com sucesso no banco de dados.")
         return True
 
@@ -68,9 +103,47 @@ def inserir_metadados(nome_arquivo):
         print(f"Erro inesperado ao inserir metadados para '{nome_arquivo}': {e}")
         return False
 
-    finally:
-        if conn:
-            conn.close()
+def inserir_metadados_em_lote(nomes_arquivo, tamanho_lote=TAMANHO_LOTE_INSERCAO):
+    """
+    Insere os metadados de vários arquivos com `executemany`, em transações de `tamanho_lote` arquivos.
+
+    Equivale a chamar `inserir_metadados` para cada arquivo, mas paga um commit
+    (e um fsync) por lote em vez de um por arquivo, e extrai os metadados do lote
+    em paralelo. Se um lote falhar (ex.: um
+    arquivo já registrado), só esse lote é desfeito e os demais seguem.
+
+    Args:
+        nomes_arquivo (list de str): Nomes dos arquivos (dentro da pasta de documentos de teste).
+        tamanho_lote (int, optional): Arquivos por transação. Padrão: `RAG_SQLITE_LOTE_INSERCAO` ou 500.
+
+    Returns:
+        int: Número de arquivos inseridos.
+    """
+    nomes_arquivo = list(nomes_arquivo)
+    inseridos = 0
+    bitmaps = bitmaps_niveis(DATABASE_PATH)
+    for lote in _em_lotes(nomes_arquivo, tamanho_lote):
+        extraidos = []
+        caminhos = ((os.path.join(DATABASE_DIR, "test_documents", nome_arquivo), None) for nome_arquivo in lote)
+        for nome_arquivo, metadados in zip(lote, extrair_metadados_em_paralelo(caminhos)):
+            if metadados is None:
+                print(f"Erro ao extrair metadados para: {nome_arquivo} - Arquivo ignorado.")
+                continue
+            extraidos.append(metadados)
+
+        try:
+            with transacao(DATABASE_PATH) as conn:
+                conn.executemany(SQL_INSERIR_METADADOS, [_valores_insercao(metadados) for metadados in extraidos])
+                gravar_tags(conn, [(metadados['nome_arquivo'], metadados['tags']) for metadados in extraidos])
+                registros_niveis = bitmaps.ler_registros(conn, [metadados['nome_arquivo'] for metadados in extraidos])
+            bitmaps.registrar(registros_niveis)
+            inseridos += len(extraidos)
+        except sqlite3.Error as e:
+            print(f"Erro ao inserir lote de {len(extraidos)} arquivos (lote desfeito): {e}")
+
+    print(f"Metadados de {inseridos} de {len(nomes_arquivo)} arquivos inseridos no banco de dados.")
+    return inseridos
+
 def obter_metadados_por_nome_arquivo(nome_arquivo):
     """
     Obtém um registro de metadados da tabela 'metadados' pelo nome do arquivo.
@@ -81,18 +154,9 @@ def obter_metadados_por_nome_arquivo(nome_arquivo):
     Returns:
         dict or None: Um dicionário contendo os metadados se o arquivo for encontrado, None caso contrário.
     """
-    conn = None
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        conn.row_factory = sqlite3.Row # Para retornar resultados como dicionários
-        cursor = conn.cursor()
-
-        sql = """
-        SELECT * FROM metadados WHERE nome_arquivo = ?
-        """
-        cursor.execute(sql, (nome_arquivo,)) # Passa o nome_arquivo como parâmetro
-
-        registro = cursor.fetchone() # Busca um único registro (ou None se não encontrar)
+        conn = obter_conexao(DATABASE_PATH)  # Conexão da thread, com row_factory sqlite3.Row
+        registro = conn.execute(SQL_METADADOS_POR_NOME, (nome_arquivo,)).fetchone() # Busca um único registro (ou None se não encontrar)
 
         if registro:
             # Se encontrou um registro, retorna como dicionário
@@ -104,58 +168,490 @@ def obter_metadados_por_nome_arquivo(nome_arquivo):
         print(f"Erro ao obter metadados para '{nome_arquivo}': {e}")
         return None # Retorna None em caso de erro
 
-    finally:
-        if conn:
-            conn.close()
+def obter_metadados_por_nomes_arquivo(nomes_arquivo):
+    """
+    Obtém, em uma única ida ao banco, os metadados de vários arquivos.
+
+    Substitui chamadas repetidas a `obter_metadados_por_nome_arquivo` (uma conexão
+    por arquivo) por uma consulta `IN (...)` sobre uma conexão reutilizada. Listas
+    maiores que o limite de parâmetros do SQLite são divididas em blocos.
+
+    Args:
+        nomes_arquivo (list de str): Nomes dos arquivos a buscar (duplicatas são ignoradas).
+
+    Returns:
+        dict: Mapeamento nome_arquivo -> dicionário de metadados. Arquivos sem registro
+              não aparecem no dicionário. Retorna um dicionário vazio em caso de erro.
+    """
+    nomes_unicos = list(dict.fromkeys(nomes_arquivo))
+    if not nomes_unicos:
+        return {}
+
+    try:
+        conn = obter_conexao(DATABASE_PATH)
+        metadados_por_nome = {}
+        for bloco in _em_lotes(nomes_unicos, MAX_PARAMETROS_SQL):
+            sql = f"""
+            SELECT * FROM metadados WHERE nome_arquivo IN ({', '.join('?' * len(bloco))})
+            """
+            for registro in conn.execute(sql, bloco):
+                metadados_por_nome[registro["nome_arquivo"]] = dict(registro)
+        return metadados_por_nome
+
+    except sqlite3.Error as e:
+        print(f"Erro ao obter metadados em lote para {len(nomes_unicos)} arquivos: {e}")
+        return {}
 
-def buscar_metadados_por_tags(tags_busca):
+def buscar_metadados_por_tags(tags_busca, modo="qualquer"):
     """
-    Busca registros de metadados na tabela 'metadados' que contenham alguma das tags fornecidas.
+    Busca registros de metadados na tabela 'metadados' pelas tags, usando o índice `documento_tags`.
+
+    Cada tag de busca é normalizada como as tags dos documentos (minúsculas, sem
+    acentos, dividida em termos por "_", "-", espaços etc.) e casa com um
+    documento que tenha todos os seus termos. "certidao_quitacao" casa com
+    "certidao_quitacao_092525360590", mas "ai" não casa com "contrato_faixa".
 
     Args:
-        tags_busca (list de str): Lista de tags a serem buscadas. A busca é do tipo "OR",
-                                   retornando documentos que contenham *qualquer uma* dessas tags.
+        tags_busca (list de str): Lista de tags a serem buscadas.
+        modo (str, optional): "qualquer" (OR: documentos com pelo menos uma das tags) ou
+                              "todas" (AND: documentos com todas as tags). Padrão: "qualquer".
 
     Returns:
         list de dict: Uma lista de dicionários, onde cada dicionário representa os metadados de um documento
-                      que contém pelo menos uma das tags de busca. Retorna uma lista vazia se nenhum documento
+                      que corresponde às tags de busca. Retorna uma lista vazia se nenhum documento
                       corresponder às tags.
     """
-    conn = None
+    if modo not in ("qualquer", "todas"):
+        raise ValueError(f"Modo de busca por tags inválido: {modo!r} (use 'qualquer' ou 'todas').")
+
+    grupos = [termos for termos in (normalizar_tags(tag) for tag in tags_busca or []) if termos]
+    if not grupos: # Se a lista de tags de busca estiver vazia, retorna lista vazia
+        return []
+    if modo == "todas":
+        grupos = [list(dict.fromkeys(termo for termos in grupos for termo in termos))]
+
+    # Cada termo é uma faixa da chave primária de documento_tags (lista de postings do termo); um grupo
+    # casa com a interseção das listas dos seus termos e grupos diferentes (modo "qualquer") são unidos
+    postings = "SELECT documento_id FROM documento_tags WHERE tag_id = (SELECT id FROM tags WHERE nome = ?)"
+    subconsultas = [
+        f"SELECT documento_id FROM ({' INTERSECT '.join([postings] * len(termos))})" for termos in grupos
+    ]
+    parametros = [termo for termos in grupos for termo in termos]
+
+    sql = f"""
+    SELECT * FROM metadados
+    WHERE id IN ({' UNION '.join(subconsultas)})
+    """
+    try:
+        return [dict(registro) for registro in obter_conexao(DATABASE_PATH).execute(sql, parametros)]
+
+    except sqlite3.Error as e:
+        print(f"Erro ao buscar metadados por tags '{tags_busca}': {e}")
+        return [] # Retorna lista vazia em caso de erro
+
+def upsert_metadados(metadados):
+    """
+    Insere ou atualiza o registro de metadados de um arquivo (chave: nome_arquivo).
+
+    Usado pela indexação incremental. Em uma atualização, `nivel_acesso` e
+    `codigo_autenticacao` são preservados, pois são definidos pelo usuário e não
+    pelo conteúdo do arquivo.
+
+    Args:
+        metadados (dict): Metadados extraídos do arquivo, incluindo 'hash_conteudo' e 'mtime'.
+
+    Returns:
+        bool: True se a operação for bem-sucedida, False em caso de erro.
+    """
+    try:
+        bitmaps = bitmaps_niveis(DATABASE_PATH)
+        with transacao(DATABASE_PATH) as conn:
+            conn.execute(SQL_UPSERT_METADADOS, _valores_upsert(metadados))
+            gravar_tags(conn, [(metadados['nome_arquivo'], metadados['tags'])])
+            registros_niveis = bitmaps.ler_registros(conn, [metadados['nome_arquivo']])
+        bitmaps.registrar(registros_niveis)
+        return True
+
+    except sqlite3.Error as e:
+        print(f"Erro ao gravar metadados para '{metadados.get('nome_arquivo')}': {e}")
+        return False
+
+def upsert_metadados_em_lote(lista_metadados, tamanho_lote=TAMANHO_LOTE_INSERCAO):
+    """
+    Versão em lote de `upsert_metadados`: `executemany` em transações de `tamanho_lote` arquivos.
+
+    Args:
+        lista_metadados (list de dict): Metadados extraídos dos arquivos.
+        tamanho_lote (int, optional): Arquivos por transação. Padrão: `RAG_SQLITE_LOTE_INSERCAO` ou 500.
+
+    Returns:
+        list de str: Nomes dos arquivos cujo lote falhou (lista vazia se tudo foi gravado).
+    """
+    falhas = []
+    bitmaps = bitmaps_niveis(DATABASE_PATH)
+    for lote in _em_lotes(list(lista_metadados), tamanho_lote):
+        try:
+            with transacao(DATABASE_PATH) as conn:
+                conn.executemany(SQL_UPSERT_METADADOS, [_valores_upsert(metadados) for metadados in lote])
+                gravar_tags(conn, [(metadados['nome_arquivo'], metadados['tags']) for metadados in lote])
+                registros_niveis = bitmaps.ler_registros(conn, [metadados['nome_arquivo'] for metadados in lote])
+            bitmaps.registrar(registros_niveis)
+        except sqlite3.Error as e:
+            print(f"Erro ao gravar lote de metadados de {len(lote)} arquivos (lote desfeito): {e}")
+            falhas.extend(metadados['nome_arquivo'] for metadados in lote)
+    return falhas
+
+def atualizar_mtime(nome_arquivo, mtime):
+    """
+    Atualiza apenas o mtime registrado de um arquivo cujo conteúdo não mudou.
+
+    Args:
+        nome_arquivo (str): Nome do arquivo.
+        mtime (float): Novo st_mtime do arquivo.
+
+    Returns:
+        bool: True se a operação for bem-sucedida, False em caso de erro.
+    """
+    return atualizar_mtimes([(nome_arquivo, mtime)])
+
+def atualizar_mtimes(mtimes_por_arquivo):
+    """
+    Atualiza, em uma única transação, o mtime registrado de vários arquivos.
+
+    Args:
+        mtimes_por_arquivo (iterável de (str, float)): Pares (nome_arquivo, st_mtime).
+
+    Returns:
+        bool: True se a operação for bem-sucedida, False em caso de erro.
+    """
+    valores = [(mtime, nome_arquivo) for nome_arquivo, mtime in mtimes_por_arquivo]
+    if not valores:
+        return True
+
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        conn.row_factory = sqlite3.Row # Para retornar resultados como dicionários
-        cursor = conn.cursor()
+        with transacao(DATABASE_PATH) as conn:
+            conn.executemany(SQL_ATUALIZAR_MTIME, valores)
+        return True
 
-        if not tags_busca: # Se a lista de tags de busca estiver vazia, retorna lista vazia
-            return []
+    except sqlite3.Error as e:
+        print(f"Erro ao atualizar mtime de {len(valores)} arquivos: {e}")
+        return False
 
-        # Constrói a cláusula WHERE dinamicamente para buscar tags usando LIKE e OR
-        clausulas_where = []
-        parametros = []
-        for tag in tags_busca:
-            clausulas_where.append("tags LIKE ?") # Adiciona "tags LIKE ?" para cada tag
-            parametros.append(f"%{tag}%") # Usa "%tag%" para buscar tag como substring (contém)
+def confirmar_assinaturas(assinaturas):
+    """
+    Grava, em uma única transação, o hash e o mtime de arquivos cujos chunks já foram todos gravados.
 
-        sql = f"""
-        SELECT * FROM metadados
-        WHERE {' OR '.join(clausulas_where)}
-        """
-        print(f"Query SQL construída dinamicamente:\n{sql}")
+    A indexação grava os metadados de um arquivo a (re)embedar sem hash e sem
+    mtime ("pendente") e só confirma a assinatura depois de gravar os vetores:
+    um arquivo interrompido no meio volta a ser processado na execução seguinte.
 
-        cursor.execute(sql, parametros) # Executa a query com a lista de parâmetros
-        registros = cursor.fetchall() # Busca todos os registros correspondentes
+    Args:
+        assinaturas (iterável de (str, str, float)): Triplas (nome_arquivo, hash_conteudo, st_mtime).
 
-        lista_metadados = []
-        for registro in registros:
-            lista_metadados.append(dict(registro)) # Converte cada sqlite3.Row para dicionário
+    Returns:
+        bool: True se a operação for bem-sucedida, False em caso de erro.
+    """
+    valores = [(hash_conteudo, mtime, nome_arquivo) for nome_arquivo, hash_conteudo, mtime in assinaturas]
+    if not valores:
+        return True
 
-        return lista_metadados # Retorna a lista de dicionários de metadados
+    try:
+        with transacao(DATABASE_PATH) as conn:
+            conn.executemany(SQL_CONFIRMAR_ASSINATURA, valores)
+        return True
 
     except sqlite3.Error as e:
-        print(f"Erro ao buscar metadados por tags '{tags_busca}': {e}")
-        return [] # Retorna lista vazia em caso de erro
+        print(f"Erro ao confirmar a assinatura de {len(valores)} arquivos: {e}")
+        return False
+
+def listar_assinaturas_arquivos():
+    """
+    Lista a assinatura (hash do conteúdo, mtime e tamanho) de todos os arquivos registrados.
+
+    Returns:
+        dict: Mapeamento nome_arquivo -> {'hash_conteudo', 'mtime', 'tamanho_bytes'}.
+              Retorna um dicionário vazio em caso de erro.
+    """
+    try:
+        conn = obter_conexao(DATABASE_PATH)
+        cursor = conn.execute("SELECT nome_arquivo, hash_conteudo, mtime, tamanho_bytes FROM metadados")
+        return {
+            registro["nome_arquivo"]: {
+                "hash_conteudo": registro["hash_conteudo"],
+                "mtime": registro["mtime"],
+                "tamanho_bytes": registro["tamanho_bytes"],
+            }
+            for registro in cursor
+        }
+
+    except sqlite3.Error as e:
+        print(f"Erro ao listar assinaturas dos arquivos: {e}")
+        return {}
+
+def obter_assinaturas_arquivos(nomes_arquivo, colecao=None, diretorio=None):
+    """
+    Assinatura (hash do conteúdo, mtime e tamanho) dos arquivos informados que estão registrados.
+
+    Args:
+        nomes_arquivo (iterável de str): Nomes dos arquivos.
+        colecao (str, optional): Com `diretorio`, só considera os arquivos já indexados nesta coleção a
+            partir deste diretório (ver `registrar_arquivos_varridos`).
+        diretorio (str, optional): Caminho absoluto do diretório varrido.
+
+    Returns:
+        dict: Mapeamento nome_arquivo -> {'hash_conteudo', 'mtime', 'tamanho_bytes'}.
+              Retorna um dicionário vazio em caso de erro.
+    """
+    nomes_arquivo = list(nomes_arquivo)
+    assinaturas = {}
+    escopo, parametros_escopo = "", ()
+    if colecao is not None:
+        escopo = ("AND EXISTS (SELECT 1 FROM arquivos_indexados i WHERE i.colecao = ? AND i.diretorio = ? "
+                  "AND i.nome_arquivo = metadados.nome_arquivo)")
+        parametros_escopo = (colecao, diretorio)
+    try:
+        conn = obter_conexao(DATABASE_PATH)
+        for bloco in _em_lotes(nomes_arquivo, MAX_PARAMETROS_SQL - 2):
+            cursor = conn.execute(
+                f"SELECT nome_arquivo, hash_conteudo, mtime, tamanho_bytes FROM metadados "
+                f"WHERE nome_arquivo IN ({', '.join('?' * len(bloco))}) {escopo}",
+                (*bloco, *parametros_escopo),
+            )
+            for registro in cursor:
+                assinaturas[registro["nome_arquivo"]] = {
+                    "hash_conteudo": registro["hash_conteudo"],
+                    "mtime": registro["mtime"],
+                    "tamanho_bytes": registro["tamanho_bytes"],
+                }
+        return assinaturas
+
+    except sqlite3.Error as e:
+        print(f"Erro ao obter assinaturas de {len(nomes_arquivo)} arquivos: {e}")
+        return {}
+
+def iniciar_varredura(colecao, diretorio):
+    """
+    Esvazia as marcas de varredura de uma coleção e diretório (início ou fim de uma varredura).
+
+    As marcas das varreduras de outros diretórios e coleções não são tocadas.
+    Retorna False em caso de erro.
+    """
+    try:
+        with transacao(DATABASE_PATH) as conn:
+            conn.execute("DELETE FROM arquivos_varridos WHERE colecao = ? AND diretorio = ?", (colecao, diretorio))
+        return True
+
+    except sqlite3.Error as e:
+        print(f"Erro ao iniciar a varredura: {e}")
+        return False
+
+def registrar_arquivos_varridos(colecao, diretorio, nomes_arquivo):
+    """
+    Marca os arquivos como vistos pela varredura em curso e como indexados na coleção a partir do diretório.
+
+    Retorna False em caso de erro.
+    """
+    valores = [(colecao, diretorio, nome) for nome in nomes_arquivo]
+    try:
+        with transacao(DATABASE_PATH) as conn:
+            conn.executemany("INSERT OR IGNORE INTO arquivos_varridos (colecao, diretorio, nome_arquivo) VALUES (?, ?, ?)",
+                             valores)
+            conn.executemany("INSERT OR IGNORE INTO arquivos_indexados (colecao, diretorio, nome_arquivo) VALUES (?, ?, ?)",
+                             valores)
+        return True
+
+    except sqlite3.Error as e:
+        print(f"Erro ao registrar {len(valores)} arquivos varridos: {e}")
+        return False
+
+def listar_arquivos_nao_varridos(colecao, diretorio, apos=None, limite=MAX_PARAMETROS_SQL):
+    """
+    Lista, em ordem de nome, os arquivos indexados na coleção a partir do diretório que a varredura em curso não viu.
+
+    Só entram arquivos registrados por varreduras deste mesmo diretório e
+    coleção: indexar outro diretório (ou o mesmo em outra coleção) não faz os
+    arquivos daqui parecerem removidos.
+
+    Args:
+        colecao (str): Nome da coleção.
+        diretorio (str): Caminho absoluto do diretório varrido.
+        apos (str, optional): Continua a listagem depois deste nome (paginação pela chave).
+        limite (int, optional): Número máximo de nomes.
+
+    Returns:
+        list de str: Nomes dos arquivos. Retorna uma lista vazia em caso de erro.
+    """
+    try:
+        cursor = obter_conexao(DATABASE_PATH).execute(
+            """
+            SELECT i.nome_arquivo FROM arquivos_indexados i
+            WHERE i.colecao = ? AND i.diretorio = ? AND i.nome_arquivo > ?
+              AND NOT EXISTS (
+                  SELECT 1 FROM arquivos_varridos v
+                  WHERE v.colecao = i.colecao AND v.diretorio = i.diretorio AND v.nome_arquivo = i.nome_arquivo
+              )
+            ORDER BY i.nome_arquivo
+            LIMIT ?
+            """,
+            (colecao, diretorio, apos or "", limite),
+        )
+        return [registro["nome_arquivo"] for registro in cursor]
+
+    except sqlite3.Error as e:
+        print(f"Erro ao listar arquivos não varridos: {e}")
+        return []
+
+def remover_arquivos_indexados(colecao, diretorio, nomes_arquivo):
+    """
+    Desfaz o registro dos arquivos como indexados na coleção a partir do diretório.
+
+    Returns:
+        list de str or None: Os nomes que não ficaram registrados em nenhuma outra coleção ou diretório
+                             (cujos metadados podem ser removidos). None em caso de erro.
+    """
+    nomes_arquivo = list(nomes_arquivo)
+    try:
+        with transacao(DATABASE_PATH) as conn:
+            conn.executemany("DELETE FROM arquivos_indexados WHERE colecao = ? AND diretorio = ? AND nome_arquivo = ?",
+                             [(colecao, diretorio, nome) for nome in nomes_arquivo])
+            ainda_indexados = set()
+            for bloco in _em_lotes(nomes_arquivo, MAX_PARAMETROS_SQL):
+                ainda_indexados.update(registro[0] for registro in conn.execute(
+                    f"SELECT DISTINCT nome_arquivo FROM arquivos_indexados WHERE nome_arquivo IN ({', '.join('?' * len(bloco))})",
+                    bloco,
+                ))
+        return [nome for nome in nomes_arquivo if nome not in ainda_indexados]
+
+    except sqlite3.Error as e:
+        print(f"Erro ao remover o registro de {len(nomes_arquivo)} arquivos indexados: {e}")
+        return None
+
+def remover_metadados(nomes_arquivo):
+    """
+    Remove os registros de metadados dos arquivos informados.
+
+    Args:
+        nomes_arquivo (list de str): Nomes dos arquivos a remover.
+
+    Returns:
+        bool: True se a operação for bem-sucedida, False em caso de erro.
+    """
+    nomes_arquivo = list(nomes_arquivo)
+    if not nomes_arquivo:
+        return True
+
+    try:
+        with transacao(DATABASE_PATH) as conn:
+            for bloco in _em_lotes(nomes_arquivo, MAX_PARAMETROS_SQL):
+                marcadores = ', '.join('?' * len(bloco))
+                conn.execute(
+                    f"DELETE FROM documento_tags WHERE documento_id IN (SELECT id FROM metadados WHERE nome_arquivo IN ({marcadores}))",
+                    bloco,
+                )
+                conn.execute(f"DELETE FROM metadados WHERE nome_arquivo IN ({marcadores})", bloco)
+        bitmaps_niveis(DATABASE_PATH).remover(nomes_arquivo)
+        return True
+
+    except sqlite3.Error as e:
+        print(f"Erro ao remover metadados de {len(nomes_arquivo)} arquivos: {e}")
+        return False
+
+def _filtros_agregacao(tipo_documento=None, autor=None, ano=None, campo_data="data_modificacao", niveis_acesso=None):
+    """Monta a cláusula WHERE (com parâmetros) das consultas de contagem e listagem."""
+    if campo_data not in ("data_modificacao", "data_criacao"):
+        raise ValueError(f"Campo de data inválido: {campo_data!r}")
+
+    condicoes, parametros = [], []
+    if niveis_acesso is not None:
+        condicoes.append(f"nivel_acesso IN ({', '.join('?' * len(niveis_acesso))})" if niveis_acesso else "0")
+        parametros.extend(niveis_acesso)
+    if tipo_documento:
+        condicoes.append("tipo_documento = ?")
+        parametros.append(tipo_documento.lower().lstrip('.'))
+    if autor:
+        condicoes.append("autor = ? COLLATE NOCASE")
+        parametros.append(autor)
+    if ano:
+        # Datas gravadas em ISO 8601: um intervalo de strings usa o índice da coluna (strftime não usaria)
+        condicoes.append(f"{campo_data} >= ? AND {campo_data} < ?")
+        parametros.extend([f"{int(ano):04d}-01-01", f"{int(ano) + 1:04d}-01-01"])
+    return (f"WHERE {' AND '.join(condicoes)}" if condicoes else ""), parametros
+
+def contar_documentos(tipo_documento=None, autor=None, ano=None, campo_data="data_modificacao", niveis_acesso=None):
+    """
+    Conta os documentos registrados que satisfazem os filtros, com um COUNT(*) sobre os índices de 'metadados'.
+
+    Args:
+        tipo_documento (str, optional): Tipo do documento (pdf, txt, md).
+        autor (str, optional): Autor (comparação sem diferenciar maiúsculas).
+        ano (int, optional): Ano de `campo_data`.
+        campo_data (str, optional): "data_modificacao" ou "data_criacao". Padrão: "data_modificacao".
+        niveis_acesso (tuple de str, optional): Níveis de acesso visíveis (ver `controle_acesso.filtro_niveis_acesso`).
+            None: sem restrição.
+
+    Returns:
+        int or None: Número de documentos, ou None em caso de erro.
+    """
+    where, parametros = _filtros_agregacao(tipo_documento, autor, ano, campo_data, niveis_acesso)
+    try:
+        return obter_conexao(DATABASE_PATH).execute(f"SELECT COUNT(*) FROM metadados {where}", parametros).fetchone()[0]
+
+    except sqlite3.Error as e:
+        print(f"Erro ao contar documentos: {e}")
+        return None
+
+def listar_documentos(tipo_documento=None, autor=None, ano=None, campo_data="data_modificacao", limite=100,
+                      niveis_acesso=None):
+    """
+    Lista os documentos registrados que satisfazem os filtros, do mais ao menos recente em `campo_data`.
+
+    Args:
+        Filtros: ver `contar_documentos`.
+        limite (int, optional): Número máximo de documentos. Padrão: 100.
+
+    Returns:
+        list de dict: Metadados dos documentos. Retorna uma lista vazia em caso de erro.
+    """
+    where, parametros = _filtros_agregacao(tipo_documento, autor, ano, campo_data, niveis_acesso)
+    sql = f"SELECT * FROM metadados {where} ORDER BY {campo_data} DESC LIMIT ?"
+    try:
+        return [dict(registro) for registro in obter_conexao(DATABASE_PATH).execute(sql, [*parametros, limite])]
+
+    except sqlite3.Error as e:
+        print(f"Erro ao listar documentos: {e}")
+        return []
+
+def atualizar_nivel_acesso(nomes_arquivo, nivel_acesso):
+    """
+    Altera o nível de acesso dos arquivos informados em 'metadados' e nos bitmaps de níveis.
+
+    Os metadados gravados junto dos vetores também guardam o nível; use
+    `controle_acesso.definir_nivel_acesso` para atualizar os dois.
+
+    Args:
+        nomes_arquivo (list de str): Nomes dos arquivos.
+        nivel_acesso (str): "publico", "restrito" ou "confidencial".
 
-    finally:
-        if conn:
-            conn.close()
\ No newline at end of file
+    Returns:
+        int or None: Número de registros alterados, ou None em caso de erro.
+    """
+    if nivel_acesso not in NIVEIS_ACESSO:
+        raise ValueError(f"Nível de acesso inválido: {nivel_acesso!r}")
+    nomes_arquivo = list(nomes_arquivo)
+
+    try:
+        bitmaps = bitmaps_niveis(DATABASE_PATH)
+        alterados = 0
+        with transacao(DATABASE_PATH) as conn:
+            for bloco in _em_lotes(nomes_arquivo, MAX_PARAMETROS_SQL - 1):
+                alterados += conn.execute(
+                    f"UPDATE metadados SET nivel_acesso = ? WHERE nome_arquivo IN ({', '.join('?' * len(bloco))})",
+                    [nivel_acesso, *bloco],
+                ).rowcount
+            registros_niveis = bitmaps.ler_registros(conn, nomes_arquivo)
+        bitmaps.registrar(registros_niveis)
+        return alterados
+
+    except sqlite3.Error as e:
+        print(f"Erro ao alterar o nível de acesso de {len(nomes_arquivo)} arquivos: {e}")
+        return None
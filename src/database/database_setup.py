@@ -1,13 +1,98 @@
 import sqlite3
 import os
-from dotenv import load_dotenv
+from src.config import DATABASE_DIR, DATABASE_FILE, DATABASE_PATH, carregar_ambiente
+from src.database.conexao import ativar_wal
+from src.database.tags import gravar_tags
 
-load_dotenv()
+carregar_ambiente()
 
+# Colunas adicionadas depois da criação do esquema original (nome -> tipo)
+COLUNAS_MIGRADAS = {
+    "hash_conteudo": "TEXT",
+    "mtime": "REAL",
+}
 
-DATABASE_DIR = os.environ.get("RAG_DATABASE_DIR", "data")  # Usa variável de ambiente ou 'data' como padrão
-DATABASE_FILE = os.environ.get("RAG_DATABASE_FILE", "metadados.db") # Usa variável de ambiente ou 'metadados.db' como padrão
-DATABASE_PATH = os.path.join(DATABASE_DIR, DATABASE_FILE) # Caminho completo do banco
+def _migrar_colunas(cursor):
+    """Adiciona à tabela 'metadados' as colunas que faltarem em bancos criados com o esquema antigo."""
+    cursor.execute("PRAGMA table_info(metadados)")
+    colunas_existentes = {linha[1] for linha in cursor.fetchall()}
+    for coluna, tipo in COLUNAS_MIGRADAS.items():
+        if coluna not in colunas_existentes:
+            cursor.execute(f"ALTER TABLE metadados ADD COLUMN {coluna} {tipo}")
+            print(f"Coluna '{coluna}' adicionada à tabela 'metadados'.")
+
+CREATE_ARQUIVOS_INDEXADOS_SQL = """
+CREATE TABLE IF NOT EXISTS arquivos_indexados (
+    colecao TEXT NOT NULL,
+    diretorio TEXT NOT NULL,
+    nome_arquivo TEXT NOT NULL,
+    PRIMARY KEY (colecao, diretorio, nome_arquivo)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_arquivos_indexados_nome ON arquivos_indexados (nome_arquivo);
+CREATE TABLE IF NOT EXISTS arquivos_varridos (
+    colecao TEXT NOT NULL,
+    diretorio TEXT NOT NULL,
+    nome_arquivo TEXT NOT NULL,
+    PRIMARY KEY (colecao, diretorio, nome_arquivo)
+) WITHOUT ROWID;
+"""
+
+def _migrar_arquivos_varridos(cursor):
+    """Descarta a tabela 'arquivos_varridos' antiga (só com nome_arquivo); ela só guarda a varredura em curso."""
+    cursor.execute("PRAGMA table_info(arquivos_varridos)")
+    colunas = {linha[1] for linha in cursor.fetchall()}
+    if colunas and "colecao" not in colunas:
+        cursor.execute("DROP TABLE arquivos_varridos")
+
+# Tabela com o conteúdo dos chunks e índice FTS5 de conteúdo externo sobre ela, sincronizado por triggers
+# (o tokenizador unicode61 separa em "_", "-", "." etc., como `normalizar_tags`, e remove acentos)
+CREATE_INDICE_LEXICO_SQL = """
+CREATE TABLE IF NOT EXISTS chunks_lexicos (
+    id INTEGER PRIMARY KEY,
+    colecao TEXT NOT NULL,
+    chunk_id TEXT NOT NULL,
+    nome_arquivo TEXT NOT NULL,
+    chunk_indice INTEGER,
+    inicio INTEGER,
+    fim INTEGER,
+    pagina INTEGER,
+    texto TEXT NOT NULL,
+    UNIQUE (colecao, chunk_id)
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_lexicos_arquivo ON chunks_lexicos (colecao, nome_arquivo);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+    texto, nome_arquivo,
+    content = 'chunks_lexicos', content_rowid = 'id',
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS chunks_lexicos_ai AFTER INSERT ON chunks_lexicos BEGIN
+    INSERT INTO chunks_fts (rowid, texto, nome_arquivo) VALUES (new.id, new.texto, new.nome_arquivo);
+END;
+CREATE TRIGGER IF NOT EXISTS chunks_lexicos_ad AFTER DELETE ON chunks_lexicos BEGIN
+    INSERT INTO chunks_fts (chunks_fts, rowid, texto, nome_arquivo) VALUES ('delete', old.id, old.texto, old.nome_arquivo);
+END;
+CREATE TRIGGER IF NOT EXISTS chunks_lexicos_au AFTER UPDATE ON chunks_lexicos BEGIN
+    INSERT INTO chunks_fts (chunks_fts, rowid, texto, nome_arquivo) VALUES ('delete', old.id, old.texto, old.nome_arquivo);
+    INSERT INTO chunks_fts (rowid, texto, nome_arquivo) VALUES (new.id, new.texto, new.nome_arquivo);
+END;
+"""
+
+def _migrar_tags(conn):
+    """Preenche `documento_tags` a partir da coluna `tags` em bancos criados antes da tabela de tags."""
+    if conn.execute("SELECT 1 FROM documento_tags LIMIT 1").fetchone():
+        return
+    cursor = conn.execute("SELECT nome_arquivo, tags FROM metadados WHERE tags IS NOT NULL AND tags != ''")
+    migrados = 0
+    while True:
+        bloco = cursor.fetchmany(10_000)
+        if not bloco:
+            break
+        gravar_tags(conn, bloco)
+        migrados += len(bloco)
+    if migrados:
+        print(f"Tags de {migrados} documentos migradas para a tabela 'documento_tags'.")
 
 def create_database_and_tables():
     """Cria o banco de dados SQLite e a tabela 'metadados' se não existirem."""
@@ -37,20 +122,61 @@ def create_database_and_tables():
             nivel_acesso TEXT NOT NULL CHECK(nivel_acesso IN ('publico', 'restrito', 'confidencial')),
             codigo_autenticacao TEXT,
             titulo TEXT,
-            tamanho_bytes INTEGER  -- Adicionado o campo tamanho_bytes!
+            tamanho_bytes INTEGER,  -- Adicionado o campo tamanho_bytes!
+            hash_conteudo TEXT,  -- SHA-256 do conteúdo, usado pela indexação incremental
+            mtime REAL  -- st_mtime do arquivo na última indexação
         );
         """
         cursor.execute(create_table_sql)
+        _migrar_colunas(cursor)
 
         # SQL para criar os índices (ÍNDICES DEFINIDOS)
         create_indices_sql = """
         CREATE INDEX IF NOT EXISTS idx_tipo_documento ON metadados (tipo_documento);
         CREATE INDEX IF NOT EXISTS idx_tags ON metadados (tags);
         CREATE INDEX IF NOT EXISTS idx_nivel_acesso ON metadados (nivel_acesso);
+        CREATE INDEX IF NOT EXISTS idx_data_modificacao ON metadados (data_modificacao);
+        CREATE INDEX IF NOT EXISTS idx_data_criacao ON metadados (data_criacao);
+        CREATE INDEX IF NOT EXISTS idx_autor ON metadados (autor COLLATE NOCASE);
         """
         cursor.executescript(create_indices_sql) # executescript para executar múltiplas instruções SQL de vez
 
+        # Tags normalizadas (um termo por linha) e a relação documento <-> tag, indexadas nos dois sentidos
+        create_tags_sql = """
+        CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY,
+            nome TEXT UNIQUE NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS documento_tags (
+            tag_id INTEGER NOT NULL REFERENCES tags (id),
+            documento_id INTEGER NOT NULL REFERENCES metadados (id),
+            PRIMARY KEY (tag_id, documento_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_documento_tags_documento ON documento_tags (documento_id);
+        """
+        cursor.executescript(create_tags_sql)
+        _migrar_tags(conn)
+
+        # Arquivos indexados por (coleção, diretório) e arquivos vistos pela varredura em curso de cada um: a
+        # indexação detecta remoções sem manter a listagem em memória e sem tocar em outros diretórios e coleções
+        _migrar_arquivos_varridos(cursor)
+        cursor.executescript(CREATE_ARQUIVOS_INDEXADOS_SQL)
+
+        cursor.executescript(CREATE_INDICE_LEXICO_SQL) # Índice BM25 dos chunks (preenchido pela indexação)
+
+        # Hash bcrypt do código que libera cada nível restrito (verificado uma vez por sessão, ver controle_acesso)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS codigos_acesso (
+            nivel_acesso TEXT PRIMARY KEY CHECK(nivel_acesso IN ('restrito', 'confidencial')),
+            codigo_hash TEXT NOT NULL,
+            data_atualizacao DATETIME
+        )
+        """)
+
         conn.commit() # Salva as alterações no banco de dados
+
+        # WAL fica gravado no arquivo: buscas (leitores) e indexação (escritor) deixam de se bloquear
+        ativar_wal(conn)
         print(f"Banco de dados SQLite '{DATABASE_FILE}' e tabela 'metadados' criados/verificados com sucesso em: {DATABASE_PATH}")
 
     except sqlite3.Error as e:
@@ -0,0 +1,209 @@
+import datetime
+import os
+import sqlite3
+
+from src.database import database_operations
+from src.database.conexao import MAX_PARAMETROS_SQL, obter_conexao, transacao
+from src.database.tags import normalizar_tags
+from src.utils.controle_acesso import filtro_niveis_acesso
+
+# Pesos do BM25 por coluna do índice FTS5 (texto do chunk, nome do arquivo)
+PESO_TEXTO = 1.0
+PESO_NOME_ARQUIVO = 2.0
+
+# Chunks lidos por arquivo desejado: vários chunks do mesmo arquivo costumam aparecer entre os melhores
+FATOR_CHUNKS_POR_ARQUIVO = 4
+
+SQL_UPSERT_CHUNK = """
+INSERT INTO chunks_lexicos (colecao, chunk_id, nome_arquivo, chunk_indice, inicio, fim, pagina, texto)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (colecao, chunk_id) DO UPDATE SET
+    nome_arquivo = excluded.nome_arquivo,
+    chunk_indice = excluded.chunk_indice,
+    inicio = excluded.inicio,
+    fim = excluded.fim,
+    pagina = excluded.pagina,
+    texto = excluded.texto
+"""
+
+
+def _em_lotes(itens, tamanho_lote):
+    for inicio in range(0, len(itens), tamanho_lote):
+        yield itens[inicio:inicio + tamanho_lote]
+
+
+def atualizar_chunks_lexico(chunks, index_name="documentos_index"):
+    """
+    Insere ou substitui (upsert) chunks no índice BM25 da coleção.
+
+    Args:
+        chunks (list de dict): Chunks produzidos por `src.utils.chunking` (os mesmos gravados no ChromaDB).
+        index_name (str, optional): Nome da coleção a que os chunks pertencem. Padrão: "documentos_index".
+
+    Returns:
+        bool: True se a operação for bem-sucedida, False em caso de erro.
+    """
+    if not chunks:
+        return True
+
+    valores = [
+        (index_name, chunk["id"], chunk["nome_arquivo"], chunk.get("indice"), chunk.get("inicio"),
+         chunk.get("fim"), chunk.get("pagina"), chunk["texto"])
+        for chunk in chunks
+    ]
+    try:
+        with transacao(database_operations.DATABASE_PATH) as conn:
+            conn.executemany(SQL_UPSERT_CHUNK, valores)
+        return True
+
+    except sqlite3.Error as e:
+        print(f"Erro ao gravar {len(valores)} chunks no índice BM25 '{index_name}': {e}")
+        return False
+
+
+def remover_do_indice_lexico(nomes_arquivo, index_name="documentos_index"):
+    """
+    Remove do índice BM25 da coleção todos os chunks dos arquivos informados.
+
+    Returns:
+        bool: True se a operação for bem-sucedida, False em caso de erro.
+    """
+    nomes_arquivo = list(nomes_arquivo)
+    if not nomes_arquivo:
+        return True
+
+    try:
+        with transacao(database_operations.DATABASE_PATH) as conn:
+            for bloco in _em_lotes(nomes_arquivo, MAX_PARAMETROS_SQL - 1):
+                conn.execute(
+                    f"DELETE FROM chunks_lexicos WHERE colecao = ? AND nome_arquivo IN ({', '.join('?' * len(bloco))})",
+                    [index_name, *bloco],
+                )
+        return True
+
+    except sqlite3.Error as e:
+        print(f"Erro ao remover {len(nomes_arquivo)} arquivos do índice BM25 '{index_name}': {e}")
+        return False
+
+
+def contar_chunks_lexico(index_name="documentos_index"):
+    """Número de chunks da coleção no índice BM25 (0 em caso de erro)."""
+    try:
+        conn = obter_conexao(database_operations.DATABASE_PATH)
+        return conn.execute("SELECT COUNT(*) FROM chunks_lexicos WHERE colecao = ?", (index_name,)).fetchone()[0]
+    except sqlite3.Error:
+        return 0
+
+
+def expressao_fts(query):
+    """
+    Converte o texto da busca em uma expressão MATCH do FTS5.
+
+    Cada termo (normalizado como as tags: minúsculas, sem acentos, separado em
+    qualquer caractere não alfanumérico) vira uma frase entre aspas, e os termos
+    são unidos com OR; o BM25 ordena pelos documentos que casam mais termos raros.
+    "certidao_quitacao_092525360590" vira '"certidao" OR "quitacao" OR "092525360590"'.
+
+    Returns:
+        str or None: Expressão MATCH, ou None se a query não tiver termos.
+    """
+    termos = normalizar_tags(query)
+    if not termos:
+        return None
+    return " OR ".join(f'"{termo}"' for termo in termos)
+
+
+def _condicao_valores(coluna, valor, parametros):
+    valores = list(valor) if isinstance(valor, (list, tuple, set)) else [valor]
+    parametros.extend(valores)
+    return f"{coluna} IN ({', '.join('?' * len(valores))})"
+
+
+def _data_iso(data):
+    return data.isoformat() if isinstance(data, datetime.datetime) else str(data)
+
+
+def buscar_documentos_bm25(query, index_name="documentos_index", n_results=30, tipo_documento_filtro=None,
+                           nivel_acesso_filtro=None, linguagem_filtro=None, data_modificacao_de=None,
+                           data_modificacao_ate=None, filtro_extra=None, concessao=None):
+    """
+    Busca lexical (BM25 do FTS5) nos chunks da coleção, com os mesmos filtros de `buscar_documentos_chromadb`.
+
+    Os filtros de metadados são aplicados no SQL (junção com 'metadados'), assim
+    como os níveis de acesso liberados pela `concessao`. Os chunks são agrupados
+    por arquivo, mantendo o de melhor BM25 de cada um.
+
+    Args:
+        query (str): Texto da busca.
+        index_name (str, optional): Nome da coleção. Padrão: "documentos_index".
+        n_results (int, optional): Número de arquivos retornados. Padrão: 30.
+        Demais argumentos: ver `buscar_documentos_chromadb`.
+
+    Returns:
+        list de dict: Resultados no formato de `buscar_documentos_chromadb` (nome_arquivo, score, trecho,
+                      tipo_documento, chunk_id, inicio, fim, pagina), um por arquivo. O score é o valor
+                      do `bm25()` do FTS5: quanto menor (mais negativo), mais relevante.
+    """
+    expressao = expressao_fts(query)
+    if expressao is None:
+        return []
+    niveis = filtro_niveis_acesso(concessao, nivel_acesso_filtro)
+    if niveis == ():
+        return []
+
+    parametros = [PESO_TEXTO, PESO_NOME_ARQUIVO, expressao, index_name]
+    condicoes = []
+    if tipo_documento_filtro:
+        tipos = tipo_documento_filtro if isinstance(tipo_documento_filtro, (list, tuple, set)) else [tipo_documento_filtro]
+        condicoes.append(_condicao_valores("m.tipo_documento", [t.lower().lstrip(".") for t in tipos], parametros))
+    if niveis:
+        condicoes.append(_condicao_valores("m.nivel_acesso", niveis, parametros))
+    if linguagem_filtro:
+        condicoes.append(_condicao_valores("m.linguagem", linguagem_filtro, parametros))
+    if data_modificacao_de is not None:
+        condicoes.append("m.data_modificacao >= ?")
+        parametros.append(_data_iso(data_modificacao_de))
+    if data_modificacao_ate is not None:
+        condicoes.append("m.data_modificacao <= ?")
+        parametros.append(_data_iso(data_modificacao_ate))
+
+    sql = f"""
+    SELECT c.chunk_id, c.nome_arquivo, c.inicio, c.fim, c.pagina, c.texto, m.tipo_documento,
+           bm25(chunks_fts, ?, ?) AS score
+    FROM chunks_fts
+    JOIN chunks_lexicos c ON c.id = chunks_fts.rowid
+    {'JOIN' if condicoes else 'LEFT JOIN'} metadados m ON m.nome_arquivo = c.nome_arquivo
+    WHERE chunks_fts MATCH ? AND c.colecao = ? {''.join(' AND ' + condicao for condicao in condicoes)}
+    ORDER BY score
+    LIMIT ?
+    """
+    limite = n_results * FATOR_CHUNKS_POR_ARQUIVO
+    try:
+        conn = obter_conexao(database_operations.DATABASE_PATH)
+        registros = conn.execute(sql, [*parametros, limite]).fetchall()
+
+    except sqlite3.Error as e:
+        print(f"Erro na busca BM25 por '{query}' no índice '{index_name}': {e}")
+        return []
+
+    melhores = {}
+    for registro in registros:
+        melhores.setdefault(registro["nome_arquivo"], registro)
+
+    if filtro_extra is not None:
+        metadados_por_nome = database_operations.obter_metadados_por_nomes_arquivo(list(melhores))
+        melhores = {nome: r for nome, r in melhores.items() if filtro_extra(metadados_por_nome.get(nome))}
+
+    return [
+        {
+            "nome_arquivo": registro["nome_arquivo"],
+            "score": registro["score"],
+            "trecho": registro["texto"],
+            "tipo_documento": registro["tipo_documento"] or os.path.splitext(registro["nome_arquivo"])[1].lstrip(".") or None,
+            "chunk_id": registro["chunk_id"],
+            "inicio": registro["inicio"],
+            "fim": registro["fim"],
+            "pagina": registro["pagina"],
+        }
+        for registro in list(melhores.values())[:n_results]
+    ]
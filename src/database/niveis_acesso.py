@@ -0,0 +1,211 @@
+import os
+import sqlite3
+import threading
+import time
+
+from src.config import carregar_ambiente
+from src.database.conexao import MAX_PARAMETROS_SQL, abrir_conexao
+
+carregar_ambiente()
+
+# Níveis aceitos pela coluna metadados.nivel_acesso, do menos ao mais restrito
+NIVEIS_ACESSO = ("publico", "restrito", "confidencial")
+
+# Intervalo mínimo (s) entre verificações de escritas feitas por outros processos (PRAGMA data_version)
+INTERVALO_VERIFICACAO_S = float(os.environ.get("RAG_ACESSO_VERIFICACAO_S", "1.0"))
+
+SQL_NIVEIS_POR_NOME = "SELECT id, nome_arquivo, nivel_acesso FROM metadados WHERE nome_arquivo IN ({})"
+
+
+class BitmapsNiveisAcesso:
+    """
+    Bitmaps pré-calculados dos documentos de cada nível de acesso, indexados por `metadados.id`.
+
+    Checar se um hit pode ser mostrado custa uma consulta ao dicionário nome -> id e
+    uma leitura no vetor booleano dos níveis concedidos, sem ida ao SQLite. Os
+    bitmaps são carregados na primeira consulta e mantidos em dia pelas escritas em
+    'metadados' deste processo (`registrar` e `remover`, chamados por
+    `database_operations`). Escritas de outros processos (ex.: a indexação rodando
+    ao lado do serviço de busca) são detectadas pelo `PRAGMA data_version` de uma
+    conexão própria, verificado no máximo a cada `INTERVALO_VERIFICACAO_S`, e
+    provocam uma recarga completa.
+
+    Documentos sem registro em 'metadados' são tratados como públicos, como na
+    gravação dos metadados dos vetores (`_metadados_chroma`).
+
+    Se a carga falhar, os bitmaps ficam incompletos até uma nova carga (tentada
+    a cada verificação): `cobre_todos` passa a responder False, e as buscas
+    mantêm o filtro `nivel_acesso` em vez de dispensá-lo.
+    """
+
+    def __init__(self, caminho_banco, intervalo_verificacao=INTERVALO_VERIFICACAO_S):
+        self.caminho_banco = caminho_banco
+        self.intervalo_verificacao = intervalo_verificacao
+        self._lock = threading.Lock()
+        self._conn = None
+        self._versao_dados = None
+        self._verificado_em = 0.0
+        self._ids = None  # nome_arquivo -> id; None enquanto não carregado
+        self._completo = False  # False se a última carga falhou (os bitmaps não representam o banco)
+        self._nivel_por_id = None  # id -> índice em NIVEIS_ACESSO (-1: sem documento)
+        self._bitmaps = {}
+        self._contagens = {}
+        self._mascaras = {}  # tupla de níveis -> OR dos bitmaps (descartadas a cada alteração)
+
+    # --- Carga e sincronização ------------------------------------------------------
+
+    def _carregar(self):
+        import numpy as np  # Importação tardia: comandos que só leem metadados não carregam o NumPy
+
+        if self._conn is None:
+            self._conn = abrir_conexao(self.caminho_banco)
+        self._versao_dados = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        try:
+            registros = self._conn.execute("SELECT id, nome_arquivo, nivel_acesso FROM metadados").fetchall()
+            self._completo = True
+        except sqlite3.Error as e:
+            print(f"Erro ao carregar os níveis de acesso dos documentos: {e}")
+            registros = []
+            self._completo = False
+        maior_id = max((registro[0] for registro in registros), default=0)
+        self._ids = {}
+        self._nivel_por_id = np.full(max(1024, 2 * (maior_id + 1)), -1, dtype=np.int8)
+        self._aplicar(registros)
+
+    def _garantir_atual(self):
+        """Carrega os bitmaps, se necessário, e recarrega se outro processo alterou o banco."""
+        if self._ids is None:
+            self._carregar()
+            self._verificado_em = time.monotonic()
+            return
+        agora = time.monotonic()
+        if agora - self._verificado_em < self.intervalo_verificacao:
+            return
+        self._verificado_em = agora
+        if not self._completo or self._conn.execute("PRAGMA data_version").fetchone()[0] != self._versao_dados:
+            self._carregar()
+
+    def _aplicar(self, registros):
+        import numpy as np
+
+        for id_documento, nome_arquivo, nivel_acesso in registros:
+            if id_documento >= len(self._nivel_por_id):
+                expandido = np.full(max(2 * len(self._nivel_por_id), id_documento + 1), -1, dtype=np.int8)
+                expandido[:len(self._nivel_por_id)] = self._nivel_por_id
+                self._nivel_por_id = expandido
+            anterior = self._ids.get(nome_arquivo)
+            if anterior is not None and anterior != id_documento:
+                self._nivel_por_id[anterior] = -1
+            self._ids[nome_arquivo] = id_documento
+            self._nivel_por_id[id_documento] = NIVEIS_ACESSO.index(nivel_acesso)
+        self._recalcular_bitmaps()
+
+    def _recalcular_bitmaps(self):
+        import numpy as np
+
+        self._bitmaps = {nivel: self._nivel_por_id == indice for indice, nivel in enumerate(NIVEIS_ACESSO)}
+        self._contagens = {nivel: int(np.count_nonzero(bitmap)) for nivel, bitmap in self._bitmaps.items()}
+        self._mascaras = {}
+
+    def ler_registros(self, conn, nomes_arquivo):
+        """
+        Lê (id, nome_arquivo, nivel_acesso) dos arquivos informados, para `registrar` depois do commit.
+
+        Chamada dentro da transação que gravou os registros (vê as próprias escritas).
+        Se os bitmaps ainda não foram carregados, não lê nada: a carga completa já os incluirá.
+        """
+        if self._ids is None:
+            return []
+        registros = []
+        for inicio in range(0, len(nomes_arquivo), MAX_PARAMETROS_SQL):
+            bloco = nomes_arquivo[inicio:inicio + MAX_PARAMETROS_SQL]
+            registros.extend(tuple(registro) for registro in
+                             conn.execute(SQL_NIVEIS_POR_NOME.format(", ".join("?" * len(bloco))), bloco))
+        return registros
+
+    def registrar(self, registros):
+        """Aplica nos bitmaps registros (id, nome_arquivo, nivel_acesso) inseridos ou alterados."""
+        if not registros:
+            return
+        with self._lock:
+            if self._ids is not None:
+                self._aplicar(registros)
+
+    def remover(self, nomes_arquivo):
+        """Retira dos bitmaps os arquivos removidos de 'metadados'."""
+        with self._lock:
+            if self._ids is None:
+                return
+            for nome_arquivo in nomes_arquivo:
+                id_documento = self._ids.pop(nome_arquivo, None)
+                if id_documento is not None:
+                    self._nivel_por_id[id_documento] = -1
+            self._recalcular_bitmaps()
+
+    # --- Consultas -----------------------------------------------------------------
+
+    def _mascara(self, niveis):
+        import numpy as np
+
+        mascara = self._mascaras.get(niveis)
+        if mascara is None:
+            mascara = np.zeros(len(self._nivel_por_id), dtype=bool)
+            for nivel in niveis:
+                mascara |= self._bitmaps[nivel]
+            self._mascaras[niveis] = mascara
+        return mascara
+
+    def permitidos(self, nomes_arquivo, niveis):
+        """
+        Indica, para cada arquivo, se o nível dele está entre `niveis`.
+
+        Args:
+            nomes_arquivo (list de str): Nomes dos arquivos (ex.: os hits de uma busca).
+            niveis (tuple de str): Níveis concedidos.
+
+        Returns:
+            list de bool: Na ordem de `nomes_arquivo`.
+        """
+        niveis = tuple(niveis)
+        sem_registro = "publico" in niveis
+        with self._lock:
+            self._garantir_atual()
+            mascara, ids = self._mascara(niveis), self._ids
+            return [bool(mascara[ids[nome]]) if nome in ids else sem_registro for nome in nomes_arquivo]
+
+    def contagens(self):
+        """Número de documentos registrados em cada nível."""
+        with self._lock:
+            self._garantir_atual()
+            return dict(self._contagens)
+
+    def cobre_todos(self, niveis):
+        """
+        True se nenhum documento registrado está fora de `niveis` (e os sem registro, públicos, estão dentro).
+
+        False se os bitmaps não puderam ser carregados: sem saber os níveis, o filtro não é dispensado.
+        """
+        if "publico" not in niveis:
+            return False
+        with self._lock:
+            self._garantir_atual()
+            return self._completo and all(total == 0 for nivel, total in self._contagens.items() if nivel not in niveis)
+
+    def fechar(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn, self._ids = None, None
+
+
+_bitmaps_por_banco = {}
+_bitmaps_lock = threading.Lock()
+
+
+def bitmaps_niveis(caminho_banco):
+    """Retorna os bitmaps de níveis de acesso compartilhados do processo para o banco em `caminho_banco`."""
+    bitmaps = _bitmaps_por_banco.get(caminho_banco)
+    if bitmaps is None:
+        with _bitmaps_lock:
+            bitmaps = _bitmaps_por_banco.setdefault(caminho_banco, BitmapsNiveisAcesso(caminho_banco))
+    return bitmaps
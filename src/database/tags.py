@@ -0,0 +1,59 @@
+import re
+import unicodedata
+
+from src.database.conexao import MAX_PARAMETROS_SQL
+
+# Separadores de termos de tag: tudo que não é letra ou dígito (inclui "_", "-", ",", ";" e espaços)
+_SEPARADORES = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalizar_tags(tags):
+    """
+    Divide o campo `tags` de um documento em termos normalizados.
+
+    Os termos são separados por qualquer caractere não alfanumérico, convertidos
+    para minúsculas e sem acentos. Assim, "certidao_quitacao_092525360590" e
+    "Certidão; Quitação" geram os termos {"certidao", "quitacao", ...}, e a busca
+    por "ai" não casa mais com "contrato_faixa" (o LIKE '%ai%' casava).
+
+    Args:
+        tags (str or None): Valor da coluna `tags` (nome do arquivo sem extensão ou palavras-chave do PDF).
+
+    Returns:
+        list de str: Termos únicos, na ordem em que aparecem.
+    """
+    if not tags:
+        return []
+    texto = unicodedata.normalize("NFKD", str(tags).lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return list(dict.fromkeys(termo for termo in _SEPARADORES.split(texto) if termo))
+
+
+def gravar_tags(conn, tags_por_arquivo):
+    """
+    Substitui as tags normalizadas dos documentos informados (tabelas `tags` e `documento_tags`).
+
+    Deve ser chamada dentro da mesma transação que grava os registros em `metadados`.
+
+    Args:
+        conn (sqlite3.Connection): Conexão com a transação aberta.
+        tags_por_arquivo (list de (str, str)): Pares (nome_arquivo, valor da coluna tags).
+    """
+    tags_por_arquivo = list(tags_por_arquivo)
+    ids = {}
+    for inicio in range(0, len(tags_por_arquivo), MAX_PARAMETROS_SQL):
+        bloco = [nome for nome, _ in tags_por_arquivo[inicio:inicio + MAX_PARAMETROS_SQL]]
+        sql = f"SELECT id, nome_arquivo FROM metadados WHERE nome_arquivo IN ({', '.join('?' * len(bloco))})"
+        ids.update((nome, documento_id) for documento_id, nome in conn.execute(sql, bloco))
+
+    pares = []  # (documento_id, termo)
+    for nome_arquivo, tags in tags_por_arquivo:
+        if nome_arquivo in ids:
+            pares.extend((ids[nome_arquivo], termo) for termo in normalizar_tags(tags))
+
+    conn.executemany("DELETE FROM documento_tags WHERE documento_id = ?", [(i,) for i in ids.values()])
+    conn.executemany("INSERT OR IGNORE INTO tags (nome) VALUES (?)", [(termo,) for _, termo in pares])
+    conn.executemany(
+        "INSERT OR IGNORE INTO documento_tags (tag_id, documento_id) SELECT id, ? FROM tags WHERE nome = ?",
+        pares,
+    )
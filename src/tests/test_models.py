@@ -1,17 +1,10 @@
 #!/usr/bin/env python3
 
-import torch
-from sentence_transformers import SentenceTransformer, util
-from InstructorEmbedding import INSTRUCTOR
-from sklearn.metrics.pairwise import cosine_similarity
-import numpy as np
+# torch, sentence_transformers, sklearn e o cache de embeddings são importados dentro das funções: quem só usa
+# MODEL_NAMES, QUERIES ou load_test_documents (main.py, benchmarks) não paga o carregamento das bibliotecas de ML
 import os
 import time
-import more_itertools as mit
-
-# Definir o dispositivo: GPU se disponível, senão CPU
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-print(f"Dispositivo usado: {device}")
+from src.utils.ingestion import extrair_paginas_pdf
 
 # Pasta onde estão os documentos de teste
 DATA_DIR = "data/test_documents"
@@ -32,6 +25,12 @@ def load_test_documents(data_dir):
     for filename in os.listdir(data_dir):
         if filename.endswith((".txt", ".pdf", ".docx", ".html", ".md")): # Adicione as extensões relevantes
             filepath = os.path.join(data_dir, filename)
+            if filename.endswith(".pdf"): # PDFs são binários: extrai o texto das páginas com o PyPDF2
+                try:
+                    documents[filename] = "\n".join(texto for _, texto in extrair_paginas_pdf(filepath))
+                except Exception as e:
+                    print(f"Erro ao extrair texto do PDF {filename}: {e}")
+                continue
             try:
                 with open(filepath, "r", encoding="utf-8") as f: # Tenta ler como texto
                     documents[filename] = f.read()
@@ -47,7 +46,7 @@ def load_test_documents(data_dir):
                 continue
     return documents
 
-def generate_embeddings(model_name, documents, device, batch_size=32):
+def generate_embeddings(model_name, documents, device, batch_size=32, backend=None):
     """
     Gera embeddings para uma lista de documentos usando um modelo Sentence Transformer, com processamento em lotes.
 
@@ -56,20 +55,22 @@ def generate_embeddings(model_name, documents, device, batch_size=32):
         documents (dict): Dicionário de documentos (nome_arquivo: conteúdo).
         device (torch.device): Dispositivo (CPU ou GPU) para rodar o modelo.
         batch_size (int, optional): Tamanho do lote para processamento. Padrão: 32. # ADICIONADO batch_size
+        backend (str, optional): Backend de inferência ("torch", "torch-int8" ou "onnx-int8"). Padrão: `RAG_BACKEND_ENCODER`.
     """
+    import more_itertools as mit
+    import torch
+    from src.utils.embedding_cache import codificar_textos
+
     start_time = time.time()
-    print(f"Carregando modelo: {model_name}")
-    model = SentenceTransformer(model_name).to(device)
-    corpus = list(documents.values())
-    embeddings_docs_list = [] # Lista para guardar os embeddings de cada lote
+    embeddings_docs = None # Alocado no primeiro lote e preenchido lote a lote (sem lista de lotes + torch.cat, que dobra o pico de memória)
 
     print(f"Gerando embeddings em lotes de {batch_size}...") # Mensagem informativa
 
-    for batch in mit.chunked(corpus, batch_size): # Divide o corpus em lotes
-        batch_embeddings = model.encode(batch, convert_to_tensor=True, device=device) # Gera embeddings para o lote atual
-        embeddings_docs_list.append(batch_embeddings) # Adiciona os embeddings do lote à lista
-
-    embeddings_docs = torch.cat(embeddings_docs_list, dim=0) # Concatena os embeddings de todos os lotes em um único tensor
+    for inicio, batch in enumerate(mit.chunked(documents.values(), batch_size)): # Divide o corpus em lotes
+        batch_embeddings = torch.from_numpy(codificar_textos(model_name, batch, device=device, batch_size=batch_size, backend=backend)) # Consulta o cache e gera só os embeddings ausentes
+        if embeddings_docs is None:
+            embeddings_docs = torch.empty((len(documents), batch_embeddings.shape[1]), dtype=batch_embeddings.dtype, device=device)
+        embeddings_docs[inicio * batch_size:inicio * batch_size + len(batch)] = batch_embeddings.to(device) # Copia o lote para a sua faixa
 
     end_time = time.time()
     embedding_time = end_time - start_time
@@ -77,6 +78,11 @@ def generate_embeddings(model_name, documents, device, batch_size=32):
     return embeddings_docs, list(documents.keys()), embedding_time
 
 def search_and_evaluate(embeddings_docs, embeddings_queries, document_filenames, model_name):
+    import numpy as np
+    import torch
+    from sentence_transformers import util
+    from sklearn.metrics.pairwise import cosine_similarity
+
     print(f"\n--- Resultados para o modelo: {model_name} ---")
     for query_idx, query in enumerate(QUERIES):
         print(f"\nQuery: '{query}'")
@@ -99,15 +105,27 @@ def search_and_evaluate(embeddings_docs, embeddings_queries, document_filenames,
             print(f"- {doc_name}: (Similaridade: {score:.4f})")
 
 def main():
+    """
+    Comparação rápida e visual dos modelos (top-3 por query) sobre `data/test_documents`.
+
+    Para medições reprodutíveis (recall@k, MRR, latência, ingestão e RSS por modelo
+    e backend, com saída em JSON) use `python -m src.benchmarks.bench_recuperacao`.
+    """
+    import torch
+    from src.utils.embedding_cache import codificar_textos
+
+    # Definir o dispositivo: GPU se disponível, senão CPU
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    print(f"Dispositivo usado: {device}")
+
     documents = load_test_documents(DATA_DIR) # Carrega documentos de teste
     if not documents:
         print(f"Nenhum documento encontrado em {DATA_DIR}. Adicione documentos de teste lá.")
         return
 
     for model_name in MODEL_NAMES: # Itera sobre os modelos definidos
-        embeddings_docs, embeddings_queries, document_filenames, embedding_time = generate_embeddings(
-            model_name, documents, QUERIES, device
-        )
+        embeddings_docs, document_filenames, embedding_time = generate_embeddings(model_name, documents, device)
+        embeddings_queries = torch.from_numpy(codificar_textos(model_name, QUERIES, device=device)).to(device)
         search_and_evaluate(embeddings_docs, embeddings_queries, document_filenames, model_name)
         print(f"\nTempo total de embedding para {model_name}: {embedding_time:.2f} segundos.\n")
 
@@ -0,0 +1,103 @@
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from src.config import carregar_ambiente
+from src.database.indice_lexico import buscar_documentos_bm25
+from src.utils.db_vectores import buscar_documentos_chromadb
+from src.utils.instrumentacao import etapa
+
+carregar_ambiente()
+
+# Constante k do reciprocal-rank fusion: score = soma de 1 / (k + posição) em cada lista
+K_RRF = int(os.environ.get("RAG_K_RRF", "60"))
+
+# Candidatos pedidos a cada recuperador, no mínimo (a fusão precisa de listas mais longas que n_results)
+MIN_CANDIDATOS = 50
+
+# Threads que executam a busca vetorial enquanto a BM25 roda na thread chamadora. O encode (torch/ONNX),
+# o ChromaDB e o SQLite liberam o GIL, então as duas buscas se sobrepõem de fato.
+_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("RAG_THREADS_BUSCA_HIBRIDA", "4")),
+                               thread_name_prefix="busca-hibrida")
+
+
+def fundir_rrf(listas_por_recuperador, k=K_RRF, n_results=None):
+    """
+    Combina listas ranqueadas de arquivos com reciprocal-rank fusion.
+
+    Cada arquivo recebe a soma de 1 / (k + posição) nas listas em que aparece
+    (posição começando em 1). Só a posição importa, então recuperadores com
+    escalas de score incomparáveis (distância de cosseno e BM25) podem ser somados.
+
+    Args:
+        listas_por_recuperador (dict): Nome do recuperador -> lista de resultados (dicts com 'nome_arquivo'),
+            do mais ao menos relevante.
+        k (int, optional): Constante do RRF. Padrão: `RAG_K_RRF` ou 60.
+        n_results (int, optional): Número máximo de resultados. Padrão: todos.
+
+    Returns:
+        list de dict: Resultados ordenados pelo score RRF (maior = mais relevante). Cada um é uma cópia do
+                      resultado do recuperador em que o arquivo ficou melhor posicionado, com 'score'
+                      substituído pelo score RRF e 'posicoes' (recuperador -> posição) acrescentado.
+    """
+    fundidos = {}
+    for recuperador, resultados in listas_por_recuperador.items():
+        for posicao, resultado in enumerate(resultados, start=1):
+            entrada = fundidos.get(resultado["nome_arquivo"])
+            if entrada is None:
+                entrada = fundidos[resultado["nome_arquivo"]] = {"score": 0.0, "posicoes": {}, "melhor": (posicao, resultado)}
+            entrada["score"] += 1.0 / (k + posicao)
+            entrada["posicoes"][recuperador] = posicao
+            if posicao < entrada["melhor"][0]:
+                entrada["melhor"] = (posicao, resultado)
+
+    ordenados = sorted(fundidos.values(), key=lambda entrada: entrada["score"], reverse=True)
+    if n_results is not None:
+        ordenados = ordenados[:n_results]
+    return [{**entrada["melhor"][1], "score": entrada["score"], "posicoes": entrada["posicoes"]} for entrada in ordenados]
+
+
+def buscar_documentos_hibrido(query, model_name, index_name="documentos_index", n_results=30, tipo_documento_filtro=None,
+                              sessao=None, nivel_acesso_filtro=None, linguagem_filtro=None,
+                              data_modificacao_de=None, data_modificacao_ate=None, filtro_extra=None, backend=None,
+                              n_candidatos=None, k_rrf=K_RRF, concessao=None):
+    """
+    Busca híbrida: vetorial (ChromaDB) e lexical (BM25 do FTS5), fundidas com reciprocal-rank fusion.
+
+    A busca lexical recupera o que a densa perde em tokens exatos (números de
+    documento, CPFs, nomes de arquivo). As duas buscas rodam em paralelo, de forma
+    que a latência fica próxima da mais lenta delas, e não da soma.
+
+    Args:
+        query (str): Texto da busca.
+        model_name (str): Modelo de embedding usado na indexação.
+        n_results (int, optional): Número de resultados retornados. Padrão: 30.
+        n_candidatos (int, optional): Candidatos pedidos a cada recuperador. Padrão: max(2 * n_results, 50).
+        k_rrf (int, optional): Constante do RRF. Padrão: `RAG_K_RRF` ou 60.
+        Demais argumentos: ver `buscar_documentos_chromadb`.
+
+    Returns:
+        list de dict: Resultados no formato de `buscar_documentos_chromadb`, com 'score' RRF (maior = mais
+                      relevante) e 'posicoes' com a posição do arquivo em cada recuperador.
+    """
+    n_candidatos = n_candidatos or max(2 * n_results, MIN_CANDIDATOS)
+    filtros = {
+        "tipo_documento_filtro": tipo_documento_filtro,
+        "nivel_acesso_filtro": nivel_acesso_filtro,
+        "linguagem_filtro": linguagem_filtro,
+        "data_modificacao_de": data_modificacao_de,
+        "data_modificacao_ate": data_modificacao_ate,
+        "filtro_extra": filtro_extra,
+        "concessao": concessao,
+    }
+
+    # A cópia do contexto leva a consulta em andamento (instrumentação) para a thread da busca vetorial
+    futuro_vetorial = _executor.submit(
+        contextvars.copy_context().run, buscar_documentos_chromadb, query, model_name, index_name=index_name,
+        n_results=n_candidatos, sessao=sessao, backend=backend, **filtros,
+    )
+    with etapa("busca_lexical"):
+        resultados_bm25 = buscar_documentos_bm25(query, index_name=index_name, n_results=n_candidatos, **filtros)
+    resultados_vetoriais = futuro_vetorial.result()
+
+    with etapa("fusao"):
+        return fundir_rrf({"vetorial": resultados_vetoriais, "bm25": resultados_bm25}, k=k_rrf, n_results=n_results)
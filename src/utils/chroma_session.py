@@ -0,0 +1,160 @@
+import os
+import sqlite3
+import threading
+import chromadb
+from src.config import DATABASE_DIR, carregar_ambiente
+
+carregar_ambiente()
+
+CHROMA_PATH = os.path.join(DATABASE_DIR, "chroma_db")
+
+# Trechos das mensagens de erro de um cliente fechado ou parado (o "system" do chromadb parado deixa a API
+# sem os bindings), que a reabertura da sessão resolve
+MENSAGENS_CLIENTE_FECHADO = ("closed", "not running", "could not connect", "has no attribute 'bindings'")
+
+
+def _cliente_invalido(erro):
+    """True se `erro` indica conexão perdida ou cliente fechado; erros da operação em si não são repetidos."""
+    if isinstance(erro, (ConnectionError, sqlite3.ProgrammingError)):
+        return True
+    return (isinstance(erro, (AttributeError, RuntimeError, ValueError, sqlite3.OperationalError, chromadb.errors.ChromaError))
+            and any(trecho in str(erro).lower() for trecho in MENSAGENS_CLIENTE_FECHADO))
+
+
+def _descartar_sistema(client):
+    """
+    Para o "system" do chromadb usado por `client` e o remove do cache de systems.
+
+    O chromadb compartilha um system por caminho entre os clientes do processo;
+    sem removê-lo, um novo cliente no mesmo caminho herdaria o system inválido.
+    Os systems de outros caminhos não são tocados. Se a versão instalada do
+    chromadb não tiver esse cache interno, recorre a `clear_system_cache()`,
+    que é público mas descarta os systems de todos os caminhos.
+    """
+    from chromadb.api.shared_system_client import SharedSystemClient
+
+    identificador = getattr(client, "_identifier", None)
+    sistemas = getattr(SharedSystemClient, "_identifier_to_system", None)
+    contagens = getattr(SharedSystemClient, "_identifier_to_refcount", None)
+    trava = getattr(SharedSystemClient, "_refcount_lock", None)
+    if identificador is None or not isinstance(sistemas, dict) or not isinstance(contagens, dict) or trava is None:
+        limpar_cache = getattr(SharedSystemClient, "clear_system_cache", None)
+        if limpar_cache is not None:
+            limpar_cache()
+        return
+    with trava:
+        contagens.pop(identificador, None)
+    sistema = sistemas.pop(identificador, None)
+    if sistema is not None:
+        try:
+            sistema.stop()
+        except Exception as e:
+            print(f"Aviso: falha ao parar o ChromaDB em '{identificador}': {e}")
+
+
+class SessaoChroma:
+    """
+    Sessão de longa duração sobre um diretório persistente do ChromaDB.
+
+    Mantém um único `PersistentClient` por caminho e guarda os handles das
+    coleções já resolvidas, evitando reabrir o armazenamento em disco e
+    recarregar o segmento HNSW a cada busca. Se uma operação falhar porque o
+    cliente ficou inválido (fechado, parado ou sem conexão), a sessão é
+    reaberta e a operação é repetida uma vez; os demais erros são propagados.
+    """
+
+    def __init__(self, persist_path=CHROMA_PATH):
+        self.persist_path = persist_path
+        self._client = None
+        self._colecoes = {}
+        self._lock = threading.RLock()
+
+    @property
+    def client(self):
+        """Cliente ChromaDB da sessão, criado na primeira utilização."""
+        with self._lock:
+            if self._client is None:
+                os.makedirs(self.persist_path, exist_ok=True)
+                self._client = chromadb.PersistentClient(path=self.persist_path)
+            return self._client
+
+    def obter_colecao(self, nome, criar=False):
+        """
+        Retorna o handle (em cache) de uma coleção.
+
+        Args:
+            nome (str): Nome da coleção.
+            criar (bool, optional): Se True, cria a coleção caso ela não exista.
+
+        Returns:
+            chromadb.Collection: A coleção.
+
+        Raises:
+            Exception: Se a coleção não existir e `criar` for False.
+        """
+        with self._lock:
+            colecao = self._colecoes.get(nome)
+            if colecao is None:
+                if criar:
+                    colecao = self.client.get_or_create_collection(name=nome)
+                else:
+                    colecao = self.client.get_collection(name=nome)
+                self._colecoes[nome] = colecao
+            return colecao
+
+    def executar(self, nome, operacao, criar=False):
+        """
+        Executa `operacao(colecao)` sobre a coleção, reabrindo a sessão uma vez se o cliente estiver inválido.
+
+        Args:
+            nome (str): Nome da coleção.
+            operacao (callable): Função que recebe a coleção e retorna o resultado da operação.
+            criar (bool, optional): Se True, cria a coleção caso ela não exista.
+
+        Returns:
+            O valor retornado por `operacao`.
+        """
+        try:
+            return operacao(self.obter_colecao(nome, criar=criar))
+        except Exception as e:
+            if not _cliente_invalido(e):
+                raise
+            print(f"Aviso: falha na operação sobre a coleção '{nome}' ({e}). Reabrindo a sessão ChromaDB.")
+            self.reabrir()
+            return operacao(self.obter_colecao(nome, criar=criar))
+
+    def esquecer_colecao(self, nome):
+        """Descarta o handle em cache de uma coleção (por exemplo, depois de removê-la)."""
+        with self._lock:
+            self._colecoes.pop(nome, None)
+
+    def reabrir(self):
+        """Descarta o cliente e os handles em cache; o próximo acesso abre o armazenamento novamente."""
+        with self._lock:
+            self._colecoes.clear()
+            client, self._client = self._client, None
+            if client is not None:
+                _descartar_sistema(client)
+
+
+_sessoes = {}
+_sessoes_lock = threading.Lock()
+
+
+def obter_sessao_chroma(persist_path=CHROMA_PATH):
+    """
+    Retorna a sessão compartilhada do processo para o caminho informado.
+
+    Args:
+        persist_path (str, optional): Diretório persistente do ChromaDB. Padrão: `data/chroma_db`.
+
+    Returns:
+        SessaoChroma: A sessão associada ao caminho.
+    """
+    chave = os.path.abspath(persist_path)
+    with _sessoes_lock:
+        sessao = _sessoes.get(chave)
+        if sessao is None:
+            sessao = SessaoChroma(persist_path)
+            _sessoes[chave] = sessao
+        return sessao
@@ -0,0 +1,193 @@
+import os
+import re
+from src.config import carregar_ambiente
+
+carregar_ambiente()
+
+# Tamanho máximo de cada chunk e sobreposição entre chunks consecutivos (em tokens)
+TAMANHO_CHUNK_TOKENS = int(os.environ.get("RAG_TAMANHO_CHUNK_TOKENS", "384"))
+SOBREPOSICAO_TOKENS = int(os.environ.get("RAG_SOBREPOSICAO_TOKENS", "64"))
+
+# Quantos chunks são acumulados antes de ordenar por tamanho e embedar
+JANELA_ORDENACAO = 1024
+
+_REGEX_PARAGRAFO = re.compile(r"\S(?:.*?\S)?(?=\s*\n\s*\n|\s*\Z)", re.DOTALL)
+_REGEX_SENTENCA = re.compile(r"\S.*?(?:[.!?](?=\s)|\Z)", re.DOTALL)
+_REGEX_PALAVRA = re.compile(r"\S+")
+
+
+def separar_id_chunk(chunk_id):
+    """Separa um ID 'arquivo#chunk_n' em (nome_arquivo, n). IDs sem sufixo retornam (id, 0)."""
+    nome_arquivo, separador, sufixo = chunk_id.rpartition("#chunk_")
+    if not separador or not sufixo.isdigit():
+        return chunk_id, 0
+    return nome_arquivo, int(sufixo)
+
+
+def _contador_tokens(tokenizer):
+    """Retorna uma função que conta os tokens de uma lista de textos (aproximação por palavras sem tokenizer)."""
+    if tokenizer is None:
+        return lambda textos: [int(len(texto.split()) * 1.3) + 1 for texto in textos]
+
+    def contar(textos):
+        if not textos:
+            return []
+        return [len(ids) for ids in tokenizer(textos, add_special_tokens=False)["input_ids"]]
+
+    return contar
+
+
+def _unidades(texto):
+    """
+    Divide o texto em unidades (sentenças dentro de parágrafos) com offsets de caractere.
+
+    Returns:
+        list de tuple: (inicio, fim) de cada unidade.
+    """
+    unidades = []
+    for paragrafo in _REGEX_PARAGRAFO.finditer(texto):
+        for sentenca in _REGEX_SENTENCA.finditer(texto, paragrafo.start(), paragrafo.end()):
+            unidades.append((sentenca.start(), sentenca.end()))
+    return unidades
+
+
+def _quebrar_unidade_longa(texto, inicio, fim, max_tokens, contar):
+    """Quebra uma unidade maior que o limite em pedaços de palavras que caibam em `max_tokens`."""
+    palavras = list(_REGEX_PALAVRA.finditer(texto, inicio, fim))
+    tokens_palavras = contar([p.group() for p in palavras])
+    pedacos, inicio_pedaco, tokens = [], None, 0
+    for palavra, n_tokens in zip(palavras, tokens_palavras):
+        if inicio_pedaco is not None and tokens + n_tokens > max_tokens:
+            pedacos.append((inicio_pedaco, fim_pedaco, tokens))
+            inicio_pedaco, tokens = None, 0
+        if inicio_pedaco is None:
+            inicio_pedaco = palavra.start()
+        fim_pedaco = palavra.end()
+        tokens += n_tokens
+    if inicio_pedaco is not None:
+        pedacos.append((inicio_pedaco, fim_pedaco, tokens))
+    return pedacos
+
+
+def dividir_em_chunks(nome_arquivo, texto, tokenizer=None, max_tokens=TAMANHO_CHUNK_TOKENS,
+                      sobreposicao=SOBREPOSICAO_TOKENS, pagina=None, indice_inicial=0):
+    """
+    Divide o texto de um documento em chunks respeitando fronteiras de sentença e parágrafo.
+
+    As sentenças são agrupadas até `max_tokens` tokens; cada novo chunk repete as
+    últimas sentenças do anterior até somar `sobreposicao` tokens. Sentenças maiores
+    que o limite são quebradas por palavras. É um gerador: os chunks são produzidos
+    à medida que o texto é percorrido.
+
+    Args:
+        nome_arquivo (str): Nome do arquivo de origem.
+        texto (str): Conteúdo do documento (ou da página).
+        tokenizer (optional): Tokenizer do modelo (ex.: `SentenceTransformer.tokenizer`). Sem tokenizer,
+            o número de tokens é estimado pelo número de palavras.
+        max_tokens (int, optional): Tamanho máximo do chunk em tokens. Padrão: `RAG_TAMANHO_CHUNK_TOKENS`.
+        sobreposicao (int, optional): Sobreposição entre chunks em tokens. Padrão: `RAG_SOBREPOSICAO_TOKENS`.
+        pagina (int, optional): Número da página de origem (para PDFs).
+        indice_inicial (int, optional): Índice do primeiro chunk (para continuar a numeração entre páginas).
+
+    Yields:
+        dict: Chunk com 'id' ('arquivo#chunk_n'), 'nome_arquivo', 'indice', 'texto', 'inicio', 'fim',
+              'pagina' e 'n_tokens'. 'inicio'/'fim' são offsets de caractere em `texto`.
+    """
+    contar = _contador_tokens(tokenizer)
+
+    # Unidades atômicas (inicio, fim, n_tokens), já quebradas para caber no limite
+    unidades = _unidades(texto)
+    tokens_unidades = contar([texto[inicio:fim] for inicio, fim in unidades])
+    atomicas = []
+    for (inicio, fim), n_tokens in zip(unidades, tokens_unidades):
+        if n_tokens > max_tokens:
+            atomicas.extend(_quebrar_unidade_longa(texto, inicio, fim, max_tokens, contar))
+        else:
+            atomicas.append((inicio, fim, n_tokens))
+
+    indice = indice_inicial
+    atual, tokens_atual = [], 0
+    for unidade in atomicas:
+        if atual and tokens_atual + unidade[2] > max_tokens:
+            yield _montar_chunk(nome_arquivo, texto, atual, tokens_atual, indice, pagina)
+            indice += 1
+            # Mantém o final do chunk anterior como sobreposição
+            sobra, tokens_sobra = [], 0
+            for anterior in reversed(atual):
+                if tokens_sobra + anterior[2] > sobreposicao or tokens_sobra + anterior[2] + unidade[2] > max_tokens:
+                    break
+                sobra.insert(0, anterior)
+                tokens_sobra += anterior[2]
+            atual, tokens_atual = sobra, tokens_sobra
+        atual.append(unidade)
+        tokens_atual += unidade[2]
+
+    if atual:
+        yield _montar_chunk(nome_arquivo, texto, atual, tokens_atual, indice, pagina)
+
+
+def _montar_chunk(nome_arquivo, texto, unidades, n_tokens, indice, pagina):
+    inicio, fim = unidades[0][0], unidades[-1][1]
+    return {
+        "id": f"{nome_arquivo}#chunk_{indice}",
+        "nome_arquivo": nome_arquivo,
+        "indice": indice,
+        "texto": texto[inicio:fim],
+        "inicio": inicio,
+        "fim": fim,
+        "pagina": pagina,
+        "n_tokens": n_tokens,
+    }
+
+
+def dividir_paginas_em_chunks(nome_arquivo, paginas, tokenizer=None, max_tokens=TAMANHO_CHUNK_TOKENS,
+                              sobreposicao=SOBREPOSICAO_TOKENS):
+    """
+    Divide um documento paginado (ex.: PDF) em chunks que nunca atravessam páginas.
+
+    Args:
+        nome_arquivo (str): Nome do arquivo de origem.
+        paginas (iterable de tuple): Pares (numero_pagina, texto).
+        tokenizer, max_tokens, sobreposicao: Ver `dividir_em_chunks`.
+
+    Yields:
+        dict: Chunks numerados continuamente ao longo do documento; 'inicio'/'fim' são relativos à página.
+    """
+    indice = 0
+    for numero_pagina, texto in paginas:
+        for chunk in dividir_em_chunks(nome_arquivo, texto, tokenizer, max_tokens, sobreposicao,
+                                       pagina=numero_pagina, indice_inicial=indice):
+            indice = chunk["indice"] + 1
+            yield chunk
+
+
+def lotes_ordenados_por_tamanho(chunks, batch_size, janela=JANELA_ORDENACAO):
+    """
+    Agrupa um fluxo de chunks em lotes de tamanho parecido, para minimizar o padding.
+
+    Os chunks são lidos em janelas de `janela` itens; cada janela é ordenada pelo
+    número de tokens e fatiada em lotes de `batch_size`. A memória usada fica
+    limitada ao tamanho da janela.
+
+    Args:
+        chunks (iterable de dict): Chunks produzidos por `dividir_em_chunks`.
+        batch_size (int): Tamanho de cada lote.
+        janela (int, optional): Número de chunks ordenados de cada vez. Padrão: 1024.
+
+    Yields:
+        list de dict: Lotes de chunks.
+    """
+    buffer = []
+    for chunk in chunks:
+        buffer.append(chunk)
+        if len(buffer) >= janela:
+            yield from _fatiar_ordenado(buffer, batch_size)
+            buffer = []
+    if buffer:
+        yield from _fatiar_ordenado(buffer, batch_size)
+
+
+def _fatiar_ordenado(buffer, batch_size):
+    buffer.sort(key=lambda chunk: chunk["n_tokens"])
+    for inicio in range(0, len(buffer), batch_size):
+        yield buffer[inicio:inicio + batch_size]
@@ -0,0 +1,238 @@
+import base64
+import datetime
+import functools
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import sqlite3
+import time
+from src.config import carregar_ambiente
+from src.database import database_operations
+from src.database.conexao import obter_conexao, transacao
+from src.database.niveis_acesso import NIVEIS_ACESSO, bitmaps_niveis
+
+carregar_ambiente()
+
+# Custo (log2 das rodadas) do bcrypt nos códigos de acesso: 12 leva da ordem de 100-300 ms por verificação
+CUSTO_BCRYPT = int(os.environ.get("RAG_BCRYPT_CUSTO", "12"))
+
+# Validade (s) da concessão emitida ao abrir uma sessão
+VALIDADE_CONCESSAO_S = int(os.environ.get("RAG_VALIDADE_CONCESSAO", "3600"))
+
+# Chave HMAC das concessões. Sem ela, cada processo sorteia a sua e as concessões não sobrevivem a um reinício
+# (nem valem entre processos diferentes)
+_CHAVE_CONCESSAO = os.environ.get("RAG_CHAVE_CONCESSAO", "").encode("utf-8") or secrets.token_bytes(32)
+
+# Concessões verificadas mantidas em cache (a verificação do HMAC deixa de ser refeita a cada busca)
+MAX_CONCESSOES_EM_CACHE = 4096
+
+# Níveis vistos sem concessão
+NIVEIS_PUBLICOS = ("publico",)
+
+
+def _b64(dados):
+    return base64.urlsafe_b64encode(dados).rstrip(b"=").decode("ascii")
+
+
+def _de_b64(texto):
+    return base64.urlsafe_b64decode(texto + "=" * (-len(texto) % 4))
+
+
+def _assinar(carga):
+    return hmac.new(_CHAVE_CONCESSAO, carga.encode("ascii"), hashlib.sha256).digest()
+
+
+def definir_codigo_acesso(nivel_acesso, codigo):
+    """
+    Grava o hash bcrypt (com salt) do código que libera um nível de acesso.
+
+    O código de "confidencial" libera também os documentos restritos.
+
+    Args:
+        nivel_acesso (str): "restrito" ou "confidencial".
+        codigo (str): Código em texto claro (só o hash é gravado).
+
+    Returns:
+        bool: True se o código foi gravado, False em caso de erro.
+    """
+    import bcrypt  # Só quem administra ou abre sessões precisa do bcrypt
+
+    if nivel_acesso not in NIVEIS_ACESSO[1:]:
+        raise ValueError(f"Nível sem código de acesso: {nivel_acesso!r}")
+    codigo_hash = bcrypt.hashpw(codigo.encode("utf-8"), bcrypt.gensalt(CUSTO_BCRYPT)).decode("ascii")
+    try:
+        with transacao(database_operations.DATABASE_PATH) as conn:
+            conn.execute(
+                "INSERT INTO codigos_acesso (nivel_acesso, codigo_hash, data_atualizacao) VALUES (?, ?, ?) "
+                "ON CONFLICT(nivel_acesso) DO UPDATE SET codigo_hash = excluded.codigo_hash, "
+                "data_atualizacao = excluded.data_atualizacao",
+                (nivel_acesso, codigo_hash, datetime.datetime.now().isoformat()),
+            )
+        return True
+
+    except sqlite3.Error as e:
+        print(f"Erro ao gravar o código de acesso do nível '{nivel_acesso}': {e}")
+        return False
+
+
+def emitir_concessao(niveis, validade_s=VALIDADE_CONCESSAO_S):
+    """
+    Emite uma concessão assinada (HMAC-SHA256) e com prazo de validade para os níveis informados.
+
+    Returns:
+        str: "<carga>.<assinatura>", ambas em base64 url-safe; a carga é o JSON {"niveis", "expira"}.
+    """
+    carga = _b64(json.dumps({"niveis": list(niveis), "expira": int(time.time() + validade_s)}).encode("utf-8"))
+    return f"{carga}.{_b64(_assinar(carga))}"
+
+
+def abrir_sessao(codigo, validade_s=VALIDADE_CONCESSAO_S):
+    """
+    Verifica o código de acesso (bcrypt) e emite uma concessão para a sessão.
+
+    O bcrypt é deliberadamente lento, por isso roda aqui, uma vez por sessão (no
+    máximo uma verificação por nível com código), e nunca por resultado de busca:
+    as buscas recebem a concessão, cuja checagem é um HMAC em cache.
+
+    Args:
+        codigo (str): Código informado pelo usuário.
+        validade_s (int, optional): Validade da concessão em segundos. Padrão: `RAG_VALIDADE_CONCESSAO` ou 3600.
+
+    Returns:
+        dict or None: {"concessao", "niveis", "expira"}, ou None se o código não confere com nenhum nível.
+    """
+    import bcrypt
+
+    try:
+        hashes = dict(obter_conexao(database_operations.DATABASE_PATH).execute(
+            "SELECT nivel_acesso, codigo_hash FROM codigos_acesso"
+        ).fetchall())
+    except sqlite3.Error as e:
+        print(f"Erro ao ler os códigos de acesso: {e}")
+        return None
+
+    # Do nível mais alto ao mais baixo: um código libera o próprio nível e os abaixo dele
+    for indice in range(len(NIVEIS_ACESSO) - 1, 0, -1):
+        codigo_hash = hashes.get(NIVEIS_ACESSO[indice])
+        if codigo_hash and bcrypt.checkpw(codigo.encode("utf-8"), codigo_hash.encode("ascii")):
+            niveis = NIVEIS_ACESSO[:indice + 1]
+            concessao = emitir_concessao(niveis, validade_s)
+            return {"concessao": concessao, "niveis": list(niveis), "expira": ler_concessao(concessao)[1]}
+    return None
+
+
+@functools.lru_cache(maxsize=MAX_CONCESSOES_EM_CACHE)
+def _decodificar_concessao(concessao):
+    """(níveis, expira) de uma concessão com assinatura válida, ou None. O prazo é checado por quem chama."""
+    carga, _, assinatura = concessao.partition(".")
+    try:
+        if not hmac.compare_digest(_de_b64(assinatura), _assinar(carga)):
+            return None
+        dados = json.loads(_de_b64(carga))
+        return tuple(nivel for nivel in NIVEIS_ACESSO if nivel in dados["niveis"]), float(dados["expira"])
+    except (ValueError, KeyError, TypeError, UnicodeEncodeError):
+        return None
+
+
+def ler_concessao(concessao):
+    """(níveis, expira) de uma concessão válida e dentro do prazo, ou None."""
+    if not concessao:
+        return None
+    decodificada = _decodificar_concessao(concessao)
+    if decodificada is None or decodificada[1] < time.time():
+        return None
+    return decodificada
+
+
+def concessao_valida(concessao):
+    """True se a concessão tem assinatura válida e não expirou."""
+    return ler_concessao(concessao) is not None
+
+
+def niveis_autorizados(concessao=None, nivel_acesso_filtro=None):
+    """
+    Níveis que uma busca pode ver: os da concessão (ou só o público, sem concessão válida), restritos ao filtro.
+
+    Args:
+        concessao (str, optional): Concessão emitida por `abrir_sessao`.
+        nivel_acesso_filtro (str or list, optional): Nível(is) pedidos na busca.
+
+    Returns:
+        tuple de str: Níveis autorizados, na ordem de `NIVEIS_ACESSO` (vazia se o filtro só pede níveis não concedidos).
+    """
+    decodificada = ler_concessao(concessao)
+    niveis = decodificada[0] if decodificada else NIVEIS_PUBLICOS
+    if nivel_acesso_filtro:
+        pedidos = nivel_acesso_filtro if isinstance(nivel_acesso_filtro, (list, tuple, set)) else [nivel_acesso_filtro]
+        niveis = tuple(nivel for nivel in niveis if nivel in pedidos)
+    return niveis
+
+
+def filtro_niveis_acesso(concessao=None, nivel_acesso_filtro=None):
+    """
+    Pré-filtro de nível de acesso de uma busca, decidido pelos bitmaps de níveis (sem consulta ao SQLite).
+
+    Returns:
+        tuple de str or None: None quando os níveis autorizados cobrem todos os documentos (a busca
+                              dispensa o filtro); senão, os níveis autorizados (tupla vazia: nada visível).
+    """
+    niveis = niveis_autorizados(concessao, nivel_acesso_filtro)
+    if niveis and bitmaps_niveis(database_operations.DATABASE_PATH).cobre_todos(niveis):
+        return None
+    return niveis
+
+
+def documentos_permitidos(nomes_arquivo, niveis):
+    """Para cada arquivo, True se o nível dele está entre `niveis` (checagem nos bitmaps, sem consulta ao SQLite)."""
+    return bitmaps_niveis(database_operations.DATABASE_PATH).permitidos(nomes_arquivo, niveis)
+
+
+def filtrar_autorizados(resultados, niveis):
+    """Mantém só os resultados (dicts com 'nome_arquivo') cujo documento está em um dos `niveis`."""
+    if niveis is None or not resultados:
+        return resultados
+    permitidos = documentos_permitidos([resultado["nome_arquivo"] for resultado in resultados], niveis)
+    return [resultado for resultado, permitido in zip(resultados, permitidos) if permitido]
+
+
+def definir_nivel_acesso(nomes_arquivo, nivel_acesso, index_name="documentos_index", sessao=None):
+    """
+    Altera o nível de acesso de documentos no SQLite, nos bitmaps e nos metadados dos vetores.
+
+    Args:
+        nomes_arquivo (list de str): Nomes dos arquivos.
+        nivel_acesso (str): "publico", "restrito" ou "confidencial".
+        index_name (str, optional): Nome da coleção. Padrão: "documentos_index".
+        sessao (SessaoChroma or SessaoNumpy, optional): Sessão vetorial a usar. Padrão: a sessão compartilhada.
+
+    Returns:
+        int or None: Número de documentos alterados no SQLite, ou None em caso de erro.
+    """
+    from src.utils.query_cache import invalidar_resultados
+    from src.utils.vector_store import obter_sessao_vetorial
+
+    nomes_arquivo = list(nomes_arquivo)
+    alterados = database_operations.atualizar_nivel_acesso(nomes_arquivo, nivel_acesso)
+    if alterados is None:
+        return None
+
+    # O ChromaDB não altera só metadados no upsert: os vetores são relidos e regravados com o novo nível
+    def regravar(collection):
+        registros = collection.get(where={"nome_arquivo": {"$in": nomes_arquivo}},
+                                   include=["embeddings", "documents", "metadatas"])
+        if registros["ids"]:
+            collection.upsert(
+                ids=registros["ids"],
+                embeddings=registros["embeddings"],
+                documents=registros["documents"],
+                metadatas=[{**(metadados or {}), "nivel_acesso": nivel_acesso} for metadados in registros["metadatas"]],
+            )
+
+    try:
+        (sessao or obter_sessao_vetorial()).executar(index_name, regravar)
+    except Exception as e:
+        print(f"Aviso: nível de acesso não atualizado nos vetores da coleção '{index_name}': {e}")
+    invalidar_resultados()
+    return alterados
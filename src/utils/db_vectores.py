@@ -1,83 +1,480 @@
-import chromadb
-from sentence_transformers import SentenceTransformer
+import datetime
+import itertools
 import os
-from dotenv import load_dotenv
-from src.database.database_operations import obter_metadados_por_nome_arquivo
+import numpy as np
+from src.config import carregar_ambiente
+from src.database.database_operations import obter_metadados_por_nomes_arquivo
+from src.utils.chunking import separar_id_chunk
+from src.utils.controle_acesso import documentos_permitidos, filtrar_autorizados, filtro_niveis_acesso
+from src.utils.embedding_cache import codificar_textos, normalizar_texto
+from src.utils.encoders import nome_modelo_cache
+from src.utils.instrumentacao import etapa
+from src.utils.query_cache import cache_embeddings_query, cache_resultados, chave_hashavel, invalidar_resultados, versao_indice
+from src.utils.vector_store import obter_sessao_vetorial
 
-load_dotenv()
+carregar_ambiente()
 
-DATABASE_DIR = os.environ.get("RAG_DATABASE_DIR", "data")
+# Fator inicial de over-fetch: cada documento pode ter vários chunks entre os vizinhos mais próximos
+FATOR_OVERFETCH_INICIAL = 3
+FATOR_OVERFETCH_MAXIMO = 64
 
-def criar_indice_chromadb(documentos, embeddings, index_name="documentos_index"):
-    """Cria um índice ChromaDB com os documentos e embeddings fornecidos."""
+# Vetores enviados por chamada de upsert: limita a memória temporária de cada gravação
+TAMANHO_LOTE_ESCRITA = int(os.environ.get("RAG_LOTE_ESCRITA", "512"))
 
-    # Garante que o diretório de dados exista
-    os.makedirs(DATABASE_DIR, exist_ok=True)
+# Campos do resultado de `collection.query` com uma lista por query
+CAMPOS_POR_QUERY = ("ids", "distances", "documents", "metadatas")
 
-    # Cria um cliente ChromaDB persistente (salva os dados em disco)
-    client = chromadb.PersistentClient(path=os.path.join(DATABASE_DIR, "chroma_db"))
 
-    # Cria uma coleção (se já existir, ele a reutiliza, para foi adicionado o get_or_create_collection)
-    collection = client.get_or_create_collection(name=index_name)
+def _como_matriz(embeddings):
+    """Converte embeddings (tensor, array NumPy ou listas) em uma matriz float32, sem passar por listas Python."""
+    if hasattr(embeddings, "detach"):  # Tensor do torch
+        embeddings = embeddings.detach().cpu().numpy()
+    return np.asarray(embeddings, dtype=np.float32)
 
-    # Prepara os dados para inserção no ChromaDB
-    ids = list(documentos.keys())  # Usa os nomes dos arquivos como IDs
-    textos = list(documentos.values())  # Conteúdo dos documentos
 
-    # Adiciona os documentos e embeddings à coleção
-    collection.add(
-        embeddings=embeddings.tolist(),  # Converte embeddings para lista (se forem tensores)
-        documents=textos,
-        ids=ids,
-    )
+def _normalizar_tipo_documento(tipo_documento):
+    """Normaliza o tipo de documento para comparação ("PDF", ".pdf" -> "pdf")."""
+    return tipo_documento.lower().lstrip('.') if tipo_documento else None
+
+
+def _timestamp_iso(data):
+    """Converte uma data ISO (com ou sem 'Z') ou um datetime em timestamp POSIX. Retorna None se inválida."""
+    if data is None:
+        return None
+    if isinstance(data, datetime.datetime):
+        return data.timestamp()
+    try:
+        return datetime.datetime.fromisoformat(str(data).rstrip("Z")).timestamp()
+    except ValueError:
+        return None
+
+
+def _metadados_chroma(nome_arquivo, metadados):
+    """
+    Monta os metadados gravados junto de cada vetor no ChromaDB.
+
+    O ChromaDB só aceita valores str/int/float/bool, por isso campos nulos são
+    omitidos e a data de modificação também é gravada como timestamp numérico
+    (`data_modificacao_ts`), o que permite filtros por intervalo com $gte/$lte.
+
+    Args:
+        nome_arquivo (str): Nome do arquivo (usado para deduzir o tipo se não houver metadados).
+        metadados (dict or None): Registro da tabela 'metadados' do SQLite.
+
+    Returns:
+        dict: Metadados prontos para `collection.add`.
+    """
+    metadados = metadados or {}
+    tipo_documento = metadados.get("tipo_documento") or os.path.splitext(nome_arquivo)[1]
+    resultado = {
+        "nome_arquivo": nome_arquivo,
+        "tipo_documento": _normalizar_tipo_documento(tipo_documento) or "desconhecido",
+        "nivel_acesso": metadados.get("nivel_acesso") or "publico",
+    }
+    if metadados.get("linguagem"):
+        resultado["linguagem"] = metadados["linguagem"]
+    if metadados.get("data_modificacao"):
+        resultado["data_modificacao"] = metadados["data_modificacao"]
+        timestamp = _timestamp_iso(metadados["data_modificacao"])
+        if timestamp is not None:
+            resultado["data_modificacao_ts"] = timestamp
+    return resultado
+
+
+def _condicao_igualdade(campo, valor):
+    """Condição `where` para um valor único ou uma lista de valores aceitos."""
+    if isinstance(valor, (list, tuple, set)):
+        return {campo: {"$in": list(valor)}}
+    return {campo: valor}
+
+
+def _construir_filtro_where(tipo_documento_filtro=None, nivel_acesso_filtro=None, linguagem_filtro=None,
+                            data_modificacao_de=None, data_modificacao_ate=None):
+    """
+    Traduz os filtros de busca para a cláusula `where` do ChromaDB.
+
+    Returns:
+        dict or None: Filtro `where` ou None se nenhum filtro foi informado.
+    """
+    condicoes = []
+    if tipo_documento_filtro:
+        if isinstance(tipo_documento_filtro, (list, tuple, set)):
+            tipo_documento_filtro = [_normalizar_tipo_documento(t) for t in tipo_documento_filtro]
+        else:
+            tipo_documento_filtro = _normalizar_tipo_documento(tipo_documento_filtro)
+        condicoes.append(_condicao_igualdade("tipo_documento", tipo_documento_filtro))
+    if nivel_acesso_filtro:
+        condicoes.append(_condicao_igualdade("nivel_acesso", nivel_acesso_filtro))
+    if linguagem_filtro:
+        condicoes.append(_condicao_igualdade("linguagem", linguagem_filtro))
+    if data_modificacao_de is not None:
+        condicoes.append({"data_modificacao_ts": {"$gte": _timestamp_iso(data_modificacao_de)}})
+    if data_modificacao_ate is not None:
+        condicoes.append({"data_modificacao_ts": {"$lte": _timestamp_iso(data_modificacao_ate)}})
+
+    if not condicoes:
+        return None
+    if len(condicoes) == 1:
+        return condicoes[0]
+    return {"$and": condicoes}
+
+def criar_indice_chromadb(documentos, embeddings, index_name="documentos_index", sessao=None):
+    """Cria um índice ChromaDB com os documentos e embeddings fornecidos.
+
+    Os metadados de filtragem (tipo_documento, nivel_acesso, linguagem e
+    data_modificacao) são lidos do SQLite e gravados junto de cada vetor,
+    para que as buscas possam aplicá-los como pré-filtros.
+
+    Args:
+        documentos (dict): Dicionário de documentos (nome_arquivo: conteúdo).
+        embeddings: Embeddings dos documentos, na mesma ordem de `documentos`.
+        index_name (str, optional): Nome da coleção. Padrão: "documentos_index".
+        sessao (SessaoChroma or SessaoNumpy, optional): Sessão vetorial a usar. Padrão: a sessão compartilhada
+            do armazenamento `RAG_VECTOR_STORE` (ver `src.utils.vector_store`).
+    """
+
+    atualizar_indice_chromadb(list(documentos.keys()), list(documentos.values()), embeddings, index_name, sessao)
     print(f"Índice ChromaDB '{index_name}' criado/atualizado com sucesso.")
 
-def buscar_documentos_chromadb(query, model_name, index_name="documentos_index", n_results=30, tipo_documento_filtro=None): # Adicionado tipo_documento_filtro
-    """Busca documentos no índice ChromaDB com base em uma query, com filtro opcional por tipo de documento."""
+def atualizar_indice_chromadb(ids, textos, embeddings, index_name="documentos_index", sessao=None):
+    """Insere ou substitui (upsert) vetores no índice ChromaDB, com os metadados de filtragem do SQLite.
+
+    Args:
+        ids (list de str): IDs dos documentos (nomes dos arquivos).
+        textos (list de str): Conteúdo dos documentos, na mesma ordem de `ids`.
+        embeddings: Embeddings dos documentos (tensor, array NumPy ou lista), na mesma ordem de `ids`.
+        index_name (str, optional): Nome da coleção. Padrão: "documentos_index".
+        sessao (SessaoChroma or SessaoNumpy, optional): Sessão vetorial a usar. Padrão: a sessão compartilhada
+            do armazenamento `RAG_VECTOR_STORE` (ver `src.utils.vector_store`).
+    """
+    if not ids:
+        return
+
+    # Usa a sessão compartilhada (um único cliente persistente por diretório)
+    sessao = sessao or obter_sessao_vetorial()
+
+    # Obtém a coleção (se já existir, ela é reutilizada)
+    collection = sessao.obter_colecao(index_name, criar=True)
+
+    metadados_por_nome = obter_metadados_por_nomes_arquivo(ids)
+    metadatas = [_metadados_chroma(nome, metadados_por_nome.get(nome)) for nome in ids]
+
+    # Upsert: IDs já existentes são substituídos em vez de causar erro. Em lotes de tamanho fixo; os
+    # embeddings seguem como matriz float32 (o ChromaDB e o armazenamento NumPy a aceitam diretamente).
+    embeddings = _como_matriz(embeddings)
+    for inicio in range(0, len(ids), TAMANHO_LOTE_ESCRITA):
+        fim = inicio + TAMANHO_LOTE_ESCRITA
+        collection.upsert(
+            embeddings=embeddings[inicio:fim],
+            documents=textos[inicio:fim],
+            metadatas=metadatas[inicio:fim],
+            ids=ids[inicio:fim],
+        )
+    invalidar_resultados()
+
+def atualizar_chunks_chromadb(chunks, embeddings, index_name="documentos_index", sessao=None):
+    """Insere ou substitui (upsert) chunks no índice ChromaDB.
+
+    Cada chunk é gravado com o ID 'arquivo#chunk_n' e, além dos metadados de
+    filtragem do documento, com o nome do arquivo, o índice do chunk, os offsets
+    de caractere e a página de origem (quando houver).
+
+    Args:
+        chunks (list de dict): Chunks produzidos por `src.utils.chunking`.
+        embeddings: Embeddings dos chunks, na mesma ordem.
+        index_name (str, optional): Nome da coleção. Padrão: "documentos_index".
+        sessao (SessaoChroma or SessaoNumpy, optional): Sessão vetorial a usar. Padrão: a sessão compartilhada
+            do armazenamento `RAG_VECTOR_STORE` (ver `src.utils.vector_store`).
+    """
+    if not chunks:
+        return
+
+    sessao = sessao or obter_sessao_vetorial()
+    collection = sessao.obter_colecao(index_name, criar=True)
+
+    metadados_por_nome = obter_metadados_por_nomes_arquivo([chunk["nome_arquivo"] for chunk in chunks])
+    metadatas = []
+    for chunk in chunks:
+        metadados = _metadados_chroma(chunk["nome_arquivo"], metadados_por_nome.get(chunk["nome_arquivo"]))
+        metadados["chunk_indice"] = chunk["indice"]
+        metadados["inicio"] = chunk["inicio"]
+        metadados["fim"] = chunk["fim"]
+        if chunk.get("pagina") is not None:
+            metadados["pagina"] = chunk["pagina"]
+        metadatas.append(metadados)
+
+    # Em lotes de tamanho fixo, como em `criar_indice_chromadb`
+    embeddings = _como_matriz(embeddings)
+    for inicio in range(0, len(chunks), TAMANHO_LOTE_ESCRITA):
+        fim = inicio + TAMANHO_LOTE_ESCRITA
+        collection.upsert(
+            embeddings=embeddings[inicio:fim],
+            documents=[chunk["texto"] for chunk in chunks[inicio:fim]],
+            metadatas=metadatas[inicio:fim],
+            ids=[chunk["id"] for chunk in chunks[inicio:fim]],
+        )
+    invalidar_resultados()
+
+def remover_do_indice_chromadb(nomes_arquivo, index_name="documentos_index", sessao=None):
+    """Remove do índice ChromaDB todos os vetores (documento inteiro e chunks) dos arquivos informados.
+
+    Args:
+        nomes_arquivo (list de str): Nomes dos arquivos a remover.
+        index_name (str, optional): Nome da coleção. Padrão: "documentos_index".
+        sessao (SessaoChroma or SessaoNumpy, optional): Sessão vetorial a usar. Padrão: a sessão compartilhada
+            do armazenamento `RAG_VECTOR_STORE` (ver `src.utils.vector_store`).
+    """
+    nomes_arquivo = list(nomes_arquivo)
+    if not nomes_arquivo:
+        return
+
+    def remover(collection):
+        collection.delete(ids=nomes_arquivo)  # Vetores de documento inteiro (ID = nome do arquivo)
+        collection.delete(where={"nome_arquivo": {"$in": nomes_arquivo}})  # Chunks
+
+    sessao = sessao or obter_sessao_vetorial()
+    sessao.executar(index_name, remover, criar=True)
+    invalidar_resultados()
+
+def buscar_documentos_chromadb(query, model_name, index_name="documentos_index", n_results=30, tipo_documento_filtro=None,
+                               sessao=None, nivel_acesso_filtro=None, linguagem_filtro=None,
+                               data_modificacao_de=None, data_modificacao_ate=None, filtro_extra=None, backend=None,
+                               concessao=None):
+    """Busca documentos no índice ChromaDB com base em uma query, com filtros opcionais de metadados.
 
-    # Carrega o modelo de embedding
-    model = SentenceTransformer(model_name)
-    query_embedding = model.encode(query, convert_to_tensor=True).tolist()
+    Os filtros de tipo, nível de acesso, linguagem e data são aplicados pelo
+    próprio ChromaDB (cláusula `where`), antes da seleção dos vizinhos, de forma
+    que a busca sempre retorna até `n_results` documentos que satisfazem o filtro
+    em uma única consulta. Filtros que o ChromaDB não expressa podem ser passados
+    em `filtro_extra`. Como o índice guarda chunks, os hits são agrupados por
+    arquivo (mantendo o chunk mais próximo de cada um) e a busca faz over-fetch
+    adaptativo até completar `n_results` arquivos ou esgotar a coleção.
 
-    # Cria um cliente ChromaDB persistente
-    client = chromadb.PersistentClient(path=os.path.join(DATABASE_DIR, "chroma_db"))
+    Só aparecem documentos dos níveis de acesso liberados pela `concessao` (sem
+    ela, só os públicos). Os bitmaps de níveis decidem o pré-filtro: se os níveis
+    liberados cobrem o corpus inteiro, a consulta dispensa o filtro; se nenhum
+    documento é visível, nem consulta o índice. Cada hit ainda é conferido nos
+    bitmaps, o que custa microssegundos e não uma ida ao SQLite por resultado.
 
-    # Obtém a coleção
-    collection = client.get_collection(name=index_name)
-    if collection is None:
-        print(f"Erro: Coleção ChromaDB '{index_name}' não encontrada.")
+    Embeddings de queries e resultados ficam em cache em memória (LRU + TTL);
+    o cache de resultados é invalidado sempre que a coleção é alterada.
+
+    Args:
+        query (str): Texto da busca.
+        model_name (str): Modelo de embedding usado na indexação.
+        index_name (str, optional): Nome da coleção. Padrão: "documentos_index".
+        n_results (int, optional): Número de resultados retornados. Padrão: 30.
+        tipo_documento_filtro (str or list, optional): Tipo(s) de documento (pdf, txt, md).
+        sessao (SessaoChroma or SessaoNumpy, optional): Sessão vetorial a usar. Padrão: a sessão compartilhada
+            do armazenamento `RAG_VECTOR_STORE` (ver `src.utils.vector_store`).
+        nivel_acesso_filtro (str or list, optional): Nível(is) de acesso aceitos, dentro dos liberados pela concessão.
+        linguagem_filtro (str or list, optional): Linguagem(ns) aceitas.
+        data_modificacao_de (str or datetime, optional): Data de modificação mínima.
+        data_modificacao_ate (str or datetime, optional): Data de modificação máxima.
+        filtro_extra (callable, optional): Predicado que recebe o dicionário de metadados do SQLite
+            (ou None) e retorna True para manter o documento.
+        backend (str, optional): Backend de inferência do encoder ("torch", "torch-int8" ou "onnx-int8").
+        concessao (str, optional): Concessão emitida por `controle_acesso.abrir_sessao`.
+
+    Returns:
+        list de dict: Resultados formatados (nome_arquivo, score, trecho, tipo_documento, chunk_id,
+                      inicio, fim, pagina), um por arquivo, ordenados pelo score do melhor chunk.
+    """
+    niveis = filtro_niveis_acesso(concessao, nivel_acesso_filtro)
+    if niveis == ():
         return []
 
-    # Realiza a busca por similaridade
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=n_results,
-        include=["documents", "distances"] # Pega documentos e distâncias
-    )
+    # Reutiliza o cliente e o handle da coleção mantidos pela sessão
+    sessao = sessao or obter_sessao_vetorial()
 
-    resultados_formatados = []
-    if results and results['ids'][0]:
-        for i, doc_id in enumerate(results['ids'][0]):
-            nome_arquivo = doc_id # doc_id é o nome do arquivo
-            metadados = obter_metadados_por_nome_arquivo(nome_arquivo) # Busca metadados no SQLite
-
-            if metadados:
-                tipo_doc_resultado = metadados.get("tipo_documento") # Obtém o tipo de documento dos metadados
-            else:
-                tipo_doc_resultado = None
-
-            # Aplica o filtro por tipo de documento (se especificado)
-            print(f"Debug: tipo_documento_filtro = '{tipo_documento_filtro}', tipo_doc_resultado = '{tipo_doc_resultado}'")
-            if tipo_documento_filtro is None or tipo_doc_resultado.lower().lstrip('.') == tipo_documento_filtro.lower(): # Filtro
-                resultados_formatados.append(
-                    {
-                        "nome_arquivo": nome_arquivo,
-                        "score": results['distances'][0][i],
-                        "trecho": results['documents'][0][i],
-                        "tipo_documento": tipo_doc_resultado, # Adiciona tipo de documento aos resultados
-                    }
+    where = _construir_filtro_where(tipo_documento_filtro, niveis, linguagem_filtro,
+                                    data_modificacao_de, data_modificacao_ate)
+
+    # Nível 2 do cache: resultados já formatados (não se aplica a predicados arbitrários em filtro_extra)
+    chave_query = (nome_modelo_cache(model_name, backend), normalizar_texto(query))
+    chave_resultados = None
+    if filtro_extra is None:
+        chave_resultados = (chave_query, sessao.persist_path, index_name, chave_hashavel(where), n_results, versao_indice())
+        encontrado, resultados = cache_resultados.obter(chave_resultados)
+        if encontrado:
+            # O nível de um documento pode ter mudado em outro processo depois da gravação no cache
+            return filtrar_autorizados([dict(resultado) for resultado in resultados], niveis)
+
+    # Nível 1 do cache: embedding da query (em memória e, abaixo dele, o cache persistente de embeddings)
+    encontrado, query_embedding = cache_embeddings_query.obter(chave_query)
+    if not encontrado:
+        query_embedding = codificar_textos(model_name, [query], backend=backend)[0].tolist()
+        cache_embeddings_query.gravar(chave_query, query_embedding)
+
+    resultados_formatados = _consultar_indice(query_embedding, index_name, n_results, where, filtro_extra, sessao, niveis)
+    if resultados_formatados is None:
+        return []
+
+    if chave_resultados is not None:
+        cache_resultados.gravar(chave_resultados, [dict(resultado) for resultado in resultados_formatados])
+    return resultados_formatados
+
+
+def buscar_documentos_chromadb_em_lote(queries, model_name, index_name="documentos_index", n_results=30,
+                                       tipo_documento_filtro=None, sessao=None, nivel_acesso_filtro=None,
+                                       linguagem_filtro=None, data_modificacao_de=None, data_modificacao_ate=None,
+                                       backend=None, concessao=None):
+    """Busca várias queries de uma vez, com os mesmos filtros, em uma única chamada ao encoder e ao ChromaDB.
+
+    Equivale a chamar `buscar_documentos_chromadb` para cada query, mas as queries
+    fora do cache são codificadas em um só `model.encode` e enviadas ao ChromaDB em
+    uma só consulta. Queries cujo over-fetch inicial não basta para completar
+    `n_results` arquivos são refeitas individualmente com over-fetch adaptativo.
+
+    Args:
+        queries (list de str): Textos das buscas.
+        Demais argumentos: ver `buscar_documentos_chromadb` (exceto `filtro_extra`).
+
+    Returns:
+        list de list de dict: Os resultados formatados de cada query, na ordem de `queries`.
+    """
+    niveis = filtro_niveis_acesso(concessao, nivel_acesso_filtro)
+    if niveis == ():
+        return [[] for _ in queries]
+
+    sessao = sessao or obter_sessao_vetorial()
+    where = _construir_filtro_where(tipo_documento_filtro, niveis, linguagem_filtro,
+                                    data_modificacao_de, data_modificacao_ate)
+    modelo_cache = nome_modelo_cache(model_name, backend)
+    versao = versao_indice()
+
+    resultados = [None] * len(queries)
+    chaves_query = [(modelo_cache, normalizar_texto(query)) for query in queries]
+    chaves_resultados = [(chave, sessao.persist_path, index_name, chave_hashavel(where), n_results, versao) for chave in chaves_query]
+    pendentes = []
+    for i, chave_resultados in enumerate(chaves_resultados):
+        encontrado, em_cache = cache_resultados.obter(chave_resultados)
+        if encontrado:
+            resultados[i] = filtrar_autorizados([dict(resultado) for resultado in em_cache], niveis)
+        else:
+            pendentes.append(i)
+    if not pendentes:
+        return resultados
+
+    # Embeddings: cache em memória e, para o restante, uma única chamada ao encoder
+    embeddings = {}
+    sem_embedding = []
+    for i in pendentes:
+        encontrado, embedding = cache_embeddings_query.obter(chaves_query[i])
+        if encontrado:
+            embeddings[i] = embedding
+        else:
+            sem_embedding.append(i)
+    if sem_embedding:
+        calculados = codificar_textos(model_name, [queries[i] for i in sem_embedding], backend=backend)
+        for i, embedding in zip(sem_embedding, calculados):
+            embeddings[i] = embedding.tolist()
+            cache_embeddings_query.gravar(chaves_query[i], embeddings[i])
+
+    n_busca = n_results * FATOR_OVERFETCH_INICIAL
+    try:
+        with etapa("consulta_vetorial"):
+            results = sessao.executar(
+                index_name,
+                lambda collection: collection.query(
+                    query_embeddings=[embeddings[i] for i in pendentes],
+                    n_results=n_busca,
+                    where=where,
+                    include=["documents", "distances", "metadatas"],
+                ),
+            )
+    except Exception as e:
+        print(f"Erro: Coleção ChromaDB '{index_name}' não encontrada ou indisponível: {e}")
+        for i in pendentes:
+            resultados[i] = []
+        return resultados
+
+    for posicao, i in enumerate(pendentes):
+        # Só os campos por query: o resultado do ChromaDB traz também listas globais (ex.: 'included')
+        results_query = {campo: [results[campo][posicao]] for campo in CAMPOS_POR_QUERY if results.get(campo)}
+        formatados = _formatar_resultados(results_query, None, n_results, niveis)
+        if len(formatados) < n_results and len(results_query["ids"][0]) >= n_busca:
+            # Muitos chunks do mesmo arquivo: completa com over-fetch adaptativo
+            formatados = _consultar_indice(embeddings[i], index_name, n_results, where, None, sessao, niveis) or []
+        resultados[i] = formatados
+        cache_resultados.gravar(chaves_resultados[i], [dict(resultado) for resultado in formatados])
+    return resultados
+
+
+def _consultar_indice(query_embedding, index_name, n_results, where, filtro_extra, sessao, niveis=None):
+    """Executa a busca no ChromaDB com over-fetch adaptativo. Retorna None se a coleção estiver indisponível."""
+    fator = FATOR_OVERFETCH_INICIAL
+
+    while True:
+        n_busca = n_results * fator
+
+        # Realiza a busca por similaridade, com os filtros aplicados pelo ChromaDB
+        try:
+            with etapa("consulta_vetorial"):
+                results = sessao.executar(
+                    index_name,
+                    lambda collection: collection.query(
+                        query_embeddings=[query_embedding],
+                        n_results=n_busca,
+                        where=where,
+                        include=["documents", "distances", "metadatas"] # Pega documentos, distâncias e metadados
+                    ),
                 )
-            else:
-                print(f"Documento '{nome_arquivo}' filtrado por tipo: {tipo_doc_resultado}. Filtro: {tipo_documento_filtro}") # Mensagem de filtro
+        except Exception as e:
+            print(f"Erro: Coleção ChromaDB '{index_name}' não encontrada ou indisponível: {e}")
+            return None
+
+        resultados_formatados = _formatar_resultados(results, filtro_extra, n_results, niveis)
+
+        # Para quando há resultados suficientes, quando a coleção se esgotou ou no over-fetch máximo
+        esgotou = len(results['ids'][0]) < n_busca if results and results['ids'] else True
+        if len(resultados_formatados) >= n_results or esgotou or fator >= FATOR_OVERFETCH_MAXIMO:
+            return resultados_formatados
+        fator *= 4
+
+
+def _formatar_resultados(results, filtro_extra, n_results, niveis=None):
+    """Agrupa os chunks por arquivo, confere os níveis de acesso, junta os metadados do SQLite e aplica o filtro extra."""
+    resultados_formatados = []
+    if not results or not results['ids'][0]:
+        return resultados_formatados
+
+    with etapa("juncao_metadados"):
+        # Os hits vêm ordenados por distância: o primeiro chunk de cada arquivo é o melhor
+        melhores_hits = {}
+        for i, chunk_id in enumerate(results['ids'][0]):
+            metadados_chroma = results['metadatas'][0][i] or {}
+            nome_arquivo = metadados_chroma.get("nome_arquivo") or separar_id_chunk(chunk_id)[0]
+            if nome_arquivo not in melhores_hits:
+                melhores_hits[nome_arquivo] = (i, chunk_id, metadados_chroma)
+
+        if niveis is not None:
+            # Conferência nos bitmaps: o nível gravado junto dos vetores pode estar desatualizado
+            permitidos = documentos_permitidos(list(melhores_hits), niveis)
+            melhores_hits = {nome: hit for (nome, hit), permitido in zip(melhores_hits.items(), permitidos) if permitido}
+
+        # Busca os metadados de todos os arquivos no SQLite de uma só vez
+        metadados_por_nome = obter_metadados_por_nomes_arquivo(list(melhores_hits))
+
+    hits = melhores_hits.items()
+    if filtro_extra is not None:
+        with etapa("filtro"):
+            hits = [(nome_arquivo, hit) for nome_arquivo, hit in hits if filtro_extra(metadados_por_nome.get(nome_arquivo))]
+
+    with etapa("formatacao"):
+        for nome_arquivo, (i, chunk_id, metadados_chroma) in itertools.islice(hits, n_results):
+            metadados = metadados_por_nome.get(nome_arquivo)
+            resultados_formatados.append(
+                {
+                    "nome_arquivo": nome_arquivo,
+                    "score": results['distances'][0][i],
+                    "trecho": results['documents'][0][i],
+                    "tipo_documento": metadados_chroma.get("tipo_documento") or (metadados or {}).get("tipo_documento"),
+                    "chunk_id": chunk_id,
+                    "inicio": metadados_chroma.get("inicio"),
+                    "fim": metadados_chroma.get("fim"),
+                    "pagina": metadados_chroma.get("pagina"),
+                }
+            )
 
     return resultados_formatados
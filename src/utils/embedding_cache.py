@@ -0,0 +1,383 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import numpy as np
+from src.config import DATABASE_DIR, carregar_ambiente
+from src.utils.instrumentacao import etapa, incrementar
+from src.utils.trava_arquivo import trava_arquivo
+
+carregar_ambiente()
+
+CACHE_DIR = os.environ.get("RAG_CACHE_EMBEDDINGS_DIR", os.path.join(DATABASE_DIR, "cache_embeddings"))
+CACHE_MAX_MB = int(os.environ.get("RAG_CACHE_EMBEDDINGS_MAX_MB", "2048"))
+CACHE_DTYPE = os.environ.get("RAG_CACHE_EMBEDDINGS_DTYPE", "float32")  # float32 ou float16
+
+# Após uma compactação, o cache fica com esta fração do limite (evita compactar a cada inserção)
+FRACAO_APOS_DESPEJO = 0.75
+
+# Os acessos lidos ficam em memória e o `ultimo_acesso` é gravado no SQLite em lote, no máximo a cada
+# estes segundos (ou a cada gravação/compactação): uma leitura do cache não vira uma escrita no banco
+INTERVALO_ACESSOS_S = float(os.environ.get("RAG_CACHE_EMBEDDINGS_ACESSOS_S", "60"))
+
+_REGEX_ESPACOS = re.compile(r"\s+")
+
+
+def normalizar_texto(texto):
+    """Normaliza o texto para a chave do cache (Unicode NFC, espaços colapsados, sem bordas)."""
+    return _REGEX_ESPACOS.sub(" ", unicodedata.normalize("NFC", texto)).strip()
+
+
+def chave_embedding(model_name, texto):
+    """Chave do cache: SHA-1 (20 bytes) do nome do modelo mais o texto normalizado."""
+    return hashlib.sha1(f"{model_name}\0{normalizar_texto(texto)}".encode("utf-8")).digest()
+
+
+def _nome_arquivo_modelo(model_name):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name) + ".vec"
+
+
+class CacheEmbeddings:
+    """
+    Cache persistente de embeddings, indexado por (modelo, hash do texto normalizado).
+
+    Os vetores de cada modelo ficam em um arquivo binário append-only, lido via
+    `np.memmap`; um banco SQLite pequeno guarda, para cada chave, a linha do
+    vetor no arquivo e o instante do último acesso. Quando o tamanho total passa
+    do limite, o cache é compactado mantendo as entradas usadas mais recentemente.
+
+    O cache é seguro entre threads e entre processos (ex.: a indexação e o serviço
+    de busca gravando ao mesmo tempo): gravações e compactações rodam sob uma
+    trava de arquivo, e a gravação corta o arquivo de vetores em `linhas` antes de
+    acrescentar, descartando bytes deixados por uma gravação interrompida entre o
+    acréscimo e o commit. Os acessos são gravados em lote (`INTERVALO_ACESSOS_S`).
+    """
+
+    def __init__(self, diretorio=CACHE_DIR, max_bytes=CACHE_MAX_MB * 1024 * 1024, dtype=CACHE_DTYPE,
+                 intervalo_acessos=INTERVALO_ACESSOS_S):
+        self.diretorio = diretorio
+        self.max_bytes = max_bytes
+        self.dtype = np.dtype(dtype)
+        self.intervalo_acessos = intervalo_acessos
+        self._lock = threading.Lock()
+        self._trava = os.path.join(diretorio, ".trava")
+        self._memmaps = {}
+        self._acessos_pendentes = {}  # chave -> instante do último acesso ainda não gravado
+        self._acessos_gravados_em = time.monotonic()
+        self._estatisticas = {"acertos": 0, "falhas": 0, "despejos": 0}
+
+        os.makedirs(diretorio, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(diretorio, "indice.db"), check_same_thread=False)
+        self._conn.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS modelos (
+                modelo TEXT PRIMARY KEY,
+                arquivo TEXT NOT NULL,
+                dimensao INTEGER NOT NULL,
+                dtype TEXT NOT NULL,
+                linhas INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS entradas (
+                chave BLOB PRIMARY KEY,
+                modelo TEXT NOT NULL,
+                linha INTEGER NOT NULL,
+                ultimo_acesso REAL NOT NULL
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_entradas_acesso ON entradas (ultimo_acesso);
+            """
+        )
+
+    # --- Leitura -----------------------------------------------------------------
+
+    def _info_modelo(self, model_name):
+        return self._conn.execute(
+            "SELECT arquivo, dimensao, dtype, linhas FROM modelos WHERE modelo = ?", (model_name,)
+        ).fetchone()
+
+    def _memmap(self, model_name, info):
+        """
+        Memmap (somente leitura) das `linhas` registradas do modelo.
+
+        É reaberto quando o número de linhas muda ou quando o arquivo foi trocado por
+        uma compactação (inclusive de outro processo), detectada pelo inode.
+        """
+        arquivo, dimensao, dtype, linhas = info
+        caminho = os.path.join(self.diretorio, arquivo)
+        inode = os.stat(caminho).st_ino
+        memmap, inode_memmap = self._memmaps.get(model_name, (None, None))
+        if memmap is None or memmap.shape[0] != linhas or inode_memmap != inode:
+            memmap = np.memmap(caminho, dtype=dtype, mode="r", shape=(linhas, dimensao))
+            self._memmaps[model_name] = (memmap, inode)
+        return memmap
+
+    def _registrar_acessos(self, chaves):
+        """Guarda os acessos em memória e os grava no banco se o intervalo passou (chamar com o lock)."""
+        agora = time.time()
+        self._acessos_pendentes.update((chave, agora) for chave in chaves)
+        if time.monotonic() - self._acessos_gravados_em >= self.intervalo_acessos:
+            self._gravar_acessos()
+
+    def _gravar_acessos(self):
+        """Grava em lote o `ultimo_acesso` das entradas lidas desde a última gravação (chamar com o lock)."""
+        self._acessos_gravados_em = time.monotonic()
+        if not self._acessos_pendentes:
+            return
+        pendentes, self._acessos_pendentes = self._acessos_pendentes, {}
+        try:
+            self._conn.executemany(
+                "UPDATE entradas SET ultimo_acesso = MAX(ultimo_acesso, ?) WHERE chave = ?",
+                ((instante, chave) for chave, instante in pendentes.items()),
+            )
+            self._conn.commit()
+        except sqlite3.OperationalError as e:  # Ex.: banco travado por outro processo; os acessos só ordenam o despejo
+            self._conn.rollback()
+            print(f"Aviso: acessos do cache de embeddings não gravados: {e}")
+
+    def obter(self, model_name, textos):
+        """
+        Busca no cache os embeddings de uma lista de textos.
+
+        Args:
+            model_name (str): Nome do modelo que gerou os embeddings.
+            textos (list de str): Textos a buscar.
+
+        Returns:
+            tuple: (vetores, faltantes). `vetores` é uma lista com um array float32 por texto
+                   encontrado (None para os ausentes); `faltantes` lista os índices dos ausentes.
+        """
+        chaves = [chave_embedding(model_name, texto) for texto in textos]
+        vetores = [None] * len(textos)
+
+        with self._lock:
+            info = self._info_modelo(model_name)
+            if info is not None and info[3] > 0:
+                linhas = {}
+                for inicio in range(0, len(chaves), 900):
+                    bloco = chaves[inicio:inicio + 900]
+                    linhas.update(self._conn.execute(
+                        f"SELECT chave, linha FROM entradas WHERE chave IN ({', '.join('?' * len(bloco))})", bloco
+                    ).fetchall())
+                if linhas:
+                    try:
+                        memmap = self._memmap(model_name, info)
+                    except (OSError, ValueError):  # Arquivo sendo trocado por uma compactação de outro processo
+                        memmap = ()
+                    for i, chave in enumerate(chaves):
+                        linha = linhas.get(chave)
+                        if linha is not None and linha < len(memmap):
+                            vetores[i] = np.asarray(memmap[linha], dtype=np.float32)
+                    self._registrar_acessos(linhas)
+
+            faltantes = [i for i, vetor in enumerate(vetores) if vetor is None]
+            self._estatisticas["acertos"] += len(textos) - len(faltantes)
+            self._estatisticas["falhas"] += len(faltantes)
+        return vetores, faltantes
+
+    # --- Escrita -----------------------------------------------------------------
+
+    def gravar(self, model_name, textos, embeddings):
+        """
+        Acrescenta embeddings ao cache (textos já presentes são ignorados).
+
+        Args:
+            model_name (str): Nome do modelo que gerou os embeddings.
+            textos (list de str): Textos correspondentes.
+            embeddings (array-like): Matriz (len(textos), dimensão).
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if len(textos) == 0:
+            return
+
+        with self._lock, trava_arquivo(self._trava):
+            self._gravar_acessos()
+            info = self._info_modelo(model_name)
+            if info is None:
+                arquivo = _nome_arquivo_modelo(model_name)
+                self._conn.execute(
+                    "INSERT INTO modelos (modelo, arquivo, dimensao, dtype, linhas) VALUES (?, ?, ?, ?, 0)",
+                    (model_name, arquivo, embeddings.shape[1], self.dtype.name),
+                )
+                info = (arquivo, embeddings.shape[1], self.dtype.name, 0)
+            arquivo, dimensao, dtype, linhas = info
+
+            # Descarta duplicatas (no próprio lote e já existentes no cache)
+            novos = {}
+            for texto, vetor in zip(textos, embeddings):
+                novos.setdefault(chave_embedding(model_name, texto), vetor)
+            existentes = set()
+            chaves = list(novos)
+            for inicio in range(0, len(chaves), 900):
+                bloco = chaves[inicio:inicio + 900]
+                existentes.update(chave for (chave,) in self._conn.execute(
+                    f"SELECT chave FROM entradas WHERE chave IN ({', '.join('?' * len(bloco))})", bloco
+                ))
+            chaves = [chave for chave in chaves if chave not in existentes]
+            if not chaves:
+                self._conn.commit()
+                return
+
+            # A linha de cada vetor vem de `linhas`: o arquivo é cortado nesse tamanho antes do acréscimo,
+            # descartando bytes de uma gravação que não chegou ao commit (queda entre o acréscimo e o commit)
+            matriz = np.stack([novos[chave] for chave in chaves]).astype(dtype)
+            with open(os.path.join(self.diretorio, arquivo), "ab") as f:
+                f.truncate(linhas * dimensao * np.dtype(dtype).itemsize)
+                f.write(matriz.tobytes())
+
+            agora = time.time()
+            self._conn.executemany(
+                "INSERT INTO entradas (chave, modelo, linha, ultimo_acesso) VALUES (?, ?, ?, ?)",
+                ((chave, model_name, linhas + i, agora) for i, chave in enumerate(chaves)),
+            )
+            self._conn.execute("UPDATE modelos SET linhas = ? WHERE modelo = ?", (linhas + len(chaves), model_name))
+            self._conn.commit()
+
+            if self._tamanho_bytes() > self.max_bytes:
+                self._compactar(int(self.max_bytes * FRACAO_APOS_DESPEJO))
+
+    def obter_ou_calcular(self, model_name, textos, calcular):
+        """
+        Retorna os embeddings dos textos, calculando (e gravando) apenas os ausentes do cache.
+
+        Args:
+            model_name (str): Nome do modelo.
+            textos (list de str): Textos a embedar.
+            calcular (callable): Recebe a lista de textos ausentes e retorna a matriz de embeddings.
+
+        Returns:
+            np.ndarray: Matriz float32 (len(textos), dimensão), na ordem de `textos`.
+        """
+        vetores, faltantes = self.obter(model_name, textos)
+        if faltantes:
+            textos_faltantes = [textos[i] for i in faltantes]
+            calculados = np.asarray(calcular(textos_faltantes), dtype=np.float32)
+            self.gravar(model_name, textos_faltantes, calculados)
+            for i, vetor in zip(faltantes, calculados):
+                vetores[i] = vetor
+        return np.stack(vetores) if vetores else np.empty((0, 0), dtype=np.float32)
+
+    # --- Despejo -----------------------------------------------------------------
+
+    def _tamanho_bytes(self):
+        total = 0
+        for dimensao, dtype, linhas in self._conn.execute("SELECT dimensao, dtype, linhas FROM modelos"):
+            total += dimensao * np.dtype(dtype).itemsize * linhas
+        return total
+
+    def _compactar(self, alvo_bytes):
+        """Reescreve os arquivos de vetores mantendo as entradas mais recentes até `alvo_bytes` (chamar com as travas)."""
+        self._gravar_acessos()
+        modelos = {
+            modelo: (arquivo, dimensao, dtype)
+            for modelo, arquivo, dimensao, dtype in self._conn.execute("SELECT modelo, arquivo, dimensao, dtype FROM modelos")
+        }
+        mantidas = {modelo: [] for modelo in modelos}
+        total, removidas = 0, []
+        for chave, modelo, linha in self._conn.execute(
+            "SELECT chave, modelo, linha FROM entradas ORDER BY ultimo_acesso DESC"
+        ).fetchall():
+            _, dimensao, dtype = modelos[modelo]
+            tamanho = dimensao * np.dtype(dtype).itemsize
+            if total + tamanho <= alvo_bytes:
+                mantidas[modelo].append((chave, linha))
+                total += tamanho
+            else:
+                removidas.append((chave,))
+
+        for modelo, entradas in mantidas.items():
+            arquivo, dimensao, dtype = modelos[modelo]
+            caminho = os.path.join(self.diretorio, arquivo)
+            entradas.sort(key=lambda entrada: entrada[1])
+            antigo = np.memmap(caminho, dtype=dtype, mode="r") if entradas and os.path.getsize(caminho) else None
+            with open(caminho + ".tmp", "wb") as f:
+                for inicio in range(0, len(entradas), 4096):
+                    bloco = [linha for _, linha in entradas[inicio:inicio + 4096]]
+                    f.write(np.asarray(antigo.reshape(-1, dimensao)[bloco]).tobytes())
+            del antigo
+            self._memmaps.pop(modelo, None)
+            os.replace(caminho + ".tmp", caminho)
+            self._conn.executemany(
+                "UPDATE entradas SET linha = ? WHERE chave = ?", ((nova, chave) for nova, (chave, _) in enumerate(entradas))
+            )
+            self._conn.execute("UPDATE modelos SET linhas = ? WHERE modelo = ?", (len(entradas), modelo))
+
+        self._conn.executemany("DELETE FROM entradas WHERE chave = ?", removidas)
+        self._conn.commit()
+        self._estatisticas["despejos"] += len(removidas)
+        print(f"Cache de embeddings compactado: {len(removidas)} entradas despejadas, {total / 1024 / 1024:.1f} MB mantidos.")
+
+    def limpar(self):
+        """Remove todas as entradas do cache."""
+        with self._lock, trava_arquivo(self._trava):
+            self._compactar(0)
+
+    def estatisticas(self):
+        """
+        Retorna os contadores do cache.
+
+        Returns:
+            dict: Acertos, falhas, despejos, taxa de acerto, número de entradas e tamanho em bytes.
+        """
+        with self._lock:
+            consultas = self._estatisticas["acertos"] + self._estatisticas["falhas"]
+            return {
+                **self._estatisticas,
+                "taxa_acerto": self._estatisticas["acertos"] / consultas if consultas else 0.0,
+                "entradas": self._conn.execute("SELECT COUNT(*) FROM entradas").fetchone()[0],
+                "tamanho_bytes": self._tamanho_bytes(),
+            }
+
+
+_cache_padrao = None
+_cache_lock = threading.Lock()
+
+
+def obter_cache_embeddings():
+    """Retorna o cache de embeddings padrão do processo (em `RAG_CACHE_EMBEDDINGS_DIR`)."""
+    global _cache_padrao
+    with _cache_lock:
+        if _cache_padrao is None:
+            _cache_padrao = CacheEmbeddings()
+        return _cache_padrao
+
+
+def codificar_textos(model_name, textos, device="cpu", batch_size=32, usar_cache=True, backend=None):
+    """
+    Gera os embeddings de uma lista de textos consultando antes o cache persistente.
+
+    O modelo só é obtido do registro se algum texto não estiver no cache, de forma
+    que textos já vistos não exigem nem o carregamento do modelo.
+
+    Args:
+        model_name (str): Nome do modelo Sentence Transformer.
+        textos (list de str): Textos a embedar.
+        device (str, optional): Dispositivo do modelo. Padrão: "cpu".
+        batch_size (int, optional): Tamanho do lote de `model.encode`. Padrão: 32.
+        usar_cache (bool, optional): Se False, ignora o cache. Padrão: True.
+        backend (str, optional): Backend de inferência ("torch", "torch-int8" ou "onnx-int8").
+
+    Returns:
+        np.ndarray: Matriz float32 (len(textos), dimensão).
+    """
+    from src.utils.encoders import nome_modelo_cache
+    from src.utils.model_registry import obter_modelo_embedding
+
+    textos = list(textos)
+    calculados = [0]
+
+    def calcular(faltantes):
+        calculados[0] += len(faltantes)
+        model = obter_modelo_embedding(model_name, device=device, backend=backend)
+        return model.encode(faltantes, batch_size=batch_size, convert_to_numpy=True)
+
+    with etapa("codificacao"):
+        if usar_cache:
+            embeddings = obter_cache_embeddings().obter_ou_calcular(nome_modelo_cache(model_name, backend), textos, calcular)
+        else:
+            embeddings = np.asarray(calcular(textos), dtype=np.float32)
+    incrementar("textos_codificados_total", calculados[0], origem="modelo")
+    incrementar("textos_codificados_total", len(textos) - calculados[0], origem="cache")
+    return embeddings
@@ -0,0 +1,112 @@
+import os
+import re
+from src.config import DATABASE_DIR, carregar_ambiente
+
+carregar_ambiente()
+
+# Backends de inferência disponíveis para os modelos de embedding
+BACKEND_TORCH = "torch"  # PyTorch fp32 (comportamento original)
+BACKEND_TORCH_INT8 = "torch-int8"  # PyTorch com quantização dinâmica int8 das camadas Linear
+BACKEND_ONNX_INT8 = "onnx-int8"  # ONNX Runtime com pesos int8
+BACKENDS = (BACKEND_TORCH, BACKEND_TORCH_INT8, BACKEND_ONNX_INT8)
+
+BACKEND_PADRAO = os.environ.get("RAG_BACKEND_ENCODER", BACKEND_TORCH)
+
+# Diretório onde os modelos convertidos para ONNX ficam em cache
+MODELOS_ONNX_DIR = os.environ.get("RAG_MODELOS_ONNX_DIR", os.path.join(DATABASE_DIR, "modelos_onnx"))
+
+# Conjunto de instruções alvo da quantização ONNX (arm64, avx2, avx512 ou avx512_vnni)
+QUANTIZACAO_ONNX = os.environ.get("RAG_QUANTIZACAO_ONNX", "avx512_vnni")
+
+
+def validar_backend(backend):
+    """Retorna o backend informado (ou o padrão) e levanta ValueError se ele não existir."""
+    backend = backend or BACKEND_PADRAO
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de encoder desconhecido: '{backend}'. Opções: {', '.join(BACKENDS)}")
+    return backend
+
+
+def nome_modelo_cache(model_name, backend=None):
+    """
+    Nome usado para identificar os embeddings de um modelo em caches persistentes.
+
+    Backends quantizados produzem vetores ligeiramente diferentes do fp32, por isso
+    recebem um sufixo próprio e não compartilham entradas com o modelo original.
+    """
+    backend = validar_backend(backend)
+    return model_name if backend == BACKEND_TORCH else f"{model_name}@{backend}"
+
+
+def _memoria_int8(modelo):
+    """Estima a memória de um modelo após a quantização dinâmica int8 das camadas Linear."""
+    import torch
+
+    total = 0
+    for modulo in modelo.modules():
+        for parametro in modulo.parameters(recurse=False):
+            bytes_por_elemento = 1 if isinstance(modulo, torch.nn.Linear) and parametro.dim() == 2 else parametro.element_size()
+            total += parametro.numel() * bytes_por_elemento
+    return total
+
+
+def _carregar_torch_int8(model_name):
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    modelo = SentenceTransformer(model_name, device="cpu")
+    memoria = _memoria_int8(modelo)
+    modelo = torch.quantization.quantize_dynamic(modelo, {torch.nn.Linear}, dtype=torch.qint8)
+    # Os pesos empacotados em int8 não aparecem em parameters(); informa o tamanho ao registro de modelos
+    modelo.memoria_estimada_bytes = memoria
+    return modelo
+
+
+def _carregar_onnx_int8(model_name):
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    diretorio = os.path.join(MODELOS_ONNX_DIR, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name))
+    arquivo = f"onnx/model_qint8_{QUANTIZACAO_ONNX}.onnx"
+    caminho = os.path.join(diretorio, arquivo)
+
+    if not os.path.exists(caminho):
+        # Primeira utilização: exporta o modelo para ONNX, quantiza para int8 e guarda em disco
+        print(f"Exportando '{model_name}' para ONNX int8 ({QUANTIZACAO_ONNX}) em {diretorio} ...")
+        modelo_onnx = SentenceTransformer(model_name, backend="onnx", device="cpu")
+        modelo_onnx.save_pretrained(diretorio)
+        export_dynamic_quantized_onnx_model(modelo_onnx, QUANTIZACAO_ONNX, diretorio)
+
+    modelo = SentenceTransformer(diretorio, backend="onnx", device="cpu", model_kwargs={"file_name": arquivo})
+    modelo.memoria_estimada_bytes = os.path.getsize(caminho)
+    return modelo
+
+
+def carregar_encoder(model_name, backend=None, device="cpu", dtype=None):
+    """
+    Carrega um modelo de embedding no backend de inferência escolhido.
+
+    Todos os backends retornam um `SentenceTransformer`, com a mesma interface
+    (`encode`, `tokenizer`, `max_seq_length`). Os backends int8 rodam só em CPU.
+
+    Args:
+        model_name (str): Nome do modelo Sentence Transformer.
+        backend (str, optional): "torch", "torch-int8" ou "onnx-int8". Padrão: `RAG_BACKEND_ENCODER` ou "torch".
+        device (str, optional): Dispositivo (apenas para o backend "torch"). Padrão: "cpu".
+        dtype (str, optional): "float16" para meia precisão (apenas para o backend "torch").
+
+    Returns:
+        SentenceTransformer: O modelo carregado.
+    """
+    backend = validar_backend(backend)
+
+    if backend == BACKEND_TORCH_INT8:
+        return _carregar_torch_int8(model_name)
+    if backend == BACKEND_ONNX_INT8:
+        return _carregar_onnx_int8(model_name)
+
+    from sentence_transformers import SentenceTransformer
+
+    modelo = SentenceTransformer(model_name, device=str(device))
+    if dtype == "float16":
+        modelo = modelo.half()
+    return modelo
@@ -0,0 +1,381 @@
+import hashlib
+import itertools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from src.config import MODELO_PADRAO, carregar_ambiente
+from src.database.database_operations import (
+    atualizar_mtimes,
+    confirmar_assinaturas,
+    iniciar_varredura,
+    listar_arquivos_nao_varridos,
+    obter_assinaturas_arquivos,
+    registrar_arquivos_varridos,
+    remover_arquivos_indexados,
+    remover_metadados,
+    upsert_metadados_em_lote,
+)
+from src.database.database_setup import create_database_and_tables
+from src.database.indice_lexico import atualizar_chunks_lexico, contar_chunks_lexico, remover_do_indice_lexico
+from src.utils.chunking import TAMANHO_CHUNK_TOKENS, dividir_em_chunks, lotes_ordenados_por_tamanho, separar_id_chunk
+from src.utils.db_vectores import TAMANHO_LOTE_ESCRITA, atualizar_chunks_chromadb, remover_do_indice_chromadb
+from src.utils.embedding_cache import codificar_textos
+from src.utils.ingestion import extrair_paginas_em_paralelo
+from src.utils.instrumentacao import etapa, incrementar
+from src.utils.metadata_extraction import THREADS_METADADOS, extrair_metadados, varrer_arquivos
+from src.utils.model_registry import obter_modelo_embedding
+from src.utils.vector_store import obter_sessao_vetorial
+
+try:
+    import resource
+except ImportError:  # Windows: o pico de RSS não é reportado
+    resource = None
+
+carregar_ambiente()
+
+# Arquivos avaliados por vez na varredura (assinaturas, hash e metadados gravados no SQLite em lote)
+TAMANHO_LOTE_VARREDURA = int(os.environ.get("RAG_LOTE_VARREDURA", "256"))
+
+EXTENSOES_SUPORTADAS = (".txt", ".pdf", ".md")
+
+
+def calcular_hash_arquivo(filepath, tamanho_bloco=1024 * 1024):
+    """
+    Calcula o SHA-256 do conteúdo de um arquivo, lendo-o em blocos.
+
+    Args:
+        filepath (str): Caminho do arquivo.
+        tamanho_bloco (int, optional): Tamanho de cada leitura em bytes. Padrão: 1 MiB.
+
+    Returns:
+        str: Hash hexadecimal do conteúdo.
+    """
+    sha256 = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b""):
+            sha256.update(bloco)
+    return sha256.hexdigest()
+
+
+def _avaliar_arquivo(diretorio, nome_arquivo, stat_info, assinatura):
+    """
+    Avalia um arquivo cujo tamanho ou mtime difere do registrado (ou que é novo).
+
+    Returns:
+        tuple: ("tocado", None) se o conteúdo não mudou, ("falha", None) se a extração
+               falhou ou ("pendente", metadados) se o arquivo deve ser (re)embedado.
+    """
+    filepath = os.path.join(diretorio, nome_arquivo)
+    hash_conteudo = calcular_hash_arquivo(filepath)
+    if assinatura and assinatura["hash_conteudo"] == hash_conteudo:
+        return "tocado", None  # Só o mtime mudou (ex.: `touch`); não há o que reembedar
+
+    metadados = extrair_metadados(filepath, stat_info)  # Reaproveita a stat da varredura
+    if metadados is None:
+        return "falha", None
+    metadados["nome_arquivo"] = nome_arquivo
+    metadados["hash_conteudo"] = hash_conteudo
+    metadados["mtime"] = stat_info.st_mtime
+    return "pendente", metadados
+
+
+class _ConfirmacaoAssinaturas:
+    """
+    Assinaturas (hash e mtime) dos arquivos em (re)indexação, confirmadas no SQLite só depois da gravação dos chunks.
+
+    Os metadados de um arquivo a (re)embedar são gravados sem hash e sem mtime; a
+    assinatura fica aqui até o arquivo ter sido todo extraído e todos os seus
+    chunks gravados (os chunks de um arquivo podem cair em lotes de escrita
+    diferentes). Se a indexação for interrompida antes disso, o arquivo continua
+    sem assinatura e é reavaliado e reembedado na execução seguinte.
+    """
+
+    def __init__(self):
+        self._assinaturas = {}  # nome_arquivo -> (hash_conteudo, mtime)
+        self._restantes = {}  # nome_arquivo -> chunks produzidos e ainda não gravados
+        self._extraidos = set()
+
+    def pendente(self, metadados):
+        """Guarda a assinatura do arquivo e a retira dos metadados a gravar (estado "pendente")."""
+        self._assinaturas[metadados["nome_arquivo"]] = (metadados.pop("hash_conteudo"), metadados.pop("mtime"))
+
+    def produzido(self, nome_arquivo):
+        self._restantes[nome_arquivo] = self._restantes.get(nome_arquivo, 0) + 1
+
+    def extraido(self, nome_arquivo):
+        if nome_arquivo in self._assinaturas:
+            self._extraidos.add(nome_arquivo)
+
+    def descartar(self, nome_arquivo):
+        self._assinaturas.pop(nome_arquivo, None)
+        self._restantes.pop(nome_arquivo, None)
+        self._extraidos.discard(nome_arquivo)
+
+    def gravados(self, chunks):
+        """Desconta os chunks gravados e confirma os arquivos que ficaram completos."""
+        for chunk in chunks:
+            self._restantes[chunk["nome_arquivo"]] = self._restantes.get(chunk["nome_arquivo"], 0) - 1
+        self.confirmar()
+
+    def confirmar(self):
+        prontos = [nome for nome in self._extraidos if not self._restantes.get(nome)]
+        if prontos and confirmar_assinaturas([(nome, *self._assinaturas[nome]) for nome in prontos]):
+            for nome in prontos:
+                self.descartar(nome)
+
+
+def _agrupar(itens, tamanho_lote):
+    """Agrupa um iterável em listas de até `tamanho_lote` itens."""
+    iterador = iter(itens)
+    while lote := list(itertools.islice(iterador, tamanho_lote)):
+        yield lote
+
+
+def _arquivos_pendentes(diretorio, diretorio_varrido, index_name, sessao, resumo, confirmacao):
+    """
+    Varre o diretório em lotes e produz os arquivos novos ou alterados, sem acumular a listagem.
+
+    A varredura lista os diretórios em paralelo (`varrer_arquivos`), com uma stat
+    por arquivo. Para cada lote de `TAMANHO_LOTE_VARREDURA` arquivos: marca os nomes
+    como vistos (as remoções são detectadas no SQLite ao final) e compara tamanho e
+    mtime com as assinaturas gravadas; arquivos iguais não são abertos. As marcas
+    são por coleção e diretório (`diretorio_varrido`, o caminho absoluto). Só os que
+    mudaram têm o hash calculado e os metadados extraídos, em um pool de threads.
+    Metadados e mtimes são gravados em lote, e os chunks antigos dos arquivos
+    alterados são removidos (o número de chunks pode ter mudado). Os arquivos a
+    (re)embedar são gravados sem hash e sem mtime: a assinatura fica em
+    `confirmacao` até os chunks do arquivo serem gravados.
+
+    Yields:
+        tuple: (nome_arquivo, filepath) de cada arquivo a (re)embedar, com os metadados já gravados.
+    """
+    with ThreadPoolExecutor(max_workers=THREADS_METADADOS) as executor:
+        for lote in _agrupar(varrer_arquivos(diretorio, EXTENSOES_SUPORTADAS), TAMANHO_LOTE_VARREDURA):
+            nomes = [nome_arquivo for nome_arquivo, _ in lote]
+            # Só valem as assinaturas de arquivos já indexados nesta coleção a partir deste diretório
+            assinaturas = obter_assinaturas_arquivos(nomes, index_name, diretorio_varrido)
+            registrar_arquivos_varridos(index_name, diretorio_varrido, nomes)
+
+            candidatos = []
+            for nome_arquivo, stat_info in lote:
+                assinatura = assinaturas.get(nome_arquivo)
+                if assinatura and assinatura["tamanho_bytes"] == stat_info.st_size and assinatura["mtime"] == stat_info.st_mtime:
+                    resumo["inalterados"] += 1
+                else:
+                    candidatos.append((nome_arquivo, stat_info, assinatura))
+
+            with etapa("avaliacao_arquivos"):
+                avaliacoes = executor.map(lambda candidato: _avaliar_arquivo(diretorio, *candidato), candidatos)
+                metadados_pendentes = []
+                mtimes_tocados = []  # (nome_arquivo, mtime) de arquivos cujo conteúdo não mudou
+                for (nome_arquivo, stat_info, _), (estado, metadados) in zip(candidatos, avaliacoes):
+                    if estado == "tocado":
+                        mtimes_tocados.append((nome_arquivo, stat_info.st_mtime))
+                        resumo["inalterados"] += 1
+                    elif estado == "falha":
+                        resumo["falhas"] += 1
+                    else:
+                        confirmacao.pendente(metadados)
+                        metadados_pendentes.append(metadados)
+
+            atualizar_mtimes(mtimes_tocados)
+            falhas_gravacao = set(upsert_metadados_em_lote(metadados_pendentes))
+            resumo["falhas"] += len(falhas_gravacao)
+            for nome_arquivo in falhas_gravacao:
+                confirmacao.descartar(nome_arquivo)
+            pendentes = [m["nome_arquivo"] for m in metadados_pendentes if m["nome_arquivo"] not in falhas_gravacao]
+
+            # Também os novos: a coleção pode ter chunks de uma indexação anterior do mesmo nome feita de outro diretório
+            remover_do_indice_chromadb(pendentes, index_name, sessao)
+            remover_do_indice_lexico(pendentes, index_name)
+            for nome_arquivo in pendentes:
+                resumo["alterados" if nome_arquivo in assinaturas else "novos"] += 1
+                yield nome_arquivo, os.path.join(diretorio, nome_arquivo)
+
+
+def _remover_arquivos_ausentes(diretorio, index_name, sessao):
+    """
+    Remove do índice os arquivos indexados a partir do diretório que a varredura não encontrou. Retorna quantos.
+
+    Só os arquivos registrados por varreduras deste diretório e coleção são
+    considerados. Os metadados no SQLite só são removidos se o arquivo não
+    estiver indexado em outra coleção ou a partir de outro diretório.
+    """
+    removidos = 0
+    ultimo = None
+    while nomes := listar_arquivos_nao_varridos(index_name, diretorio, apos=ultimo, limite=TAMANHO_LOTE_VARREDURA):
+        remover_do_indice_chromadb(nomes, index_name, sessao)
+        remover_do_indice_lexico(nomes, index_name)
+        sem_registro = remover_arquivos_indexados(index_name, diretorio, nomes)
+        if sem_registro is not None and remover_metadados(sem_registro):
+            removidos += len(nomes)
+        ultimo = nomes[-1]
+    return removidos
+
+
+def _gravar_chunks(chunks, embeddings, index_name, sessao, confirmacao):
+    with etapa("gravacao"):
+        atualizar_chunks_chromadb(chunks, np.concatenate(embeddings), index_name, sessao)
+        if atualizar_chunks_lexico(chunks, index_name):
+            confirmacao.gravados(chunks)
+        else:
+            for nome_arquivo in {chunk["nome_arquivo"] for chunk in chunks}:
+                confirmacao.descartar(nome_arquivo)  # Fica pendente: reembedado na próxima indexação
+    incrementar("chunks_gravados_total", len(chunks))
+
+
+def _rss_pico_mb(filhos=False):
+    """Pico de RSS (MB) do processo ou, com `filhos`, do maior processo filho já encerrado. None sem `resource`."""
+    if resource is None:
+        return None
+    uso = resource.getrusage(resource.RUSAGE_CHILDREN if filhos else resource.RUSAGE_SELF)
+    return uso.ru_maxrss / 1024  # ru_maxrss em KiB no Linux
+
+
+def _gerar_chunks(pendentes, tokenizer, max_tokens, resumo, index_name, sessao, confirmacao):
+    """Extrai o texto dos arquivos pendentes em paralelo e produz os chunks página a página."""
+
+    def ao_falhar(nome_arquivo, erro):
+        # Sem o registro, o arquivo volta a ser processado na próxima indexação
+        confirmacao.descartar(nome_arquivo)
+        remover_do_indice_chromadb([nome_arquivo], index_name, sessao)
+        remover_do_indice_lexico([nome_arquivo], index_name)
+        remover_metadados([nome_arquivo])
+        resumo["falhas"] += 1
+
+    # As páginas de um arquivo chegam juntas e em ordem: basta o índice do próximo chunk do arquivo atual
+    arquivo_atual, proximo_indice = None, 0
+    for nome_arquivo, pagina, texto in extrair_paginas_em_paralelo(pendentes, ao_falhar=ao_falhar,
+                                                                   ao_concluir=confirmacao.extraido,
+                                                                   estatisticas=resumo.setdefault("extracao", {})):
+        if nome_arquivo != arquivo_atual:
+            arquivo_atual, proximo_indice = nome_arquivo, 0
+        for chunk in dividir_em_chunks(nome_arquivo, texto, tokenizer, max_tokens, pagina=pagina,
+                                       indice_inicial=proximo_indice):
+            proximo_indice = chunk["indice"] + 1
+            confirmacao.produzido(nome_arquivo)
+            yield chunk
+
+
+def _reconstruir_indice_lexico(index_name, sessao, tamanho_pagina=5000):
+    """Preenche o índice BM25 a partir dos chunks já gravados no ChromaDB, se ele estiver vazio."""
+    if contar_chunks_lexico(index_name):
+        return
+
+    sessao = sessao or obter_sessao_vetorial()
+    try:
+        collection = sessao.obter_colecao(index_name)
+        total = collection.count()
+    except Exception:
+        return  # Coleção ainda não existe: será criada pela indexação
+    if not total:
+        return
+
+    print(f"Reconstruindo o índice BM25 de '{index_name}' a partir de {total} chunks do ChromaDB...")
+    for deslocamento in range(0, total, tamanho_pagina):
+        pagina = collection.get(limit=tamanho_pagina, offset=deslocamento, include=["documents", "metadatas"])
+        chunks = []
+        for chunk_id, texto, metadados in zip(pagina["ids"], pagina["documents"], pagina["metadatas"]):
+            metadados = metadados or {}
+            chunks.append({
+                "id": chunk_id,
+                "nome_arquivo": metadados.get("nome_arquivo") or separar_id_chunk(chunk_id)[0],
+                "indice": metadados.get("chunk_indice"),
+                "inicio": metadados.get("inicio"),
+                "fim": metadados.get("fim"),
+                "pagina": metadados.get("pagina"),
+                "texto": texto or "",
+            })
+        atualizar_chunks_lexico(chunks, index_name)
+
+
+def indexar_diretorio(diretorio, model_name=MODELO_PADRAO, index_name="documentos_index", device="cpu",
+                      batch_size=32, sessao=None, backend=None):
+    """
+    Indexa incrementalmente os documentos de um diretório, em um pipeline de geradores com memória limitada.
+
+    Varredura, leitura, extração, embedding e gravação são encadeados como
+    geradores, cada um com buffer de tamanho fixo: a varredura avalia
+    `TAMANHO_LOTE_VARREDURA` arquivos por vez, a extração mantém poucos arquivos
+    em voo, os chunks são ordenados em janelas e as gravações no armazenamento
+    vetorial e no índice BM25 são feitas a cada `TAMANHO_LOTE_ESCRITA` (`RAG_LOTE_ESCRITA`) chunks.
+    Nada é proporcional ao tamanho do corpus, que pode ter milhões de arquivos.
+
+    Para cada arquivo, compara tamanho e mtime com os valores gravados no SQLite;
+    só os arquivos cujo tamanho ou mtime mudou têm o conteúdo lido e o hash
+    recalculado, e só os que têm hash diferente (ou são novos) são divididos em
+    chunks, reembedados e gravados com upsert. O hash e o mtime de um arquivo só
+    são gravados depois de todos os seus chunks: uma indexação interrompida não
+    deixa arquivos registrados como em dia e sem vetores. Arquivos que sumiram do
+    diretório têm os vetores e os chunks do índice BM25 removidos da coleção (e os
+    metadados, se não estiverem indexados em outra coleção ou diretório); arquivos
+    indexados a partir de outros diretórios ou em outras coleções não são tocados.
+
+    Args:
+        diretorio (str): Diretório com os documentos.
+        model_name (str, optional): Modelo de embedding. Padrão: `RAG_MODELO_EMBEDDING` ou multilingual-e5-large.
+        index_name (str, optional): Nome da coleção. Padrão: "documentos_index".
+        device (str, optional): Dispositivo do modelo. Padrão: "cpu".
+        batch_size (int, optional): Tamanho do lote de embedding. Padrão: 32.
+        sessao (SessaoChroma or SessaoNumpy, optional): Sessão vetorial a usar. Padrão: a de `RAG_VECTOR_STORE`.
+        backend (str, optional): Backend de inferência do encoder ("torch", "torch-int8" ou "onnx-int8").
+
+    Returns:
+        dict: Contagem de arquivos novos, alterados, inalterados, removidos e com falha, o tempo total (s)
+              e o pico de RSS (MB) do processo e dos processos de extração. None se o diretório não existe.
+    """
+    if not os.path.isdir(diretorio):
+        # Sem este teste, uma varredura vazia faria todos os arquivos registrados parecerem removidos
+        print(f"Erro: diretório não encontrado: '{diretorio}'")
+        return None
+
+    inicio = time.perf_counter()
+    diretorio_varrido = os.path.realpath(diretorio)  # Chave das marcas de varredura e do registro dos arquivos
+    create_database_and_tables()  # Garante o esquema (e migra bancos antigos)
+
+    _reconstruir_indice_lexico(index_name, sessao)  # Coleções indexadas antes do índice BM25 existir
+
+    resumo = {"novos": 0, "alterados": 0, "inalterados": 0, "removidos": 0, "falhas": 0}
+    confirmacao = _ConfirmacaoAssinaturas()
+    iniciar_varredura(index_name, diretorio_varrido)
+
+    pendentes = _arquivos_pendentes(diretorio, diretorio_varrido, index_name, sessao, resumo, confirmacao)
+    primeiro = next(pendentes, None)
+    if primeiro is not None:
+        # O modelo só é carregado se houver algo a embedar
+        model = obter_modelo_embedding(model_name, device=device, backend=backend)
+        max_tokens = min(TAMANHO_CHUNK_TOKENS, model.max_seq_length - 2)  # Reserva espaço para [CLS]/[SEP]
+        chunks = _gerar_chunks(itertools.chain([primeiro], pendentes), model.tokenizer, max_tokens, resumo,
+                               index_name, sessao, confirmacao)
+
+        buffer_chunks, buffer_embeddings = [], []
+        for lote in lotes_ordenados_por_tamanho(chunks, batch_size):
+            buffer_chunks.extend(lote)
+            buffer_embeddings.append(
+                codificar_textos(model_name, [chunk["texto"] for chunk in lote], device, batch_size, backend=backend)
+            )
+            if len(buffer_chunks) >= TAMANHO_LOTE_ESCRITA:
+                _gravar_chunks(buffer_chunks, buffer_embeddings, index_name, sessao, confirmacao)
+                buffer_chunks, buffer_embeddings = [], []
+        if buffer_chunks:
+            _gravar_chunks(buffer_chunks, buffer_embeddings, index_name, sessao, confirmacao)
+        confirmacao.confirmar()  # Arquivos sem texto extraídos depois da última gravação
+
+    # Depois da varredura completa: o que foi indexado daqui e não foi visto sumiu do diretório
+    resumo["removidos"] = _remover_arquivos_ausentes(diretorio_varrido, index_name, sessao)
+    iniciar_varredura(index_name, diretorio_varrido)
+
+    for estado in ("novos", "alterados", "inalterados", "removidos", "falhas"):
+        incrementar("arquivos_indexados_total", resumo[estado], estado=estado)
+    resumo["tempo_segundos"] = time.perf_counter() - inicio
+    resumo["rss_pico_mb"] = _rss_pico_mb()
+    resumo["rss_pico_extracao_mb"] = _rss_pico_mb(filhos=True)
+    memoria = (f" Pico de RSS: {resumo['rss_pico_mb']:.0f} MB (extração: {resumo['rss_pico_extracao_mb']:.0f} MB)."
+               if resumo["rss_pico_mb"] is not None else "")
+    print(
+        f"Indexação de '{diretorio}' concluída em {resumo['tempo_segundos']:.2f} s: "
+        f"{resumo['novos']} novos, {resumo['alterados']} alterados, {resumo['inalterados']} inalterados, "
+        f"{resumo['removidos']} removidos, {resumo['falhas']} falhas.{memoria}"
+    )
+    return resumo
@@ -0,0 +1,249 @@
+import os
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from src.config import carregar_ambiente
+
+carregar_ambiente()
+
+# Tempo máximo de extração de um arquivo (em segundos) e número de processos de extração
+TIMEOUT_POR_ARQUIVO = float(os.environ.get("RAG_TIMEOUT_EXTRACAO", "120"))
+NUM_PROCESSOS = int(os.environ.get("RAG_PROCESSOS_EXTRACAO", "0")) or os.cpu_count() or 1
+
+
+class TempoEsgotadoExtracao(Exception):
+    """Levantada dentro do processo de extração quando um arquivo excede o tempo limite."""
+
+
+def ler_texto_arquivo(filepath):
+    """Lê o conteúdo textual de um arquivo (UTF-8, com fallback para latin-1). Retorna None em caso de erro."""
+    try:
+        with open(filepath, "r", encoding="utf-8") as f:
+            return f.read()
+    except UnicodeDecodeError:
+        try:
+            with open(filepath, "r", encoding="latin-1") as f:
+                return f.read()
+        except Exception as e:
+            print(f"Erro ao ler arquivo {filepath}: {e}")
+            return None
+    except Exception as e:
+        print(f"Erro ao ler arquivo {filepath}: {e}")
+        return None
+
+
+def extrair_paginas_pdf(filepath):
+    """
+    Extrai o texto de cada página de um PDF com o PyPDF2.
+
+    Args:
+        filepath (str): Caminho do PDF.
+
+    Returns:
+        list de tuple: Pares (numero_pagina, texto), começando em 1. Páginas sem texto
+                       (ex.: digitalizadas sem OCR) são omitidas.
+    """
+    from PyPDF2 import PdfReader
+
+    paginas = []
+    with open(filepath, "rb") as f:
+        reader = PdfReader(f)
+        for numero, pagina in enumerate(reader.pages, start=1):
+            texto = (pagina.extract_text() or "").strip()
+            if texto:
+                paginas.append((numero, texto))
+    return paginas
+
+
+def extrair_paginas(filepath):
+    """
+    Extrai o texto de um documento como uma lista de páginas.
+
+    PDFs têm o texto extraído página a página; TXT e MD são lidos como uma única
+    "página" sem número.
+
+    Args:
+        filepath (str): Caminho do documento.
+
+    Returns:
+        list de tuple: Pares (numero_pagina ou None, texto).
+
+    Raises:
+        OSError: Se o arquivo não puder ser lido.
+    """
+    if filepath.lower().endswith(".pdf"):
+        return extrair_paginas_pdf(filepath)
+
+    texto = ler_texto_arquivo(filepath)
+    if texto is None:
+        raise OSError(f"Não foi possível ler o arquivo {filepath}")
+    return [(None, texto)] if texto.strip() else []
+
+
+def _alarme(signum, frame):
+    raise TempoEsgotadoExtracao()
+
+
+def _extrair_com_timeout(filepath, timeout):
+    """Executa `extrair_paginas` no processo de trabalho, interrompendo-a se exceder `timeout` segundos."""
+    usar_alarme = timeout and hasattr(signal, "SIGALRM")
+    if usar_alarme:
+        signal.signal(signal.SIGALRM, _alarme)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return extrair_paginas(filepath)
+    except TempoEsgotadoExtracao:
+        raise TimeoutError(f"Extração de {filepath} excedeu {timeout:.0f} s")
+    finally:
+        if usar_alarme:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def _descartar_pool(pool):
+    """
+    Encerra o pool sem esperar pelos arquivos em voo.
+
+    `shutdown` não interrompe tarefas em execução: processos ainda vivos (ex.:
+    travados em código nativo, fora do alcance do alarme) são terminados, em vez
+    de ficarem ocupando CPU e memória até o fim da indexação.
+    """
+    processos = list((pool._processes or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for processo in processos:
+        if processo.is_alive():
+            processo.terminate()
+    for processo in processos:
+        processo.join(timeout=5)
+        if processo.is_alive():
+            processo.kill()
+
+
+def extrair_paginas_em_paralelo(arquivos, max_workers=NUM_PROCESSOS, timeout_por_arquivo=TIMEOUT_POR_ARQUIVO,
+                                tamanho_fila=None, ao_falhar=None, ao_concluir=None, estatisticas=None):
+    """
+    Extrai o texto dos documentos em um pool de processos e produz registros página a página.
+
+    A extração de PDFs é limitada por CPU, por isso roda em `ProcessPoolExecutor`.
+    No máximo `tamanho_fila` arquivos ficam em processamento ou aguardando consumo
+    ao mesmo tempo, de forma que um consumidor lento (o embedder) segura a extração
+    em vez de acumular o corpus inteiro em memória. As páginas de um arquivo são
+    produzidas juntas e em ordem; arquivos diferentes chegam na ordem em que
+    terminam. Um arquivo que excede o tempo limite ou falha é reportado a
+    `ao_falhar` e não interrompe os demais; os processos de um arquivo travado
+    são terminados.
+
+    Se um processo morre (ex.: falta de memória), o pool inteiro quebra e não se
+    sabe qual dos arquivos em voo foi o culpado: todos são reenviados, um de cada
+    vez, a um pool novo, e só o arquivo que quebra o pool sozinho é reportado.
+
+    Args:
+        arquivos (iterable de tuple): Pares (nome_arquivo, filepath).
+        max_workers (int, optional): Número de processos. Padrão: `RAG_PROCESSOS_EXTRACAO` ou o número de CPUs.
+        timeout_por_arquivo (float, optional): Tempo máximo por arquivo em segundos. Padrão: `RAG_TIMEOUT_EXTRACAO`.
+        tamanho_fila (int, optional): Número máximo de arquivos em voo. Padrão: 2 * max_workers.
+        ao_falhar (callable, optional): Chamada como `ao_falhar(nome_arquivo, erro)` para cada falha.
+        ao_concluir (callable, optional): Chamada como `ao_concluir(nome_arquivo)` depois que todas as páginas
+            do arquivo foram consumidas (também para arquivos sem texto, que não produzem páginas).
+        estatisticas (dict, optional): Se informado, recebe 'arquivos', 'paginas', 'falhas',
+            'tempo_segundos' e 'paginas_por_segundo' ao final.
+
+    Yields:
+        tuple: Registros (nome_arquivo, numero_pagina ou None, texto).
+    """
+    tamanho_fila = tamanho_fila or 2 * max_workers
+    estatisticas = estatisticas if estatisticas is not None else {}
+    estatisticas.update({"arquivos": 0, "paginas": 0, "falhas": 0})
+    inicio = time.perf_counter()
+
+    def falhar(nome_arquivo, erro):
+        estatisticas["falhas"] += 1
+        print(f"Erro ao extrair texto de '{nome_arquivo}': {erro}")
+        if ao_falhar:
+            ao_falhar(nome_arquivo, erro)
+
+    def enviar(nome_arquivo, filepath, isolado):
+        future = pool.submit(_extrair_com_timeout, filepath, timeout_por_arquivo)
+        em_voo[future] = (nome_arquivo, filepath, time.monotonic(), isolado)
+
+    iterador = iter(arquivos)
+    pool = ProcessPoolExecutor(max_workers=max_workers)
+    em_voo = {}  # future -> (nome_arquivo, filepath, instante de envio, enviado sozinho após uma quebra do pool)
+    suspeitos = []  # (nome_arquivo, filepath) em voo quando o pool quebrou, reenviados um de cada vez
+    try:
+        esgotado = False
+        while True:
+            # Completa a janela de arquivos em voo; um suspeito roda sem outros arquivos ao lado
+            while not any(isolado for *_, isolado in em_voo.values()):
+                if suspeitos:
+                    if em_voo:
+                        break
+                    enviar(*suspeitos.pop(0), isolado=True)
+                    continue
+                if esgotado or len(em_voo) >= tamanho_fila:
+                    break
+                try:
+                    nome_arquivo, filepath = next(iterador)
+                except StopIteration:
+                    esgotado = True
+                    break
+                enviar(nome_arquivo, filepath, isolado=False)
+
+            if not em_voo:
+                break
+
+            concluidos, _ = wait(em_voo, timeout=timeout_por_arquivo, return_when=FIRST_COMPLETED)
+            if not concluidos:
+                # Nenhum arquivo terminou dentro do prazo (processo travado fora do alcance do alarme):
+                # descarta o pool, reporta os atrasados e reenvia os demais para um pool novo.
+                agora = time.monotonic()
+                _descartar_pool(pool)
+                pool = ProcessPoolExecutor(max_workers=max_workers)
+                atrasados, em_voo = em_voo, {}
+                for nome_arquivo, filepath, enviado, isolado in atrasados.values():
+                    if agora - enviado >= timeout_por_arquivo:
+                        falhar(nome_arquivo, TimeoutError(f"sem resposta após {timeout_por_arquivo:.0f} s"))
+                    else:
+                        enviar(nome_arquivo, filepath, isolado)
+                continue
+
+            quebrados = []  # Arquivos que estavam no pool quando ele quebrou
+            for future in concluidos:
+                nome_arquivo, filepath, _, _ = em_voo.pop(future)
+                try:
+                    paginas = future.result()
+                except BrokenProcessPool as e:
+                    quebrados.append((nome_arquivo, filepath, e))
+                    continue
+                except Exception as e:
+                    falhar(nome_arquivo, e)
+                    continue
+
+                estatisticas["arquivos"] += 1
+                estatisticas["paginas"] += len(paginas)
+                for numero_pagina, texto in paginas:
+                    yield nome_arquivo, numero_pagina, texto
+                if ao_concluir:
+                    ao_concluir(nome_arquivo)
+
+            if quebrados:
+                # Um processo morreu (ex.: falta de memória) e levou o pool junto. Sozinho em voo, o arquivo
+                # é o culpado; senão todos os que estavam em voo viram suspeitos e vão para um pool novo
+                quebrados.extend((nome_arquivo, filepath, None) for nome_arquivo, filepath, *_ in em_voo.values())
+                _descartar_pool(pool)
+                pool = ProcessPoolExecutor(max_workers=max_workers)
+                em_voo = {}
+                if len(quebrados) == 1:
+                    nome_arquivo, _, erro = quebrados[0]
+                    falhar(nome_arquivo, erro)
+                else:
+                    suspeitos.extend((nome_arquivo, filepath) for nome_arquivo, filepath, _ in quebrados)
+    finally:
+        _descartar_pool(pool)
+        estatisticas["tempo_segundos"] = time.perf_counter() - inicio
+        estatisticas["paginas_por_segundo"] = estatisticas["paginas"] / estatisticas["tempo_segundos"] if estatisticas["tempo_segundos"] else 0.0
+        print(
+            f"Extração: {estatisticas['arquivos']} arquivos, {estatisticas['paginas']} páginas, "
+            f"{estatisticas['falhas']} falhas em {estatisticas['tempo_segundos']:.2f} s "
+            f"({estatisticas['paginas_por_segundo']:.1f} páginas/s)."
+        )
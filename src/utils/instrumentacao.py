@@ -0,0 +1,366 @@
+import contextvars
+import cProfile
+import datetime
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from src.config import DATABASE_DIR, carregar_ambiente
+
+carregar_ambiente()
+
+# Instrumentação das buscas e da ingestão (etapas, contadores e histogramas). Desativada, cada
+# etapa custa uma chamada de função que devolve um gerenciador de contexto vazio.
+INSTRUMENTACAO_ATIVA = os.environ.get("RAG_INSTRUMENTACAO", "0") == "1"
+
+# Consultas mais lentas guardadas (0 = nenhuma) e, se ativado, o perfil do cProfile de cada uma
+CONSULTAS_LENTAS = int(os.environ.get("RAG_CONSULTAS_LENTAS", "0"))
+PERFIL_CPROFILE = os.environ.get("RAG_PERFIL_CPROFILE", "0") == "1"
+DIRETORIO_PERFIS = os.environ.get("RAG_DIRETORIO_PERFIS", os.path.join(DATABASE_DIR, "perfis"))
+
+# Limites superiores (s) dos buckets dos histogramas de latência
+LIMITES_LATENCIA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Prefixo dos nomes de métrica na exportação para o Prometheus
+PREFIXO_PROMETHEUS = "rag_"
+
+_DESCRICOES = {
+    "etapa_segundos": "Duração de cada etapa da busca ou da ingestão.",
+    "consulta_segundos": "Duração total de cada consulta, por rota.",
+    "consultas_total": "Consultas atendidas, por rota e resultado.",
+    "textos_codificados_total": "Textos que passaram pelo encoder, por origem (cache ou modelo).",
+    "arquivos_indexados_total": "Arquivos avaliados pela indexação, por estado.",
+    "chunks_gravados_total": "Chunks gravados no armazenamento vetorial e no índice BM25.",
+    "reranker_pares_total": "Pares query-trecho pontuados pelo re-ranqueador, por origem (cache ou modelo).",
+    "reranker_interrompidos_total": "Re-ranqueamentos interrompidos pelo orçamento de tempo.",
+}
+
+
+class Histograma:
+    """Histograma de buckets fixos (cumulativos na exportação, como no Prometheus)."""
+
+    __slots__ = ("limites", "contagens", "soma", "total")
+
+    def __init__(self, limites=LIMITES_LATENCIA):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)  # O último bucket é o +Inf
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.contagens[bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def percentil(self, p):
+        """Estimativa do percentil `p` (0-100) por interpolação linear dentro do bucket. None se vazio."""
+        if not self.total:
+            return None
+        alvo = p / 100 * self.total
+        acumulado = 0
+        for indice, contagem in enumerate(self.contagens):
+            if contagem and acumulado + contagem >= alvo:
+                inferior = self.limites[indice - 1] if indice > 0 else 0.0
+                superior = self.limites[indice] if indice < len(self.limites) else inferior
+                return inferior + (superior - inferior) * (alvo - acumulado) / contagem
+            acumulado += contagem
+        return self.limites[-1]
+
+
+def _chave(nome, rotulos):
+    return nome, tuple(sorted(rotulos.items()))
+
+
+def _rotulos_prometheus(rotulos, extra=()):
+    pares = [*rotulos, *extra]
+    if not pares:
+        return ""
+    escapados = (f'{nome}="{str(valor).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                 for nome, valor in pares)
+    return "{" + ",".join(escapados) + "}"
+
+
+class RegistroMetricas:
+    """
+    Contadores e histogramas identificados por nome e rótulos. Seguro entre threads.
+
+    Exporta em JSON (`exportar_json`) ou no formato de texto do Prometheus
+    (`exportar_prometheus`), com os nomes prefixados por `rag_`.
+    """
+
+    def __init__(self):
+        self._contadores = {}  # (nome, rótulos) -> valor
+        self._histogramas = {}  # (nome, rótulos) -> Histograma
+        self._lock = threading.Lock()
+
+    def incrementar(self, nome, valor=1, **rotulos):
+        chave = _chave(nome, rotulos)
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    def observar(self, nome, valor, **rotulos):
+        chave = _chave(nome, rotulos)
+        with self._lock:
+            histograma = self._histogramas.get(chave)
+            if histograma is None:
+                histograma = self._histogramas[chave] = Histograma()
+            histograma.observar(valor)
+
+    def limpar(self):
+        with self._lock:
+            self._contadores.clear()
+            self._histogramas.clear()
+
+    def exportar_json(self):
+        """Retorna {'contadores': [...], 'histogramas': [...]}, com média e percentis estimados (ms) dos histogramas."""
+        with self._lock:
+            contadores = [{"nome": nome, "rotulos": dict(rotulos), "valor": valor}
+                          for (nome, rotulos), valor in sorted(self._contadores.items())]
+            histogramas = []
+            for (nome, rotulos), h in sorted(self._histogramas.items()):
+                histogramas.append({
+                    "nome": nome,
+                    "rotulos": dict(rotulos),
+                    "total": h.total,
+                    "soma_s": h.soma,
+                    "media_ms": h.soma / h.total * 1000 if h.total else 0.0,
+                    **{f"p{p}_ms": h.percentil(p) * 1000 for p in (50, 95, 99)},
+                    "buckets": dict(zip([*map(str, h.limites), "+Inf"], h.contagens)),
+                })
+        return {"contadores": contadores, "histogramas": histogramas}
+
+    def exportar_prometheus(self):
+        """Retorna as métricas no formato de texto de exposição do Prometheus (versão 0.0.4)."""
+        linhas = []
+        with self._lock:
+            familias = {}
+            for (nome, rotulos), valor in sorted(self._contadores.items()):
+                familias.setdefault((nome, "counter"), []).append(
+                    f"{PREFIXO_PROMETHEUS}{nome}{_rotulos_prometheus(rotulos)} {valor}")
+            for (nome, rotulos), h in sorted(self._histogramas.items()):
+                amostras = familias.setdefault((nome, "histogram"), [])
+                acumulado = 0
+                for limite, contagem in zip([*map(repr, h.limites), "+Inf"], h.contagens):
+                    acumulado += contagem
+                    amostras.append(f"{PREFIXO_PROMETHEUS}{nome}_bucket{_rotulos_prometheus(rotulos, [('le', limite)])} {acumulado}")
+                amostras.append(f"{PREFIXO_PROMETHEUS}{nome}_sum{_rotulos_prometheus(rotulos)} {h.soma!r}")
+                amostras.append(f"{PREFIXO_PROMETHEUS}{nome}_count{_rotulos_prometheus(rotulos)} {h.total}")
+        for (nome, tipo), amostras in familias.items():
+            if nome in _DESCRICOES:
+                linhas.append(f"# HELP {PREFIXO_PROMETHEUS}{nome} {_DESCRICOES[nome]}")
+            linhas.append(f"# TYPE {PREFIXO_PROMETHEUS}{nome} {tipo}")
+            linhas.extend(amostras)
+        return "\n".join(linhas) + "\n"
+
+
+class Consulta:
+    """Uma consulta em andamento ou concluída: rótulo (rota), texto, etapas e duração."""
+
+    __slots__ = ("rotulo", "texto", "etapas", "inicio", "segundos", "thread")
+
+    def __init__(self, rotulo, texto=None):
+        self.rotulo = rotulo
+        self.texto = texto
+        self.etapas = []  # (etapa, segundos); list.append é atômico, e etapas de outras threads também entram
+        self.inicio = time.time()
+        self.segundos = None
+        self.thread = threading.get_native_id()
+
+    def resumo(self):
+        etapas = {}
+        for nome, segundos in self.etapas:
+            etapas[nome] = etapas.get(nome, 0.0) + segundos * 1000
+        return {
+            "rotulo": self.rotulo,
+            "texto": self.texto,
+            "duracao_ms": (self.segundos or 0.0) * 1000,
+            "inicio": datetime.datetime.fromtimestamp(self.inicio).isoformat(),
+            "fim": datetime.datetime.fromtimestamp(self.inicio + (self.segundos or 0.0)).isoformat(),
+            "thread": self.thread,  # TID nativo, o mesmo que o py-spy mostra com --threads
+            "etapas_ms": etapas,
+        }
+
+
+class ConsultasLentas:
+    """As `capacidade` consultas mais lentas, com o perfil do cProfile quando ele está ativo. Seguro entre threads."""
+
+    def __init__(self, capacidade=CONSULTAS_LENTAS):
+        self.capacidade = capacidade
+        self._heap = []  # Min-heap de (segundos, sequência, consulta, perfil)
+        self._sequencia = itertools.count()
+        self._lock = threading.Lock()
+
+    def oferecer(self, consulta, perfil=None):
+        with self._lock:
+            item = (consulta.segundos, next(self._sequencia), consulta, perfil)
+            if len(self._heap) < self.capacidade:
+                heapq.heappush(self._heap, item)
+            elif self._heap and consulta.segundos > self._heap[0][0]:
+                heapq.heapreplace(self._heap, item)
+
+    def listar(self):
+        """Retorna o resumo das consultas guardadas, da mais lenta para a mais rápida."""
+        with self._lock:
+            itens = sorted(self._heap, reverse=True)
+        return [consulta.resumo() for _, _, consulta, _ in itens]
+
+    def despejar(self, diretorio=DIRETORIO_PERFIS):
+        """
+        Grava as consultas guardadas em `diretorio`.
+
+        Cria `consultas_lentas.json` (resumo com etapas, horário e TID de cada
+        consulta, para cruzar com uma gravação do py-spy) e, para as consultas
+        perfiladas, `consulta_<n>.prof` no formato do pstats (abrível com
+        `python -m pstats` ou snakeviz).
+
+        Returns:
+            list de str: Caminhos dos arquivos gravados.
+        """
+        with self._lock:
+            itens = sorted(self._heap, reverse=True)
+        os.makedirs(diretorio, exist_ok=True)
+        caminhos = []
+        resumos = []
+        for posicao, (_, _, consulta, perfil) in enumerate(itens, start=1):
+            resumo = consulta.resumo()
+            if perfil is not None:
+                caminho = os.path.join(diretorio, f"consulta_{posicao}.prof")
+                perfil.dump_stats(caminho)
+                resumo["perfil"] = caminho
+                caminhos.append(caminho)
+            resumos.append(resumo)
+        caminho = os.path.join(diretorio, "consultas_lentas.json")
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump(resumos, f, ensure_ascii=False, indent=1)
+        return [caminho, *caminhos]
+
+    def limpar(self):
+        with self._lock:
+            self._heap.clear()
+
+
+metricas = RegistroMetricas()
+consultas_lentas = ConsultasLentas()
+
+_ativa = INSTRUMENTACAO_ATIVA
+_consulta_atual = contextvars.ContextVar("consulta_atual", default=None)
+
+
+class _Nulo:
+    """Gerenciador de contexto vazio devolvido por `etapa` e `medir_consulta` com a instrumentação desativada."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *erro):
+        return False
+
+
+_NULO = _Nulo()
+
+
+class _Etapa:
+    __slots__ = ("nome", "inicio")
+
+    def __init__(self, nome):
+        self.nome = nome
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *erro):
+        segundos = time.perf_counter() - self.inicio
+        metricas.observar("etapa_segundos", segundos, etapa=self.nome)
+        consulta = _consulta_atual.get()
+        if consulta is not None:
+            consulta.etapas.append((self.nome, segundos))
+        return False
+
+
+class _MedicaoConsulta:
+    __slots__ = ("consulta", "token", "perfil", "inicio")
+
+    def __init__(self, rotulo, texto):
+        self.consulta = Consulta(rotulo, texto)
+
+    def __enter__(self):
+        self.token = _consulta_atual.set(self.consulta)
+        self.perfil = None
+        if PERFIL_CPROFILE and consultas_lentas.capacidade:
+            try:
+                self.perfil = cProfile.Profile()
+                self.perfil.enable()
+            except ValueError:  # Outro profiler já ativo nesta thread
+                self.perfil = None
+        self.inicio = time.perf_counter()
+        return self.consulta
+
+    def __exit__(self, tipo_erro, *erro):
+        self.consulta.segundos = time.perf_counter() - self.inicio
+        if self.perfil is not None:
+            self.perfil.disable()
+        _consulta_atual.reset(self.token)
+        metricas.observar("consulta_segundos", self.consulta.segundos, rota=self.consulta.rotulo)
+        metricas.incrementar("consultas_total", rota=self.consulta.rotulo, resultado="erro" if tipo_erro else "ok")
+        if consultas_lentas.capacidade:
+            consultas_lentas.oferecer(self.consulta, self.perfil)
+        return False
+
+
+def etapa(nome):
+    """
+    Mede uma etapa (codificacao, consulta_vetorial, juncao_metadados, filtro, formatacao...) com `with etapa(...)`.
+
+    A duração vai para o histograma `etapa_segundos{etapa=nome}` e, se houver
+    uma consulta em andamento no contexto, para o detalhamento dela.
+    """
+    return _Etapa(nome) if _ativa else _NULO
+
+
+def medir_consulta(rotulo, texto=None):
+    """
+    Mede uma consulta inteira com `with medir_consulta(...)`: duração por rota, contagem e etapas.
+
+    As etapas executadas dentro do bloco (inclusive em threads que recebam o
+    contexto com `contextvars.copy_context()`) entram no detalhamento da
+    consulta, usado na lista das mais lentas (`RAG_CONSULTAS_LENTAS`).
+    """
+    return _MedicaoConsulta(rotulo, texto) if _ativa else _NULO
+
+
+def rotular_consulta(rotulo):
+    """Define o rótulo (rota) da consulta em andamento, quando ele só é conhecido depois do início."""
+    consulta = _consulta_atual.get()
+    if consulta is not None:
+        consulta.rotulo = rotulo
+
+
+def incrementar(nome, valor=1, **rotulos):
+    """Incrementa um contador (no-op com a instrumentação desativada)."""
+    if _ativa:
+        metricas.incrementar(nome, valor, **rotulos)
+
+
+def ativar_instrumentacao(ativa=True, consultas_lentas_max=None):
+    """Ativa ou desativa a instrumentação em tempo de execução e, opcionalmente, ajusta quantas consultas lentas guardar."""
+    global _ativa
+    _ativa = ativa
+    if consultas_lentas_max is not None:
+        consultas_lentas.capacidade = consultas_lentas_max
+
+
+def instrumentacao_ativa():
+    return _ativa
+
+
+def exportar_metricas(formato="json"):
+    """Exporta as métricas: dict com 'contadores', 'histogramas' e 'consultas_lentas' ("json") ou texto ("prometheus")."""
+    if formato == "prometheus":
+        return metricas.exportar_prometheus()
+    return {**metricas.exportar_json(), "consultas_lentas": consultas_lentas.listar()}
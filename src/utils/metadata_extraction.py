@@ -1,15 +1,39 @@
 import os
 import datetime
-import statx
-from PyPDF2 import PdfReader
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from src.config import carregar_ambiente
+from src.utils.pdf_info import ler_info_pdf
 
-def _obter_metadados_fs(filepath):
-    """Obtém metadados do sistema de arquivos para um arquivo (versão simplificada)."""
+carregar_ambiente()
+
+# Threads da varredura de diretórios e da extração de metadados. Só compensam quando a E/S domina (cache
+# frio, disco de rede): com o cache quente o trabalho é limitado pelo GIL, daí o padrão de uma por CPU.
+THREADS_METADADOS = int(os.environ.get("RAG_THREADS_METADADOS", "0")) or min(8, os.cpu_count() or 1)
+
+# Arquivos por item da fila da varredura paralela e itens na fila (limita a memória da varredura)
+ARQUIVOS_POR_ITEM_VARREDURA = 256
+ITENS_FILA_VARREDURA = 64
+
+
+def _data_iso(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp).isoformat() + "Z"
+
+
+def _obter_metadados_fs(filepath, stat_info=None):
+    """
+    Obtém metadados do sistema de arquivos para um arquivo, com uma única chamada a stat.
+
+    Args:
+        filepath (str): Caminho do arquivo.
+        stat_info (os.stat_result, optional): Resultado de stat já obtido (ex.: pela varredura com
+            `os.scandir`). Se omitido, é feito um `os.stat`.
+    """
 
     try:
-        # Tenta usar statx para obter informações, incluindo stx_btime
-        stx_info = statx.statx(filepath)
-        stat_info = os.stat(filepath)
+        stat_info = stat_info or os.stat(filepath)
 
         # Dicionário para armazenar os metadados
         metadata = {}
@@ -26,15 +50,11 @@ def _obter_metadados_fs(filepath):
         metadata['tags'] = os.path.splitext(metadata['nome_arquivo'])[0]
 
         # --- Datas ---
-        metadata['data_modificacao'] = datetime.datetime.fromtimestamp(stat_info.st_mtime).isoformat() + "Z"
+        metadata['data_modificacao'] = _data_iso(stat_info.st_mtime)
+
+        # Data de criação: st_birthtime onde o stat a fornece (macOS, BSD, Windows); senão, st_ctime
+        metadata['data_criacao'] = _data_iso(getattr(stat_info, 'st_birthtime', stat_info.st_ctime))
 
-        # Data de Criação (tentando usar stx_btime, fallback para stx_ctime)
-        if hasattr(stx_info, 'btime'):  # Verifica se stx_btime está disponível
-            metadata['data_criacao'] = datetime.datetime.fromtimestamp(stx_info.btime).isoformat() + "Z"
-        else:
-            print(f"Aviso: stx_btime não suportado neste sistema. Usando stx_ctime para data de criação de {filepath}.")
-            metadata['data_criacao'] = datetime.datetime.fromtimestamp(stat_info.st_ctime).isoformat() + "Z"
-        
         return metadata
 
     except FileNotFoundError:
@@ -44,9 +64,9 @@ def _obter_metadados_fs(filepath):
         print(f"Erro ao obter metadados do sistema de arquivos: {e} - {type(e)}")
         return None
 
-def _extrair_metadados_txt(filepath):
+def _extrair_metadados_txt(filepath, stat_info=None):
     """Extrai metadados de um arquivo .txt."""
-    metadados = _obter_metadados_fs(filepath)
+    metadados = _obter_metadados_fs(filepath, stat_info)
     if metadados:
         metadados["tipo_documento"] = "txt"
         metadados["tags"] = os.path.splitext(metadados['nome_arquivo'])[0]
@@ -59,29 +79,41 @@ def _extrair_metadados_txt(filepath):
             print(f"Erro ao ler arquivo TXT: {e}")
     return metadados
 
-def _extrair_metadados_pdf(filepath):
-    """Extrai metadados de um arquivo .pdf."""
-    metadados = _obter_metadados_fs(filepath)
+def _ler_info_pdf_completo(filepath):
+    """Lê o /Info com o `PdfReader` (PDFs criptografados ou fora do padrão)."""
+    from PyPDF2 import PdfReader
+
+    with open(filepath, "rb") as f:
+        metadata = PdfReader(f).metadata
+        if not metadata:
+            return {}
+        keywords = metadata.get("/Keywords")
+        keywords = keywords.get_object() if keywords is not None else None
+        return {"/Author": metadata.author, "/Title": metadata.title,
+                "/Keywords": str(keywords) if isinstance(keywords, str) else None}
+
+def _extrair_metadados_pdf(filepath, stat_info=None):
+    """Extrai metadados de um arquivo .pdf, lendo só o trailer e o /Info (sem a árvore de páginas)."""
+    metadados = _obter_metadados_fs(filepath, stat_info)
     if metadados:
         metadados["tipo_documento"] = "pdf"
         try:
-            with open(filepath, "rb") as f:
-                reader = PdfReader(f)
-                metadata = reader.metadata
-                if metadata:
-                    metadados["autor"] = metadata.author or "Autor Desconhecido"
-                    metadados["titulo"] = metadata.title
-                    # Remove a lógica de data daqui! Já está em _obter_metadados_fs()
-                    if hasattr(metadata, 'keywords') and metadata.keywords:
-                        metadados["tags"] = metadata.keywords
+            info = ler_info_pdf(filepath)
+            if info is None:
+                info = _ler_info_pdf_completo(filepath)
+            if info:
+                metadados["autor"] = info.get("/Author") or "Autor Desconhecido"
+                metadados["titulo"] = info.get("/Title")
+                if info.get("/Keywords"):
+                    metadados["tags"] = info["/Keywords"]
 
         except Exception as e:
             print(f"Erro ao ler metadados do PDF: {e}")
     return metadados
 
-def _extrair_metadados_md(filepath):
+def _extrair_metadados_md(filepath, stat_info=None):
     """Extrai metadados de um arquivo .md."""
-    metadados = _obter_metadados_fs(filepath)
+    metadados = _obter_metadados_fs(filepath, stat_info)
     if metadados:
         metadados["tipo_documento"] = "md"
         metadados["tags"] = os.path.splitext(metadados['nome_arquivo'])[0]
@@ -94,18 +126,147 @@ def _extrair_metadados_md(filepath):
             print(f"Erro ao ler arquivo MD: {e}")
     return metadados
 
-def extrair_metadados(filepath):
-    """Extrai metadados de um arquivo, independentemente do tipo (TXT, MD, PDF)."""
+def extrair_metadados(filepath, stat_info=None):
+    """
+    Extrai metadados de um arquivo, independentemente do tipo (TXT, MD, PDF).
+
+    Args:
+        filepath (str): Caminho do arquivo.
+        stat_info (os.stat_result, optional): Resultado de stat já obtido na varredura (evita um novo stat).
+    """
     try:
         if filepath.lower().endswith(".txt"):
-            return _extrair_metadados_txt(filepath)
+            return _extrair_metadados_txt(filepath, stat_info)
         elif filepath.lower().endswith(".pdf"):
-            return _extrair_metadados_pdf(filepath)
+            return _extrair_metadados_pdf(filepath, stat_info)
         elif filepath.lower().endswith(".md"):
-            return _extrair_metadados_md(filepath)
+            return _extrair_metadados_md(filepath, stat_info)
         else:
             print(f"Tipo de arquivo não suportado para extração de metadados: {filepath}")
             return None  # Tipo de arquivo não suportado
     except Exception as e:
         print(f"Erro ao extrair metadados de {filepath}: {e} - {type(e)}")
         return None
+
+def extrair_metadados_em_paralelo(arquivos, max_workers=THREADS_METADADOS):
+    """
+    Extrai os metadados de vários arquivos em um pool de threads, preservando a ordem.
+
+    A extração é limitada por E/S (stat, primeira linha, trailer do PDF). No
+    máximo 2 * `max_workers` arquivos ficam em processamento por vez, então o
+    iterável de entrada pode ser um gerador de qualquer tamanho.
+
+    Args:
+        arquivos (iterable de tuple): Pares (filepath, stat_info); stat_info pode ser None.
+        max_workers (int, optional): Número de threads. Padrão: `RAG_THREADS_METADADOS` ou uma por CPU (até 8).
+
+    Yields:
+        dict or None: Metadados de cada arquivo, na ordem de entrada (None em caso de erro).
+    """
+    if max_workers <= 1:
+        for filepath, stat_info in arquivos:
+            yield extrair_metadados(filepath, stat_info)
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        em_voo = deque()
+        for filepath, stat_info in arquivos:
+            em_voo.append(executor.submit(extrair_metadados, filepath, stat_info))
+            if len(em_voo) >= 2 * max_workers:
+                yield em_voo.popleft().result()
+        while em_voo:
+            yield em_voo.popleft().result()
+
+def _listar_diretorio(diretorio, extensoes):
+    """Lista um diretório: (subdiretórios, [(caminho, stat)] dos arquivos com as extensões). Uma stat por arquivo."""
+    subdiretorios, arquivos = [], []
+    try:
+        with os.scandir(diretorio) as entradas:
+            for entrada in entradas:
+                if entrada.is_dir(follow_symlinks=False):
+                    subdiretorios.append(entrada.path)
+                elif entrada.name.lower().endswith(extensoes) and entrada.is_file():
+                    arquivos.append((entrada.path, entrada.stat()))
+    except OSError as e:
+        print(f"Erro ao listar o diretório '{diretorio}': {e}")
+    return subdiretorios, arquivos
+
+def _varrer_em_serie(diretorio, extensoes):
+    pendentes = [diretorio]
+    while pendentes:
+        subdiretorios, arquivos = _listar_diretorio(pendentes.pop(), extensoes)
+        pendentes.extend(subdiretorios)
+        yield from arquivos
+
+def _varrer_em_threads(diretorio, extensoes, max_workers):
+    """Varre a árvore com `max_workers` threads, cada uma listando um diretório por vez."""
+    diretorios = queue.SimpleQueue()
+    resultados = queue.Queue(maxsize=ITENS_FILA_VARREDURA)
+    parar = threading.Event()
+    trava = threading.Lock()
+    pendentes = [1]  # Diretórios enfileirados e ainda não listados
+    fim = object()
+
+    def entregar(item):
+        # Bloqueia enquanto a fila estiver cheia (o consumidor dita o ritmo), mas desiste se a varredura parar
+        while not parar.is_set():
+            try:
+                resultados.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def trabalhar():
+        while (atual := diretorios.get()) is not None and not parar.is_set():
+            try:
+                subdiretorios, arquivos = _listar_diretorio(atual, extensoes)
+                with trava:
+                    pendentes[0] += len(subdiretorios)
+                for subdiretorio in subdiretorios:
+                    diretorios.put(subdiretorio)
+                for inicio in range(0, len(arquivos), ARQUIVOS_POR_ITEM_VARREDURA):
+                    entregar(arquivos[inicio:inicio + ARQUIVOS_POR_ITEM_VARREDURA])
+            finally:
+                with trava:
+                    pendentes[0] -= 1
+                    concluido = pendentes[0] == 0
+                if concluido:
+                    entregar(fim)
+
+    threads = [threading.Thread(target=trabalhar, daemon=True) for _ in range(max_workers)]
+    diretorios.put(diretorio)
+    for thread in threads:
+        thread.start()
+    try:
+        while (item := resultados.get()) is not fim:
+            yield from item
+    finally:
+        parar.set()
+        for _ in threads:
+            diretorios.put(None)
+
+def varrer_arquivos(diretorio, extensoes=(".txt", ".pdf", ".md"), max_workers=THREADS_METADADOS):
+    """
+    Percorre recursivamente o diretório com `os.scandir` e produz os arquivos com as extensões informadas.
+
+    Com `max_workers` > 1, os diretórios são listados em paralelo por threads
+    (as chamadas a scandir e stat liberam o GIL), e os arquivos chegam na ordem
+    em que são encontrados. A stat de cada arquivo é a da varredura, e pode ser
+    repassada a `extrair_metadados`. A fila entre as threads e o consumidor tem
+    tamanho fixo, então a memória não cresce com o número de arquivos.
+
+    Args:
+        diretorio (str): Diretório raiz.
+        extensoes (tuple de str, optional): Extensões aceitas, em minúsculas. Padrão: .txt, .pdf e .md.
+        max_workers (int, optional): Número de threads. Padrão: `RAG_THREADS_METADADOS` ou uma por CPU (até 8).
+
+    Yields:
+        tuple: (nome_arquivo, os.stat_result), com nome_arquivo relativo ao diretório e separado por '/'.
+    """
+    prefixo = len(os.path.join(diretorio, ""))
+    if max_workers > 1:
+        arquivos = _varrer_em_threads(diretorio, extensoes, max_workers)
+    else:
+        arquivos = _varrer_em_serie(diretorio, extensoes)
+    for caminho, stat_info in arquivos:
+        yield caminho[prefixo:].replace(os.sep, "/"), stat_info
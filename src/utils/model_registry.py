@@ -0,0 +1,250 @@
+import os
+import threading
+from collections import OrderedDict
+from src.config import carregar_ambiente
+
+carregar_ambiente()
+
+# Orçamento de memória (em MB) para os modelos residentes no processo
+MEMORIA_MAXIMA_MB = int(os.environ.get("RAG_MODELOS_MEMORIA_MAX_MB", "4096"))
+
+# Modelo de classificação usado por classificar_query
+MODELO_CLASSIFICADOR = "distilbert-base-multilingual-cased"
+
+
+def _estimar_memoria(modelo):
+    """
+    Estima a memória ocupada pelos pesos de um modelo (em bytes).
+
+    Args:
+        modelo: Modelo PyTorch, SentenceTransformer ou pipeline do transformers.
+
+    Returns:
+        int: Número aproximado de bytes ocupados pelos parâmetros e buffers do modelo.
+    """
+    if getattr(modelo, "memoria_estimada_bytes", None) is not None:
+        return modelo.memoria_estimada_bytes  # Informado pelo carregador (ex.: modelos quantizados ou ONNX)
+
+    if hasattr(modelo, "model") and not hasattr(modelo, "parameters"):
+        modelo = modelo.model  # Pipelines do transformers guardam o modelo em .model
+
+    if not hasattr(modelo, "parameters"):
+        return 0
+
+    total = sum(p.numel() * p.element_size() for p in modelo.parameters())
+    if hasattr(modelo, "buffers"):
+        total += sum(b.numel() * b.element_size() for b in modelo.buffers())
+    return total
+
+
+class RegistroModelos:
+    """
+    Registro de modelos compartilhado pelo processo inteiro.
+
+    Os modelos são carregados sob demanda (lazy) e identificados pela chave
+    (tipo, nome do modelo, dispositivo, dtype e, para embeddings, o backend de
+    inferência). Quando a soma da memória dos modelos residentes ultrapassa o
+    orçamento, os menos usados recentemente são descarregados (LRU). O acesso
+    é seguro entre threads: cada chave tem seu próprio lock de carregamento,
+    de forma que duas threads pedindo o mesmo modelo não o carregam duas vezes.
+    """
+
+    def __init__(self, memoria_maxima_bytes=MEMORIA_MAXIMA_MB * 1024 * 1024):
+        self.memoria_maxima_bytes = memoria_maxima_bytes
+        self._modelos = OrderedDict()  # chave -> (modelo, bytes)
+        self._lock = threading.Lock()
+        self._locks_carregamento = {}
+        self._estatisticas = {"carregamentos": 0, "acertos": 0, "despejos": 0}
+
+    def obter(self, chave, carregador):
+        """
+        Retorna o modelo associado à chave, carregando-o com `carregador` se necessário.
+
+        Args:
+            chave (tuple): Identificador do modelo (tipo, nome, dispositivo, dtype[, backend]).
+            carregador (callable): Função sem argumentos que carrega e retorna o modelo.
+
+        Returns:
+            O modelo residente.
+        """
+        with self._lock:
+            if chave in self._modelos:
+                self._modelos.move_to_end(chave)
+                self._estatisticas["acertos"] += 1
+                return self._modelos[chave][0]
+            lock_chave = self._locks_carregamento.setdefault(chave, threading.Lock())
+
+        with lock_chave:
+            # Outra thread pode ter carregado o modelo enquanto esperávamos o lock
+            with self._lock:
+                if chave in self._modelos:
+                    self._modelos.move_to_end(chave)
+                    self._estatisticas["acertos"] += 1
+                    return self._modelos[chave][0]
+
+            modelo = carregador()
+            tamanho = _estimar_memoria(modelo)
+
+            with self._lock:
+                self._modelos[chave] = (modelo, tamanho)
+                self._estatisticas["carregamentos"] += 1
+                self._despejar_excedentes(chave)
+                self._locks_carregamento.pop(chave, None)
+            return modelo
+
+    def _despejar_excedentes(self, chave_protegida):
+        """Descarrega os modelos menos usados até respeitar o orçamento de memória (chamar com o lock)."""
+        while self._memoria_em_uso() > self.memoria_maxima_bytes and len(self._modelos) > 1:
+            chave_antiga = next(iter(self._modelos))
+            if chave_antiga == chave_protegida:
+                break
+            del self._modelos[chave_antiga]
+            self._estatisticas["despejos"] += 1
+            print(f"Modelo '{chave_antiga[1]}' ({chave_antiga[0]}) descarregado do registro para liberar memória.")
+
+    def _memoria_em_uso(self):
+        return sum(tamanho for _, tamanho in self._modelos.values())
+
+    def remover(self, chave):
+        """Remove explicitamente um modelo do registro. Retorna True se ele estava residente."""
+        with self._lock:
+            return self._modelos.pop(chave, None) is not None
+
+    def limpar(self):
+        """Descarrega todos os modelos residentes."""
+        with self._lock:
+            self._modelos.clear()
+
+    def estatisticas(self):
+        """
+        Retorna os contadores do registro.
+
+        Returns:
+            dict: Carregamentos, acertos, despejos, número de modelos residentes e memória em uso (bytes).
+        """
+        with self._lock:
+            return {
+                **self._estatisticas,
+                "modelos_residentes": len(self._modelos),
+                "memoria_bytes": self._memoria_em_uso(),
+            }
+
+
+# Registro padrão do processo
+registro_modelos = RegistroModelos()
+
+
+def obter_modelo_embedding(model_name, device="cpu", dtype=None, backend=None):
+    """
+    Retorna um SentenceTransformer residente, carregando-o apenas na primeira chamada.
+
+    Args:
+        model_name (str): Nome do modelo Sentence Transformer.
+        device (str or torch.device, optional): Dispositivo onde o modelo roda. Padrão: "cpu".
+        dtype (str, optional): "float16" para carregar o modelo em meia precisão. Padrão: float32.
+        backend (str, optional): Backend de inferência ("torch", "torch-int8" ou "onnx-int8").
+            Padrão: `RAG_BACKEND_ENCODER` ou "torch".
+
+    Returns:
+        SentenceTransformer: O modelo carregado.
+    """
+    from src.utils.encoders import BACKEND_TORCH, carregar_encoder, validar_backend
+
+    backend = validar_backend(backend)
+    dtype = dtype or "float32"
+    if backend != BACKEND_TORCH:
+        device, dtype = "cpu", "int8"  # Backends quantizados rodam só em CPU
+    chave = ("embedding", model_name, str(device), dtype, backend)
+
+    def carregar():
+        print(f"Carregando modelo de embedding: {model_name} ({device}, {dtype}, backend {backend})")
+        return carregar_encoder(model_name, backend=backend, device=device, dtype=dtype)
+
+    return registro_modelos.obter(chave, carregar)
+
+
+def obter_classificador(model_name=MODELO_CLASSIFICADOR, device="cpu", dtype=None):
+    """
+    Retorna um pipeline de classificação de texto residente.
+
+    Args:
+        model_name (str, optional): Nome do modelo de classificação.
+        device (str, optional): Dispositivo onde o pipeline roda. Padrão: "cpu".
+        dtype (str, optional): "float16" para meia precisão. Padrão: float32.
+
+    Returns:
+        transformers.Pipeline: O pipeline de classificação.
+    """
+    dtype = dtype or "float32"
+    chave = ("classificacao", model_name, str(device), dtype)
+
+    def carregar():
+        from transformers import pipeline
+
+        print(f"Carregando modelo de classificação: {model_name} ({device}, {dtype})")
+        classificador = pipeline("text-classification", model=model_name, device=str(device))
+        if dtype == "float16":
+            classificador.model = classificador.model.half()
+        return classificador
+
+    return registro_modelos.obter(chave, carregar)
+
+
+def obter_reranker(model_name, device="cpu", dtype=None):
+    """
+    Retorna um CrossEncoder (re-ranqueador) residente, carregando-o apenas na primeira chamada.
+
+    Args:
+        model_name (str): Nome do modelo cross-encoder.
+        device (str, optional): Dispositivo onde o modelo roda. Padrão: "cpu".
+        dtype (str, optional): "float16" para meia precisão. Padrão: float32.
+
+    Returns:
+        sentence_transformers.CrossEncoder: O modelo carregado.
+    """
+    dtype = dtype or "float32"
+    chave = ("reranker", model_name, str(device), dtype)
+
+    def carregar():
+        from sentence_transformers import CrossEncoder
+
+        print(f"Carregando re-ranqueador: {model_name} ({device}, {dtype})")
+        reranker = CrossEncoder(model_name, device=str(device))
+        if dtype == "float16":
+            reranker.model.half()
+        reranker.memoria_estimada_bytes = _estimar_memoria(reranker.model)
+        return reranker
+
+    return registro_modelos.obter(chave, carregar)
+
+
+def aquecer_modelos(model_names, device="cpu", dtype=None, incluir_classificador=False, backend=None, reranker=None):
+    """
+    Carrega os modelos informados e executa uma inferência de aquecimento em cada um.
+
+    Deve ser chamada na inicialização da aplicação, para que a primeira busca
+    não pague o custo de carregamento do modelo.
+
+    Args:
+        model_names (list de str): Modelos de embedding a carregar.
+        device (str, optional): Dispositivo dos modelos. Padrão: "cpu".
+        dtype (str, optional): dtype dos modelos. Padrão: float32.
+        incluir_classificador (bool, optional): Se True, também aquece o classificador de queries.
+        backend (str, optional): Backend de inferência dos modelos de embedding.
+        reranker (str, optional): Modelo cross-encoder a aquecer também (ver `src.utils.reranker`).
+    """
+    for model_name in model_names:
+        modelo = obter_modelo_embedding(model_name, device=device, dtype=dtype, backend=backend)
+        modelo.encode("aquecimento")
+
+    if incluir_classificador:
+        classificador = obter_classificador(device=device, dtype=dtype)
+        classificador("aquecimento")
+
+    if reranker:
+        obter_reranker(reranker, device=device, dtype=dtype).predict([("aquecimento", "aquecimento")])
+
+
+def estatisticas_modelos():
+    """Retorna os contadores de carregamentos, acertos e despejos do registro padrão."""
+    return registro_modelos.estatisticas()
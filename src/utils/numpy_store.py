@@ -0,0 +1,807 @@
+import json
+import os
+import re
+import threading
+import time
+from functools import reduce
+import numpy as np
+from src.config import carregar_ambiente
+from src.database.conexao import MAX_PARAMETROS_SQL, obter_conexao, transacao
+from src.utils.query_cache import chave_hashavel
+from src.utils.trava_arquivo import trava_arquivo
+from src.utils.vector_store import ARMAZENAMENTO_NUMPY, DIRETORIOS_ARMAZENAMENTO, VectorStore
+
+carregar_ambiente()
+
+# Precisão da matriz varrida na busca: float32, float16 ou int8 (com uma escala float32 por vetor). O
+# produto interno é sempre calculado em float32; float16 e int8 reduzem a 1/2 e a ~1/4 a memória mapeada.
+DTYPE_VETORES = os.environ.get("RAG_NUMPY_STORE_DTYPE", "float32")
+DTYPES_VETORES = ("float32", "float16", "int8")
+
+# Redução de dimensão da matriz de busca (0 = nenhuma): "pca" (componentes principais ajustadas no corpus)
+# ou "truncar" (primeiras coordenadas, renormalizadas; para modelos treinados no estilo Matryoshka)
+DIMENSAO_REDUZIDA = int(os.environ.get("RAG_NUMPY_STORE_DIMENSAO", "0"))
+REDUCAO_DIMENSAO = os.environ.get("RAG_NUMPY_STORE_REDUCAO", "pca")
+REDUCOES = ("pca", "truncar")
+
+# Re-scoring: com a matriz de busca compacta, são pedidos FATOR x k candidatos a ela e os k melhores são
+# escolhidos pelo produto interno com os vetores float32 completos, guardados em um arquivo à parte do
+# qual só as linhas dos candidatos são lidas. 0 = sem re-scoring (e, sem redução de dimensão, sem a cópia).
+FATOR_RESCORE = int(os.environ.get("RAG_NUMPY_STORE_RESCORE", "4"))
+
+# Vetores a partir dos quais a PCA é ajustada (antes disso a busca usa os vetores completos) e
+# tamanho máximo da amostra do ajuste
+MIN_VETORES_PCA = int(os.environ.get("RAG_NUMPY_STORE_MIN_PCA", "4096"))
+AMOSTRA_PCA = 50_000
+
+# Linhas da matriz multiplicadas por vez: limita a memória temporária a (queries x linhas) scores
+LINHAS_POR_BLOCO = int(os.environ.get("RAG_NUMPY_STORE_BLOCO", "32768"))
+
+# Matrizes float16/int8 são convertidas para float32 bloco a bloco: blocos que cabem no cache do processador
+# (até estes bytes convertidos) evitam alocar e percorrer na RAM uma cópia float32 grande a cada bloco
+BYTES_BLOCO_CONVERTIDO = 8 * 1024 * 1024
+
+# Capacidade inicial da matriz; ela dobra quando enche
+CAPACIDADE_INICIAL = 1024
+
+# Filtros que aceitam menos que esta fração das linhas: a busca reúne só as aceitas em vez de varrer a matriz
+FRACAO_FILTRO_SELETIVO = 0.25
+
+# Bitmaps de filtros mantidos em cache (descartados a cada escrita na coleção)
+MAX_BITMAPS_EM_CACHE = 64
+
+# Intervalo mínimo (s) entre verificações de escritas feitas por outros processos (geração em registros.db)
+INTERVALO_VERIFICACAO_S = float(os.environ.get("RAG_NUMPY_STORE_VERIFICACAO_S", "1.0"))
+
+SQL_CRIAR_REGISTROS = """
+CREATE TABLE IF NOT EXISTS registros (
+    linha INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    documento TEXT,
+    metadados TEXT
+)
+"""
+
+# Geração da coleção: incrementada na mesma transação de cada escrita, para que os outros processos
+# com a coleção aberta saibam que o estado em memória (IDs, linhas livres, códigos, memmaps) mudou
+SQL_CRIAR_GERACAO = """
+CREATE TABLE IF NOT EXISTS geracao (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    valor INTEGER NOT NULL
+)
+"""
+SQL_INICIAR_GERACAO = "INSERT OR IGNORE INTO geracao (id, valor) VALUES (1, 0)"
+SQL_INCREMENTAR_GERACAO = "UPDATE geracao SET valor = valor + 1 WHERE id = 1"
+SQL_LER_GERACAO = "SELECT valor FROM geracao WHERE id = 1"
+
+SQL_UPSERT_REGISTRO = """
+INSERT INTO registros (linha, id, documento, metadados) VALUES (?, ?, ?, ?)
+ON CONFLICT (linha) DO UPDATE SET id = excluded.id, documento = excluded.documento, metadados = excluded.metadados
+"""
+
+
+def _comparar(operador):
+    def predicado(valor, alvo):
+        try:
+            return operador(valor, alvo)
+        except TypeError:  # Ex.: string comparada com número
+            return False
+    return predicado
+
+
+_OPERADORES = {
+    "$eq": lambda valor, alvo: valor == alvo,
+    "$ne": lambda valor, alvo: valor != alvo,
+    "$gt": _comparar(lambda valor, alvo: valor > alvo),
+    "$gte": _comparar(lambda valor, alvo: valor >= alvo),
+    "$lt": _comparar(lambda valor, alvo: valor < alvo),
+    "$lte": _comparar(lambda valor, alvo: valor <= alvo),
+    "$in": lambda valor, alvo: valor in alvo,
+    "$nin": lambda valor, alvo: valor not in alvo,
+}
+
+
+def _em_lotes(itens, tamanho_lote):
+    for inicio in range(0, len(itens), tamanho_lote):
+        yield itens[inicio:inicio + tamanho_lote]
+
+
+def normalizar_vetores(vetores):
+    """Converte para uma matriz float32 (n, d) com linhas de norma 1."""
+    vetores = np.atleast_2d(np.asarray(vetores, dtype=np.float32))
+    normas = np.linalg.norm(vetores, axis=1, keepdims=True)
+    return vetores / np.maximum(normas, 1e-12)
+
+
+def quantizar_int8(vetores):
+    """Quantiza cada linha em int8 com escala própria (máximo absoluto / 127). Retorna (códigos, escalas)."""
+    vetores = np.asarray(vetores, dtype=np.float32)
+    escalas = np.maximum(np.abs(vetores).max(axis=1), 1e-12) / 127
+    return np.rint(vetores / escalas[:, None]).astype(np.int8), escalas.astype(np.float32)
+
+
+def ajustar_pca(vetores, dimensao):
+    """
+    Componentes (dimensao, d) que melhor preservam os produtos internos dos vetores.
+
+    São os autovetores principais da matriz de segundo momento, sem centralizar:
+    a busca compara produtos internos, e não distâncias à média do corpus.
+    """
+    vetores = np.asarray(vetores, dtype=np.float64)
+    _, autovetores = np.linalg.eigh(vetores.T @ vetores)  # Autovalores em ordem crescente
+    return np.ascontiguousarray(autovetores[:, ::-1][:, :dimensao].T, dtype=np.float32)
+
+
+def buscar_top_k(consultas, vetores, k, mascara=None, linhas_por_bloco=LINHAS_POR_BLOCO, escalas=None):
+    """
+    Top-k exato por produto interno, em blocos de linhas.
+
+    Cada bloco é convertido para float32 e multiplicado por todas as queries de
+    uma vez; `argpartition` separa os k melhores do bloco, que são fundidos com
+    os k melhores acumulados. Só a ordenação final é completa, sobre k colunas.
+    Se a máscara aceita poucas linhas, só elas são lidas da matriz.
+
+    Args:
+        consultas (np.ndarray): Queries (m, d) em float32.
+        vetores (np.ndarray): Matriz (n, d); pode ser um memmap.
+        k (int): Número de vizinhos por query.
+        mascara (np.ndarray, optional): Bitmap (n,) das linhas elegíveis. Padrão: todas.
+        linhas_por_bloco (int, optional): Linhas multiplicadas por vez.
+        escalas (np.ndarray, optional): Escala (n,) de cada linha de uma matriz quantizada (ver `quantizar_int8`).
+
+    Returns:
+        tuple: (linhas, scores), arrays (m, k') do maior para o menor produto interno, com k' <= k.
+    """
+    m, n = len(consultas), len(vetores)
+    if vetores.dtype != np.float32:
+        linhas_por_bloco = min(linhas_por_bloco, max(256, BYTES_BLOCO_CONVERTIDO // (4 * vetores.shape[1])))
+    candidatas = None
+    elegiveis = n
+    if mascara is not None:
+        elegiveis = int(np.count_nonzero(mascara))
+        if elegiveis < FRACAO_FILTRO_SELETIVO * n:
+            candidatas, mascara = np.flatnonzero(mascara), None
+
+    k = min(k, elegiveis)
+    melhores_linhas = np.empty((m, 0), dtype=np.int64)
+    melhores_scores = np.empty((m, 0), dtype=np.float32)
+    if k <= 0:
+        return melhores_linhas, melhores_scores
+
+    total = n if candidatas is None else len(candidatas)
+    for inicio in range(0, total, linhas_por_bloco):
+        fim = min(inicio + linhas_por_bloco, total)
+        if candidatas is None:
+            linhas_bloco = np.arange(inicio, fim)
+            bloco = vetores[inicio:fim]
+        else:
+            linhas_bloco = candidatas[inicio:fim]
+            bloco = vetores[linhas_bloco]
+
+        scores = consultas @ np.asarray(bloco, dtype=np.float32).T
+        if escalas is not None:
+            scores *= escalas[inicio:fim] if candidatas is None else escalas[linhas_bloco]
+        if mascara is not None:
+            scores[:, ~mascara[inicio:fim]] = -np.inf
+
+        k_bloco = min(k, fim - inicio)
+        parte = np.argpartition(-scores, k_bloco - 1, axis=1)[:, :k_bloco]
+        scores = np.concatenate([melhores_scores, np.take_along_axis(scores, parte, axis=1)], axis=1)
+        linhas = np.concatenate([melhores_linhas, linhas_bloco[parte]], axis=1)
+        if scores.shape[1] > k:
+            parte = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            scores = np.take_along_axis(scores, parte, axis=1)
+            linhas = np.take_along_axis(linhas, parte, axis=1)
+        melhores_scores, melhores_linhas = scores, linhas
+
+    ordem = np.argsort(-melhores_scores, axis=1, kind="stable")
+    return np.take_along_axis(melhores_linhas, ordem, axis=1), np.take_along_axis(melhores_scores, ordem, axis=1)
+
+
+def reordenar_top_k(consultas, vetores, linhas, k):
+    """
+    Re-scoring: reordena os candidatos de cada query pelo produto interno com os vetores completos.
+
+    Só as linhas candidatas (sem repetição entre as queries) são lidas de `vetores`.
+
+    Args:
+        consultas (np.ndarray): Queries (m, d) em float32.
+        vetores (np.ndarray): Matriz completa (n, d); pode ser um memmap.
+        linhas (np.ndarray): Candidatos (m, c) de cada query, como os de `buscar_top_k`.
+        k (int): Número de vizinhos por query.
+
+    Returns:
+        tuple: (linhas, scores), arrays (m, k') do maior para o menor produto interno, com k' <= k.
+    """
+    if linhas.shape[1] == 0:
+        return linhas, np.empty(linhas.shape, dtype=np.float32)
+    unicas, posicoes = np.unique(linhas.ravel(), return_inverse=True)
+    scores = consultas @ np.asarray(vetores[unicas], dtype=np.float32).T
+    scores = np.take_along_axis(scores, posicoes.reshape(linhas.shape), axis=1)
+    ordem = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+    return np.take_along_axis(linhas, ordem, axis=1), np.take_along_axis(scores, ordem, axis=1)
+
+
+def _redimensionar(caminho, atual, capacidade, n_linhas, dtype, forma_linha):
+    """Cria o .npy de `capacidade` linhas copiando as `n_linhas` primeiras de `atual` (que segue válido) e o mapeia."""
+    temporario = caminho + ".tmp"
+    nova = np.lib.format.open_memmap(temporario, mode="w+", dtype=dtype, shape=(capacidade, *forma_linha))
+    for inicio in range(0, n_linhas if atual is not None else 0, LINHAS_POR_BLOCO):
+        fim = min(inicio + LINHAS_POR_BLOCO, n_linhas)
+        nova[inicio:fim] = atual[inicio:fim]
+    nova.flush()
+    del nova
+    os.replace(temporario, caminho)
+    return np.load(caminho, mmap_mode="r+")
+
+
+class ColecaoNumpy(VectorStore):
+    """
+    Coleção de vetores com busca exata sobre uma matriz NumPy mapeada em memória.
+
+    Os vetores normalizados ficam em `vetores.npy` (memmap), uma linha por ID;
+    IDs, textos e metadados ficam no sidecar SQLite
+    `registros.db`, indexado pela linha. Cada campo de metadados é mantido em
+    memória como um array de códigos por linha, o que transforma um filtro
+    `where` em um bitmap calculado por operações vetorizadas, antes da busca.
+
+    Para até algumas centenas de milhares de vetores, a multiplicação em blocos
+    custa menos que o HNSW do ChromaDB e o resultado é exato. As distâncias são
+    a L2 ao quadrado entre vetores normalizados (2 - 2 * cosseno), a mesma
+    escala de uma coleção padrão do ChromaDB com embeddings normalizados.
+
+    A matriz de busca pode ser compacta: float16, int8 com uma escala por vetor
+    (`escalas.npy`) e/ou com dimensão reduzida por PCA ou truncamento. Nesse caso
+    os vetores float32 completos ficam em `completos.npy`, lido só nas linhas dos
+    candidatos para o re-scoring e para o ajuste da PCA. O formato é fixado na
+    criação da coleção e gravado em `formato.json`.
+
+    Linhas removidas são reaproveitadas por inserções seguintes. Escritas são
+    serializadas por um lock e, entre processos (ex.: a indexação ao lado do
+    serviço de busca), por uma trava em `.trava`; cada escrita incrementa a
+    geração em `registros.db`. Os outros processos comparam a geração no máximo
+    a cada `INTERVALO_VERIFICACAO_S` (e sempre antes de escrever) e, se ela
+    mudou, recarregam o estado em memória e remapeiam as matrizes. Buscas só
+    seguram o lock para montar o bitmap.
+    """
+
+    def __init__(self, diretorio, dtype=DTYPE_VETORES, dimensao_reduzida=DIMENSAO_REDUZIDA, reducao=REDUCAO_DIMENSAO,
+                 fator_rescore=FATOR_RESCORE, intervalo_verificacao=INTERVALO_VERIFICACAO_S):
+        if dtype not in DTYPES_VETORES:
+            raise ValueError(f"Precisão de vetores desconhecida: '{dtype}'. Opções: {', '.join(DTYPES_VETORES)}")
+        if reducao not in REDUCOES:
+            raise ValueError(f"Redução de dimensão desconhecida: '{reducao}'. Opções: {', '.join(REDUCOES)}")
+        self.diretorio = diretorio
+        self.fator_rescore = fator_rescore
+        self.intervalo_verificacao = intervalo_verificacao
+        self._caminho_vetores = os.path.join(diretorio, "vetores.npy")
+        self._caminho_escalas = os.path.join(diretorio, "escalas.npy")
+        self._caminho_completos = os.path.join(diretorio, "completos.npy")
+        self._caminho_projecao = os.path.join(diretorio, "projecao.npy")
+        self._caminho_formato = os.path.join(diretorio, "formato.json")
+        self._caminho_registros = os.path.join(diretorio, "registros.db")
+        self._caminho_trava = os.path.join(diretorio, ".trava")
+        self._lock = threading.RLock()
+        self.formato = {
+            "dtype": dtype,
+            "dimensao": None,  # Dimensão dos embeddings, conhecida na primeira inserção
+            "dimensao_reduzida": dimensao_reduzida,
+            "reducao": reducao,
+            "completos": bool(dimensao_reduzida) or (dtype != "float32" and fator_rescore > 0),
+        }
+        self._vetores = None  # memmap (capacidade, dimensão da busca), criado na primeira inserção
+        self._escalas = None  # memmap (capacidade,) das escalas dos vetores int8
+        self._completos = None  # memmap (capacidade, dimensão) float32, se a matriz de busca é compacta
+        self._projecao = None  # Componentes (dimensao_reduzida, dimensão) da PCA, depois do ajuste
+        self._n_linhas = 0  # Linhas já usadas, vivas ou livres
+        self._ids = []  # linha -> ID (None se a linha está livre)
+        self._linha_por_id = {}
+        self._livres = []
+        self._vivos = np.zeros(0, dtype=bool)
+        self._codigos = {}  # campo -> array int32 (capacidade,) com o código do valor, -1 se ausente
+        self._vocabularios = {}  # campo -> ({(é_bool, valor): código}, [valor por código])
+        self._bitmaps = {}
+        self._geracao = None  # Geração de registros.db refletida no estado em memória
+        self._verificado_em = 0.0
+
+        os.makedirs(diretorio, exist_ok=True)
+        with trava_arquivo(self._caminho_trava):
+            with transacao(self._caminho_registros) as conn:
+                conn.execute(SQL_CRIAR_REGISTROS)
+                conn.execute(SQL_CRIAR_GERACAO)
+                conn.execute(SQL_INICIAR_GERACAO)
+            self._carregar()
+
+    # --- Estado em memória ------------------------------------------------------------
+
+    def _carregar(self):
+        """(Re)constrói o estado em memória a partir dos arquivos. Chamar com a trava entre processos."""
+        self._vetores = self._escalas = self._completos = self._projecao = None
+        self._linha_por_id, self._codigos, self._vocabularios, self._bitmaps = {}, {}, {}, {}
+        if os.path.exists(self._caminho_vetores):
+            self._vetores = np.load(self._caminho_vetores, mmap_mode="r+")
+        if os.path.exists(self._caminho_escalas):
+            self._escalas = np.load(self._caminho_escalas, mmap_mode="r+")
+        if os.path.exists(self._caminho_completos):
+            self._completos = np.load(self._caminho_completos, mmap_mode="r+")
+        if os.path.exists(self._caminho_projecao):
+            self._projecao = np.load(self._caminho_projecao)
+
+        # O formato de uma coleção existente prevalece sobre o pedido; coleções anteriores ao formato.json
+        # têm só a matriz completa, no dtype em que foi gravada
+        if os.path.exists(self._caminho_formato):
+            with open(self._caminho_formato, encoding="utf-8") as f:
+                self.formato = json.load(f)
+        elif self._vetores is not None:
+            self.formato.update(dtype=self._vetores.dtype.name, dimensao=self._vetores.shape[1], dimensao_reduzida=0,
+                                completos=False)
+            self._gravar_formato()
+        self._vivos = np.zeros(self._capacidade(), dtype=bool)
+
+        conn = obter_conexao(self._caminho_registros)
+        conn.execute("BEGIN")  # Geração e registros lidos do mesmo snapshot
+        try:
+            self._geracao = conn.execute(SQL_LER_GERACAO).fetchone()[0]
+            registros = conn.execute("SELECT linha, id, metadados FROM registros ORDER BY linha").fetchall()
+        finally:
+            conn.commit()
+        self._verificado_em = time.monotonic()
+        self._n_linhas = registros[-1]["linha"] + 1 if registros else 0
+        if self._n_linhas > self._capacidade():
+            raise ValueError(f"Coleção '{self.diretorio}' inconsistente: {self._n_linhas} registros e "
+                             f"{self._capacidade()} linhas em '{self._caminho_vetores}'.")
+
+        self._ids = [None] * self._n_linhas
+        for registro in registros:
+            linha = registro["linha"]
+            self._ids[linha] = registro["id"]
+            self._linha_por_id[registro["id"]] = linha
+            self._vivos[linha] = True
+            self._gravar_metadados(linha, json.loads(registro["metadados"]) if registro["metadados"] else None)
+        self._livres = [linha for linha, id_ in enumerate(self._ids) if id_ is None]
+
+    def _sincronizar(self, forcar=False):
+        """
+        Recarrega o estado em memória se outro processo escreveu na coleção.
+
+        Sem `forcar`, a geração é lida no máximo a cada `intervalo_verificacao`.
+        Com `forcar` (antes de escrever, com a trava já tomada), é lida sempre.
+        """
+        agora = time.monotonic()
+        if not forcar and agora - self._verificado_em < self.intervalo_verificacao:
+            return
+        self._verificado_em = agora
+        if obter_conexao(self._caminho_registros).execute(SQL_LER_GERACAO).fetchone()[0] == self._geracao:
+            return
+        with trava_arquivo(self._caminho_trava):
+            with self._lock:
+                if obter_conexao(self._caminho_registros).execute(SQL_LER_GERACAO).fetchone()[0] != self._geracao:
+                    self._carregar()
+
+    def _avancar_geracao(self, conn):
+        """Incrementa a geração na transação de escrita `conn`; o estado em memória passa a refleti-la."""
+        conn.execute(SQL_INCREMENTAR_GERACAO)
+        self._geracao = conn.execute(SQL_LER_GERACAO).fetchone()[0]
+
+    def _gravar_formato(self):
+        temporario = self._caminho_formato + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(self.formato, f)
+        os.replace(temporario, self._caminho_formato)
+
+    def _capacidade(self):
+        matriz = self._completos if self._completos is not None else self._vetores
+        return 0 if matriz is None else matriz.shape[0]
+
+    def _aguarda_pca(self):
+        """True se a coleção usa PCA e ela ainda não foi ajustada (a busca usa os vetores completos)."""
+        return bool(self.formato["dimensao_reduzida"]) and self.formato["reducao"] == "pca" and self._projecao is None
+
+    def _matrizes_busca(self):
+        """(atributo, caminho, dtype, forma da linha) da matriz de busca e, em int8, das escalas."""
+        colunas = self.formato["dimensao_reduzida"] or self.formato["dimensao"]
+        matrizes = [("_vetores", self._caminho_vetores, np.dtype(self.formato["dtype"]), (colunas,))]
+        if self.formato["dtype"] == "int8":
+            matrizes.append(("_escalas", self._caminho_escalas, np.float32, ()))
+        return matrizes
+
+    def _matrizes(self):
+        """Matrizes por linha mantidas no estado atual (a de busca só existe depois do ajuste da PCA)."""
+        matrizes = []
+        if self.formato["completos"]:
+            matrizes.append(("_completos", self._caminho_completos, np.float32, (self.formato["dimensao"],)))
+        if not self._aguarda_pca():
+            matrizes.extend(self._matrizes_busca())
+        return matrizes
+
+    def _projetar(self, vetores, projecao):
+        """Leva vetores completos normalizados ao espaço da matriz de busca (sem mudar a precisão)."""
+        dimensao_reduzida = self.formato["dimensao_reduzida"]
+        if not dimensao_reduzida:
+            return vetores
+        if self.formato["reducao"] == "truncar":
+            return normalizar_vetores(vetores[:, :dimensao_reduzida])
+        return vetores @ projecao.T
+
+    def _compactar(self, vetores, projecao):
+        """Linhas da matriz de busca para vetores completos normalizados: (linhas, escalas ou None)."""
+        vetores = self._projetar(vetores, projecao)
+        if self.formato["dtype"] == "int8":
+            return quantizar_int8(vetores)
+        return vetores.astype(self.formato["dtype"]), None
+
+    def _garantir_capacidade(self, linhas_necessarias, dimensao):
+        """Cria ou aumenta (dobrando) os arquivos das matrizes. As antigas continuam válidas para buscas em curso."""
+        if self.formato["dimensao"] is None:
+            if self.formato["dimensao_reduzida"] and self.formato["dimensao_reduzida"] >= dimensao:
+                # Sem esta verificação, o truncamento falharia no primeiro upsert e a PCA só no ajuste
+                raise ValueError(f"Dimensão reduzida {self.formato['dimensao_reduzida']} não é menor que a dimensão "
+                                 f"{dimensao} dos embeddings da coleção '{self.diretorio}'.")
+            self.formato["dimensao"] = dimensao
+            self._gravar_formato()
+        elif self.formato["dimensao"] != dimensao:
+            raise ValueError(f"Dimensão {dimensao} incompatível com a coleção '{self.diretorio}' "
+                             f"(dimensão {self.formato['dimensao']}).")
+        capacidade = self._capacidade()
+        if linhas_necessarias <= capacidade:
+            return
+
+        nova_capacidade = max(CAPACIDADE_INICIAL, capacidade)
+        while nova_capacidade < linhas_necessarias:
+            nova_capacidade *= 2
+
+        for atributo, caminho, dtype, forma_linha in self._matrizes():
+            setattr(self, atributo, _redimensionar(caminho, getattr(self, atributo), nova_capacidade, self._n_linhas,
+                                                   dtype, forma_linha))
+
+        acrescimo = nova_capacidade - capacidade
+        self._vivos = np.concatenate([self._vivos, np.zeros(acrescimo, dtype=bool)])
+        for campo, codigos in self._codigos.items():
+            self._codigos[campo] = np.concatenate([codigos, np.full(acrescimo, -1, dtype=np.int32)])
+
+    def _codigo(self, campo, valor):
+        codigos_por_valor, valores = self._vocabularios.setdefault(campo, ({}, []))
+        chave = (isinstance(valor, bool), valor)  # True e 1 são valores distintos nos metadados
+        codigo = codigos_por_valor.get(chave)
+        if codigo is None:
+            codigo = codigos_por_valor[chave] = len(valores)
+            valores.append(valor)
+        return codigo
+
+    def _gravar_metadados(self, linha, metadados):
+        for codigos in self._codigos.values():
+            codigos[linha] = -1
+        for campo, valor in (metadados or {}).items():
+            codigos = self._codigos.get(campo)
+            if codigos is None:
+                codigos = self._codigos[campo] = np.full(self._capacidade(), -1, dtype=np.int32)
+            codigos[linha] = self._codigo(campo, valor)
+
+    # --- Filtros ----------------------------------------------------------------------
+
+    def _bitmap_condicao(self, campo, condicao, n):
+        codigos = self._codigos.get(campo)
+        if codigos is None:
+            return np.zeros(n, dtype=bool)  # Campo ausente em todos os registros
+        if not isinstance(condicao, dict):
+            condicao = {"$eq": condicao}
+
+        valores = self._vocabularios[campo][1]
+        bitmap = np.ones(n, dtype=bool)
+        for operador, alvo in condicao.items():
+            predicado = _OPERADORES.get(operador)
+            if predicado is None:
+                raise ValueError(f"Operador de filtro não suportado: '{operador}'")
+            # Avalia o predicado uma vez por valor distinto e espalha o resultado pelas linhas;
+            # o último elemento (False) é o que o código -1 (campo ausente) seleciona
+            aceitos = np.fromiter((predicado(valor, alvo) for valor in valores), dtype=bool, count=len(valores))
+            bitmap &= np.append(aceitos, False)[codigos[:n]]
+        return bitmap
+
+    def _bitmap(self, where, n):
+        if "$and" in where:
+            return reduce(np.logical_and, (self._bitmap(condicao, n) for condicao in where["$and"]))
+        if "$or" in where:
+            return reduce(np.logical_or, (self._bitmap(condicao, n) for condicao in where["$or"]))
+        bitmap = np.ones(n, dtype=bool)
+        for campo, condicao in where.items():
+            bitmap &= self._bitmap_condicao(campo, condicao, n)
+        return bitmap
+
+    def _mascara(self, where):
+        """Bitmap das linhas vivas que satisfazem `where` (None = todas as linhas são elegíveis). Chamar com o lock."""
+        n = self._n_linhas
+        if not where:
+            return None if len(self._linha_por_id) == n else self._vivos[:n].copy()
+
+        chave = chave_hashavel(where)
+        mascara = self._bitmaps.get(chave)
+        if mascara is None:
+            if len(self._bitmaps) >= MAX_BITMAPS_EM_CACHE:
+                self._bitmaps.clear()
+            mascara = self._bitmaps[chave] = self._vivos[:n] & self._bitmap(where, n)
+        return mascara
+
+    def _linhas(self, ids, where):
+        """Linhas vivas com os IDs informados (ou todas) que satisfazem `where`. Chamar com o lock."""
+        mascara = self._mascara(where)
+        if ids is None:
+            return (np.flatnonzero(mascara) if mascara is not None else np.arange(self._n_linhas)).tolist()
+        linhas = [self._linha_por_id[id_] for id_ in ids if id_ in self._linha_por_id]
+        return linhas if mascara is None else [linha for linha in linhas if mascara[linha]]
+
+    def _ler_registros(self, linhas, include):
+        colunas = ["linha", "id"]
+        if "documents" in include:
+            colunas.append("documento")
+        if "metadatas" in include:
+            colunas.append("metadados")
+
+        conn = obter_conexao(self._caminho_registros)
+        registros = {}
+        for bloco in _em_lotes(sorted(set(linhas)), MAX_PARAMETROS_SQL):
+            for registro in conn.execute(
+                f"SELECT {', '.join(colunas)} FROM registros WHERE linha IN ({', '.join('?' * len(bloco))})", bloco
+            ):
+                registros[registro["linha"]] = registro
+        return registros
+
+    # --- VectorStore ------------------------------------------------------------------
+
+    def upsert(self, ids, embeddings, metadatas=None, documents=None):
+        ids = list(ids)
+        if not ids:
+            return
+        vetores = normalizar_vetores(embeddings)
+        if len(vetores) != len(ids):
+            raise ValueError(f"{len(ids)} IDs e {len(vetores)} embeddings.")
+        metadatas = metadatas or [None] * len(ids)
+        documents = documents or [None] * len(ids)
+
+        with trava_arquivo(self._caminho_trava), self._lock:
+            self._sincronizar(forcar=True)
+            # Aloca as linhas sem alterar o estado: ele só muda depois que o sidecar foi gravado
+            livres = list(self._livres)
+            proxima = self._n_linhas
+            novas = {}
+            linhas = []
+            for id_ in ids:
+                linha = self._linha_por_id.get(id_, novas.get(id_))
+                if linha is None:
+                    if livres:
+                        linha = livres.pop()
+                    else:
+                        linha, proxima = proxima, proxima + 1
+                    novas[id_] = linha
+                linhas.append(linha)
+
+            self._garantir_capacidade(proxima, vetores.shape[1])
+            if self._completos is not None:
+                self._completos[linhas] = vetores
+            if self._vetores is not None:
+                compactos, escalas = self._compactar(vetores, self._projecao)
+                self._vetores[linhas] = compactos
+                if escalas is not None:
+                    self._escalas[linhas] = escalas
+
+            with transacao(self._caminho_registros) as conn:
+                conn.executemany(SQL_UPSERT_REGISTRO, [
+                    (linha, id_, documento, json.dumps(metadados, ensure_ascii=False) if metadados is not None else None)
+                    for linha, id_, documento, metadados in zip(linhas, ids, documents, metadatas)
+                ])
+                self._avancar_geracao(conn)
+
+            self._livres = livres
+            self._ids.extend([None] * (proxima - self._n_linhas))
+            for linha, id_, metadados in zip(linhas, ids, metadatas):
+                self._ids[linha] = id_
+                self._linha_por_id[id_] = linha
+                self._vivos[linha] = True
+                self._gravar_metadados(linha, metadados)
+            self._n_linhas = proxima
+            self._bitmaps.clear()
+
+            if self._aguarda_pca() and len(self._linha_por_id) >= MIN_VETORES_PCA:
+                self.ajustar_reducao()
+
+    def ajustar_reducao(self):
+        """
+        Ajusta (ou reajusta) a PCA com uma amostra dos vetores da coleção e regrava a matriz de busca.
+
+        Chamado na inserção que leva a coleção a `MIN_VETORES_PCA` vetores; pode
+        ser chamado de novo depois que o corpus mudar bastante. A nova matriz é
+        montada em arquivos temporários, e as buscas em curso seguem com a antiga.
+        """
+        with trava_arquivo(self._caminho_trava), self._lock:
+            self._sincronizar(forcar=True)
+            if not self.formato["dimensao_reduzida"] or self.formato["reducao"] != "pca" or self._completos is None:
+                return
+            vivas = np.flatnonzero(self._vivos[:self._n_linhas])
+            if not len(vivas):
+                return
+            amostra = np.sort(np.random.default_rng(0).choice(vivas, size=min(AMOSTRA_PCA, len(vivas)), replace=False))
+            projecao = ajustar_pca(self._completos[amostra], self.formato["dimensao_reduzida"])
+
+            novas = {atributo: np.lib.format.open_memmap(caminho + ".tmp", mode="w+", dtype=dtype,
+                                                         shape=(self._capacidade(), *forma_linha))
+                     for atributo, caminho, dtype, forma_linha in self._matrizes_busca()}
+            for inicio in range(0, self._n_linhas, LINHAS_POR_BLOCO):
+                fim = min(inicio + LINHAS_POR_BLOCO, self._n_linhas)
+                compactos, escalas = self._compactar(np.asarray(self._completos[inicio:fim]), projecao)
+                novas["_vetores"][inicio:fim] = compactos
+                if escalas is not None:
+                    novas["_escalas"][inicio:fim] = escalas
+
+            for atributo, caminho, _, _ in self._matrizes_busca():
+                novas.pop(atributo).flush()
+                os.replace(caminho + ".tmp", caminho)
+                setattr(self, atributo, np.load(caminho, mmap_mode="r+"))
+            np.save(self._caminho_projecao + ".tmp.npy", projecao)
+            os.replace(self._caminho_projecao + ".tmp.npy", self._caminho_projecao)
+            self._projecao = projecao
+            with transacao(self._caminho_registros) as conn:  # Os outros processos remapeiam as novas matrizes
+                self._avancar_geracao(conn)
+
+    def delete(self, ids=None, where=None):
+        if ids is None and not where:
+            return
+        with trava_arquivo(self._caminho_trava), self._lock:
+            self._sincronizar(forcar=True)
+            linhas = self._linhas(ids, where)
+            if not linhas:
+                return
+            with transacao(self._caminho_registros) as conn:
+                conn.executemany("DELETE FROM registros WHERE linha = ?", [(linha,) for linha in linhas])
+                self._avancar_geracao(conn)
+
+            for linha in linhas:
+                del self._linha_por_id[self._ids[linha]]
+                self._ids[linha] = None
+                self._vivos[linha] = False
+                self._gravar_metadados(linha, None)
+                self._livres.append(linha)
+            self._bitmaps.clear()
+
+    def query(self, query_embeddings, n_results=10, where=None, include=("metadatas", "documents", "distances")):
+        consultas = normalizar_vetores(query_embeddings)
+        self._sincronizar()
+        with self._lock:
+            vetores, escalas, completos, projecao = self._vetores, self._escalas, self._completos, self._projecao
+            n = self._n_linhas
+            mascara = self._mascara(where)
+
+        if n == 0 or (vetores is None and completos is None):
+            linhas, scores = np.empty((len(consultas), 0), dtype=np.int64), np.empty((len(consultas), 0))
+        elif vetores is None:  # PCA ainda não ajustada: busca exata nos vetores completos
+            linhas, scores = buscar_top_k(consultas, completos[:n], n_results, mascara)
+        else:
+            reordenar = completos is not None and self.fator_rescore > 0
+            linhas, scores = buscar_top_k(self._projetar(consultas, projecao), vetores[:n],
+                                          n_results * self.fator_rescore if reordenar else n_results, mascara,
+                                          escalas=escalas[:n] if escalas is not None else None)
+            if reordenar:
+                linhas, scores = reordenar_top_k(consultas, completos, linhas, n_results)
+
+        registros = self._ler_registros(linhas.ravel().tolist(), include)
+        resultado = {"ids": [], "distances": [], "documents": [], "metadatas": []}
+        for linhas_query, scores_query in zip(linhas.tolist(), scores.tolist()):
+            # Uma linha removida depois da busca não tem mais registro e é descartada
+            hits = [(registros[linha], score) for linha, score in zip(linhas_query, scores_query) if linha in registros]
+            resultado["ids"].append([registro["id"] for registro, _ in hits])
+            resultado["distances"].append([max(0.0, 2.0 - 2.0 * score) for _, score in hits])
+            if "documents" in include:
+                resultado["documents"].append([registro["documento"] for registro, _ in hits])
+            if "metadatas" in include:
+                resultado["metadatas"].append(
+                    [json.loads(registro["metadados"]) if registro["metadados"] else None for registro, _ in hits]
+                )
+        return {campo: valores for campo, valores in resultado.items() if campo == "ids" or campo in include}
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("metadatas", "documents")):
+        self._sincronizar()
+        with self._lock:
+            linhas = self._linhas(ids, where)[offset or 0:]
+            vetores, escalas, completos = self._vetores, self._escalas, self._completos
+        if limit is not None:
+            linhas = linhas[:limit]
+
+        registros = self._ler_registros(linhas, include)
+        linhas = [linha for linha in linhas if linha in registros]
+        resultado = {"ids": [registros[linha]["id"] for linha in linhas]}
+        if "documents" in include:
+            resultado["documents"] = [registros[linha]["documento"] for linha in linhas]
+        if "metadatas" in include:
+            resultado["metadatas"] = [
+                json.loads(registros[linha]["metadados"]) if registros[linha]["metadados"] else None for linha in linhas
+            ]
+        if "embeddings" in include:
+            if not linhas:
+                resultado["embeddings"] = np.empty((0, 0))
+            elif completos is not None:
+                resultado["embeddings"] = np.asarray(completos[linhas])
+            elif escalas is not None:  # int8 sem a cópia completa: vetores dequantizados
+                resultado["embeddings"] = vetores[linhas].astype(np.float32) * escalas[linhas][:, None]
+            else:
+                resultado["embeddings"] = np.asarray(vetores[linhas], dtype=np.float32)
+        return resultado
+
+    def count(self):
+        self._sincronizar()
+        with self._lock:
+            return len(self._linha_por_id)
+
+    def fechar(self):
+        """Grava em disco as páginas pendentes das matrizes."""
+        with self._lock:
+            for matriz in (self._vetores, self._escalas, self._completos):
+                if matriz is not None:
+                    matriz.flush()
+
+
+class SessaoNumpy:
+    """
+    Sessão sobre um diretório de coleções `ColecaoNumpy`, com a mesma interface de `SessaoChroma`.
+
+    Cada coleção fica em um subdiretório e é aberta (memmap e metadados em
+    memória) uma única vez por sessão. O formato (precisão, redução de dimensão
+    e re-scoring) vale para as coleções criadas pela sessão.
+    """
+
+    def __init__(self, persist_path=DIRETORIOS_ARMAZENAMENTO[ARMAZENAMENTO_NUMPY], dtype=DTYPE_VETORES,
+                 dimensao_reduzida=DIMENSAO_REDUZIDA, reducao=REDUCAO_DIMENSAO, fator_rescore=FATOR_RESCORE):
+        self.persist_path = persist_path
+        self.formato = {"dtype": dtype, "dimensao_reduzida": dimensao_reduzida, "reducao": reducao,
+                        "fator_rescore": fator_rescore}
+        self._colecoes = {}
+        self._lock = threading.RLock()
+
+    def _diretorio_colecao(self, nome):
+        return os.path.join(self.persist_path, re.sub(r"[^A-Za-z0-9_.-]+", "_", nome))
+
+    def obter_colecao(self, nome, criar=False):
+        """
+        Retorna a coleção (aberta uma única vez).
+
+        Raises:
+            ValueError: Se a coleção não existir e `criar` for False.
+        """
+        with self._lock:
+            colecao = self._colecoes.get(nome)
+            if colecao is None:
+                diretorio = self._diretorio_colecao(nome)
+                if not criar and not os.path.isdir(diretorio):
+                    raise ValueError(f"Coleção '{nome}' não existe em '{self.persist_path}'.")
+                colecao = self._colecoes[nome] = ColecaoNumpy(diretorio, **self.formato)
+            return colecao
+
+    def executar(self, nome, operacao, criar=False):
+        """Executa `operacao(colecao)` sobre a coleção."""
+        return operacao(self.obter_colecao(nome, criar=criar))
+
+    def esquecer_colecao(self, nome):
+        """Descarta a coleção aberta; o próximo acesso a reabre do disco."""
+        with self._lock:
+            colecao = self._colecoes.pop(nome, None)
+        if colecao is not None:
+            colecao.fechar()
+
+    def reabrir(self):
+        """Descarta todas as coleções abertas."""
+        with self._lock:
+            colecoes, self._colecoes = self._colecoes, {}
+        for colecao in colecoes.values():
+            colecao.fechar()
+
+
+_sessoes = {}
+_sessoes_lock = threading.Lock()
+
+
+def obter_sessao_numpy(persist_path=DIRETORIOS_ARMAZENAMENTO[ARMAZENAMENTO_NUMPY]):
+    """Retorna a sessão compartilhada do processo para o caminho informado."""
+    chave = os.path.abspath(persist_path)
+    with _sessoes_lock:
+        sessao = _sessoes.get(chave)
+        if sessao is None:
+            sessao = _sessoes[chave] = SessaoNumpy(persist_path)
+        return sessao
@@ -0,0 +1,659 @@
+import atexit
+import heapq
+import itertools
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from src.config import carregar_ambiente
+from src.utils.chunking import separar_id_chunk
+from src.utils.trava_arquivo import trava_arquivo
+from src.utils.vector_store import (
+    ARMAZENAMENTO_CHROMA,
+    ARMAZENAMENTO_NUMPY,
+    ARMAZENAMENTO_PARTICIONADO,
+    DIRETORIOS_ARMAZENAMENTO,
+    VectorStore,
+)
+
+carregar_ambiente()
+
+# Número de shards de um armazenamento novo (um armazenamento existente segue o do seu arquivo de partições)
+N_SHARDS = int(os.environ.get("RAG_SHARDS", "4"))
+
+# Armazenamento de cada shard: "chroma" ou "numpy"
+BASE_SHARDS = os.environ.get("RAG_SHARDS_BASE", ARMAZENAMENTO_CHROMA)
+
+# Threads de BLAS/OpenMP por processo de shard. Padrão: os núcleos divididos entre os shards
+THREADS_POR_SHARD = int(os.environ.get("RAG_THREADS_POR_SHARD", "0"))
+
+# Arquivo com a geração ativa, o número de shards e a base; trocado atomicamente (os.replace)
+ARQUIVO_PARTICOES = "particoes.json"
+
+# Trava entre processos das escritas e das reconstruções (no diretório do armazenamento)
+ARQUIVO_TRAVA = ".trava"
+
+# Intervalo mínimo (s) entre verificações de trocas de geração feitas por outros processos
+INTERVALO_VERIFICACAO_S = float(os.environ.get("RAG_SHARDS_VERIFICACAO_S", "1.0"))
+
+# Registros (IDs) por lote na cópia entre conjuntos de shards
+LOTE_COPIA = 1000
+
+# Operações que não criam a coleção no shard: sem ela, o shard responde None (nenhum vetor)
+_OPERACOES_SEM_CRIAR = {"query", "get", "count", "delete"}
+
+
+def shard_do_id(chunk_id, n_shards):
+    """
+    Shard de um vetor: CRC32 do nome do arquivo módulo o número de shards.
+
+    O hash é do documento, e não do chunk: todos os chunks de um arquivo ficam no
+    mesmo shard, de modo que remover ou reindexar um documento toca um único shard.
+    """
+    return zlib.crc32(separar_id_chunk(chunk_id)[0].encode("utf-8")) % n_shards
+
+
+# --- Processo de cada shard --------------------------------------------------------
+
+
+def _abrir_sessao_base(base, persist_path):
+    if base == ARMAZENAMENTO_NUMPY:
+        from src.utils.numpy_store import SessaoNumpy
+
+        return SessaoNumpy(persist_path)
+
+    from src.utils.chroma_session import SessaoChroma
+
+    return SessaoChroma(persist_path)
+
+
+def _listar_colecoes(sessao, base):
+    if base == ARMAZENAMENTO_NUMPY:
+        if not os.path.isdir(sessao.persist_path):
+            return []
+        return sorted(nome for nome in os.listdir(sessao.persist_path)
+                      if os.path.isdir(os.path.join(sessao.persist_path, nome)))
+    return sorted(getattr(colecao, "name", colecao) for colecao in sessao.client.list_collections())
+
+
+def _executar_no_shard(sessao, base, operacao, nome, args, kwargs):
+    if operacao in ("encerrar", "reabrir"):
+        sessao.reabrir()
+        return None
+    if operacao == "listar":
+        return _listar_colecoes(sessao, base)
+    if operacao == "esquecer":
+        sessao.esquecer_colecao(nome)
+        return None
+    if operacao == "existe":
+        try:
+            sessao.obter_colecao(nome)
+            return True
+        except Exception:
+            return False
+    if operacao == "criar":
+        sessao.obter_colecao(nome, criar=True)
+        return None
+
+    if operacao in _OPERACOES_SEM_CRIAR:
+        try:
+            colecao = sessao.obter_colecao(nome)
+        except Exception:
+            return None
+    else:
+        colecao = sessao.obter_colecao(nome, criar=True)
+    return getattr(colecao, operacao)(*args, **kwargs)
+
+
+def _servir_shard(conexao, base, persist_path, threads):
+    """
+    Laço do processo de um shard: recebe (id, operação, coleção, args, kwargs) e responde (id, ok, resultado).
+
+    Os limites de threads são definidos antes de importar o NumPy/ChromaDB, para
+    que N shards em paralelo não disputem os mesmos núcleos com N pools de BLAS.
+    """
+    for variavel in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(variavel, str(threads))
+    sessao = _abrir_sessao_base(base, persist_path)
+
+    while True:
+        try:
+            id_pedido, operacao, nome, args, kwargs = conexao.recv()
+        except (EOFError, OSError):
+            break
+        try:
+            resposta = (id_pedido, True, _executar_no_shard(sessao, base, operacao, nome, args, kwargs))
+        except Exception as e:
+            resposta = (id_pedido, False, f"{type(e).__name__}: {e}")
+        conexao.send(resposta)
+        if operacao == "encerrar":
+            break
+    conexao.close()
+
+
+class _TrabalhadorShard:
+    """Processo de um shard, com um pipe e uma thread que resolve as respostas nos Futures dos pedidos."""
+
+    def __init__(self, contexto, base, persist_path, threads):
+        self.persist_path = persist_path
+        self.conexao, conexao_filho = contexto.Pipe()
+        self.processo = contexto.Process(target=_servir_shard, args=(conexao_filho, base, persist_path, threads),
+                                         name=f"shard-{os.path.basename(persist_path)}", daemon=True)
+        self.processo.start()
+        conexao_filho.close()
+        self._pendentes = {}
+        self._ids = itertools.count()
+        self._lock_envio = threading.Lock()
+        self._leitor = threading.Thread(target=self._receber, daemon=True)
+        self._leitor.start()
+
+    def enviar(self, operacao, nome=None, *args, **kwargs):
+        """Envia um pedido ao shard e retorna o Future da resposta."""
+        futuro = Future()
+        with self._lock_envio:
+            id_pedido = next(self._ids)
+            self._pendentes[id_pedido] = futuro
+            try:
+                self.conexao.send((id_pedido, operacao, nome, args, kwargs))
+            except (OSError, ValueError) as e:
+                self._pendentes.pop(id_pedido, None)
+                futuro.set_exception(RuntimeError(f"Shard '{self.persist_path}' indisponível: {e}"))
+        return futuro
+
+    def _receber(self):
+        while True:
+            try:
+                id_pedido, ok, resultado = self.conexao.recv()
+            except (EOFError, OSError):
+                break
+            futuro = self._pendentes.pop(id_pedido, None)
+            if futuro is None:
+                continue
+            if ok:
+                futuro.set_result(resultado)
+            else:
+                futuro.set_exception(RuntimeError(f"Shard '{self.persist_path}': {resultado}"))
+        for futuro in list(self._pendentes.values()):
+            futuro.set_exception(RuntimeError(f"Processo do shard '{self.persist_path}' encerrado."))
+        self._pendentes.clear()
+
+    def encerrar(self, timeout=30.0):
+        try:
+            self.enviar("encerrar").result(timeout)
+        except Exception as e:
+            print(f"Aviso: shard '{self.persist_path}' não encerrou normalmente: {e}")
+        self.processo.join(timeout)
+        if self.processo.is_alive():
+            self.processo.terminate()
+        self.conexao.close()
+
+
+class _ConjuntoShards:
+    """Os processos de uma geração de shards, com a contagem de operações em andamento."""
+
+    def __init__(self, contexto, diretorio, n_shards, base):
+        self.diretorio = diretorio
+        self.n_shards = n_shards
+        threads = THREADS_POR_SHARD or max(1, (os.cpu_count() or 1) // n_shards)
+        self.trabalhadores = [
+            _TrabalhadorShard(contexto, base, os.path.join(diretorio, f"shard_{i}"), threads) for i in range(n_shards)
+        ]
+        self._em_uso = 0
+        self._condicao = threading.Condition()
+
+    def difundir(self, operacao, nome=None, *args, **kwargs):
+        """Envia o mesmo pedido a todos os shards em paralelo e retorna as respostas, na ordem dos shards."""
+        futuros = [trabalhador.enviar(operacao, nome, *args, **kwargs) for trabalhador in self.trabalhadores]
+        return [futuro.result() for futuro in futuros]
+
+    def particionar(self, ids):
+        """Índices de `ids` agrupados por shard: {shard: [índices]}."""
+        grupos = {}
+        for indice, chunk_id in enumerate(ids):
+            grupos.setdefault(shard_do_id(chunk_id, self.n_shards), []).append(indice)
+        return grupos
+
+    def adquirir(self):
+        with self._condicao:
+            self._em_uso += 1
+
+    def liberar(self):
+        with self._condicao:
+            self._em_uso -= 1
+            self._condicao.notify_all()
+
+    def encerrar(self, timeout=30.0):
+        """Espera as operações em andamento (até `timeout`) e encerra os processos."""
+        with self._condicao:
+            self._condicao.wait_for(lambda: self._em_uso == 0, timeout)
+        for trabalhador in self.trabalhadores:
+            trabalhador.encerrar()
+
+
+# --- Coleção e sessão particionadas -----------------------------------------------------
+
+
+def _selecionar(valores, indices):
+    if valores is None:
+        return None
+    if hasattr(valores, "shape"):
+        return valores[indices]
+    return [valores[indice] for indice in indices]
+
+
+def _juntar_embeddings(partes):
+    import numpy as np
+
+    partes = [np.asarray(parte) for parte in partes if parte is not None and len(parte)]
+    return np.concatenate(partes) if partes else np.empty((0, 0))
+
+
+class ColecaoParticionada(VectorStore):
+    """
+    Coleção distribuída entre os shards de uma `SessaoParticionada`.
+
+    As escritas por ID vão só aos shards dos documentos; as buscas são
+    espalhadas em paralelo por todos os shards e os top-k parciais são
+    intercalados pela distância (scatter-gather). A coleção não guarda o conjunto
+    de shards: cada operação usa a geração ativa da sessão no momento.
+    """
+
+    def __init__(self, sessao, nome):
+        self.sessao = sessao
+        self.name = nome
+
+    def upsert(self, ids, embeddings, metadatas=None, documents=None):
+        self.sessao._escrever(self.name, "upsert", dict(ids=list(ids), embeddings=embeddings,
+                                                        metadatas=metadatas, documents=documents))
+
+    def delete(self, ids=None, where=None):
+        self.sessao._escrever(self.name, "delete", dict(ids=list(ids) if ids is not None else None, where=where))
+
+    def query(self, query_embeddings, n_results=10, where=None, include=("metadatas", "documents", "distances")):
+        include = list(include)
+        with self.sessao._usar_conjunto() as conjunto:
+            parciais = [parcial for parcial in conjunto.difundir("query", self.name, query_embeddings=query_embeddings,
+                                                                 n_results=n_results, where=where, include=include)
+                        if parcial is not None]
+
+        campos = [campo for campo in ("documents", "metadatas") if campo in include]
+        resultado = {"ids": [], "distances": [], **{campo: [] for campo in campos}}
+        for indice_query in range(len(query_embeddings)):
+            hits = heapq.nsmallest(n_results, (
+                (parcial["distances"][indice_query][posicao], parcial, posicao)
+                for parcial in parciais for posicao in range(len(parcial["ids"][indice_query]))
+            ), key=lambda hit: hit[0])
+            resultado["ids"].append([parcial["ids"][indice_query][posicao] for _, parcial, posicao in hits])
+            resultado["distances"].append([distancia for distancia, _, _ in hits])
+            for campo in campos:
+                resultado[campo].append([parcial[campo][indice_query][posicao] for _, parcial, posicao in hits])
+        return {campo: valores for campo, valores in resultado.items() if campo == "ids" or campo in include}
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("metadatas", "documents")):
+        include = list(include)
+        # Cada shard devolve até offset + limit registros; a página é cortada depois de concatenar
+        limite_shard = (offset or 0) + limit if limit is not None else None
+        with self.sessao._usar_conjunto() as conjunto:
+            if ids is None:
+                parciais = conjunto.difundir("get", self.name, where=where, limit=limite_shard, include=include)
+            else:
+                ids = list(ids)
+                futuros = [conjunto.trabalhadores[shard].enviar("get", self.name, ids=[ids[i] for i in indices],
+                                                                where=where, limit=limite_shard, include=include)
+                           for shard, indices in conjunto.particionar(ids).items()]
+                parciais = [futuro.result() for futuro in futuros]
+        parciais = [parcial for parcial in parciais if parcial is not None]
+
+        fatia = slice(offset or 0, limite_shard)
+        resultado = {"ids": [chunk_id for parcial in parciais for chunk_id in parcial["ids"]][fatia]}
+        for campo in ("documents", "metadatas"):
+            if campo in include:
+                resultado[campo] = [valor for parcial in parciais for valor in parcial[campo]][fatia]
+        if "embeddings" in include:
+            resultado["embeddings"] = _juntar_embeddings(parcial.get("embeddings") for parcial in parciais)[fatia]
+        return resultado
+
+    def count(self):
+        with self.sessao._usar_conjunto() as conjunto:
+            return sum(total or 0 for total in conjunto.difundir("count", self.name))
+
+
+class SessaoParticionada:
+    """
+    Sessão sobre um armazenamento vetorial dividido em N shards, cada um servido por um processo próprio.
+
+    Cada shard é um armazenamento comum ("chroma" ou "numpy") em
+    `<persist_path>/geracao_<g>/shard_<i>`, aberto por um processo filho que
+    recebe os pedidos por um pipe. Os vetores são distribuídos pelo hash do nome
+    do documento (`shard_do_id`); as buscas rodam em todos os shards ao mesmo
+    tempo, fora do GIL do processo principal, e os resultados são intercalados.
+
+    O arquivo `particoes.json` aponta a geração ativa. `reparticionar` monta uma
+    nova geração (outro número de shards, ou os vetores de uma reindexação) com
+    os processos novos ao lado dos atuais, que seguem atendendo buscas e
+    escritas; as escritas feitas durante a montagem são registradas e repetidas
+    na geração nova, e a troca é uma única gravação atômica do arquivo de
+    partições. Outros processos com sessões no mesmo diretório percebem a troca
+    em até `INTERVALO_VERIFICACAO_S`.
+
+    Escritas e reconstruções de processos diferentes (ex.: `rag-sys index` com
+    `rag-sys reparticionar` rodando) são serializadas por uma trava de arquivo no
+    diretório do armazenamento: a reconstrução a mantém do início à troca, e uma
+    escrita de outro processo espera por ela e relê o arquivo de partições antes
+    de gravar, indo para a geração nova. O diário cobre só as escritas do
+    próprio processo que reconstrói.
+    """
+
+    def __init__(self, persist_path=DIRETORIOS_ARMAZENAMENTO[ARMAZENAMENTO_PARTICIONADO], n_shards=N_SHARDS,
+                 base=BASE_SHARDS):
+        self.persist_path = persist_path
+        self.n_shards = n_shards
+        self.base = base
+        self._contexto = multiprocessing.get_context("spawn")
+        self._conjunto = None
+        self._geracao = None
+        self._mtime_ponteiro = None
+        self._verificado_em = 0.0
+        self._colecoes = {}
+        self._diario = None  # Escritas registradas durante uma reconstrução
+        self._lock = threading.RLock()  # Troca do conjunto ativo
+        self._lock_escrita = threading.Lock()  # Escritas x repetição do diário e troca
+        self._lock_reconstrucao = threading.Lock()
+        self._executor = None
+        self._usar_trava = True  # False nas sessões sobre um conjunto em montagem (a reconstrução já tem a trava)
+
+    # --- Geração ativa ---------------------------------------------------------------
+
+    @property
+    def _caminho_ponteiro(self):
+        return os.path.join(self.persist_path, ARQUIVO_PARTICOES)
+
+    @property
+    def _caminho_trava(self):
+        return os.path.join(self.persist_path, ARQUIVO_TRAVA)
+
+    def _diretorio_geracao(self, geracao):
+        return os.path.join(self.persist_path, f"geracao_{geracao}")
+
+    def _ler_ponteiro(self):
+        try:
+            with open(self._caminho_ponteiro, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _gravar_ponteiro(self, geracao, n_shards, base):
+        temporario = f"{self._caminho_ponteiro}.{os.getpid()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump({"geracao": geracao, "n_shards": n_shards, "base": base}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, self._caminho_ponteiro)
+
+    def _abrir_geracao(self, ponteiro):
+        self._conjunto = _ConjuntoShards(self._contexto, self._diretorio_geracao(ponteiro["geracao"]),
+                                         ponteiro["n_shards"], ponteiro["base"])
+        self._geracao, self.n_shards, self.base = ponteiro["geracao"], ponteiro["n_shards"], ponteiro["base"]
+        self._mtime_ponteiro = os.path.getmtime(self._caminho_ponteiro)
+
+    def _conjunto_atual(self, forcar=False):
+        """
+        Conjunto da geração ativa; abre a geração na primeira chamada e acompanha trocas de outros processos.
+
+        A troca é verificada no máximo a cada `INTERVALO_VERIFICACAO_S`, ou sempre com `forcar`.
+        """
+        with self._lock:
+            if self._conjunto is None:
+                os.makedirs(self.persist_path, exist_ok=True)
+                ponteiro = self._ler_ponteiro()
+                if ponteiro is None:
+                    ponteiro = {"geracao": 1, "n_shards": self.n_shards, "base": self.base}
+                    self._gravar_ponteiro(**ponteiro)
+                self._abrir_geracao(ponteiro)
+                self._verificado_em = time.monotonic()
+            elif (forcar or time.monotonic() - self._verificado_em >= INTERVALO_VERIFICACAO_S) and self._diario is None:
+                self._verificado_em = time.monotonic()
+                try:
+                    mtime = os.path.getmtime(self._caminho_ponteiro)
+                except OSError:
+                    mtime = self._mtime_ponteiro
+                if mtime != self._mtime_ponteiro:
+                    ponteiro = self._ler_ponteiro()
+                    if ponteiro and ponteiro["geracao"] != self._geracao:
+                        antigo = self._conjunto
+                        self._abrir_geracao(ponteiro)
+                        threading.Thread(target=antigo.encerrar, daemon=True).start()
+                    self._mtime_ponteiro = mtime
+            return self._conjunto
+
+    @contextmanager
+    def _usar_conjunto(self, forcar=False):
+        """Conjunto ativo, protegido contra o encerramento enquanto a operação não termina."""
+        with self._lock:
+            conjunto = self._conjunto_atual(forcar)
+            conjunto.adquirir()
+        try:
+            yield conjunto
+        finally:
+            conjunto.liberar()
+
+    # --- Interface das sessões ---------------------------------------------------------
+
+    def obter_colecao(self, nome, criar=False):
+        """
+        Retorna a coleção particionada.
+
+        Raises:
+            ValueError: Se a coleção não existir em nenhum shard e `criar` for False.
+        """
+        colecao = self._colecoes.get(nome)
+        if colecao is not None:
+            return colecao
+        with self._usar_conjunto() as conjunto:
+            if criar:
+                conjunto.difundir("criar", nome)
+            elif not any(conjunto.difundir("existe", nome)):
+                raise ValueError(f"Coleção '{nome}' não existe em '{self.persist_path}'.")
+        return self._colecoes.setdefault(nome, ColecaoParticionada(self, nome))
+
+    def executar(self, nome, operacao, criar=False):
+        """Executa `operacao(colecao)` sobre a coleção."""
+        return operacao(self.obter_colecao(nome, criar=criar))
+
+    def esquecer_colecao(self, nome):
+        """Descarta a coleção em todos os shards; o próximo acesso a reabre do disco."""
+        self._colecoes.pop(nome, None)
+        if self._conjunto is not None:
+            with self._usar_conjunto() as conjunto:
+                conjunto.difundir("esquecer", nome)
+
+    def reabrir(self):
+        """Descarta as coleções abertas em todos os shards."""
+        self._colecoes.clear()
+        if self._conjunto is not None:
+            with self._usar_conjunto() as conjunto:
+                conjunto.difundir("reabrir")
+
+    def fechar(self):
+        """Encerra os processos dos shards (gravando as páginas pendentes)."""
+        with self._lock:
+            conjunto, self._conjunto = self._conjunto, None
+            self._colecoes.clear()
+        if conjunto is not None:
+            conjunto.encerrar()
+
+    def estatisticas(self):
+        """Geração ativa, número de shards, base e vetores por shard de cada coleção."""
+        with self._usar_conjunto() as conjunto:
+            colecoes = sorted(set().union(*conjunto.difundir("listar")))
+            return {
+                "geracao": self._geracao,
+                "n_shards": conjunto.n_shards,
+                "base": self.base,
+                "colecoes": {nome: conjunto.difundir("count", nome) for nome in colecoes},
+            }
+
+    # --- Escritas ------------------------------------------------------------------------
+
+    @staticmethod
+    def _aplicar(conjunto, nome, operacao, kwargs):
+        """Aplica uma escrita no conjunto: por ID só nos shards dos documentos, por filtro em todos."""
+        ids = kwargs.get("ids")
+        if ids is None:
+            conjunto.difundir(operacao, nome, **kwargs)
+            return
+        futuros = []
+        for shard, indices in conjunto.particionar(ids).items():
+            parte = {campo: _selecionar(valores, indices) if campo != "where" else valores
+                     for campo, valores in kwargs.items()}
+            futuros.append(conjunto.trabalhadores[shard].enviar(operacao, nome, **parte))
+        for futuro in futuros:
+            futuro.result()
+
+    def _escrever(self, nome, operacao, kwargs):
+        # Reconstrução em andamento neste processo (que tem a trava): a escrita vai à geração atual e ao diário
+        with self._lock_escrita:
+            if self._diario is not None or not self._usar_trava:
+                with self._usar_conjunto() as conjunto:
+                    self._aplicar(conjunto, nome, operacao, kwargs)
+                    if self._diario is not None:
+                        self._diario.append((nome, operacao, kwargs))
+                return
+
+        # Senão, sob a trava entre processos e na geração lida agora do arquivo de partições: uma
+        # reconstrução de outro processo termina antes, e a escrita vai para a geração nova
+        with trava_arquivo(self._caminho_trava), self._lock_escrita, self._usar_conjunto(forcar=True) as conjunto:
+            self._aplicar(conjunto, nome, operacao, kwargs)
+
+    # --- Reconstrução e troca ----------------------------------------------------------------
+
+    def _copiar(self, origem, destino):
+        """
+        Copia todas as coleções da geração `origem` para `destino`, shard a shard, em lotes de IDs.
+
+        Os IDs de cada shard são lidos antes da cópia e os registros são buscados
+        por ID, e não por offset: uma remoção durante a cópia não desloca os
+        registros seguintes (que seriam pulados). IDs removidos no meio tempo
+        simplesmente não voltam, e inserções ficam no diário.
+        """
+        for nome in sorted(set().union(*origem.difundir("listar"))):
+            destino.difundir("criar", nome)
+            for trabalhador in origem.trabalhadores:
+                instantaneo = trabalhador.enviar("get", nome, include=[]).result()
+                ids = instantaneo["ids"] if instantaneo else []
+                for inicio in range(0, len(ids), LOTE_COPIA):
+                    lote = trabalhador.enviar("get", nome, ids=ids[inicio:inicio + LOTE_COPIA],
+                                              include=["embeddings", "documents", "metadatas"]).result()
+                    if not lote or not lote["ids"]:
+                        continue
+                    self._aplicar(destino, nome, "upsert", dict(
+                        ids=lote["ids"], embeddings=lote["embeddings"],
+                        metadatas=lote["metadatas"], documents=lote["documents"],
+                    ))
+
+    def reparticionar(self, n_shards=None, fonte=None):
+        """
+        Monta uma nova geração de shards e a coloca no lugar da atual, sem interromper as buscas.
+
+        Mantém a trava entre processos do armazenamento do início à troca: escritas
+        de outros processos esperam e vão para a geração nova.
+
+        Args:
+            n_shards (int, optional): Shards da nova geração. Padrão: o número atual.
+            fonte (callable, optional): `fonte(sessao)` popula a nova geração (ex.: uma reindexação
+                completa com `sessao=sessao`). Padrão: copia os vetores da geração atual.
+
+        Returns:
+            int: A nova geração.
+        """
+        from src.utils.query_cache import invalidar_resultados
+
+        with self._lock_reconstrucao, trava_arquivo(self._caminho_trava):
+            # Relê o arquivo de partições: outro processo pode ter trocado a geração antes de a trava ser obtida
+            with self._usar_conjunto(forcar=True) as atual:
+                n_shards = n_shards or atual.n_shards
+                geracao = self._geracao + 1
+                diretorio = self._diretorio_geracao(geracao)
+                shutil.rmtree(diretorio, ignore_errors=True)  # Sobra de uma reconstrução interrompida
+                novo = _ConjuntoShards(self._contexto, diretorio, n_shards, self.base)
+                with self._lock_escrita:
+                    self._diario = []
+                try:
+                    if fonte is None:
+                        self._copiar(atual, novo)
+                    else:
+                        fonte(SessaoParticionada._sobre_conjunto(self.persist_path, novo, self.base))
+
+                    # Escritas feitas durante a montagem; upsert e delete por ID ou filtro são idempotentes
+                    with self._lock_escrita:
+                        for nome, operacao, kwargs in self._diario:
+                            self._aplicar(novo, nome, operacao, kwargs)
+                        with self._lock:
+                            self._gravar_ponteiro(geracao, n_shards, self.base)
+                            antigo, self._conjunto = self._conjunto, novo
+                            self._geracao, self.n_shards = geracao, n_shards
+                            self._mtime_ponteiro = os.path.getmtime(self._caminho_ponteiro)
+                            self._diario = None
+                except BaseException:
+                    with self._lock_escrita:
+                        self._diario = None
+                    novo.encerrar()
+                    shutil.rmtree(diretorio, ignore_errors=True)
+                    raise
+
+        invalidar_resultados()
+        antigo.encerrar()
+        # A geração anterior fica em disco para processos que ainda não viram a troca; as mais antigas são removidas
+        for entrada in os.listdir(self.persist_path):
+            numero = entrada.removeprefix("geracao_")
+            if entrada.startswith("geracao_") and numero.isdigit() and int(numero) < geracao - 1:
+                shutil.rmtree(os.path.join(self.persist_path, entrada), ignore_errors=True)
+        print(f"Geração {geracao} ativa em '{self.persist_path}': {n_shards} shards.")
+        return geracao
+
+    def reparticionar_em_segundo_plano(self, n_shards=None, fonte=None):
+        """Executa `reparticionar` em uma thread e retorna o Future com a nova geração."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reparticionamento")
+        return self._executor.submit(self.reparticionar, n_shards, fonte)
+
+    @classmethod
+    def _sobre_conjunto(cls, persist_path, conjunto, base):
+        """Sessão fixa sobre um conjunto em montagem (sem arquivo de partições), entregue à `fonte`."""
+        sessao = cls(persist_path, conjunto.n_shards, base)
+        sessao._conjunto = conjunto
+        sessao._verificado_em = float("inf")
+        sessao._usar_trava = False
+        return sessao
+
+
+_sessoes = {}
+_sessoes_lock = threading.Lock()
+
+
+def obter_sessao_particionada(persist_path=DIRETORIOS_ARMAZENAMENTO[ARMAZENAMENTO_PARTICIONADO]):
+    """Retorna a sessão compartilhada do processo para o caminho informado."""
+    chave = os.path.abspath(persist_path)
+    with _sessoes_lock:
+        sessao = _sessoes.get(chave)
+        if sessao is None:
+            sessao = _sessoes[chave] = SessaoParticionada(persist_path)
+        return sessao
+
+
+def fechar_sessoes_particionadas():
+    """Encerra os processos de shards de todas as sessões compartilhadas."""
+    with _sessoes_lock:
+        sessoes = list(_sessoes.values())
+        _sessoes.clear()
+    for sessao in sessoes:
+        sessao.fechar()
+
+
+atexit.register(fechar_sessoes_particionadas)
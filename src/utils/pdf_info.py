@@ -0,0 +1,219 @@
+import io
+import re
+
+# Bytes lidos do fim do arquivo para achar o 'startxref'
+TAMANHO_CAUDA = 2048
+
+# Máximo de seções de xref seguidas por /Prev (atualizações incrementais)
+MAX_SECOES_XREF = 64
+
+CHAVES_INFO = ("/Author", "/Title", "/Keywords")
+
+_REGEX_STARTXREF = re.compile(rb"startxref\s+(\d+)")
+_REGEX_CABECALHO_OBJETO = re.compile(rb"\s*(\d+)\s+(\d+)\s+obj\b\s*")
+_REGEX_SUBSECAO = re.compile(rb"\s*(\d+)\s+(\d+)[ \t]*(?:\r\n|\r|\n)")
+_REGEX_ENTRADA = re.compile(rb"(\d{10})\s(\d{5})\s([nf])")
+_REGEX_TRAILER = re.compile(rb"\s*trailer\s*")
+
+
+class LeituraRapidaIndisponivel(Exception):
+    """Levantada quando a estrutura do PDF foge do caminho rápido (ex.: criptografia, xref corrompido)."""
+
+
+def _ler_objeto(f):
+    """Lê o objeto PDF na posição atual de `f`."""
+    from PyPDF2.generic import read_object  # Importação tardia: só quem lê PDFs paga a importação do PyPDF2
+
+    return read_object(f, None)
+
+
+def _ler_objeto_em(f, offset, numero):
+    """Lê o objeto indireto `numero` que começa em `offset`."""
+    f.seek(offset)
+    cabecalho = f.read(64)
+    m = _REGEX_CABECALHO_OBJETO.match(cabecalho)
+    if not m or int(m.group(1)) != numero:
+        raise LeituraRapidaIndisponivel(f"objeto {numero} não está em {offset}")
+    f.seek(offset + m.end())
+    return _ler_objeto(f)
+
+
+class _SecaoTabela:
+    """Seção de xref clássica ('xref' + subseções de entradas de 20 bytes + 'trailer')."""
+
+    def __init__(self, f, offset):
+        self.f = f
+        self.subsecoes = []  # (primeiro_objeto, quantidade, posicao_das_entradas)
+        posicao = offset + len(b"xref")
+        while True:
+            f.seek(posicao)
+            bloco = f.read(64)
+            m = _REGEX_SUBSECAO.match(bloco)
+            if not m:
+                break
+            inicio, quantidade = int(m.group(1)), int(m.group(2))
+            self.subsecoes.append((inicio, quantidade, posicao + m.end()))
+            posicao += m.end() + 20 * quantidade
+
+        m = _REGEX_TRAILER.match(bloco)
+        if not m:
+            raise LeituraRapidaIndisponivel("trailer não encontrado")
+        f.seek(posicao + m.end())
+        self.trailer = _ler_objeto(f)
+
+    def buscar(self, numero):
+        for inicio, quantidade, posicao in self.subsecoes:
+            if inicio <= numero < inicio + quantidade:
+                self.f.seek(posicao + 20 * (numero - inicio))
+                m = _REGEX_ENTRADA.match(self.f.read(20))
+                if not m:
+                    raise LeituraRapidaIndisponivel("entrada de xref malformada")
+                return ("offset", int(m.group(1))) if m.group(3) == b"n" else ("livre",)
+        return None
+
+
+class _SecaoStream:
+    """Seção de xref em stream (PDF 1.5+): /W, /Index e entradas binárias."""
+
+    def __init__(self, f, offset):
+        f.seek(offset)
+        m = _REGEX_CABECALHO_OBJETO.match(f.read(64))
+        if not m:
+            raise LeituraRapidaIndisponivel("xref não é uma tabela nem um stream")
+        stream = _ler_objeto_em(f, offset, int(m.group(1)))
+        if stream.get("/Type") != "/XRef":
+            raise LeituraRapidaIndisponivel("objeto em startxref não é /XRef")
+        self.trailer = stream
+        self.larguras = [int(w) for w in stream["/W"]]
+        indice = [int(i) for i in stream.get("/Index", [0, stream["/Size"]])]
+        self.faixas = list(zip(indice[::2], indice[1::2]))
+        self.dados = stream.get_data()
+
+    def _campo(self, linha, coluna, padrao):
+        largura = self.larguras[coluna]
+        if not largura:
+            return padrao
+        inicio = sum(self.larguras[:coluna]) + linha * sum(self.larguras)
+        return int.from_bytes(self.dados[inicio:inicio + largura], "big")
+
+    def buscar(self, numero):
+        linha = 0
+        for inicio, quantidade in self.faixas:
+            if inicio <= numero < inicio + quantidade:
+                linha += numero - inicio
+                tipo = self._campo(linha, 0, 1)
+                if tipo == 1:
+                    return ("offset", self._campo(linha, 1, 0))
+                if tipo == 2:
+                    return ("objstm", self._campo(linha, 1, 0), self._campo(linha, 2, 0))
+                return ("livre",)
+            linha += quantidade
+        return None
+
+
+def _secoes_xref(f, offset):
+    """Produz as seções de xref da mais recente para a mais antiga (seguindo /XRefStm e /Prev)."""
+    for _ in range(MAX_SECOES_XREF):
+        f.seek(offset)
+        if f.read(4) == b"xref":
+            secao = _SecaoTabela(f, offset)
+            yield secao
+            if "/XRefStm" in secao.trailer:  # Arquivo híbrido: tabela clássica + stream
+                yield _SecaoStream(f, int(secao.trailer["/XRefStm"]))
+        else:
+            secao = _SecaoStream(f, offset)
+            yield secao
+        if "/Prev" not in secao.trailer:
+            return
+        offset = int(secao.trailer["/Prev"])
+    raise LeituraRapidaIndisponivel("cadeia de /Prev longa demais")
+
+
+class _CadeiaXref:
+    """Seções de xref lidas sob demanda: as antigas (via /Prev) só são lidas se um objeto não estiver nas recentes."""
+
+    def __init__(self, f, offset):
+        self._iterador = _secoes_xref(f, offset)
+        self._lidas = []
+
+    def __iter__(self):
+        indice = 0
+        while True:
+            if indice == len(self._lidas):
+                secao = next(self._iterador, None)
+                if secao is None:
+                    return
+                self._lidas.append(secao)
+            yield self._lidas[indice]
+            indice += 1
+
+
+def _resolver(f, secoes, numero):
+    """Lê o objeto indireto `numero`, localizando-o pelas seções de xref (inclusive dentro de object streams)."""
+    for secao in secoes:
+        entrada = secao.buscar(numero)
+        if entrada is None:
+            continue
+        if entrada[0] == "offset":
+            return _ler_objeto_em(f, entrada[1], numero)
+        if entrada[0] == "objstm":
+            objstm = _resolver(f, secoes, entrada[1])
+            dados = objstm.get_data()
+            primeiro = int(objstm["/First"])
+            pares = [int(n) for n in dados[:primeiro].split()]
+            if pares[2 * entrada[2]] != numero:
+                raise LeituraRapidaIndisponivel(f"objeto {numero} fora de posição no object stream")
+            return _ler_objeto(io.BytesIO(dados[primeiro + pares[2 * entrada[2] + 1]:]))
+        return None  # Entrada livre: objeto removido
+    raise LeituraRapidaIndisponivel(f"objeto {numero} ausente do xref")
+
+
+def ler_info_pdf(filepath, chaves=CHAVES_INFO):
+    """
+    Lê o dicionário de informações (/Info) de um PDF sem carregar a árvore de páginas.
+
+    Lê só o fim do arquivo ('startxref'), o trailer e as entradas de xref
+    necessárias para chegar ao /Info, em vez de analisar o xref inteiro como o
+    `PdfReader`. Suporta tabelas de xref clássicas, streams de xref, object
+    streams e atualizações incrementais; PDFs criptografados ou com estrutura
+    fora do padrão retornam None, e o chamador deve usar o `PdfReader`.
+
+    Args:
+        filepath (str): Caminho do PDF.
+        chaves (tuple de str, optional): Chaves do /Info a retornar. Padrão: /Author, /Title e /Keywords.
+
+    Returns:
+        dict or None: {chave: texto} das chaves presentes (vazio se o PDF não tem /Info), ou None se a
+                      leitura rápida não for possível.
+    """
+    from PyPDF2.generic import IndirectObject
+
+    try:
+        with open(filepath, "rb") as f:
+            f.seek(0, io.SEEK_END)
+            f.seek(max(0, f.tell() - TAMANHO_CAUDA))
+            ocorrencias = _REGEX_STARTXREF.findall(f.read())
+            if not ocorrencias:
+                return None
+
+            secoes = _CadeiaXref(f, int(ocorrencias[-1]))
+            trailer = next(iter(secoes)).trailer
+            if "/Encrypt" in trailer:
+                return None
+            referencia = trailer.get("/Info")
+            if referencia is None:
+                return {}
+
+            info = _resolver(f, secoes, referencia.idnum) if isinstance(referencia, IndirectObject) else referencia
+            if info is None:
+                return {}
+            resultado = {}
+            for chave in chaves:
+                valor = info.get(chave)
+                if isinstance(valor, IndirectObject):
+                    valor = _resolver(f, secoes, valor.idnum)
+                if isinstance(valor, str):
+                    resultado[chave] = str(valor)
+            return resultado
+    except Exception:
+        return None
@@ -0,0 +1,184 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from src.config import DATABASE_PATH, carregar_ambiente
+from src.database.conexao import obter_conexao, transacao
+
+carregar_ambiente()
+
+# Limites dos caches de queries (número de itens e tempo de vida em segundos)
+MAX_EMBEDDINGS_QUERY = int(os.environ.get("RAG_CACHE_QUERIES_MAX", "1024"))
+TTL_EMBEDDINGS_QUERY = float(os.environ.get("RAG_CACHE_QUERIES_TTL", "3600"))
+MAX_RESULTADOS = int(os.environ.get("RAG_CACHE_RESULTADOS_MAX", "1024"))
+TTL_RESULTADOS = float(os.environ.get("RAG_CACHE_RESULTADOS_TTL", "300"))
+
+# Intervalo mínimo (s) entre leituras da versão do índice no banco, onde outros processos (ex.: a indexação
+# rodando ao lado do serviço de busca) a incrementam
+INTERVALO_VERSAO_S = float(os.environ.get("RAG_CACHE_VERSAO_VERIFICACAO_S", "1.0"))
+
+SQL_CRIAR_VERSAO = """
+CREATE TABLE IF NOT EXISTS versao_indice (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    valor INTEGER NOT NULL
+)
+"""
+SQL_INCREMENTAR_VERSAO = """
+INSERT INTO versao_indice (id, valor) VALUES (1, 1) ON CONFLICT (id) DO UPDATE SET valor = valor + 1
+"""
+SQL_LER_VERSAO = "SELECT valor FROM versao_indice WHERE id = 1"
+
+
+class CacheLRUTTL:
+    """
+    Cache em memória com limite de itens (LRU) e tempo de vida por item (TTL).
+
+    Seguro entre threads. Itens expirados são descartados quando acessados ou
+    quando chegam ao início da fila LRU.
+    """
+
+    def __init__(self, max_itens, ttl_segundos):
+        self.max_itens = max_itens
+        self.ttl_segundos = ttl_segundos
+        self._itens = OrderedDict()  # chave -> (expira_em, valor)
+        self._lock = threading.Lock()
+        self._estatisticas = {"acertos": 0, "falhas": 0, "expirados": 0, "despejos": 0, "invalidacoes": 0}
+
+    def obter(self, chave):
+        """
+        Busca um item no cache.
+
+        Returns:
+            tuple: (encontrado, valor). `valor` é None quando `encontrado` é False.
+        """
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None:
+                if item[0] > time.monotonic():
+                    self._itens.move_to_end(chave)
+                    self._estatisticas["acertos"] += 1
+                    return True, item[1]
+                del self._itens[chave]
+                self._estatisticas["expirados"] += 1
+            self._estatisticas["falhas"] += 1
+            return False, None
+
+    def gravar(self, chave, valor):
+        """Grava um item, despejando os menos usados recentemente se o limite for excedido."""
+        with self._lock:
+            self._itens[chave] = (time.monotonic() + self.ttl_segundos, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+                self._estatisticas["despejos"] += 1
+
+    def invalidar(self):
+        """Remove todos os itens."""
+        with self._lock:
+            self._itens.clear()
+            self._estatisticas["invalidacoes"] += 1
+
+    def estatisticas(self):
+        """Retorna acertos, falhas, expirados, despejos, invalidações, taxa de acerto e número de itens."""
+        with self._lock:
+            consultas = self._estatisticas["acertos"] + self._estatisticas["falhas"]
+            return {
+                **self._estatisticas,
+                "taxa_acerto": self._estatisticas["acertos"] / consultas if consultas else 0.0,
+                "itens": len(self._itens),
+            }
+
+
+# Nível 1: (modelo, query normalizada) -> embedding da query
+cache_embeddings_query = CacheLRUTTL(MAX_EMBEDDINGS_QUERY, TTL_EMBEDDINGS_QUERY)
+
+# Nível 2: (chave da query, índice, filtros, n_results, versão do índice) -> resultados formatados
+cache_resultados = CacheLRUTTL(MAX_RESULTADOS, TTL_RESULTADOS)
+
+_versao_indice = 0
+_versao_verificada_em = None
+_versao_lock = threading.Lock()
+
+
+def _ler_versao_compartilhada():
+    """Versão gravada no banco (0 se ainda não há nenhuma), ou None se o banco não puder ser lido."""
+    try:
+        registro = obter_conexao(DATABASE_PATH).execute(SQL_LER_VERSAO).fetchone()
+    except sqlite3.OperationalError as e:
+        if "no such table" in str(e):
+            return 0
+        print(f"Aviso: não foi possível ler a versão do índice em '{DATABASE_PATH}': {e}")
+        return None
+    return registro[0] if registro else 0
+
+
+def versao_indice():
+    """
+    Versão atual do índice vetorial; muda sempre que uma coleção é alterada, por este ou outro processo.
+
+    A versão fica na tabela 'versao_indice' do banco de metadados, lida no máximo a
+    cada `INTERVALO_VERSAO_S` segundos. Ao notar uma versão nova, os resultados em
+    cache são descartados.
+    """
+    global _versao_indice, _versao_verificada_em
+    agora = time.monotonic()
+    if _versao_verificada_em is not None and agora - _versao_verificada_em < INTERVALO_VERSAO_S:
+        return _versao_indice
+    versao = _ler_versao_compartilhada()
+    with _versao_lock:
+        _versao_verificada_em = agora
+        if versao is not None and versao != _versao_indice:
+            _versao_indice = versao
+            cache_resultados.invalidar()
+        return _versao_indice
+
+
+def invalidar_resultados():
+    """
+    Marca o índice como alterado e descarta os resultados em cache.
+
+    Deve ser chamada por toda operação que grava ou remove vetores da coleção.
+    A versão é incrementada no banco de metadados, o que invalida também os
+    caches dos outros processos. Os embeddings de queries continuam válidos,
+    pois não dependem do índice.
+    """
+    global _versao_indice, _versao_verificada_em
+    try:
+        with transacao(DATABASE_PATH) as conn:
+            conn.execute(SQL_CRIAR_VERSAO)
+            conn.execute(SQL_INCREMENTAR_VERSAO)
+            versao = conn.execute(SQL_LER_VERSAO).fetchone()[0]
+    except sqlite3.Error as e:
+        print(f"Aviso: não foi possível gravar a versão do índice em '{DATABASE_PATH}': {e}")
+        versao = None
+    with _versao_lock:
+        # Sem o banco, a invalidação vale ao menos para este processo
+        _versao_indice = versao if versao is not None else _versao_indice + 1
+        _versao_verificada_em = time.monotonic()
+    cache_resultados.invalidar()
+
+
+def chave_hashavel(valor):
+    """Converte listas, conjuntos e dicionários em tuplas, para uso como chave de cache."""
+    if isinstance(valor, dict):
+        return tuple(sorted((k, chave_hashavel(v)) for k, v in valor.items()))
+    if isinstance(valor, (list, tuple)):
+        return tuple(chave_hashavel(v) for v in valor)
+    if isinstance(valor, (set, frozenset)):
+        return tuple(sorted(chave_hashavel(v) for v in valor))
+    return valor
+
+
+def estatisticas_cache_queries():
+    """
+    Retorna os contadores dos dois níveis do cache de queries, para monitoramento.
+
+    Returns:
+        dict: {'embeddings': {...}, 'resultados': {...}, 'versao_indice': int}.
+    """
+    return {
+        "embeddings": cache_embeddings_query.estatisticas(),
+        "resultados": cache_resultados.estatisticas(),
+        "versao_indice": versao_indice(),
+    }
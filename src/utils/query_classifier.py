@@ -1,9 +1,265 @@
-from transformers import pipeline
+import os
+import re
+import threading
+import time
+import unicodedata
+from src.config import carregar_ambiente
+from src.utils.model_registry import obter_classificador
+from src.utils.query_cache import CacheLRUTTL
+
+carregar_ambiente()
+
+# O classificador de texto (nível 2) só é consultado se habilitado: o modelo padrão não é ajustado
+# para esta tarefa e seus rótulos são praticamente aleatórios. Desabilitado, o que as regras não
+# resolvem vira busca semântica.
+USAR_CLASSIFICADOR = os.environ.get("RAG_CLASSIFICADOR_QUERIES", "0") == "1"
+TAMANHO_LOTE_CLASSIFICADOR = int(os.environ.get("RAG_CLASSIFICADOR_LOTE", "32"))
+MAX_CLASSIFICACOES_CACHE = int(os.environ.get("RAG_CLASSIFICADOR_CACHE_MAX", "4096"))
+TTL_CLASSIFICACOES_CACHE = float(os.environ.get("RAG_CLASSIFICADOR_CACHE_TTL", "86400"))
+
+TIPOS_QUERY = ("busca_semantica", "contagem", "listagem")
+
+# Mapeamento de rótulos de classe para nomes de classe (MUITO IMPORTANTE: Ajuste se mudar as classes!)
+LABEL_MAPPING = {
+    "LABEL_0": "busca_semantica",
+    "LABEL_1": "contagem",
+    "LABEL_2": "listagem",
+}
+PROMPT_CLASSIFICADOR = "Classifique o tipo da seguinte query de busca de documentos: "
+
+# Regras do nível 1, aplicadas à query em minúsculas e sem acentos
+REGEX_CONTAGEM = re.compile(r"\b(quant[oa]s|quantidade d[eo]s?|numero d[eo]s?|total d[eo]s?|contar|conte)\b")
+REGEX_LISTAGEM = re.compile(
+    r"\b(list(ar|e|em|agem)|mostr(ar|e|em)|exib(ir|a|am)|quais (sao )?(os |as )?(arquivos|documentos)"
+    r"|todos os (arquivos|documentos))\b|^(os )?(arquivos|documentos) (do|da|de) autor"
+)
+# Um assunto na query exige busca no conteúdo, que os metadados não respondem
+REGEX_ASSUNTO = re.compile(r"\b(sobre|a respeito|relacionad[oa]s?|mencion\w*|trat\w* d[eoa]|fal\w* d[eoa]|contendo|com o termo)\b")
+REGEX_TIPO = re.compile(r"(?:\.|\b)(pdf|txt|md|markdown)s?\b")
+REGEX_ANO = re.compile(r"\b((?:19|20)\d{2})\b")
+REGEX_DATA_CRIACAO = re.compile(r"\bcria(d[oa]s?|cao)\b")
+# Autor: aplicado à query original, para preservar a grafia do nome. O nome vai até o fim da query ou até
+# uma oração de verbo, data ou formato ("... Maria Souza foram criados em 2023", "... João Silva em 2022")
+_FIM_AUTOR = (r"(?=[\s,;]+(?:foi|foram|s[aã]o|est[aã]o|cria\w*|modifica\w*|altera\w*|atualiza\w*|edita\w*"
+              r"|publica\w*|escrit\w*|em|no|na|nos|nas|desde|entre|antes|depois|at[eé]|durante|com|que|do tipo"
+              r"|d[eo] (?:19|20)\d{2}|(?:19|20)\d{2})\b|[\s?.!,;]*$)")
+REGEX_AUTOR = re.compile(r"\bautora?\s+(?:[eé]\s+)?(.+?)" + _FIM_AUTOR, re.IGNORECASE)
+REGEX_AUTOR_NORMALIZADA = re.compile(r"\bautora?\s+(?:e\s+)?.+?" + _FIM_AUTOR)
+
+# Contagem e listagem só vão ao SQL se a query falar de documentos/arquivos e não sobrar nenhuma palavra de
+# assunto depois de retirados os gatilhos, o substantivo, os filtros e as palavras abaixo: "quantos dias de
+# férias o contrato prevê?" tem gatilho de contagem, mas pergunta pelo conteúdo e vai para a busca semântica
+REGEX_SUBSTANTIVO_DOCUMENTO = re.compile(r"\b(arquivos?|documentos?|pdfs|txts)\b")
+PALAVRAS_NEUTRAS = frozenset("""
+    o a os as um uma uns umas de do da dos das d em no na nos nas e ou com por para que
+    eu tenho temos tem ha existe existem estao esta foram foi sao ser todos todas meus minhas meu minha
+    me mim nos aqui ai sistema base indice pasta cadastrados cadastradas registrados registradas indexados
+    indexadas armazenados armazenadas salvos salvas guardados tipo tipos formato extensao
+    modificados modificadas alterados alteradas atualizados atualizadas editados criados criadas ano
+    autor autora favor por
+""".split())
+
+# Queries de exemplo com o tipo esperado das regras e os filtros extraídos (verificados com
+# `python -m src.utils.query_classifier`)
+EXEMPLOS_ROTEAMENTO = (
+    ("Quantos arquivos PDF eu tenho?", "contagem", {"tipo_documento": "pdf"}),
+    ("Número de arquivos .md", "contagem", {"tipo_documento": "md"}),
+    ("Quantos documentos foram criados em 2023?", "contagem", {"ano": 2023, "campo_data": "data_criacao"}),
+    ("Total de PDFs do autor Maria Souza", "contagem", {"tipo_documento": "pdf", "autor": "Maria Souza"}),
+    ("Quantos PDFs do autor Maria Souza foram criados em 2023?", "contagem",
+     {"tipo_documento": "pdf", "ano": 2023, "campo_data": "data_criacao", "autor": "Maria Souza"}),
+    ("Mostre todos os arquivos TXT", "listagem", {"tipo_documento": "txt"}),
+    ("Listar os arquivos modificados em 2024", "listagem", {"ano": 2024, "campo_data": "data_modificacao"}),
+    ("documentos do autor João Silva", "listagem", {"autor": "João Silva"}),
+    ("documentos do autor João Silva em 2022", "listagem",
+     {"ano": 2022, "campo_data": "data_modificacao", "autor": "João Silva"}),
+    ("Liste os documentos da autora Ana de Souza", "listagem", {"autor": "Ana de Souza"}),
+    ("Quais são os documentos PDF?", "listagem", {"tipo_documento": "pdf"}),
+    ("relatório do projeto X", None, {}),
+    ("Quero ver os documentos sobre segurança.", "busca_semantica", {}),
+    ("buscar documentos sobre automação", "busca_semantica", {}),
+    ("Existe algum documento sobre backup?", "busca_semantica", {}),
+    # Gatilhos de contagem/listagem em perguntas sobre o conteúdo
+    ("quantos dias de férias o contrato prevê?", "busca_semantica", {}),
+    ("Qual o total de horas extras previstas no acordo?", "busca_semantica", {}),
+    ("quantos documentos citam a LGPD?", "busca_semantica", {}),
+    ("liste os requisitos de segurança do documento de arquitetura", "busca_semantica", {}),
+    ("mostre o contrato de locação", "busca_semantica", {}),
+    ("conte as etapas do processo de compras", "busca_semantica", {}),
+)
+
+# Cache do nível 2: query normalizada -> tipo previsto pelo classificador
+cache_classificacoes = CacheLRUTTL(MAX_CLASSIFICACOES_CACHE, TTL_CLASSIFICACOES_CACHE)
+
+
+class ContadoresLatencia:
+    """Contagem e latência acumulada por rótulo (nível do roteador, rota de execução etc.). Seguro entre threads."""
+
+    def __init__(self):
+        self._contadores = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, rotulo, segundos, quantidade=1):
+        with self._lock:
+            contador = self._contadores.setdefault(rotulo, {"queries": 0, "tempo_total_s": 0.0})
+            contador["queries"] += quantidade
+            contador["tempo_total_s"] += segundos
+
+    def estatisticas(self):
+        """Retorna, por rótulo, o número de queries, o tempo total e a latência média (ms)."""
+        with self._lock:
+            return {
+                rotulo: {**contador, "media_ms": contador["tempo_total_s"] / contador["queries"] * 1000}
+                for rotulo, contador in self._contadores.items()
+            }
+
+
+contadores_niveis = ContadoresLatencia()
+
+
+def _normalizar(query):
+    sem_acentos = unicodedata.normalize("NFKD", query.lower())
+    return " ".join("".join(c for c in sem_acentos if not unicodedata.combining(c)).split())
+
+
+def extrair_filtros(query):
+    """
+    Extrai da query os filtros de metadados que as rotas de contagem e listagem entendem.
+
+    Returns:
+        dict: Somente as chaves encontradas entre 'tipo_documento' ("pdf", "txt", "md"),
+              'ano' (int), 'campo_data' ("data_criacao" se a query falar em criação) e 'autor'.
+    """
+    normalizada = _normalizar(query)
+    filtros = {}
+    tipo = REGEX_TIPO.search(normalizada)
+    if tipo:
+        filtros["tipo_documento"] = "md" if tipo.group(1) == "markdown" else tipo.group(1)
+    ano = REGEX_ANO.search(normalizada)
+    if ano:
+        filtros["ano"] = int(ano.group(1))
+        filtros["campo_data"] = "data_criacao" if REGEX_DATA_CRIACAO.search(normalizada) else "data_modificacao"
+    autor = REGEX_AUTOR.search(query)
+    if autor:
+        filtros["autor"] = autor.group(1)
+    return filtros
+
+
+def _somente_metadados(normalizada):
+    """True se a query fala de documentos/arquivos e, fora gatilhos e filtros de metadados, não sobra nenhuma palavra."""
+    if not REGEX_SUBSTANTIVO_DOCUMENTO.search(normalizada):
+        return False
+    resto = REGEX_AUTOR_NORMALIZADA.sub(" ", normalizada)
+    for regex in (REGEX_CONTAGEM, REGEX_LISTAGEM, REGEX_SUBSTANTIVO_DOCUMENTO, REGEX_TIPO, REGEX_ANO):
+        resto = regex.sub(" ", resto)
+    return all(palavra in PALAVRAS_NEUTRAS for palavra in re.findall(r"\w+", resto))
+
+
+def _classificar_por_regras(query):
+    """
+    Nível 1: retorna o tipo da query, ou None se nenhuma regra decidir.
+
+    Um gatilho de contagem ou listagem ("quantos", "total de", "liste") só leva
+    às rotas de SQL se a query for apenas sobre documentos e seus metadados (ver
+    `_somente_metadados`); com palavras de assunto, a query é de busca semântica.
+    """
+    normalizada = _normalizar(query)
+    if REGEX_ASSUNTO.search(normalizada):
+        return "busca_semantica"
+    for tipo, regex in (("contagem", REGEX_CONTAGEM), ("listagem", REGEX_LISTAGEM)):
+        if regex.search(normalizada):
+            return tipo if _somente_metadados(normalizada) else "busca_semantica"
+    return None
+
+
+def classificar_queries(queries):
+    """
+    Nível 2: classifica um lote de queries com o classificador de texto.
+
+    Queries já classificadas vêm do cache; as demais passam por uma única
+    chamada do pipeline (em lotes de `RAG_CLASSIFICADOR_LOTE`).
+
+    Returns:
+        list de str: O tipo de cada query, na mesma ordem. "busca_semantica" em caso de erro.
+    """
+    tipos = [None] * len(queries)
+    pendentes = {}  # query normalizada -> posições na lista
+    for posicao, query in enumerate(queries):
+        chave = _normalizar(query)
+        encontrado, tipo = cache_classificacoes.obter(chave)
+        if encontrado:
+            tipos[posicao] = tipo
+        else:
+            pendentes.setdefault(chave, []).append(posicao)
+
+    if pendentes:
+        # Obtém o modelo de classificação do registro (carregado apenas na primeira chamada)
+        classifier = obter_classificador()
+        chaves = list(pendentes)
+        try:
+            # Usa as queries COM o prompt
+            previsoes = classifier([PROMPT_CLASSIFICADOR + queries[pendentes[chave][0]] for chave in chaves],
+                                   batch_size=TAMANHO_LOTE_CLASSIFICADOR)
+            for chave, previsao in zip(chaves, previsoes):
+                tipo = LABEL_MAPPING.get(previsao["label"], "busca_semantica")
+                cache_classificacoes.gravar(chave, tipo)
+                for posicao in pendentes[chave]:
+                    tipos[posicao] = tipo
+
+        except Exception as e:
+            print(f"Erro ao classificar {len(chaves)} queries: {e}")
+
+    return [tipo or "busca_semantica" for tipo in tipos]
+
+
+def rotear_queries(queries):
+    """
+    Decide o tipo de cada query em níveis, do mais barato ao mais caro.
+
+    1. "regras": expressões regulares para contagem e listagem em português;
+    2. "classificador": o classificador de texto, em lote e com cache (se `RAG_CLASSIFICADOR_QUERIES=1`);
+    3. "padrao": busca semântica.
+
+    A latência de cada nível é acumulada em `estatisticas_roteador()`.
+
+    Returns:
+        list de dict: Para cada query, 'tipo' (ver `TIPOS_QUERY`), 'nivel' que decidiu e
+                      'filtros' extraídos (ver `extrair_filtros`).
+    """
+    rotas = []
+    pendentes = []
+    for query in queries:
+        inicio = time.perf_counter()
+        tipo = _classificar_por_regras(query)
+        rota = {"tipo": tipo, "nivel": "regras", "filtros": extrair_filtros(query)}
+        rotas.append(rota)
+        if tipo is not None:
+            contadores_niveis.registrar("regras", time.perf_counter() - inicio)
+        else:
+            pendentes.append((query, rota))
+
+    if pendentes and USAR_CLASSIFICADOR:
+        inicio = time.perf_counter()
+        tipos = classificar_queries([query for query, _ in pendentes])
+        contadores_niveis.registrar("classificador", time.perf_counter() - inicio, quantidade=len(pendentes))
+        for (_, rota), tipo in zip(pendentes, tipos):
+            rota.update(tipo=tipo, nivel="classificador")
+    elif pendentes:
+        for _, rota in pendentes:
+            rota.update(tipo="busca_semantica", nivel="padrao")
+        contadores_niveis.registrar("padrao", 0.0, quantidade=len(pendentes))
+
+    return rotas
+
+
+def rotear_query(query):
+    """Versão de `rotear_queries` para uma única query."""
+    return rotear_queries([query])[0]
+
 
 def classificar_query(query):
     """
-    Classifica a query do usuário em um tipo (busca semântica, contagem, listagem, etc.)
-    usando um modelo de classificação de texto.
+    Classifica a query do usuário em um tipo (busca semântica, contagem, listagem, etc.).
 
     Args:
         query (str): A query do usuário.
@@ -11,43 +267,23 @@ def classificar_query(query):
     Returns:
         str: O tipo da query (ex: "busca_semantica", "contagem", "listagem").
     """
-    # Carrega o modelo de classificação pré-treinado (substitua pelo modelo desejado)
-    classifier = pipeline("text-classification", model="distilbert-base-multilingual-cased")
-
-    # Mapeamento de rótulos de classe para nomes de classe (MUITO IMPORTANTE: Ajuste se mudar as classes!)
-    label_mapping = {
-        "LABEL_0": "busca_semantica",
-        "LABEL_1": "contagem",
-        "LABEL_2": "listagem",
-    }
+    return rotear_query(query)["tipo"]
 
-    # Adiciona um prompt à query
-    prompt = "Classifique o tipo da seguinte query de busca de documentos: "
-    query_com_prompt = prompt + query
 
-    try:
-        result = classifier(query_com_prompt) # Usa a query COM o prompt
-        predicted_label = result[0]['label']
+def estatisticas_roteador():
+    """Retorna as queries e a latência por nível do roteador, e as estatísticas do cache do classificador."""
+    return {"niveis": contadores_niveis.estatisticas(), "cache_classificador": cache_classificacoes.estatisticas()}
 
-        return label_mapping.get(predicted_label, "busca_semantica")
 
-    except Exception as e:
-        print(f"Erro ao classificar a query: {e}")
-        return "busca_semantica"
-    
 if __name__ == "__main__":
-    queries = [
-        "Quantos arquivos PDF eu tenho?",
-        "Mostre todos os arquivos TXT",
-        "relatório do projeto X",
-        "Quero ver os documentos sobre segurança.",
-        "Listar os arquivos modificados em 2024",
-        "Número de arquivos .md",
-        "buscar documentos sobre automação",
-        "Existe algum documento sobre backup?",
-        "documentos do autor João Silva"
-    ]
-
-    for query in queries:
-        tipo = classificar_query(query)
-        print(f"Query: '{query}' -> Tipo: {tipo}")
\ No newline at end of file
+    queries = [query for query, _, _ in EXEMPLOS_ROTEAMENTO]
+    erros = 0
+    for (query, esperado, filtros_esperados), rota in zip(EXEMPLOS_ROTEAMENTO, rotear_queries(queries)):
+        obtido = _classificar_por_regras(query)
+        aviso = "" if obtido == esperado else f"  <- esperado pelas regras: {esperado}, obtido: {obtido}"
+        if rota["filtros"] != filtros_esperados:
+            aviso += f"  <- filtros esperados: {filtros_esperados}"
+        erros += bool(aviso)
+        print(f"Query: '{query}' -> Tipo: {rota['tipo']} ({rota['nivel']}, filtros: {rota['filtros']}){aviso}")
+    print(estatisticas_roteador())
+    raise SystemExit(1 if erros else 0)
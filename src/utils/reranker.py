@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+from src.config import MODELO_RERANKER, carregar_ambiente
+from src.utils.embedding_cache import normalizar_texto
+from src.utils.instrumentacao import etapa, incrementar
+from src.utils.query_cache import CacheLRUTTL
+
+carregar_ambiente()
+
+# Candidatos da primeira etapa enviados ao cross-encoder, pares por chamada ao modelo e orçamento por query (ms)
+N_CANDIDATOS_RERANK = int(os.environ.get("RAG_RERANK_CANDIDATOS", "30"))
+TAMANHO_LOTE_RERANK = int(os.environ.get("RAG_RERANK_LOTE", "8"))
+ORCAMENTO_RERANK_MS = float(os.environ.get("RAG_RERANK_ORCAMENTO_MS", "150"))
+
+# Scores já calculados por (modelo, query normalizada, chunk, texto do trecho)
+cache_scores_rerank = CacheLRUTTL(int(os.environ.get("RAG_CACHE_RERANK_MAX", "65536")),
+                                  float(os.environ.get("RAG_CACHE_RERANK_TTL", "3600")))
+
+# Custo médio (s) por par query-trecho de cada modelo, atualizado a cada lote (média móvel exponencial)
+_custo_por_par = {}
+_custo_lock = threading.Lock()
+PESO_CUSTO_RECENTE = 0.3
+
+
+def _chave_score(model_name, query_normalizada, resultado):
+    return (model_name, query_normalizada, resultado.get("chunk_id") or resultado["nome_arquivo"], hash(resultado["trecho"]))
+
+
+def _registrar_custo(model_name, segundos, n_pares):
+    with _custo_lock:
+        anterior = _custo_por_par.get(model_name)
+        atual = segundos / n_pares
+        _custo_por_par[model_name] = atual if anterior is None else (1 - PESO_CUSTO_RECENTE) * anterior + PESO_CUSTO_RECENTE * atual
+
+
+def reranquear(query, resultados, model_name=MODELO_RERANKER, n_results=None, orcamento_ms=ORCAMENTO_RERANK_MS,
+               tamanho_lote=TAMANHO_LOTE_RERANK, device="cpu"):
+    """
+    Segunda etapa da busca: reordena os candidatos da primeira etapa com um cross-encoder, dentro de um orçamento de tempo.
+
+    O cross-encoder lê query e trecho juntos e pontua a relevância bem melhor que a
+    distância entre embeddings, mas custa uma passada do modelo por par. Por isso:
+      - os scores ficam em cache por (query, chunk); só os pares ausentes vão ao modelo;
+      - os pares são pontuados em lotes, na ordem da primeira etapa (os mais promissores primeiro);
+      - antes de cada lote, o custo estimado (média dos lotes anteriores) é comparado
+        com o que resta do orçamento: se não couber, a pontuação para (saída antecipada).
+
+    Os candidatos pontuados vêm primeiro, ordenados pelo cross-encoder; os que ficaram
+    sem score (orçamento esgotado) seguem na ordem da primeira etapa.
+
+    Args:
+        query (str): Texto da busca.
+        resultados (list de dict): Resultados da primeira etapa (com 'nome_arquivo' e 'trecho'), do mais ao menos relevante.
+        model_name (str, optional): Modelo cross-encoder. Padrão: `RAG_MODELO_RERANKER`.
+        n_results (int, optional): Número de resultados retornados. Padrão: todos.
+        orcamento_ms (float, optional): Tempo máximo de pontuação por query (ms). Padrão: `RAG_RERANK_ORCAMENTO_MS` ou 150.
+            None: sem limite.
+        tamanho_lote (int, optional): Pares por chamada ao modelo. Padrão: `RAG_RERANK_LOTE` ou 8.
+        device (str, optional): Dispositivo do modelo. Padrão: "cpu".
+
+    Returns:
+        list de dict: Cópias dos resultados com 'score_reranker' (maior = mais relevante; None se não pontuado).
+    """
+    from src.utils.model_registry import obter_reranker
+
+    if not resultados:
+        return []
+
+    with etapa("reranqueamento"):
+        inicio = time.perf_counter()
+        prazo = inicio + orcamento_ms / 1000 if orcamento_ms is not None else None
+        query_normalizada = normalizar_texto(query)
+        chaves = [_chave_score(model_name, query_normalizada, resultado) for resultado in resultados]
+
+        scores = [None] * len(resultados)
+        pendentes = []
+        for i, chave in enumerate(chaves):
+            encontrado, score = cache_scores_rerank.obter(chave)
+            if encontrado:
+                scores[i] = score
+            else:
+                pendentes.append(i)
+        incrementar("reranker_pares_total", len(resultados) - len(pendentes), origem="cache")
+
+        modelo = obter_reranker(model_name, device=device) if pendentes else None
+        pontuados = 0
+        for inicio_lote in range(0, len(pendentes), tamanho_lote):
+            lote = pendentes[inicio_lote:inicio_lote + tamanho_lote]
+            custo_par = _custo_por_par.get(model_name)
+            if prazo is not None and custo_par is not None and time.perf_counter() + custo_par * len(lote) > prazo:
+                incrementar("reranker_interrompidos_total")
+                break
+
+            inicio_modelo = time.perf_counter()
+            calculados = modelo.predict([(query, resultados[i]["trecho"] or "") for i in lote],
+                                        batch_size=len(lote), show_progress_bar=False)
+            _registrar_custo(model_name, time.perf_counter() - inicio_modelo, len(lote))
+            for i, score in zip(lote, calculados):
+                scores[i] = float(score)
+                cache_scores_rerank.gravar(chaves[i], scores[i])
+            pontuados += len(lote)
+        incrementar("reranker_pares_total", pontuados, origem="modelo")
+
+        # Pontuados pelo cross-encoder primeiro; o restante na ordem original (sort estável)
+        ordem = sorted(range(len(resultados)), key=lambda i: (scores[i] is None, -(scores[i] or 0.0)))
+        reranqueados = [{**resultados[i], "score_reranker": scores[i]} for i in ordem]
+    return reranqueados[:n_results] if n_results is not None else reranqueados
+
+
+def estatisticas_reranker():
+    """Retorna os contadores do cache de scores e o custo médio estimado por par (ms) de cada modelo."""
+    with _custo_lock:
+        custos = {modelo: custo * 1000 for modelo, custo in _custo_por_par.items()}
+    return {"cache": cache_scores_rerank.estatisticas(), "custo_por_par_ms": custos}
@@ -0,0 +1,75 @@
+import time
+from src.database.database_operations import contar_documentos, listar_documentos
+from src.utils.busca_hibrida import buscar_documentos_hibrido
+from src.utils.controle_acesso import filtro_niveis_acesso
+from src.utils.instrumentacao import etapa, medir_consulta, rotular_consulta
+from src.utils.query_classifier import ContadoresLatencia, rotear_query
+from src.utils.reranker import MODELO_RERANKER, N_CANDIDATOS_RERANK, RERANKER_ATIVO, reranquear
+
+# Máximo de documentos devolvidos por uma query de listagem
+LIMITE_LISTAGEM = 100
+
+contadores_rotas = ContadoresLatencia()
+
+
+def responder_query(query, model_name, index_name="documentos_index", n_results=30, tipo_documento_filtro=None,
+                    backend=None, limite_listagem=LIMITE_LISTAGEM, concessao=None, usar_reranker=RERANKER_ATIVO,
+                    modelo_reranker=MODELO_RERANKER):
+    """
+    Responde a query pela rota mais barata que a atende.
+
+    Contagens e listagens ("Quantos arquivos PDF", "Listar os arquivos modificados
+    em 2024") são respondidas com COUNT/SELECT indexados sobre 'metadados', sem
+    carregar modelo algum; as demais vão para a busca híbrida e, com o
+    re-ranqueador ativo, os `N_CANDIDATOS_RERANK` primeiros candidatos dela são
+    reordenados por um cross-encoder (`src.utils.reranker`).
+
+    Args:
+        query (str): A query do usuário.
+        model_name (str): Modelo de embedding usado na indexação (só a busca semântica o usa).
+        tipo_documento_filtro (str, optional): Filtro de tipo informado pelo usuário; tem precedência
+            sobre o tipo extraído da query.
+        limite_listagem (int, optional): Máximo de documentos de uma listagem. Padrão: 100.
+        concessao (str, optional): Concessão de `controle_acesso.abrir_sessao`; contagens, listagens e buscas
+            só enxergam os níveis de acesso liberados por ela (sem ela, só os documentos públicos).
+        usar_reranker (bool, optional): Re-ranqueia a busca com um cross-encoder. Padrão: `RAG_RERANKER`.
+        modelo_reranker (str, optional): Modelo cross-encoder. Padrão: `RAG_MODELO_RERANKER`.
+        Demais argumentos: ver `buscar_documentos_hibrido`.
+
+    Returns:
+        dict: 'tipo', 'nivel' e 'filtros' da rota (ver `rotear_query`) e, conforme o tipo,
+              'total' (contagem; None em caso de erro), 'documentos' (listagem) ou 'resultados' (busca).
+    """
+    with medir_consulta("consulta", query):
+        with etapa("roteamento"):
+            rota = rotear_query(query)
+        rotular_consulta(rota["tipo"])
+        filtros = dict(rota["filtros"])
+        if tipo_documento_filtro:
+            filtros["tipo_documento"] = tipo_documento_filtro
+
+        inicio = time.perf_counter()
+        if rota["tipo"] == "contagem":
+            with etapa("agregacao_sql"):
+                resposta = {"total": contar_documentos(**filtros, niveis_acesso=filtro_niveis_acesso(concessao))}
+        elif rota["tipo"] == "listagem":
+            with etapa("agregacao_sql"):
+                resposta = {"documentos": listar_documentos(**filtros, limite=limite_listagem,
+                                                            niveis_acesso=filtro_niveis_acesso(concessao))}
+        else:
+            resultados = buscar_documentos_hibrido(
+                query, model_name, index_name=index_name,
+                n_results=max(n_results, N_CANDIDATOS_RERANK) if usar_reranker else n_results,
+                tipo_documento_filtro=filtros.get("tipo_documento"), backend=backend, concessao=concessao,
+            )
+            if usar_reranker:
+                resultados = reranquear(query, resultados, model_name=modelo_reranker, n_results=n_results)
+            resposta = {"resultados": resultados}
+        contadores_rotas.registrar(rota["tipo"], time.perf_counter() - inicio)
+
+    return {**rota, "filtros": filtros, **resposta}
+
+
+def estatisticas_rotas():
+    """Retorna as queries e a latência de execução por rota (contagem, listagem, busca_semantica)."""
+    return contadores_rotas.estatisticas()
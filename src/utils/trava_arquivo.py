@@ -0,0 +1,74 @@
+import os
+import threading
+from contextlib import contextmanager
+
+# Locks de threads por arquivo de trava: o lock do sistema (flock) é por descritor aberto, e duas
+# threads do mesmo processo abrindo o mesmo arquivo não se excluiriam de forma portável
+_locks_locais = {}
+_locks_locais_lock = threading.Lock()
+
+
+class _TravaLocal:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.dona = None  # Thread que detém a trava (a trava é reentrante nela)
+
+
+def _trava_local(caminho):
+    with _locks_locais_lock:
+        return _locks_locais.setdefault(os.path.abspath(caminho), _TravaLocal())
+
+
+@contextmanager
+def trava_arquivo(caminho):
+    """
+    Trava exclusiva entre processos (e entre threads do processo) sobre um arquivo de trava.
+
+    Usada nas escritas de arquivos compartilhados pela indexação (`rag-sys index`)
+    e pelo serviço de busca rodando ao mesmo tempo; o arquivo de trava é criado se
+    não existir e nunca é removido. A trava é liberada pelo sistema se o processo
+    morrer com ela. Reentrante dentro da mesma thread.
+
+    Args:
+        caminho (str): Caminho do arquivo de trava (ex.: "<diretório>/.trava").
+    """
+    local = _trava_local(caminho)
+    if local.dona == threading.get_ident():  # Reentrada: a trava já é desta thread
+        yield
+        return
+
+    with local.lock:
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        with open(caminho, "a+b") as arquivo:
+            _travar(arquivo)
+            local.dona = threading.get_ident()
+            try:
+                yield
+            finally:
+                local.dona = None
+                _destravar(arquivo)
+
+
+if os.name == "nt":
+    import msvcrt
+
+    def _travar(arquivo):
+        arquivo.seek(0)
+        while True:
+            try:
+                msvcrt.locking(arquivo.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:  # LK_LOCK desiste após ~10 s; a trava é esperada indefinidamente
+                continue
+
+    def _destravar(arquivo):
+        arquivo.seek(0)
+        msvcrt.locking(arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _travar(arquivo):
+        fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX)
+
+    def _destravar(arquivo):
+        fcntl.flock(arquivo.fileno(), fcntl.LOCK_UN)
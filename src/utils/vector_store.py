@@ -0,0 +1,103 @@
+import os
+from src.config import DATABASE_DIR, carregar_ambiente
+
+carregar_ambiente()
+
+# Armazenamento dos vetores: "chroma" (HNSW do ChromaDB), "numpy" (busca exata sobre uma matriz mapeada em memória)
+# ou "particionado" (shards chroma ou numpy, cada um em um processo próprio)
+ARMAZENAMENTO_CHROMA = "chroma"
+ARMAZENAMENTO_NUMPY = "numpy"
+ARMAZENAMENTO_PARTICIONADO = "particionado"
+ARMAZENAMENTOS = (ARMAZENAMENTO_CHROMA, ARMAZENAMENTO_NUMPY, ARMAZENAMENTO_PARTICIONADO)
+
+ARMAZENAMENTO_PADRAO = os.environ.get("RAG_VECTOR_STORE", ARMAZENAMENTO_CHROMA)
+
+# Diretório padrão de cada armazenamento
+DIRETORIOS_ARMAZENAMENTO = {
+    ARMAZENAMENTO_CHROMA: os.path.join(DATABASE_DIR, "chroma_db"),
+    ARMAZENAMENTO_NUMPY: os.path.join(DATABASE_DIR, "vetores_numpy"),
+    ARMAZENAMENTO_PARTICIONADO: os.path.join(DATABASE_DIR, "vetores_particionados"),
+}
+
+
+class VectorStore:
+    """
+    Interface comum das coleções de vetores.
+
+    É o subconjunto da API de `chromadb.Collection` usado pelo projeto, de modo
+    que uma coleção do ChromaDB já a satisfaz e `src.utils.db_vectores` funciona
+    sem alterações sobre qualquer implementação. Os filtros `where` seguem a
+    sintaxe do ChromaDB ($eq, $ne, $in, $nin, $gt, $gte, $lt, $lte, $and, $or).
+
+    As sessões (`SessaoChroma`, `SessaoNumpy`, `SessaoParticionada`) expõem `persist_path`,
+    `obter_colecao`, `executar`, `esquecer_colecao` e `reabrir`.
+    """
+
+    def upsert(self, ids, embeddings, metadatas=None, documents=None):
+        """Insere ou substitui os vetores (com metadados e textos) dos IDs informados."""
+        raise NotImplementedError
+
+    def delete(self, ids=None, where=None):
+        """Remove os vetores com os IDs informados e/ou que satisfazem o filtro `where`."""
+        raise NotImplementedError
+
+    def query(self, query_embeddings, n_results=10, where=None, include=("metadatas", "documents", "distances")):
+        """
+        Retorna os `n_results` vizinhos mais próximos de cada query.
+
+        Returns:
+            dict: 'ids', 'distances', 'documents' e 'metadatas', cada um com uma lista por query.
+        """
+        raise NotImplementedError
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("metadatas", "documents")):
+        """
+        Retorna os registros com os IDs informados e/ou que satisfazem `where`.
+
+        Returns:
+            dict: 'ids' e os campos de `include` ('metadatas', 'documents', 'embeddings'), em listas paralelas.
+        """
+        raise NotImplementedError
+
+    def count(self):
+        """Número de vetores na coleção."""
+        raise NotImplementedError
+
+
+def validar_armazenamento(armazenamento):
+    """Retorna o armazenamento informado (ou o padrão) e levanta ValueError se ele não existir."""
+    armazenamento = armazenamento or ARMAZENAMENTO_PADRAO
+    if armazenamento not in ARMAZENAMENTOS:
+        raise ValueError(f"Armazenamento vetorial desconhecido: '{armazenamento}'. Opções: {', '.join(ARMAZENAMENTOS)}")
+    return armazenamento
+
+
+def obter_sessao_vetorial(armazenamento=None, persist_path=None):
+    """
+    Retorna a sessão compartilhada do processo para o armazenamento vetorial escolhido.
+
+    Args:
+        armazenamento (str, optional): "chroma", "numpy" ou "particionado". Padrão: `RAG_VECTOR_STORE` ou "chroma".
+        persist_path (str, optional): Diretório do armazenamento. Padrão: `data/chroma_db`, `data/vetores_numpy`
+            ou `data/vetores_particionados`.
+
+    Returns:
+        SessaoChroma, SessaoNumpy or SessaoParticionada: A sessão associada ao caminho.
+    """
+    armazenamento = validar_armazenamento(armazenamento)
+    persist_path = persist_path or DIRETORIOS_ARMAZENAMENTO[armazenamento]
+
+    # Importação tardia: quem usa só o armazenamento NumPy não carrega o chromadb
+    if armazenamento == ARMAZENAMENTO_NUMPY:
+        from src.utils.numpy_store import obter_sessao_numpy
+
+        return obter_sessao_numpy(persist_path)
+
+    if armazenamento == ARMAZENAMENTO_PARTICIONADO:
+        from src.utils.particionamento import obter_sessao_particionada
+
+        return obter_sessao_particionada(persist_path)
+
+    from src.utils.chroma_session import obter_sessao_chroma
+
+    return obter_sessao_chroma(persist_path)